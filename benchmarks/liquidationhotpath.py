@@ -0,0 +1,217 @@
+#!/usr/bin/env pyston3
+
+import argparse
+import gc
+import json
+import logging
+import math
+import os
+import os.path
+import sys
+import time
+import tracemalloc
+import typing
+
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+import mango  # nopep8
+from tests.rpcstandin import FAKE_PRICES, fake_group_snapshot, fake_mainnet_context  # nopep8
+
+# # 🥭 Liquidation hot path benchmark
+#
+# Times the CPU-bound steps of the liquidator against synthetic groups of (by default) 1,000
+# and 10,000 margin accounts, generated by `fake_group_snapshot()`. Pass
+# `--sizes 1000 10000 100000` to include a mainnet-sized group, which takes much longer. Every margin
+# account has a USDC deposit and a borrow, and every third one has an `OpenOrders` account.
+#
+# The steps timed are:
+# * `Group.parse()`
+# * `MarginAccount.parse()`
+# * `MarginAccount.install_open_orders_accounts()`
+# * `MarginAccount.filter_out_unripe()`
+# * `LiquidatableReport.build()`
+# * `LiquidationProcessor.update_prices()` (with the `Null` liquidator and wallet balancer)
+#
+# No RPC requests are made - everything is parsed from the generated accounts.
+#
+# For each step the fastest of --repeat runs gives the throughput (quick steps are looped so
+# each run takes at least --minimum-seconds), and a separate run under
+# `tracemalloc` gives the peak memory allocated.
+#
+# Results are compared with the baseline file. A step that is more than --tolerance slower,
+# or that uses more than --tolerance more memory, than its baseline is a regression, and the
+# benchmark exits with status 1. Use --save-baseline to store the results as the new
+# baseline. Baselines only mean something on the machine that made them, so none is
+# committed. With --save-missing-baseline, results for any of the --sizes that the baseline
+# doesn't have yet are saved to it rather than checked, so the first run on a machine makes
+# its baseline and later runs are compared with it. This is what `make bench` does.
+# Otherwise a missing baseline (or missing baseline results for one of the --sizes) means the
+# benchmark can't check anything, so it stops with status 2 before running.
+#
+
+parser = argparse.ArgumentParser(description="Benchmark the liquidator's hot path against synthetic groups.")
+parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000],
+                    help="numbers of margin accounts to generate (one group for each)")
+parser.add_argument("--ripe-fraction", type=float, default=0.1,
+                    help="fraction of generated margin accounts that are ripe")
+parser.add_argument("--repeat", type=int, default=3,
+                    help="number of times to run each benchmark - the fastest run is reported")
+parser.add_argument("--minimum-seconds", type=float, default=0.2,
+                    help="shortest time for one run - quick benchmarks are looped until they take this long")
+parser.add_argument("--baseline-filename", type=str,
+                    default=os.path.join(os.path.dirname(__file__), "baselines", "liquidationhotpath.json"),
+                    help="name of the JSON file holding baseline results")
+parser.add_argument("--tolerance", type=float, default=0.25,
+                    help="fraction a result can be worse than its baseline before it is a regression")
+parser.add_argument("--save-baseline", action="store_true", default=False,
+                    help="store these results as the new baseline")
+parser.add_argument("--save-missing-baseline", action="store_true", default=False,
+                    help="store results for sizes the baseline doesn't have yet instead of stopping")
+args = parser.parse_args()
+
+logging.getLogger().setLevel(logging.ERROR)
+
+
+class BenchmarkResult(typing.NamedTuple):
+    item_count: int
+    seconds: float
+    peak_memory: int
+
+    @property
+    def per_second(self) -> float:
+        return self.item_count / self.seconds
+
+    def to_json(self) -> typing.Dict[str, float]:
+        return {"per_second": self.per_second, "peak_memory": self.peak_memory}
+
+
+def run_benchmark(func: typing.Callable[[], typing.Any], count: int, repeat: int, minimum_seconds: float) -> BenchmarkResult:
+    loops = max(1, math.ceil(minimum_seconds / max(_time_loops(func, 1), 1e-9)))
+    fastest = min(_time_loops(func, loops) for _ in range(repeat)) / loops
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return BenchmarkResult(count, fastest, peak_memory)
+
+
+def _time_loops(func: typing.Callable[[], typing.Any], loops: int) -> float:
+    # Like `timeit`, keep the garbage collector out of the timings.
+    gc.collect()
+    gc.disable()
+    try:
+        started_at = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - started_at
+    finally:
+        gc.enable()
+
+
+def benchmark_size(context: mango.Context, size: int) -> typing.Dict[str, BenchmarkResult]:
+    snapshot = fake_group_snapshot(context, size, args.ripe_fraction)
+    group_account_info = snapshot.account_info(str(context.group_id))
+    margin_account_infos = [snapshot.account_info(account["pubkey"]) for account in
+                            snapshot.program_accounts(str(context.program_id),
+                                                      [{"dataSize": mango.layouts.MARGIN_ACCOUNT_V2.sizeof()}])]
+    open_orders_by_address = {account["pubkey"]: snapshot.account_info(account["pubkey"]) for account in
+                              snapshot.program_accounts(str(context.dex_program_id), [])}
+
+    group = mango.Group.parse(context, group_account_info)
+    prices = [mango.TokenValue(basket_token.token, price) for basket_token, price
+              in zip(group.basket_tokens, list(FAKE_PRICES) + [Decimal(1)])]
+    margin_accounts = [mango.MarginAccount.parse(account_info, group) for account_info in margin_account_infos]
+    for margin_account in margin_accounts:
+        margin_account.install_open_orders_accounts(group, open_orders_by_address)
+    ripe = mango.MarginAccount.filter_out_unripe(margin_accounts, group, prices)
+
+    liquidation_processor = mango.LiquidationProcessor(context, "Benchmark", mango.NullAccountLiquidator(),
+                                                       mango.NullWalletBalancer(), Decimal("0.01"))
+
+    def install_open_orders_accounts() -> None:
+        for margin_account in margin_accounts:
+            margin_account.install_open_orders_accounts(group, open_orders_by_address)
+
+    def update_prices() -> None:
+        liquidation_processor.update_margin_accounts(ripe)
+        liquidation_processor.update_prices(group, prices)
+
+    group_parse_count = 100
+    benchmarks: typing.Dict[str, typing.Tuple[typing.Callable[[], typing.Any], int]] = {
+        "Group.parse": (lambda: [mango.Group.parse(context, group_account_info) for _ in range(group_parse_count)], group_parse_count),
+        "MarginAccount.parse": (lambda: [mango.MarginAccount.parse(account_info, group) for account_info in margin_account_infos], size),
+        "install_open_orders_accounts": (install_open_orders_accounts, size),
+        "filter_out_unripe": (lambda: mango.MarginAccount.filter_out_unripe(margin_accounts, group, prices), size),
+        "LiquidatableReport.build": (lambda: [mango.LiquidatableReport.build(group, prices, margin_account, Decimal("0.01")) for margin_account in margin_accounts], size),
+        "LiquidationProcessor.update_prices": (update_prices, len(ripe))
+    }
+
+    results: typing.Dict[str, BenchmarkResult] = {}
+    for name, (func, count) in benchmarks.items():
+        results[name] = run_benchmark(func, count, args.repeat, args.minimum_seconds)
+    return results
+
+
+def find_regressions(size: int, results: typing.Dict[str, BenchmarkResult], baseline: typing.Dict[str, typing.Dict[str, float]]) -> typing.List[str]:
+    regressions: typing.List[str] = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result.per_second < expected["per_second"] * (1 - args.tolerance):
+            regressions += [f"{name} ({size:,} accounts): {result.per_second:,.0f}/second, baseline {expected['per_second']:,.0f}/second"]
+        if result.peak_memory > expected["peak_memory"] * (1 + args.tolerance):
+            regressions += [f"{name} ({size:,} accounts): peak memory {result.peak_memory:,} bytes, baseline {expected['peak_memory']:,.0f} bytes"]
+    return regressions
+
+
+baselines: typing.Dict[str, typing.Dict[str, typing.Dict[str, float]]] = {}
+if os.path.isfile(args.baseline_filename):
+    with open(args.baseline_filename) as baseline_file:
+        baselines = json.load(baseline_file)
+
+missing_sizes = [size for size in args.sizes if str(size) not in baselines]
+if args.save_baseline:
+    saved_sizes = list(args.sizes)
+elif args.save_missing_baseline:
+    saved_sizes = missing_sizes
+    if len(missing_sizes) > 0:
+        print(f"Baseline file {args.baseline_filename} has no results for groups of {', '.join(f'{size:,}' for size in missing_sizes)} margin accounts - saving these results as their baseline.")
+elif not os.path.isfile(args.baseline_filename):
+    print(f"No baseline file {args.baseline_filename} - create one with --save-baseline (or 'make bench-baseline') or pass --baseline-filename.")
+    sys.exit(2)
+elif len(missing_sizes) > 0:
+    print(f"Baseline file {args.baseline_filename} has no results for groups of {', '.join(f'{size:,}' for size in missing_sizes)} margin accounts - save a new baseline with those --sizes.")
+    sys.exit(2)
+else:
+    saved_sizes = []
+
+context = fake_mainnet_context()
+regressions: typing.List[str] = []
+for size in args.sizes:
+    print(f"Group with {size:,} margin accounts:")
+    results = benchmark_size(context, size)
+    for name, result in results.items():
+        print(f"    {name:<36} {result.seconds:8.3f} seconds  {result.per_second:>12,.0f}/second  {result.peak_memory / (1024 * 1024):>8.1f} MB peak")
+
+    if size in saved_sizes:
+        baselines[str(size)] = {name: result.to_json() for name, result in results.items()}
+    else:
+        regressions += find_regressions(size, results, baselines.get(str(size), {}))
+
+if len(saved_sizes) > 0:
+    os.makedirs(os.path.dirname(os.path.abspath(args.baseline_filename)), exist_ok=True)
+    with open(args.baseline_filename, "w") as baseline_file:
+        json.dump(baselines, baseline_file, indent=4, sort_keys=True)
+    print(f"Baseline saved to {args.baseline_filename}.")
+
+if len(regressions) > 0:
+    regressions_text = "\n    ".join(regressions)
+    print(f"Regressions (tolerance {args.tolerance:.0%}):\n    {regressions_text}")
+    sys.exit(1)
@@ -0,0 +1,98 @@
+#!/usr/bin/env pyston3
+
+import argparse
+import datetime
+import logging
+import os
+import os.path
+import sys
+import time
+import typing
+
+from decimal import Decimal
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+import mango  # nopep8
+from tests.rpcstandin import AccountSnapshot, StandInRpcServer, fake_group_snapshot, fake_mainnet_context  # nopep8
+
+# # 🥭 Liquidator throughput benchmark
+#
+# Times `MarginAccount.load_ripe()` and a `LiquidationProcessor` price update against a local
+# `StandInRpcServer`, so the liquidator's hot path can be measured without a public RPC node.
+#
+# The server serves either a snapshot saved with `AccountSnapshot.save()` (via
+# --snapshot-filename) or a generated group with --margin-accounts margin accounts. Latency
+# and rate limits can be added to see how the liquidator behaves against a slower node.
+#
+# The liquidator and wallet balancer are the `Null` versions, so no transactions are built
+# or sent - this measures loading, parsing and balance-sheet work.
+#
+
+parser = argparse.ArgumentParser(description="Benchmark loading and processing ripe margin accounts against a local stand-in RPC server.")
+parser.add_argument("--snapshot-filename", type=str,
+                    help="name of an AccountSnapshot JSON file to serve instead of a generated group")
+parser.add_argument("--save-snapshot-filename", type=str,
+                    help="save the generated group snapshot to this file")
+parser.add_argument("--margin-accounts", type=int, default=1000,
+                    help="number of margin accounts to generate if no snapshot is given")
+parser.add_argument("--ripe-fraction", type=float, default=0.1,
+                    help="fraction of generated margin accounts that are ripe")
+parser.add_argument("--latency-ms", type=int, default=0,
+                    help="milliseconds of latency to add to every RPC request")
+parser.add_argument("--max-requests-per-second", type=int, default=0,
+                    help="rate-limit the server to this many requests per second (0 for no limit)")
+parser.add_argument("--repeat", type=int, default=3,
+                    help="number of times to run each benchmark - the fastest run is reported")
+args = parser.parse_args()
+
+logging.getLogger().setLevel(logging.ERROR)
+
+
+def time_fastest(name: str, func: typing.Callable[[], typing.Any], repeat: int, count: int) -> float:
+    fastest = min(_time_once(func) for _ in range(repeat))
+    print(f"{name:<30} {fastest:8.3f} seconds  {count / fastest:>10,.0f} accounts/second")
+    return fastest
+
+
+def _time_once(func: typing.Callable[[], typing.Any]) -> float:
+    started_at = time.perf_counter()
+    func()
+    return time.perf_counter() - started_at
+
+
+context = fake_mainnet_context()
+if args.snapshot_filename is not None:
+    snapshot = AccountSnapshot.load(args.snapshot_filename)
+    print(f"Snapshot: {len(snapshot)} accounts from {args.snapshot_filename}")
+else:
+    snapshot = fake_group_snapshot(context, args.margin_accounts, args.ripe_fraction)
+    print(f"Snapshot: {len(snapshot)} generated accounts ({args.margin_accounts} margin accounts)")
+    if args.save_snapshot_filename is not None:
+        snapshot.save(args.save_snapshot_filename)
+
+with StandInRpcServer(snapshot, datetime.timedelta(milliseconds=args.latency_ms), args.max_requests_per_second) as server:
+    standin_context = server.context_for(context)
+    group = mango.Group.load(standin_context)
+    prices = group.fetch_token_prices(standin_context)
+    margin_account_count = len(snapshot.program_accounts(str(standin_context.program_id),
+                                                         [{"dataSize": mango.layouts.MARGIN_ACCOUNT_V2.sizeof()}]))
+
+    ripe: typing.List[mango.MarginAccount] = []
+
+    def load_ripe() -> None:
+        global ripe
+        ripe = mango.MarginAccount.load_ripe(standin_context, group)
+
+    time_fastest("MarginAccount.load_ripe()", load_ripe, args.repeat, margin_account_count)
+    print(f"Ripe accounts: {len(ripe)}")
+
+    liquidation_processor = mango.LiquidationProcessor(standin_context, "Benchmark", mango.NullAccountLiquidator(),
+                                                       mango.NullWalletBalancer(), Decimal("0.01"))
+
+    def update_prices() -> None:
+        liquidation_processor.update_margin_accounts(ripe)
+        liquidation_processor.update_prices(group, prices)
+
+    time_fastest("LiquidationProcessor update", update_prices, args.repeat, len(ripe))
+    print(f"RPC requests: {dict(server.request_counts)} ({server.rate_limited_count} rate-limited)")
@@ -0,0 +1,72 @@
+import os
+import os.path
+import pytest
+import sys
+import tempfile
+import typing
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+import mango  # nopep8
+from tests.fakes import fake_deposit_transaction_response  # nopep8
+from tests.rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context  # nopep8
+
+pytest.importorskip("pytest_benchmark")
+
+# # 🥭 Replayed hot path benchmarks
+#
+# These benchmarks run the liquidator's hot paths against a `ReplayingClient`, so the timings
+# measure parsing and balance-sheet work and not the network.
+#
+# The recording is made once per session against a local `StandInRpcServer` and then replayed
+# at full speed. Run them with:
+# ```
+# pytest benchmarks/test_replayedhotpaths.py
+# ```
+# and compare runs with pytest-benchmark's `--benchmark-autosave` and `--benchmark-compare`.
+#
+
+MARGIN_ACCOUNT_COUNT = 1000
+SIGNATURE = "benchmark signature"
+
+
+@pytest.fixture(scope="module")
+def replaying_context() -> typing.Iterator[mango.Context]:
+    context = fake_mainnet_context()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "recording.jsonl.gz")
+        with StandInRpcServer(fake_group_snapshot(context, MARGIN_ACCOUNT_COUNT)) as server:
+            server.add_transaction(SIGNATURE, fake_deposit_transaction_response(context, SIGNATURE, 1, 100))
+            standin_context = server.context_for(context)
+            recorder = mango.RpcRecorder(filename)
+            standin_context.client.compatible_client.recorder = recorder
+            group = mango.Group.load(standin_context)
+            group.fetch_token_prices(standin_context)
+            mango.MarginAccount.load_ripe(standin_context, group)
+            mango.TransactionScout.load(standin_context, SIGNATURE)
+            recorder.close()
+
+        replaying = mango.Context(context.cluster, context.cluster_url, context.program_id,
+                                  context.dex_program_id, context.group_name, context.group_id)
+        replaying.client = mango.BetterClient(mango.ReplayingClient("Benchmark", context.cluster, filename))
+        yield replaying
+
+
+@pytest.fixture(scope="module")
+def group(replaying_context: mango.Context) -> mango.Group:
+    return mango.Group.load(replaying_context)
+
+
+def test_load_ripe(benchmark, replaying_context: mango.Context, group: mango.Group):
+    ripe = benchmark(mango.MarginAccount.load_ripe, replaying_context, group)
+    assert len(ripe) > 0
+
+
+def test_fetch_token_prices(benchmark, replaying_context: mango.Context, group: mango.Group):
+    prices = benchmark(group.fetch_token_prices, replaying_context)
+    assert len(prices) == len(group.basket_tokens)
+
+
+def test_transaction_scout_load(benchmark, replaying_context: mango.Context):
+    scout = benchmark(mango.TransactionScout.load, replaying_context, SIGNATURE)
+    assert scout.signatures == [SIGNATURE]
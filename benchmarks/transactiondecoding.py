@@ -0,0 +1,129 @@
+#!/usr/bin/env pyston3
+
+import argparse
+import base58
+import json
+import logging
+import os
+import os.path
+import random
+import sqlite3
+import sys
+import time
+import typing
+
+from solana.publickey import PublicKey
+
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..')))
+import mango  # nopep8
+
+# # 🥭 Transaction decoding benchmark
+#
+# Compares decoding a corpus of Mango transactions the original way (a separate variant
+# parse, an uncompiled `construct` parser and a new `PublicKey` for every account of every
+# transaction) with decoding them through an `InstructionDecoderRegistry`.
+#
+# The corpus is either the transactions recorded in a `TransactionStore` SQLite file (via
+# --store-filename) or a generated corpus of deposit, withdraw and borrow transactions.
+#
+
+parser = argparse.ArgumentParser(description="Benchmark decoding Mango transactions.")
+parser.add_argument("--cluster", type=str, default="devnet",
+                    help="Solana RPC cluster name (used for group name lookups)")
+parser.add_argument("--store-filename", type=str,
+                    help="name of a TransactionStore SQLite file to use as the corpus")
+parser.add_argument("--count", type=int, default=2000,
+                    help="number of transactions to generate if no store is given")
+parser.add_argument("--repeat", type=int, default=3,
+                    help="number of times to decode the corpus - the fastest run is reported")
+args = parser.parse_args()
+
+logging.getLogger().setLevel(logging.ERROR)
+
+
+def load_corpus(store_filename: str) -> typing.List[typing.Dict]:
+    connection = sqlite3.connect(store_filename)
+    rows = connection.execute("SELECT response FROM transactions").fetchall()
+    connection.close()
+    return [json.loads(row[0]) for row in rows]
+
+
+def generate_corpus(context: mango.Context, count: int) -> typing.List[typing.Dict]:
+    randomiser = random.Random(42)
+    keys = [str(PublicKey.create_with_seed(context.program_id, f"account {index}", PublicKey("11111111111111111111111111111111"))) for index in range(20)]
+    builders = [
+        lambda: mango.layouts.DEPOSIT.build({"quantity": randomiser.randint(1, 10 ** 12)}),
+        lambda: mango.layouts.WITHDRAW.build({"quantity": randomiser.randint(1, 10 ** 12)}),
+        lambda: mango.layouts.BORROW.build({"token_index": randomiser.randint(0, 4), "quantity": randomiser.randint(1, 10 ** 12)})
+    ]
+    corpus: typing.List[typing.Dict] = []
+    for index in range(count):
+        account_keys = randomiser.sample(keys, 8) + [str(context.program_id)]
+        instructions = [{
+            "programIdIndex": 8,
+            "accounts": [0, 1, 2, 3, 4, 5],
+            "data": base58.b58encode(randomiser.choice(builders)()).decode("ascii")
+        } for _ in range(3)]
+        corpus += [{
+            "slot": index,
+            "blockTime": 1620000000 + index,
+            "meta": {"err": None, "logMessages": [], "preTokenBalances": [], "postTokenBalances": []},
+            "transaction": {
+                "signatures": [f"signature {index}"],
+                "message": {"accountKeys": account_keys, "instructions": instructions}
+            }
+        }]
+    return corpus
+
+
+def legacy_decode(context: mango.Context, response: typing.Dict) -> typing.List[typing.Any]:
+    accounts = list(map(PublicKey, response["transaction"]["message"]["accountKeys"]))
+    decoded: typing.List[typing.Any] = []
+    for instruction_data in response["transaction"]["message"]["instructions"]:
+        if accounts[instruction_data["programIdIndex"]] != context.program_id:
+            continue
+        data = base58.b58decode(instruction_data["data"])
+        initial = mango.layouts.MANGO_INSTRUCTION_VARIANT_FINDER.parse(data)
+        parser = mango.layouts.InstructionParsersByVariant[initial.variant]
+        instruction_accounts: typing.List[PublicKey] = []
+        for account_index in instruction_data["accounts"]:
+            instruction_accounts += [accounts[account_index]]
+        decoded += [(parser.parse(data), instruction_accounts)]
+    return decoded
+
+
+def registry_decode(context: mango.Context, decoder: mango.InstructionDecoderRegistry, response: typing.Dict) -> typing.List[typing.Any]:
+    accounts = decoder.public_keys(response["transaction"]["message"]["accountKeys"])
+    return [mango.MangoInstruction.from_response(context, accounts, instruction_data, decoder)
+            for instruction_data in response["transaction"]["message"]["instructions"]]
+
+
+def time_fastest(name: str, func: typing.Callable[[], typing.Any], repeat: int, count: int) -> float:
+    fastest = min(_time_once(func) for _ in range(repeat))
+    print(f"{name:<30} {fastest:8.3f} seconds  {count / fastest:>10,.0f} transactions/second")
+    return fastest
+
+
+def _time_once(func: typing.Callable[[], typing.Any]) -> float:
+    started_at = time.perf_counter()
+    func()
+    return time.perf_counter() - started_at
+
+
+# Nothing is fetched from the cluster, so it's fine to use a placeholder URL and addresses.
+placeholder = PublicKey("11111111111111111111111111111112")
+context = mango.Context(args.cluster, "http://localhost", placeholder, placeholder, "BTC_ETH_USDT", placeholder)
+if args.store_filename is not None:
+    corpus = load_corpus(args.store_filename)
+    print(f"Corpus: {len(corpus)} transactions from {args.store_filename}")
+else:
+    corpus = generate_corpus(context, args.count)
+    print(f"Corpus: {len(corpus)} generated transactions")
+
+decoder = mango.InstructionDecoderRegistry()
+legacy = time_fastest("Legacy decoding", lambda: [legacy_decode(context, response)
+                                                  for response in corpus], args.repeat, len(corpus))
+registry = time_fastest("Registry decoding", lambda: [registry_decode(context, decoder, response)
+                                                      for response in corpus], args.repeat, len(corpus))
+print(f"Speedup: {legacy / registry:.2f}x")
@@ -3,41 +3,56 @@ from .accountliquidator import AccountLiquidator, NullAccountLiquidator, ActualA
 from .accountscout import ScoutReport, AccountScout
 from .addressableaccount import AddressableAccount
 from .aggregator import AggregatorConfig, Round, Answer, Aggregator
+from .backtest import BacktestFrame, BacktestParameters, BacktestResult, BacktestState, SimulatedTradeExecutor, SimulatedAccountLiquidator, Backtester
 from .balancesheet import BalanceSheet
 from .baskettoken import BasketToken
-from .client import CompatibleClient, BetterClient
+from .client import CompatibleClient, ReplayingClient, ReplayMissException, BetterClient
 from .constants import SYSTEM_PROGRAM_ADDRESS, SOL_MINT_ADDRESS, SOL_DECIMALS, SOL_DECIMAL_DIVISOR, WARNING_DISCLAIMER_TEXT, MangoConstants
 from .context import Context, default_cluster, default_cluster_url, default_program_id, default_dex_program_id, default_group_name, default_group_id
 from .encoding import decode_binary, encode_binary, encode_key, encode_int
 from .group import Group
 from .index import Index
-from .instructions import InstructionBuilder, ForceCancelOrdersInstructionBuilder, LiquidateInstructionBuilder, CreateSplAccountInstructionBuilder, InitializeSplAccountInstructionBuilder, TransferSplTokensInstructionBuilder, CloseSplAccountInstructionBuilder, CreateSerumOpenOrdersInstructionBuilder, NewOrderV3InstructionBuilder, ConsumeEventsInstructionBuilder, SettleInstructionBuilder
+from .instructions import InstructionBuilder, ForceCancelOrdersInstructionBuilder, LiquidateInstructionBuilder, CreateSplAccountInstructionBuilder, InitializeSplAccountInstructionBuilder, TransferSplTokensInstructionBuilder, CloseSplAccountInstructionBuilder, CreateSerumOpenOrdersInstructionBuilder, NewOrderV3InstructionBuilder, CancelOrderByClientIdInstructionBuilder, ConsumeEventsInstructionBuilder, SettleInstructionBuilder
 from .instructiontype import InstructionType
 from .liquidatablereport import LiquidatableState, LiquidatableReport
 from .liquidationevent import LiquidationEvent
+from .liquidationqueue import LiquidationQueue
 from .liquidationprocessor import LiquidationProcessor, LiquidationProcessorState
 from .mangoaccountflags import MangoAccountFlags
 from .marginaccount import MarginAccount
 from .market import Market
+from .metrics import Metric, Counter, Gauge, Histogram, MetricsRegistry, MetricsServer, default_metrics_registry
 from .marketmetadata import MarketMetadata
-from .notification import NotificationTarget, TelegramNotificationTarget, DiscordNotificationTarget, MailjetNotificationTarget, CsvFileNotificationTarget, FilteringNotificationTarget, NotificationHandler, parse_subscription_target
+from .notification import NotificationTarget, TelegramNotificationTarget, DiscordNotificationTarget, MailjetNotificationTarget, CsvFileNotificationTarget, FilteringNotificationTarget, BackgroundNotificationTarget, NotificationHandler, parse_subscription_target
 from .observables import PrintingObserverSubscriber, TimestampedPrintingObserverSubscriber, CollectingObserverSubscriber, CaptureFirstItem, FunctionObserver, create_backpressure_skipping_observer, debug_print_item, log_subscription_error, observable_pipeline_error_reporter, EventSource
 from .openorders import OpenOrders
 from .orderplacer import OrderPlacer, NullOrderPlacer, SerumOrderPlacer, Order, Side, OrderType
 from .ownedtokenvalue import OwnedTokenValue
 from .oracle import OracleSource, Price, Oracle, OracleProvider
 from .oraclefactory import create_oracle_provider
+from .oracles.composite.composite import CompositeMode, OracleSourceStatistics, CompositeOracle, CompositeOracleProvider
+from .profiler import SamplingProfiler
 from .retrier import RetryWithPauses, retry_context
+from .rpcrecorder import RpcRecorder
 from .serumaccountflags import SerumAccountFlags
+from .shardedparser import ShardedParser, get_sharded_parser
+from .snapshot import SnapshotAccountKind, Snapshot
 from .spotmarket import SpotMarket, SpotMarketLookup
+from .stresstest import MarginAccountColumns, StressScenarios, StressTestResult, StressTester
 from .token import Token, SolToken, TokenLookup
 from .tokenaccount import TokenAccount
 from .tokenvalue import TokenValue
+from .tracing import SpanStatus, Span, Tracer, NullTracer, MemoryTracer, FileTracer, get_tracer, set_tracer
 from .tradeexecutor import TradeExecutor, NullTradeExecutor, SerumImmediateTradeExecutor
-from .transactionscout import MangoInstruction, TransactionScout, fetch_all_recent_transaction_signatures
+from .transactionbatcher import TransactionBatcher
+from .transactionscout import InstructionDecoderRegistry, MangoInstruction, TransactionScout, fetch_all_recent_transaction_signatures
+from .transactioncrawler import TransactionCrawler
+from .transactionstore import TransactionStore
+from .transactionfeed import TransactionFeed
 from .version import Version
 from .wallet import Wallet
-from .walletbalancer import TargetBalance, FixedTargetBalance, PercentageTargetBalance, TargetBalanceParser, sort_changes_for_trades, calculate_required_balance_changes, FilterSmallChanges, WalletBalancer, NullWalletBalancer, LiveWalletBalancer
+from .websocketsubscription import WebSocketSubscription, WebSocketAccountSubscription, WebSocketLogsSubscription
+from .walletbalancer import TargetBalance, FixedTargetBalance, PercentageTargetBalance, TargetBalanceParser, sort_changes_for_trades, plan_trades, TradeRecord, calculate_required_balance_changes, FilterSmallChanges, WalletBalancer, NullWalletBalancer, LiveWalletBalancer, CoalescingWalletBalancer
 
 from .layouts import layouts
 
@@ -68,12 +68,11 @@ class AccountInfo:
         # Some errors this can generate:
         #  413 Client Error: Payload Too Large for url
         #  Error response from server: 'Too many inputs provided; max 100', code: -32602
-        address_strings: typing.List[str] = list(map(PublicKey.__str__, addresses))
         multiple: typing.List[AccountInfo] = []
-        chunks = AccountInfo._split_list_into_chunks(address_strings, chunk_size)
+        chunks = AccountInfo._split_list_into_chunks(addresses, chunk_size)
         for counter, chunk in enumerate(chunks):
             result: typing.Sequence[typing.Dict] = context.client.get_multiple_accounts(chunk)
-            response_value_list = zip(result, addresses)
+            response_value_list = zip(result, chunk)
             multiple += list(map(lambda pair: AccountInfo._from_response_values(pair[0], pair[1]), response_value_list))
             if (sleep_between_calls > 0.0) and (counter < (len(chunks) - 1)):
                 time.sleep(sleep_between_calls)
@@ -30,6 +30,7 @@ from .liquidationevent import LiquidationEvent
 from .marginaccount import MarginAccount
 from .observables import EventSource
 from .tokenvalue import TokenValue
+from .tracing import get_tracer
 from .transactionscout import TransactionScout
 from .wallet import Wallet
 
@@ -112,7 +113,9 @@ class ActualAccountLiquidator(AccountLiquidator):
         return liquidate_instructions
 
     def liquidate(self, liquidatable_report: LiquidatableReport) -> typing.Optional[typing.Sequence[str]]:
-        instruction_builders = self.prepare_instructions(liquidatable_report)
+        with get_tracer().span("prepare_instructions") as span:
+            instruction_builders = self.prepare_instructions(liquidatable_report)
+            span.set_attribute("instructions", len(instruction_builders))
 
         if len(instruction_builders) == 0:
             return None
@@ -162,9 +165,11 @@ class ForceCancelOrdersAccountLiquidator(ActualAccountLiquidator):
         for index, market_metadata in enumerate(liquidatable_report.group.markets):
             open_orders = liquidatable_report.margin_account.open_orders_accounts[index]
             if open_orders is not None:
-                market = market_metadata.fetch_market(self.context)
-                orders = market.load_orders_for_owner(liquidatable_report.margin_account.owner)
-                order_count = len(orders)
+                with get_tracer().span("load_orders_to_force_cancel", {"market": market_metadata.symbol}) as span:
+                    market = market_metadata.fetch_market(self.context)
+                    orders = market.load_orders_for_owner(liquidatable_report.margin_account.owner)
+                    order_count = len(orders)
+                    span.set_attribute("orders", order_count)
                 if order_count > 0:
                     force_cancel_orders_instructions += ForceCancelOrdersInstructionBuilder.multiple_instructions_from_margin_account_and_market(
                         self.context, liquidatable_report.group, self.wallet, liquidatable_report.margin_account, market_metadata, order_count)
@@ -194,7 +199,8 @@ class ReportingAccountLiquidator(AccountLiquidator):
         return self.inner.prepare_instructions(liquidatable_report)
 
     def liquidate(self, liquidatable_report: LiquidatableReport) -> typing.Optional[typing.Sequence[str]]:
-        balances_before = liquidatable_report.group.fetch_balances(self.context, self.wallet.address)
+        with get_tracer().span("fetch_balances_before"):
+            balances_before = liquidatable_report.group.fetch_balances(self.context, self.wallet.address)
         self.logger.info("Wallet balances before:")
         TokenValue.report(balances_before, self.logger.info)
 
@@ -238,16 +244,17 @@ class ReportingAccountLiquidator(AccountLiquidator):
                 if not transaction_scout.succeeded:
                     all_succeeded = False
 
-            group_after = Group.load(self.context)
-            margin_account_after_liquidation = MarginAccount.load(
-                self.context, liquidatable_report.margin_account.address, group_after)
-            intrinsic_balances_after = margin_account_after_liquidation.get_intrinsic_balances(group_after)
-            self.logger.info("Margin account balances after:")
-            TokenValue.report(intrinsic_balances_after, self.logger.info)
-
-            self.logger.info("Wallet Balances After:")
-            balances_after = group_after.fetch_balances(self.context, self.wallet.address)
-            TokenValue.report(balances_after, self.logger.info)
+            with get_tracer().span("load_balances_after"):
+                group_after = Group.load(self.context)
+                margin_account_after_liquidation = MarginAccount.load(
+                    self.context, liquidatable_report.margin_account.address, group_after)
+                intrinsic_balances_after = margin_account_after_liquidation.get_intrinsic_balances(group_after)
+                self.logger.info("Margin account balances after:")
+                TokenValue.report(intrinsic_balances_after, self.logger.info)
+
+                self.logger.info("Wallet Balances After:")
+                balances_after = group_after.fetch_balances(self.context, self.wallet.address)
+                TokenValue.report(balances_after, self.logger.info)
 
             liquidation_event = LiquidationEvent(datetime.datetime.now(),
                                                  self.liquidator_name,
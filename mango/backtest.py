@@ -0,0 +1,575 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import bisect
+import concurrent.futures
+import json
+import logging
+import typing
+
+from decimal import Decimal
+from solana.publickey import PublicKey
+
+from .accountinfo import AccountInfo
+from .accountliquidator import AccountLiquidator
+from .context import Context
+from .group import Group
+from .instructions import InstructionBuilder
+from .layouts import layouts
+from .liquidatablereport import LiquidatableReport, LiquidatableState
+from .liquidationprocessor import LiquidationProcessor
+from .marginaccount import MarginAccount
+from .rpcrecorder import RpcRecorder
+from .snapshot import Snapshot, SnapshotAccountKind
+from .tokenvalue import TokenValue
+from .tradeexecutor import TradeExecutor
+from .walletbalancer import NullWalletBalancer
+
+
+# # 🥭 Backtest
+#
+# This file contains an offline backtester for the liquidator. It replays a time series of
+# group states through a real `LiquidationProcessor`, but with a `SimulatedAccountLiquidator`
+# and `SimulatedTradeExecutor` in place of the ones that send transactions, so the
+# liquidator's settings can be tuned without risking any capital.
+#
+# For each set of `BacktestParameters` it reports:
+# * opportunities - accounts that were liquidatable, above water and worth something in any
+#   of the frames, whether or not the liquidator got to see that frame,
+# * liquidations - opportunities the simulated liquidator took,
+# * missed - opportunities it didn't take, because it didn't look in time, someone else got
+#   there first (the account stops being liquidatable in the historical data), or the
+#   `worthwhile_threshold` ruled it out,
+# * latency - seconds from the first frame an account was liquidatable to when it was
+#   liquidated. This includes the simulated time spent on the accounts the liquidator tried
+#   before it.
+# * profit - the value of the liquidator's token changes, in the quote token, at the last
+#   frame's prices.
+#
+# The simulation is deliberately simple, and deterministic - the same frames and parameters
+# always give the same result:
+# * Each liquidation takes `processing_seconds` of simulated time, and lands in whichever
+#   frame is current by then. If the account isn't liquidatable in that frame, someone else
+#   got there first.
+# * A liquidation pays off the account's largest liability, up to what its largest asset
+#   covers, and receives that asset at `liquidation_incentive` times the value paid.
+# * The simulated liquidator then buys back the token it paid and sells the token it
+#   received. Trades land `trade_seconds` later, at the price then. If the price has moved
+#   by more than `adjustment_factor` the IOC order doesn't fill and the tokens are left
+#   unhedged until the end of the run.
+# * Prices are only as fine-grained as the frames - a trade between two frames sees the
+#   earlier frame's price.
+#
+
+
+# Solana's target time between slots, used to give snapshot files a timestamp.
+_SECONDS_PER_SLOT = 0.4
+
+# Offsets in the margin account data of the fields `MarginAccount.load_ripe()` filters on.
+_GROUP_OFFSET = layouts.MANGO_ACCOUNT_FLAGS.sizeof()
+_HAS_BORROWS_OFFSET = 361
+
+
+# # 🥭 BacktestFrame class
+#
+# The state of the group at one moment - a `Snapshot` with the time it was taken.
+#
+# Frames can come from a series of snapshot files (timed by their slot) or from an RPC
+# recording (see `RpcRecorder`) of a liquidator run, in which case a frame is produced
+# every time the liquidator fetched new oracle prices.
+#
+
+class BacktestFrame:
+    def __init__(self, timestamp: float, snapshot: Snapshot):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.timestamp: float = timestamp
+        self.snapshot: Snapshot = snapshot
+
+    @staticmethod
+    def from_snapshot_files(filenames: typing.Sequence[str], seconds_per_slot: float = _SECONDS_PER_SLOT) -> typing.List["BacktestFrame"]:
+        snapshots = [Snapshot.open(filename) for filename in filenames]
+        frames = [BacktestFrame(snapshot.slot * seconds_per_slot, snapshot) for snapshot in snapshots]
+        return sorted(frames, key=lambda frame: frame.timestamp)
+
+    @staticmethod
+    def from_rpc_recording(context: Context, filename: str) -> typing.List["BacktestFrame"]:
+        frames: typing.List[BacktestFrame] = []
+        slot = 0
+        group: typing.Optional[Group] = None
+        group_account_info: typing.Optional[AccountInfo] = None
+        oracle_account_infos: typing.Dict[str, AccountInfo] = {}
+        margin_account_infos: typing.Dict[str, AccountInfo] = {}
+        open_orders_account_infos: typing.Dict[str, AccountInfo] = {}
+        account_slots: typing.Dict[str, int] = {}
+        for exchange in RpcRecorder.load(filename):
+            for method, params, result in BacktestFrame._results(exchange):
+                result_slot = slot
+                if isinstance(result, dict) and "context" in result:
+                    result_slot = result["context"]["slot"]
+                    slot = max(slot, result_slot)
+
+                prices_updated = False
+                if method == "getAccountInfo" and params[0] == str(context.group_id) and result["value"] is not None:
+                    group_account_info = AccountInfo._from_response_values(result["value"], context.group_id)
+                    group = Group.parse(context, group_account_info)
+                    account_slots[params[0]] = result_slot
+                elif method == "getMultipleAccounts" and group is not None:
+                    oracles = {str(market.oracle) for market in group.markets}
+                    for address, value in zip(params[0], result["value"]):
+                        if address in oracles and value is not None:
+                            oracle_account_infos[address] = AccountInfo._from_response_values(value, PublicKey(address))
+                            account_slots[address] = result_slot
+                            prices_updated = True
+                elif method == "getProgramAccounts" and group is not None:
+                    # Results requested `withContext` have the accounts in `value`.
+                    items = result["value"] if isinstance(result, dict) else result
+                    account_infos = {item["pubkey"]: AccountInfo._from_response_values(item["account"], PublicKey(item["pubkey"]))
+                                     for item in items}
+                    account_slots.update({address: result_slot for address in account_infos})
+                    if params[0] == str(context.program_id) and BacktestFrame._is_group_wide(params):
+                        margin_account_infos = account_infos
+                    elif params[0] == str(group.dex_program_id):
+                        open_orders_account_infos = account_infos
+
+                if prices_updated and group_account_info is not None and len(margin_account_infos) > 0:
+                    accounts: typing.List[typing.Tuple[SnapshotAccountKind, AccountInfo]] = [(SnapshotAccountKind.GROUP, group_account_info)]
+                    accounts += [(SnapshotAccountKind.MARGIN_ACCOUNT, account_info) for account_info in margin_account_infos.values()]
+                    accounts += [(SnapshotAccountKind.OPEN_ORDERS, account_info) for account_info in open_orders_account_infos.values()]
+                    accounts += [(SnapshotAccountKind.ORACLE, account_info) for account_info in oracle_account_infos.values()]
+                    timestamp = exchange["timestamp"] + exchange["elapsed"]
+                    frames += [BacktestFrame(timestamp, Snapshot(Snapshot.build(slot, accounts, account_slots)))]
+
+        return frames
+
+    @staticmethod
+    def _results(exchange: typing.Dict) -> typing.List[typing.Tuple[str, typing.List[typing.Any], typing.Any]]:
+        if exchange["status"] != 200:
+            return []
+        try:
+            response = json.loads(exchange["response"])
+        except ValueError:
+            return []
+
+        calls = exchange["request"] if isinstance(exchange["request"], list) else [exchange["request"]]
+        responses = response if isinstance(response, list) else [response]
+        results_by_id = {item.get("id"): item.get("result") for item in responses}
+        results: typing.List[typing.Tuple[str, typing.List[typing.Any], typing.Any]] = []
+        for call in calls:
+            result = results_by_id.get(call.get("id"))
+            if result is not None:
+                results += [(call["method"], call.get("params", []), result)]
+        return results
+
+    # A `getProgramAccounts` call for all the group's margin accounts filters on nothing but
+    # the group and (for ripe accounts) `has_borrows`. Anything else - like the owner - means
+    # it only fetched some of them.
+    @staticmethod
+    def _is_group_wide(params: typing.List[typing.Any]) -> bool:
+        options = params[1] if len(params) > 1 else {}
+        offsets = {account_filter["memcmp"]["offset"] for account_filter in options.get("filters", [])
+                   if "memcmp" in account_filter}
+        return _GROUP_OFFSET in offsets and offsets <= {_GROUP_OFFSET, _HAS_BORROWS_OFFSET}
+
+    def __str__(self) -> str:
+        return f"« BacktestFrame at {self.timestamp:.3f} from {self.snapshot} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 BacktestParameters class
+#
+# The liquidator settings being tested. These have the same meaning as the `bin/liquidator`
+# parameters of the same names.
+#
+
+class BacktestParameters:
+    def __init__(self, worthwhile_threshold: Decimal = Decimal("0.01"), throttle_ripe_update_to_seconds: Decimal = Decimal(5),
+                 adjustment_factor: Decimal = Decimal("0.05"), throttle_reload_to_seconds: Decimal = Decimal(60)):
+        self.worthwhile_threshold: Decimal = worthwhile_threshold
+        self.throttle_ripe_update_to_seconds: Decimal = throttle_ripe_update_to_seconds
+        self.adjustment_factor: Decimal = adjustment_factor
+        self.throttle_reload_to_seconds: Decimal = throttle_reload_to_seconds
+
+    def __str__(self) -> str:
+        return f"« BacktestParameters worthwhile: {self.worthwhile_threshold}, price throttle: {self.throttle_ripe_update_to_seconds}s, adjustment: {self.adjustment_factor}, reload throttle: {self.throttle_reload_to_seconds}s »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 BacktestResult class
+#
+# The outcome of running one set of `BacktestParameters`.
+#
+
+class BacktestResult:
+    def __init__(self, parameters: BacktestParameters, opportunities: int, liquidations: int,
+                 latencies: typing.List[float], profit: Decimal, unfilled_trades: int):
+        self.parameters: BacktestParameters = parameters
+        self.opportunities: int = opportunities
+        self.liquidations: int = liquidations
+        self.latencies: typing.List[float] = latencies
+        self.profit: Decimal = profit
+        self.unfilled_trades: int = unfilled_trades
+
+    @property
+    def missed(self) -> int:
+        return self.opportunities - self.liquidations
+
+    @property
+    def mean_latency(self) -> float:
+        return sum(self.latencies) / len(self.latencies) if len(self.latencies) > 0 else 0.0
+
+    @property
+    def max_latency(self) -> float:
+        return max(self.latencies) if len(self.latencies) > 0 else 0.0
+
+    def __str__(self) -> str:
+        return f"""« BacktestResult {self.parameters}
+    Opportunities   : {self.opportunities}
+    Liquidations    : {self.liquidations}
+    Missed          : {self.missed}
+    Mean Latency    : {self.mean_latency:.3f}s
+    Max Latency     : {self.max_latency:.3f}s
+    Profit          : {self.profit:,.8f}
+    Unfilled Trades : {self.unfilled_trades}
+»"""
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 _LoadedFrame class
+#
+# A `BacktestFrame` parsed into the objects the liquidator works with, along with the
+# addresses of all the accounts that were liquidation opportunities in that frame.
+#
+
+class _LoadedFrame:
+    def __init__(self, context: Context, frame: BacktestFrame):
+        self.timestamp: float = frame.timestamp
+        self.group: Group = frame.snapshot.load_group(context)
+        self.prices: typing.List[TokenValue] = frame.snapshot.load_prices(context, self.group)
+        self.prices_by_symbol: typing.Dict[str, Decimal] = {price.token.symbol: price.value for price in self.prices}
+        self.margin_accounts: typing.Dict[str, MarginAccount] = {
+            str(margin_account.address): margin_account for margin_account in frame.snapshot.load_margin_accounts(self.group)}
+        self.opportunities: typing.Dict[str, LiquidatableReport] = {}
+        for address, margin_account in self.margin_accounts.items():
+            report = LiquidatableReport.build(self.group, self.prices, margin_account, Decimal(0))
+            if report.state & LiquidatableState.LIQUIDATABLE and report.state & LiquidatableState.ABOVE_WATER and report.state & LiquidatableState.WORTHWHILE:
+                self.opportunities[address] = report
+
+
+# # 🥭 BacktestState class
+#
+# The simulated world a single backtest run happens in. It keeps the simulated clock, which
+# frame is current, and the opportunities seen and liquidations made so far.
+#
+# `now` is when the current check started. Work done during the check moves `elapsed_now()`
+# on from there, `processing_seconds` at a time, by calling `process()`.
+#
+
+class BacktestState:
+    def __init__(self, frames: typing.Sequence[_LoadedFrame], processing_seconds: float = 0.0):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.frames: typing.Sequence[_LoadedFrame] = frames
+        self.processing_seconds: float = processing_seconds
+        self.timestamps: typing.List[float] = [frame.timestamp for frame in frames]
+        self.now: float = frames[0].timestamp
+        self.current_index: int = -1
+        self.opportunities: typing.Dict[str, float] = {}
+        self.liquidations: typing.Dict[str, float] = {}
+        self._processed: int = 0
+
+    @property
+    def current(self) -> _LoadedFrame:
+        return self.frames[self.current_index]
+
+    def frame_at(self, timestamp: float) -> _LoadedFrame:
+        return self.frames[max(bisect.bisect_right(self.timestamps, timestamp) - 1, 0)]
+
+    # Moving the clock forward records the opportunities in every frame passed, not just the
+    # ones the liquidator gets to see.
+    def advance_to(self, timestamp: float) -> None:
+        self.now = timestamp
+        self._processed = 0
+        latest = max(bisect.bisect_right(self.timestamps, timestamp) - 1, 0)
+        for index in range(self.current_index + 1, latest + 1):
+            for address in self.frames[index].opportunities:
+                if address not in self.opportunities:
+                    self.opportunities[address] = self.frames[index].timestamp
+        self.current_index = max(self.current_index, latest)
+
+    def elapsed_now(self) -> float:
+        return self.now + (self._processed * self.processing_seconds)
+
+    def process(self) -> None:
+        self._processed += 1
+
+    def price(self, symbol: str, timestamp: typing.Optional[float] = None) -> Decimal:
+        frame = self.current if timestamp is None else self.frame_at(timestamp)
+        return frame.prices_by_symbol[symbol]
+
+    def record_liquidation(self, address: str) -> None:
+        self.liquidations[address] = self.elapsed_now()
+
+    def latencies(self) -> typing.List[float]:
+        return [liquidated_at - self.opportunities[address] for address, liquidated_at in self.liquidations.items()]
+
+    def __str__(self) -> str:
+        return f"« BacktestState at {self.now:.3f}, frame {self.current_index + 1} of {len(self.frames)} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 SimulatedTradeExecutor class
+#
+# A `TradeExecutor` that trades against the backtest's historical prices. It keeps the
+# token balances that liquidating and trading produce, starting from zero, in `inventory`.
+#
+# The IOC order is priced `adjustment_factor` away from the current price, the way
+# `SerumImmediateTradeExecutor` prices it, but fills at the price `trade_seconds` later. If
+# the price has moved past the order's limit by then, the order doesn't fill.
+#
+
+class SimulatedTradeExecutor(TradeExecutor):
+    def __init__(self, state: BacktestState, quote_symbol: str, adjustment_factor: Decimal, trade_seconds: float = 1.0):
+        super().__init__()
+        self.state: BacktestState = state
+        self.quote_symbol: str = quote_symbol
+        self.adjustment_factor: Decimal = adjustment_factor
+        self.trade_seconds: float = trade_seconds
+        self.inventory: typing.Dict[str, Decimal] = {}
+        self.trade_count: int = 0
+        self.unfilled_trades: int = 0
+
+    def adjust(self, symbol: str, quantity: Decimal) -> None:
+        self.inventory[symbol] = self.inventory.get(symbol, Decimal(0)) + quantity
+
+    def buy(self, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
+        return self._execute(symbol, quantity, Decimal(1) + self.adjustment_factor)
+
+    def sell(self, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
+        return self._execute(symbol, -quantity, Decimal(1) - self.adjustment_factor)
+
+    def _execute(self, symbol: str, quantity: Decimal, limit_multiplier: Decimal) -> typing.Sequence[str]:
+        base_symbol = symbol.split("/")[0]
+        limit_price = self.state.price(base_symbol) * limit_multiplier
+        fill_price = self.state.price(base_symbol, self.state.elapsed_now() + self.trade_seconds)
+        is_buy = quantity > 0
+        if (is_buy and fill_price > limit_price) or (not is_buy and fill_price < limit_price):
+            self.unfilled_trades += 1
+            self.logger.info(f"Simulated IOC order for {quantity:,.8f} '{symbol}' at {limit_price:,.8f} did not fill - price moved to {fill_price:,.8f}.")
+            return []
+
+        self.adjust(base_symbol, quantity)
+        self.adjust(self.quote_symbol, -quantity * fill_price)
+        self.last_book_prices[symbol] = fill_price
+        self.trade_count += 1
+        return [f"simulated-trade-{self.trade_count}"]
+
+    def value(self, prices_by_symbol: typing.Dict[str, Decimal]) -> Decimal:
+        return sum((quantity * prices_by_symbol[symbol] for symbol, quantity in self.inventory.items()), Decimal(0))
+
+    def __str__(self) -> str:
+        return f"« SimulatedTradeExecutor [{self.trade_count} trades, {self.unfilled_trades} unfilled] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 SimulatedAccountLiquidator class
+#
+# An `AccountLiquidator` that liquidates in the backtest's simulated world.
+#
+# Each liquidation attempt takes the state's `processing_seconds`. A liquidation only succeeds
+# if the account is still a liquidation opportunity in the frame current when it lands - if
+# the historical data shows it isn't, some other liquidator got there first (or the price
+# recovered) and the account is skipped.
+#
+
+class SimulatedAccountLiquidator(AccountLiquidator):
+    def __init__(self, state: BacktestState, trade_executor: SimulatedTradeExecutor, liquidation_incentive: Decimal = Decimal("1.05")):
+        super().__init__()
+        self.state: BacktestState = state
+        self.trade_executor: SimulatedTradeExecutor = trade_executor
+        self.liquidation_incentive: Decimal = liquidation_incentive
+
+    def prepare_instructions(self, liquidatable_report: LiquidatableReport) -> typing.List[InstructionBuilder]:
+        return []
+
+    def liquidate(self, liquidatable_report: LiquidatableReport) -> typing.Optional[typing.Sequence[str]]:
+        address = str(liquidatable_report.margin_account.address)
+        if address in self.state.liquidations:
+            return None
+
+        self.state.process()
+        landing_frame = self.state.frame_at(self.state.elapsed_now())
+        current_report = landing_frame.opportunities.get(address)
+        if current_report is None:
+            self.logger.info(f"Margin account {address} is no longer liquidatable - skipping.")
+            return None
+
+        balance_sheets = current_report.margin_account.get_priced_balance_sheets(current_report.group, current_report.prices)
+        most_liabilities = max(balance_sheets, key=lambda sheet: sheet.liabilities)
+        most_assets = max([sheet for sheet in balance_sheets if sheet.token != most_liabilities.token],
+                          key=lambda sheet: sheet.assets)
+        value_paid = min(most_liabilities.liabilities, most_assets.assets / self.liquidation_incentive)
+        if value_paid <= 0:
+            return None
+
+        paid_symbol = most_liabilities.token.symbol
+        received_symbol = most_assets.token.symbol
+        quantity_paid = value_paid / landing_frame.prices_by_symbol[paid_symbol]
+        quantity_received = value_paid * self.liquidation_incentive / landing_frame.prices_by_symbol[received_symbol]
+        self.trade_executor.adjust(paid_symbol, -quantity_paid)
+        self.trade_executor.adjust(received_symbol, quantity_received)
+        self.state.record_liquidation(address)
+        self.logger.info(f"Simulated liquidation of {address} - paid {quantity_paid:,.8f} {paid_symbol}, received {quantity_received:,.8f} {received_symbol}.")
+
+        quote_symbol = self.trade_executor.quote_symbol
+        if paid_symbol != quote_symbol:
+            self.trade_executor.buy(f"{paid_symbol}/{quote_symbol}", quantity_paid)
+        if received_symbol != quote_symbol:
+            self.trade_executor.sell(f"{received_symbol}/{quote_symbol}", quantity_received)
+
+        return [f"simulated-liquidation-{len(self.state.liquidations)}"]
+
+    def __str__(self) -> str:
+        return f"« SimulatedAccountLiquidator [{len(self.state.liquidations)} liquidations] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 _BacktestLiquidationProcessor class
+#
+# A `LiquidationProcessor` that reloads margin accounts from the backtest's frame at the
+# simulated time rather than from an RPC node. Accounts the simulated liquidator has
+# liquidated come back drained.
+#
+
+class _BacktestLiquidationProcessor(LiquidationProcessor):
+    def __init__(self, context: Context, account_liquidator: SimulatedAccountLiquidator, worthwhile_threshold: Decimal):
+        super().__init__(context, "Backtest", account_liquidator, NullWalletBalancer(), worthwhile_threshold)
+        self.backtest_state: BacktestState = account_liquidator.state
+
+    def _reload_margin_account(self, address: PublicKey, group: Group) -> MarginAccount:
+        frame = self.backtest_state.frame_at(self.backtest_state.elapsed_now())
+        margin_account = frame.margin_accounts[str(address)]
+        if str(address) not in self.backtest_state.liquidations:
+            return margin_account
+
+        return MarginAccount(margin_account.account_info, margin_account.version, margin_account.account_flags,
+                             margin_account.info, False, margin_account.mango_group, margin_account.owner, False,
+                             [TokenValue(deposit.token, Decimal(0)) for deposit in margin_account.deposits],
+                             [TokenValue(borrow.token, Decimal(0)) for borrow in margin_account.borrows],
+                             margin_account.open_orders)
+
+
+# # 🥭 Backtester class
+#
+# Runs `BacktestParameters` over a series of `BacktestFrame`s.
+#
+# Each run starts the simulated clock at the first frame and moves it forward in
+# `throttle_ripe_update_to_seconds` steps, the way the liquidator's price subscription
+# does - or, if liquidating took longer than that, to when the liquidations finished. At
+# each step the `LiquidationProcessor` gets the latest frame's prices. Every
+# `throttle_reload_to_seconds` it also gets the ripe accounts from the latest frame, and in
+# between it works from those (possibly stale) accounts, just like the real liquidator.
+#
+# `run_all()` runs many sets of parameters, spread across `processes` worker processes.
+# Each worker parses the frames once and then runs whichever parameters it's given.
+#
+
+class Backtester:
+    def __init__(self, context: Context, frames: typing.Sequence[BacktestFrame],
+                 liquidation_incentive: Decimal = Decimal("1.05"), trade_seconds: float = 1.0, processing_seconds: float = 0.5):
+        if len(frames) == 0:
+            raise Exception("No frames to backtest.")
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.context: Context = context
+        self.frames: typing.Sequence[BacktestFrame] = sorted(frames, key=lambda frame: frame.timestamp)
+        self.liquidation_incentive: Decimal = liquidation_incentive
+        self.trade_seconds: float = trade_seconds
+        self.processing_seconds: float = processing_seconds
+        self._loaded: typing.List[_LoadedFrame] = [_LoadedFrame(context, frame) for frame in self.frames]
+
+    def run(self, parameters: BacktestParameters) -> BacktestResult:
+        state = BacktestState(self._loaded, self.processing_seconds)
+        quote_symbol = state.frames[0].group.shared_quote_token.token.symbol
+        trade_executor = SimulatedTradeExecutor(state, quote_symbol, parameters.adjustment_factor, self.trade_seconds)
+        account_liquidator = SimulatedAccountLiquidator(state, trade_executor, self.liquidation_incentive)
+        liquidation_processor = _BacktestLiquidationProcessor(
+            self.context, account_liquidator, parameters.worthwhile_threshold)
+
+        started_at = self._loaded[0].timestamp
+        finished_at = self._loaded[-1].timestamp
+        price_step = float(parameters.throttle_ripe_update_to_seconds)
+        reload_step = float(parameters.throttle_reload_to_seconds)
+        next_reload = started_at
+        check = started_at
+        while check <= finished_at:
+            state.advance_to(check)
+            frame = state.current
+            if check >= next_reload:
+                ripe = MarginAccount.filter_out_unripe(list(frame.margin_accounts.values()), frame.group, frame.prices)
+                liquidation_processor.update_margin_accounts(ripe)
+                next_reload = check + reload_step
+            liquidation_processor.update_prices(frame.group, frame.prices)
+            check = max(check + price_step, state.elapsed_now())
+        state.advance_to(finished_at)
+
+        profit = trade_executor.value(state.frames[-1].prices_by_symbol)
+        return BacktestResult(parameters, len(state.opportunities), len(state.liquidations),
+                              state.latencies(), profit, trade_executor.unfilled_trades)
+
+    def run_all(self, all_parameters: typing.Sequence[BacktestParameters], processes: int = 1) -> typing.List[BacktestResult]:
+        if processes <= 1:
+            return [self.run(parameters) for parameters in all_parameters]
+
+        context_parameters = (self.context.cluster, self.context.cluster_url, self.context.program_id,
+                              self.context.dex_program_id, self.context.group_name, self.context.group_id)
+        frame_data = [(frame.timestamp, bytes(frame.snapshot)) for frame in self.frames]
+        with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=_initialise_worker,
+                                                    initargs=(context_parameters, frame_data, self.liquidation_incentive, self.trade_seconds, self.processing_seconds)) as executor:
+            return list(executor.map(_run_in_worker, all_parameters))
+
+    def __str__(self) -> str:
+        return f"« Backtester over {len(self.frames)} frames »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# Each worker process builds its own `Backtester` once, when it starts.
+_worker_backtester: typing.Optional[Backtester] = None
+
+
+def _initialise_worker(context_parameters: typing.Tuple[typing.Any, ...], frame_data: typing.List[typing.Tuple[float, bytes]],
+                       liquidation_incentive: Decimal, trade_seconds: float, processing_seconds: float) -> None:
+    global _worker_backtester
+    context = Context(*context_parameters)
+    frames = [BacktestFrame(timestamp, Snapshot(data)) for timestamp, data in frame_data]
+    _worker_backtester = Backtester(context, frames, liquidation_incentive, trade_seconds, processing_seconds)
+
+
+def _run_in_worker(parameters: BacktestParameters) -> BacktestResult:
+    if _worker_backtester is None:
+        raise Exception("Backtest worker process has not been initialised.")
+    return _worker_backtester.run(parameters)
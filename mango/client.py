@@ -14,10 +14,12 @@
 #   [Email](mailto:hello@blockworks.foundation)
 
 import datetime
+import collections
 import itertools
 import json
 import logging
 import requests
+import threading
 import time
 import typing
 
@@ -32,6 +34,27 @@ from solana.rpc.commitment import Commitment
 from solana.rpc.types import DataSliceOpts, MemcmpOpts, RPCResponse, TokenAccountOpts, TxOpts
 
 from .constants import SOL_DECIMAL_DIVISOR
+from .metrics import default_metrics_registry
+from .rpcrecorder import RpcRecorder
+from .tracing import get_tracer
+
+
+_rpc_request_seconds = default_metrics_registry.histogram(
+    "mango_rpc_request_seconds", "Time taken by RPC requests.", ["method"])
+_rpc_sent_bytes = default_metrics_registry.counter(
+    "mango_rpc_sent_bytes_total", "Bytes sent in RPC requests.", ["method"])
+_rpc_received_bytes = default_metrics_registry.counter(
+    "mango_rpc_received_bytes_total", "Bytes received in RPC responses.", ["method"])
+_rpc_errors = default_metrics_registry.counter(
+    "mango_rpc_errors_total", "RPC requests that failed, other than by rate-limiting.", ["method"])
+_rpc_rate_limited = default_metrics_registry.counter(
+    "mango_rpc_rate_limited_total", "RPC requests rejected by rate-limiting.", ["method", "reason"])
+_confirmation_seconds = default_metrics_registry.histogram(
+    "mango_wait_for_confirmation_seconds", "Time taken waiting for transactions to be confirmed.")
+_confirmations = default_metrics_registry.counter(
+    "mango_transaction_confirmations_total", "Transactions waited on, by whether they were confirmed.", ["result"])
+_replay_misses = default_metrics_registry.counter(
+    "mango_rpc_replay_misses_total", "Replayed RPC requests with no recorded response to the same request.", ["method"])
 
 
 # # 🥭 RateLimitException class
@@ -61,6 +84,15 @@ class TooManyRequestsRateLimitException(RateLimitException):
     pass
 
 
+# # 🥭 ReplayMissException class
+#
+# A `ReplayMissException` is raised by a `ReplayingClient` when a request has no recorded
+# response.
+#
+class ReplayMissException(Exception):
+    pass
+
+
 # # 🥭 TransactionException class
 #
 # A `TransactionException` exception that can provide additional error data, or at least better output
@@ -114,6 +146,7 @@ _FiltersKey = "filters"
 _DataSliceKey = "dataSlice"
 _DataSizeKey = "dataSize"
 _MemCmp = "memcmp"
+_WithContextKey = "withContext"
 _SkipPreflightKey = "skipPreflight"
 _PreflightCommitmentKey = "preflightCommitment"
 
@@ -126,6 +159,18 @@ UnspecifiedEncoding = "unspecified"
 # A `CompatibleClient` class that tries to be compatible with the proper Solana Client, but that handles
 # some common operations better from our point of view.
 #
+# Requests go through a `requests.Session`, so HTTP connections to the RPC node are pooled and
+# reused instead of being set up again for every call. `requests.Session` isn't documented as
+# thread-safe and a client is often shared by worker threads (like a `TransactionCrawler`'s),
+# so each thread gets its own session.
+#
+# If `blockhash_cache_duration` is set to more than zero, `send_transaction()` reuses the
+# recent blockhash it fetched for up to that long instead of fetching one for every transaction.
+# Blockhashes stay valid for around a minute, so this should be kept well below that.
+#
+# If `recorder` is set to an `RpcRecorder`, every request and response is recorded so they can
+# be replayed later by a `ReplayingClient`.
+#
 class CompatibleClient:
     def __init__(self, name: str, cluster: str, cluster_url: str, commitment: Commitment, skip_preflight: bool):
         self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
@@ -134,14 +179,32 @@ class CompatibleClient:
         self.cluster_url: str = cluster_url
 
         self._request_counter = itertools.count()
+        self._thread_local: threading.local = threading.local()
+
+        self.blockhash_cache_duration: datetime.timedelta = datetime.timedelta(seconds=0)
+        self._cached_blockhash: typing.Optional[Blockhash] = None
+        self._cached_blockhash_time: datetime.datetime = datetime.datetime.min
+        self._blockhash_lock: threading.Lock = threading.Lock()
 
         self.commitment: Commitment = commitment
         self.skip_preflight: bool = skip_preflight
         self.encoding: str = "base64"
+        self.recorder: typing.Optional[RpcRecorder] = None
+
+    @property
+    def _session(self) -> requests.Session:
+        session: typing.Optional[requests.Session] = getattr(self._thread_local, "session", None)
+        if session is None:
+            session = self._create_session()
+            self._thread_local.session = session
+        return session
+
+    def _create_session(self) -> requests.Session:
+        return requests.Session()
 
     def is_node_healthy(self) -> bool:
         try:
-            response = requests.get(f"{self.cluster_url}/health")
+            response = self._session.get(f"{self.cluster_url}/health")
             response.raise_for_status()
         except (IOError, requests.HTTPError) as err:
             self.logger.warning(f"[{self.name}] Health check failed with error: {err}")
@@ -163,7 +226,7 @@ class CompatibleClient:
         options = self._build_options_with_encoding(commitment, encoding, data_slice)
         return self._send_request("getAccountInfo", str(pubkey), options)
 
-    def get_confirmed_signature_for_address2(self, account: typing.Union[str, Account, PublicKey], before: typing.Optional[str] = None, limit: typing.Optional[int] = None) -> RPCResponse:
+    def get_confirmed_signature_for_address2(self, account: typing.Union[str, Account, PublicKey], before: typing.Optional[str] = None, limit: typing.Optional[int] = None, until: typing.Optional[str] = None) -> RPCResponse:
         if isinstance(account, Account):
             account = str(account.public_key())
 
@@ -174,6 +237,9 @@ class CompatibleClient:
         if before:
             opts["before"] = before
 
+        if until:
+            opts["until"] = until
+
         if limit:
             opts["limit"] = limit
 
@@ -182,6 +248,9 @@ class CompatibleClient:
     def get_confirmed_transaction(self, signature: str, encoding: str = "json") -> RPCResponse:
         return self._send_request("getConfirmedTransaction", signature, encoding)
 
+    def get_confirmed_transactions(self, signatures: typing.Sequence[str], encoding: str = "json") -> typing.List[RPCResponse]:
+        return self._send_batch_request([("getConfirmedTransaction", signature, encoding) for signature in signatures])
+
     def get_minimum_balance_for_rent_exemption(self, size: int, commitment: Commitment = UnspecifiedCommitment) -> RPCResponse:
         options = self._build_options(commitment, None, None)
         return self._send_request("getMinimumBalanceForRentExemption", size, options)
@@ -191,8 +260,11 @@ class CompatibleClient:
                              encoding: typing.Optional[str] = UnspecifiedEncoding,
                              data_slice: typing.Optional[DataSliceOpts] = None,
                              data_size: typing.Optional[int] = None,
-                             memcmp_opts: typing.Optional[typing.List[MemcmpOpts]] = None) -> RPCResponse:
+                             memcmp_opts: typing.Optional[typing.List[MemcmpOpts]] = None,
+                             with_context: bool = False) -> RPCResponse:
         options = self._build_options_with_encoding(commitment, encoding, data_slice)
+        if with_context:
+            options[_WithContextKey] = True
         options[_FiltersKey] = []
 
         if data_size:
@@ -229,17 +301,10 @@ class CompatibleClient:
     def get_multiple_accounts(self, pubkeys: typing.Sequence[PublicKey], commitment: Commitment = UnspecifiedCommitment,
                               encoding: str = UnspecifiedEncoding, data_slice: typing.Optional[DataSliceOpts] = None) -> RPCResponse:
         options = self._build_options_with_encoding(commitment, encoding, data_slice)
-        return self._send_request("getMultipleAccounts", pubkeys, options)
+        return self._send_request("getMultipleAccounts", [str(pubkey) for pubkey in pubkeys], options)
 
     def send_transaction(self, transaction: Transaction, *signers: Account, opts: TxOpts = TxOpts(preflight_commitment=UnspecifiedCommitment)) -> RPCResponse:
-        try:
-            blockhash_resp = self.get_recent_blockhash()
-            if not blockhash_resp["result"]:
-                raise RuntimeError("Failed to get recent blockhash")
-            transaction.recent_blockhash = Blockhash(blockhash_resp["result"]["value"]["blockhash"])
-        except Exception as err:
-            raise RuntimeError("Failed to get recent blockhash") from err
-
+        transaction.recent_blockhash = self._blockhash_for_transaction()
         transaction.sign(*signers)
 
         encoded_transaction: str = b64encode(transaction.serialize()).decode("utf-8")
@@ -264,8 +329,81 @@ class CompatibleClient:
         request_id = next(self._request_counter) + 1
         headers = {"Content-Type": "application/json"}
         data = json.dumps({"jsonrpc": "2.0", "id": request_id, "method": method, "params": params})
-        raw_response = requests.post(self.cluster_url, headers=headers, data=data)
+        raw_response = self._post_with_metrics(method, headers, data)
 
+        response = json.loads(raw_response.text)
+        self._raise_on_response_error(method, response)
+
+        # The call succeeded.
+        return typing.cast(RPCResponse, response)
+
+    # Sends several calls in a single JSON-RPC batch request - one HTTP round-trip instead of
+    # one per call. Each call is a tuple of the method name followed by its parameters.
+    # Responses are returned in the same order as the calls, whatever order the server
+    # returned them in.
+    def _send_batch_request(self, calls: typing.Sequence[typing.Tuple[typing.Any, ...]]) -> typing.List[RPCResponse]:
+        if len(calls) == 0:
+            return []
+
+        request_ids = [next(self._request_counter) + 1 for _ in calls]
+        headers = {"Content-Type": "application/json"}
+        data = json.dumps([{"jsonrpc": "2.0", "id": request_id, "method": call[0], "params": call[1:]}
+                           for request_id, call in zip(request_ids, calls)])
+        method = calls[0][0]
+        raw_response = self._post_with_metrics(method, headers, data)
+
+        responses = json.loads(raw_response.text)
+        if not isinstance(responses, list):
+            # Some servers reject batches outright with a single error response.
+            self._raise_on_response_error(method, responses)
+            raise Exception(f"Batch request for method '{method}' did not return a list of responses.")
+
+        responses_by_id = {response.get("id"): response for response in responses}
+        ordered: typing.List[RPCResponse] = []
+        for request_id in request_ids:
+            if request_id not in responses_by_id:
+                raise Exception(f"No response to batched request {request_id} for method '{method}'.")
+            response = responses_by_id[request_id]
+            self._raise_on_response_error(method, response)
+            ordered += [typing.cast(RPCResponse, response)]
+
+        return ordered
+
+    # Posts the request and checks the HTTP status, recording the request's latency, size and
+    # any errors or rate-limiting in the RPC metrics.
+    def _post_with_metrics(self, method: str, headers: typing.Dict[str, str], data: str) -> requests.Response:
+        _rpc_sent_bytes.labels(method).inc(len(data))
+        started_at = time.perf_counter()
+        try:
+            raw_response = self._post(method, headers, data)
+        except Exception:
+            _rpc_errors.labels(method).inc()
+            raise
+        finally:
+            _rpc_request_seconds.labels(method).observe(time.perf_counter() - started_at)
+
+        _rpc_received_bytes.labels(method).inc(len(raw_response.text))
+        try:
+            self._raise_on_http_error(method, raw_response)
+        except TooMuchBandwidthRateLimitException:
+            _rpc_rate_limited.labels(method, "too_much_bandwidth").inc()
+            raise
+        except TooManyRequestsRateLimitException:
+            _rpc_rate_limited.labels(method, "too_many_requests").inc()
+            raise
+        except Exception:
+            _rpc_errors.labels(method).inc()
+            raise
+        return raw_response
+
+    def _post(self, method: str, headers: typing.Dict[str, str], data: str) -> requests.Response:
+        started_at = time.time()
+        raw_response = self._session.post(self.cluster_url, headers=headers, data=data)
+        if self.recorder is not None:
+            self.recorder.record(method, data, raw_response.status_code, raw_response.text, time.time() - started_at)
+        return raw_response
+
+    def _raise_on_http_error(self, method: str, raw_response: requests.Response) -> None:
         # Some custom exceptions specifically for rate-limiting. This allows calling code to handle this
         # specific case if they so choose.
         #
@@ -278,10 +416,11 @@ class CompatibleClient:
         # Not a rate-limit problem, but maybe there was some other error?
         raw_response.raise_for_status()
 
+    def _raise_on_response_error(self, method: str, response: typing.Dict) -> None:
         # All seems OK, but maybe the server returned an error? If so, try to pass on as much
         # information as we can.
-        response = json.loads(raw_response.text)
         if "error" in response:
+            _rpc_errors.labels(method).inc()
             if response["error"] is str:
                 message: str = typing.cast(str, response["error"])
                 raise Exception(f"Transaction failed: '{message}'")
@@ -296,8 +435,23 @@ class CompatibleClient:
                 raise TransactionException(exception_message, error_code, self.name,
                                            error_accounts, error_err, error_logs)
 
-        # The call succeeded.
-        return typing.cast(RPCResponse, response)
+    def _blockhash_for_transaction(self) -> Blockhash:
+        with self._blockhash_lock:
+            now = datetime.datetime.now()
+            if (self._cached_blockhash is not None) and (now - self._cached_blockhash_time < self.blockhash_cache_duration):
+                return self._cached_blockhash
+
+            try:
+                blockhash_resp = self.get_recent_blockhash()
+                if not blockhash_resp["result"]:
+                    raise RuntimeError("Failed to get recent blockhash")
+                blockhash = Blockhash(blockhash_resp["result"]["value"]["blockhash"])
+            except Exception as err:
+                raise RuntimeError("Failed to get recent blockhash") from err
+
+            self._cached_blockhash = blockhash
+            self._cached_blockhash_time = now
+            return blockhash
 
     def _build_options(self, commitment: Commitment, encoding: typing.Optional[str], data_slice: typing.Optional[DataSliceOpts]) -> typing.Dict[str, typing.Any]:
         options: typing.Dict[str, typing.Any] = {}
@@ -327,6 +481,104 @@ class CompatibleClient:
         return f"{self}"
 
 
+# # 🥭 ReplayingClient class
+#
+# A `CompatibleClient` that answers requests from an `RpcRecorder` recording instead of an RPC
+# node. It's useful for running code against real data repeatably, without network noise.
+#
+# A request gets the next recorded response to the same method with the same parameters.
+# Response IDs are rewritten to match the new request IDs.
+#
+# If there isn't a recorded response to the same request, a `ReplayMissException` is raised,
+# since any other response would silently give the code being replayed different data. If
+# `strict` is False (for instance to replay a run that sent transactions, which have a
+# different blockhash each time), a miss is logged as a warning, counted in `misses`, and
+# gets the next recorded response to the same method instead, cycling through them.
+#
+# `speed` controls how long responses take. 1.0 takes as long as the recorded requests did,
+# 10.0 is 10 times faster, and 0 (the default) doesn't wait at all.
+#
+class ReplayingClient(CompatibleClient):
+    def __init__(self, name: str, cluster: str, filename: str, speed: float = 0.0, strict: bool = True):
+        super().__init__(name, cluster, f"replay://{filename}", Commitment("processed"), False)
+        self.filename: str = filename
+        self.speed: float = speed
+        self.strict: bool = strict
+        self.misses: int = 0
+        self._replay_lock: threading.Lock = threading.Lock()
+        self._by_request: typing.Dict[str, typing.Deque[typing.Dict]] = collections.defaultdict(collections.deque)
+        self._by_method: typing.Dict[str, typing.List[typing.Dict]] = collections.defaultdict(list)
+        self._method_positions: typing.Dict[str, int] = collections.defaultdict(int)
+        for exchange in RpcRecorder.load(filename):
+            self._by_request[ReplayingClient._request_key(exchange["request"])].append(exchange)
+            self._by_method[exchange["method"]].append(exchange)
+
+    def is_node_healthy(self) -> bool:
+        return True
+
+    def _post(self, method: str, headers: typing.Dict[str, str], data: str) -> requests.Response:
+        request = json.loads(data)
+        exchange = self._find_exchange(method, request)
+        if self.speed > 0:
+            time.sleep(exchange["elapsed"] / self.speed)
+
+        raw_response = requests.Response()
+        raw_response.status_code = exchange["status"]
+        raw_response.url = self.cluster_url
+        raw_response._content = ReplayingClient._with_request_ids(exchange, request).encode("utf-8")
+        if self.recorder is not None:
+            self.recorder.record(method, data, raw_response.status_code, raw_response.text, exchange["elapsed"])
+        return raw_response
+
+    def _find_exchange(self, method: str, request: typing.Any) -> typing.Dict:
+        with self._replay_lock:
+            matching = self._by_request.get(ReplayingClient._request_key(request))
+            if matching:
+                exchange = matching.popleft()
+                if len(matching) == 0:
+                    # Keep answering repeats of the last request with its last response.
+                    matching.append(exchange)
+                return exchange
+
+            same_method = self._by_method.get(method)
+            if self.strict or not same_method:
+                raise ReplayMissException(
+                    f"No recorded response for method '{method}' with parameters {ReplayingClient._request_key(request)} in {self.filename}.")
+
+            self.misses += 1
+            _replay_misses.labels(method).inc()
+            self.logger.warning(
+                f"No recorded response for method '{method}' with these parameters - replaying another recorded '{method}' response instead.")
+            position = self._method_positions[method]
+            self._method_positions[method] = (position + 1) % len(same_method)
+            return same_method[position]
+
+    @staticmethod
+    def _request_key(request: typing.Any) -> str:
+        if isinstance(request, list):
+            return json.dumps([[call["method"], call.get("params")] for call in request], sort_keys=True)
+        return json.dumps([request["method"], request.get("params")], sort_keys=True)
+
+    @staticmethod
+    def _with_request_ids(exchange: typing.Dict, request: typing.Any) -> str:
+        try:
+            response = json.loads(exchange["response"])
+        except ValueError:
+            # Not JSON - probably the body of an HTTP error.
+            return exchange["response"]
+
+        if isinstance(request, list) and isinstance(response, list):
+            new_ids = {call["id"]: new_call["id"] for call, new_call in zip(exchange["request"], request)}
+            for item in response:
+                item["id"] = new_ids.get(item.get("id"))
+        elif isinstance(response, dict) and isinstance(request, dict):
+            response["id"] = request["id"]
+        return json.dumps(response)
+
+    def __str__(self) -> str:
+        return f"« 𝚁𝚎𝚙𝚕𝚊𝚢𝚒𝚗𝚐𝙲𝚕𝚒𝚎𝚗𝚝 [{self.cluster}]: {self.filename} »"
+
+
 class BetterClient:
     def __init__(self, client: CompatibleClient):
         self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
@@ -377,6 +629,14 @@ class BetterClient:
     def skip_preflight(self, value: bool) -> None:
         self.compatible_client.skip_preflight = value
 
+    @property
+    def blockhash_cache_duration(self) -> datetime.timedelta:
+        return self.compatible_client.blockhash_cache_duration
+
+    @blockhash_cache_duration.setter
+    def blockhash_cache_duration(self, value: datetime.timedelta) -> None:
+        self.compatible_client.blockhash_cache_duration = value
+
     @staticmethod
     def from_configuration(name: str, cluster: str, cluster_url: str, commitment: Commitment, skip_preflight: bool) -> "BetterClient":
         compatible = CompatibleClient(name, cluster, cluster_url, commitment, skip_preflight)
@@ -395,14 +655,18 @@ class BetterClient:
         response = self.compatible_client.get_account_info(pubkey, commitment, encoding, data_slice)
         return response["result"]
 
-    def get_confirmed_signatures_for_address2(self, account: typing.Union[str, Account, PublicKey], before: typing.Optional[str] = None, limit: typing.Optional[int] = None) -> typing.Sequence[str]:
-        response = self.compatible_client.get_confirmed_signature_for_address2(account, before, limit)
+    def get_confirmed_signatures_for_address2(self, account: typing.Union[str, Account, PublicKey], before: typing.Optional[str] = None, limit: typing.Optional[int] = None, until: typing.Optional[str] = None) -> typing.Sequence[str]:
+        response = self.compatible_client.get_confirmed_signature_for_address2(account, before, limit, until)
         return [result["signature"] for result in response["result"]]
 
     def get_confirmed_transaction(self, signature: str, encoding: str = "json") -> typing.Dict:
         response = self.compatible_client.get_confirmed_transaction(signature, encoding)
         return response["result"]
 
+    def get_confirmed_transactions(self, signatures: typing.Sequence[str], encoding: str = "json") -> typing.Sequence[typing.Optional[typing.Dict]]:
+        responses = self.compatible_client.get_confirmed_transactions(signatures, encoding)
+        return [response["result"] for response in responses]
+
     def get_minimum_balance_for_rent_exemption(self, size: int, commitment: Commitment = UnspecifiedCommitment) -> int:
         response = self.compatible_client.get_minimum_balance_for_rent_exemption(size, commitment)
         return response["result"]
@@ -412,9 +676,10 @@ class BetterClient:
                              encoding: typing.Optional[str] = UnspecifiedEncoding,
                              data_slice: typing.Optional[DataSliceOpts] = None,
                              data_size: typing.Optional[int] = None,
-                             memcmp_opts: typing.Optional[typing.List[MemcmpOpts]] = None) -> typing.Dict:
+                             memcmp_opts: typing.Optional[typing.List[MemcmpOpts]] = None,
+                             with_context: bool = False) -> typing.Dict:
         response = self.compatible_client.get_program_accounts(
-            pubkey, commitment, encoding, data_slice, data_size, memcmp_opts)
+            pubkey, commitment, encoding, data_slice, data_size, memcmp_opts, with_context)
         return response["result"]
 
     def get_recent_blockhash(self, commitment: Commitment = UnspecifiedCommitment) -> Blockhash:
@@ -435,11 +700,19 @@ class BetterClient:
         return response["result"]["value"]
 
     def send_transaction(self, transaction: Transaction, *signers: Account, opts: TxOpts = TxOpts(preflight_commitment=UnspecifiedCommitment)) -> str:
-        response = self.compatible_client.send_transaction(
-            transaction, *signers, opts=opts)
-        return response["result"]
+        with get_tracer().span("send_transaction", {"instructions": len(transaction.instructions)}) as span:
+            response = self.compatible_client.send_transaction(
+                transaction, *signers, opts=opts)
+            span.set_attribute("signature", response["result"])
+            return response["result"]
 
     def wait_for_confirmation(self, transaction_ids: typing.Sequence[str], max_wait_in_seconds: int = 60) -> typing.Sequence[typing.Dict]:
+        with get_tracer().span("wait_for_confirmation", {"transactions": len(transaction_ids)}) as span:
+            all_confirmed = self._wait_for_confirmation(transaction_ids, max_wait_in_seconds)
+            span.set_attribute("confirmed", len(all_confirmed))
+            return all_confirmed
+
+    def _wait_for_confirmation(self, transaction_ids: typing.Sequence[str], max_wait_in_seconds: int) -> typing.Sequence[typing.Dict]:
         self.logger.info(f"Waiting up to {max_wait_in_seconds} seconds for {transaction_ids}.")
         all_confirmed: typing.List[typing.Dict] = []
         start_time: datetime.datetime = datetime.datetime.now()
@@ -454,7 +727,10 @@ class BetterClient:
                     all_confirmed += [confirmed]
                     break
 
+        _confirmation_seconds.observe((datetime.datetime.now() - start_time).total_seconds())
+        _confirmations.labels("confirmed").inc(len(all_confirmed))
         if len(all_confirmed) != len(transaction_ids):
+            _confirmations.labels("timed_out").inc(len(transaction_ids) - len(all_confirmed))
             self.logger.info(f"Timed out after {max_wait_in_seconds} seconds waiting on transaction {transaction_id}.")
         return all_confirmed
 
@@ -26,11 +26,15 @@ from solana.publickey import PublicKey
 from solana.rpc.commitment import Commitment
 from solana.rpc.types import RPCError, RPCResponse, TxOpts
 
-from .client import BetterClient
+from .client import BetterClient, ReplayingClient
 from .constants import MangoConstants
 from .market import CompoundMarketLookup, MarketLookup
+from .metrics import MetricsServer, default_metrics_registry
+from .profiler import SamplingProfiler
+from .rpcrecorder import RpcRecorder
 from .spotmarket import SpotMarketLookup
 from .token import TokenLookup
+from .tracing import FileTracer, set_tracer
 
 
 # # 🥭 Context
@@ -67,6 +71,25 @@ _OLD_3_TOKEN_PROGRAM_ID = PublicKey("JD3bq9hGdy38PuWQ4h2YJpELmHVGPPfFSuFkpzAd9zf
 # Probably best to access this through the Context object
 _pool_scheduler = ThreadPoolScheduler(multiprocessing.cpu_count())
 
+# There's only ever one metrics server for the process, however many `Context`s are created.
+_metrics_server: typing.Optional[MetricsServer] = None
+
+
+def _start_metrics_server(port: int) -> None:
+    global _metrics_server
+    if _metrics_server is None:
+        _metrics_server = MetricsServer(default_metrics_registry, port).start()
+
+
+# Likewise there's only ever one profiler.
+_profiler: typing.Optional[SamplingProfiler] = None
+
+
+def _start_profiler(filename: str, interval: float, top: int) -> None:
+    global _profiler
+    if _profiler is None:
+        _profiler = SamplingProfiler(filename, interval, top).install()
+
 
 # # 🥭 Context class
 #
@@ -102,10 +125,24 @@ class Context:
         self.retry_pauses: typing.List[Decimal] = [Decimal(4), Decimal(
             8), Decimal(16), Decimal(20), Decimal(30)]
 
+        # Number of processes to spread CPU-bound parsing of large account loads across. 0 or 1
+        # means parse in this process.
+        self.parse_processes: int = 0
+
     @property
     def pool_scheduler(self) -> ThreadPoolScheduler:
         return _pool_scheduler
 
+    # Solana RPC nodes serve websocket subscriptions on the same host and port as HTTP requests,
+    # so the websocket URL is just the cluster URL with a websocket scheme.
+    @property
+    def websocket_url(self) -> str:
+        if self.cluster_url.startswith("https://"):
+            return "wss://" + self.cluster_url[len("https://"):]
+        if self.cluster_url.startswith("http://"):
+            return "ws://" + self.cluster_url[len("http://"):]
+        return self.cluster_url
+
     @staticmethod
     def default():
         return Context(default_cluster, default_cluster_url, default_program_id,
@@ -246,6 +283,29 @@ class Context:
         parser.add_argument("--token-data-file", type=str, default="solana.tokenlist.json",
                             help="data file that contains token symbols, names, mints and decimals (format is same as https://raw.githubusercontent.com/solana-labs/token-list/main/src/tokens/solana.tokenlist.json)")
 
+        parser.add_argument("--record-rpc-filename", type=str, default=None,
+                            help="record every RPC request and response to this gzip-compressed file")
+        parser.add_argument("--replay-rpc-filename", type=str, default=None,
+                            help="answer RPC requests from this recording instead of the cluster")
+        parser.add_argument("--replay-rpc-speed", type=float, default=0.0,
+                            help="speed to replay recorded RPC responses at (1.0 is the recorded speed, 0 does not wait)")
+        parser.add_argument("--replay-rpc-lenient", action="store_true", default=False,
+                            help="answer requests that weren't recorded with another recorded response to the same method, instead of failing")
+        parser.add_argument("--metrics-port", type=int, default=None,
+                            help="serve Prometheus metrics at http://<host>:<port>/metrics")
+        parser.add_argument("--trace-filename", type=str, default=None,
+                            help="append tracing spans to this file (in OTLP JSON format)")
+        parser.add_argument("--profile", action="store_true", default=False,
+                            help="run under a sampling profiler, writing results on exit or on SIGUSR1")
+        parser.add_argument("--profile-filename", type=str, default="mango-profile.folded",
+                            help="file to write profiler samples to, in folded-stacks (flame graph) format")
+        parser.add_argument("--profile-interval-ms", type=float, default=10,
+                            help="milliseconds between profiler samples")
+        parser.add_argument("--profile-top", type=int, default=20,
+                            help="number of hot functions to list in the profiler summary")
+        parser.add_argument("--parse-processes", type=int, default=0,
+                            help="number of processes to parse margin accounts in when loading ripe accounts (0 parses in this process)")
+
         # This isn't really a Context thing but we don't have a better place for it (yet) and we
         # don't want to duplicate it in every command.
         parser.add_argument("--log-level", default=logging_default, type=lambda level: getattr(logging, level),
@@ -281,7 +341,21 @@ class Context:
         if group_id == PublicKey("7pVYhpKUHw88neQHxgExSH6cerMZ1Axx1ALQP9sxtvQV"):
             program_id = PublicKey("JD3bq9hGdy38PuWQ4h2YJpELmHVGPPfFSuFkpzAd9zfu")
 
-        return Context(args.cluster, cluster_url, program_id, args.dex_program_id, args.group_name, group_id)
+        context = Context(args.cluster, cluster_url, program_id, args.dex_program_id, args.group_name, group_id)
+        context.parse_processes = args.parse_processes
+        if args.replay_rpc_filename is not None:
+            context.client = BetterClient(ReplayingClient(
+                "Mango Explorer", args.cluster, args.replay_rpc_filename, args.replay_rpc_speed, not args.replay_rpc_lenient))
+        if args.record_rpc_filename is not None:
+            context.client.compatible_client.recorder = RpcRecorder(args.record_rpc_filename)
+        if args.metrics_port is not None:
+            _start_metrics_server(args.metrics_port)
+        if args.trace_filename is not None:
+            set_tracer(FileTracer(args.trace_filename))
+        if args.profile:
+            _start_profiler(args.profile_filename, args.profile_interval_ms / 1000, args.profile_top)
+
+        return context
 
     def __str__(self) -> str:
         return f"""« 𝙲𝚘𝚗𝚝𝚎𝚡𝚝:
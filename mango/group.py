@@ -32,6 +32,7 @@ from .marketmetadata import MarketMetadata
 from .market import MarketLookup
 from .token import SolToken, Token, TokenLookup
 from .tokenvalue import TokenValue
+from .tracing import get_tracer
 from .version import Version
 
 # # 🥭 Group class
@@ -162,10 +163,11 @@ class Group(AddressableAccount):
         # if we use AccountInfo.load_multiple() and parse the data ourselves.
         #
         # This seems to halve the time this function takes.
-        oracle_addresses = list([market.oracle for market in self.markets])
-        oracle_account_infos = AccountInfo.load_multiple(context, oracle_addresses)
-        oracles = map(lambda oracle_account_info: Aggregator.parse(context, oracle_account_info), oracle_account_infos)
-        prices = list(map(lambda oracle: oracle.price, oracles)) + [Decimal(1)]
+        with get_tracer().span("fetch_token_prices"):
+            oracle_addresses = list([market.oracle for market in self.markets])
+            oracle_account_infos = AccountInfo.load_multiple(context, oracle_addresses)
+            oracles = map(lambda oracle_account_info: Aggregator.parse(context, oracle_account_info), oracle_account_infos)
+            prices = list(map(lambda oracle: oracle.price, oracles)) + [Decimal(1)]
         token_prices = []
         for index, price in enumerate(prices):
             token_prices += [TokenValue(self.basket_tokens[index].token, price)]
@@ -185,9 +187,8 @@ class Group(AddressableAccount):
         sol_balance = context.fetch_sol_balance(root_address)
         balances += [TokenValue(SolToken, sol_balance)]
 
-        for basket_token in self.basket_tokens:
-            balance = TokenValue.fetch_total_value(context, root_address, basket_token.token)
-            balances += [balance]
+        basket_tokens = [basket_token.token for basket_token in self.basket_tokens]
+        balances += TokenValue.fetch_total_values(context, root_address, basket_tokens)
         return balances
 
     def __str__(self) -> str:
@@ -607,6 +607,36 @@ class NewOrderV3InstructionBuilder(InstructionBuilder):
 »"""
 
 
+# # 🥭 CancelOrderByClientIdInstructionBuilder class
+#
+# Creates an instruction to cancel a Serum order by the client ID it was placed with.
+#
+class CancelOrderByClientIdInstructionBuilder(InstructionBuilder):
+    def __init__(self, context: Context, wallet: Wallet, market: Market, open_orders_address: PublicKey, client_id: int):
+        super().__init__(context)
+        self.wallet: Wallet = wallet
+        self.market: Market = market
+        self.open_orders_address: PublicKey = open_orders_address
+        self.client_id: int = client_id
+
+    def build(self) -> TransactionInstruction:
+        instruction = self.market.make_cancel_order_by_client_id_instruction(
+            self.wallet.account,
+            self.open_orders_address,
+            self.client_id
+        )
+
+        return instruction
+
+    def __str__(self) -> str:
+        return f"""« CancelOrderByClientIdInstructionBuilder:
+    market: {self.market.state.public_key()},
+    wallet.account: {self.wallet.account.public_key()},
+    open_orders_address: {self.open_orders_address},
+    client_id: {self.client_id}
+»"""
+
+
 # # 🥭 ConsumeEventsInstructionBuilder class
 #
 # Creates an event-consuming 'crank' instruction.
@@ -98,8 +98,8 @@ class FloatAdapter(construct.Adapter):
     def _decode(self, obj, context, path) -> Decimal:
         return Decimal(obj) / self.divisor
 
-    def _encode(self, obj, context, path) -> bytes:
-        return bytes(obj)
+    def _encode(self, obj, context, path) -> int:
+        return int(Decimal(obj) * self.divisor)
 
 
 # ## PublicKeyAdapter
@@ -117,6 +117,8 @@ class PublicKeyAdapter(construct.Adapter):
         return PublicKey(obj)
 
     def _encode(self, obj, context, path) -> bytes:
+        if obj is None:
+            return bytes([0] * 32)
         return bytes(obj)
 
 
@@ -132,8 +134,8 @@ class DatetimeAdapter(construct.Adapter):
     def _decode(self, obj, context, path) -> datetime.datetime:
         return datetime.datetime.fromtimestamp(obj)
 
-    def _encode(self, obj, context, path) -> bytes:
-        return bytes(obj)
+    def _encode(self, obj, context, path) -> int:
+        return int(obj.timestamp())
 
 
 # # Layout Structs
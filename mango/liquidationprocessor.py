@@ -13,24 +13,31 @@
 #   [Github](https://github.com/blockworks-foundation)
 #   [Email](mailto:hello@blockworks.foundation)
 
+import concurrent.futures
+import contextlib
 import enum
 import logging
+import threading
 import time
 import traceback
 import typing
 
 from datetime import datetime, timedelta
 from decimal import Decimal
+from solana.publickey import PublicKey
 
 from .accountliquidator import AccountLiquidator
 from .context import Context
 from .group import Group
 from .liquidatablereport import LiquidatableReport, LiquidatableState
 from .liquidationevent import LiquidationEvent
+from .liquidationqueue import LiquidationQueue
 from .marginaccount import MarginAccount
+from .metrics import default_metrics_registry
 from .observables import EventSource
 from .tokenvalue import TokenValue
-from .walletbalancer import WalletBalancer
+from .tracing import Span, get_tracer
+from .walletbalancer import CoalescingWalletBalancer, WalletBalancer
 
 # # 🥭 Liquidation Processor
 #
@@ -39,6 +46,16 @@ from .walletbalancer import WalletBalancer
 #
 
 
+_update_prices_seconds = default_metrics_registry.histogram(
+    "mango_update_prices_seconds", "Time taken to check all ripe accounts against new prices.")
+_liquidate_all_seconds = default_metrics_registry.histogram(
+    "mango_liquidate_all_seconds", "Time taken to liquidate all worthwhile accounts.")
+_accounts = default_metrics_registry.gauge(
+    "mango_liquidation_accounts", "Accounts at each stage of the last price check.", ["stage"])
+_liquidations = default_metrics_registry.counter(
+    "mango_liquidations_total", "Liquidation attempts, by result.", ["result"])
+
+
 # # 💧 LiquidationProcessorState enum
 #
 # An enum that describes the current state of the `LiquidationProcessor`.
@@ -53,19 +70,75 @@ class LiquidationProcessorState(enum.Enum):
         return self.name
 
 
+# # 💧 _WalletTokenGate class
+#
+# Liquidations and wallet rebalances both spend the wallet's tokens, so a rebalance mustn't
+# sell tokens a liquidation is about to pay with. Any number of liquidations can run at once,
+# but a rebalance waits for the liquidations in flight to finish and runs on its own. Once a
+# rebalance is waiting, new liquidations wait for it, so a steady stream of liquidations can't
+# hold it off forever.
+#
+
+class _WalletTokenGate:
+    def __init__(self):
+        self._condition: threading.Condition = threading.Condition()
+        self._liquidating: int = 0
+        self._balance_waiting: bool = False
+
+    @contextlib.contextmanager
+    def liquidating(self) -> typing.Iterator[None]:
+        with self._condition:
+            self._condition.wait_for(lambda: not self._balance_waiting)
+            self._liquidating += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._liquidating -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def balancing(self) -> typing.Iterator[None]:
+        with self._condition:
+            self._balance_waiting = True
+            self._condition.wait_for(lambda: self._liquidating == 0)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._balance_waiting = False
+                self._condition.notify_all()
+
+
 # # 💧 LiquidationProcessor class
 #
 # An `AccountLiquidator` liquidates a `MarginAccount`. A `LiquidationProcessor` processes a
 # list of `MarginAccount`s, determines if they're liquidatable, and calls an
 # `AccountLiquidator` to do the work.
 #
+# Worthwhile accounts are processed highest net assets first, using a `LiquidationQueue`. The
+# queue from the most recent pass is kept in `liquidation_queue` so its processing order can
+# be inspected.
+#
+# By default accounts are liquidated one at a time, with the wallet rebalanced and the margin
+# account reloaded before moving on to the next account. Setting `max_in_flight` to more than
+# 1 switches to a pipelined mode: up to `max_in_flight` accounts are liquidated concurrently
+# (each waiting on its own confirmation), the post-liquidation reload happens on the same
+# worker as the liquidation, and wallet rebalancing runs in the background on its own thread
+# so it never holds up the next liquidation. An account is only ever being liquidated by one
+# worker at a time - it's taken off the queue while it's in flight and only put back when its
+# reload shows it's still worthwhile. A background rebalance never runs at the same time as a
+# liquidation (see `_WalletTokenGate`).
+#
+# `shutdown()` waits for any background rebalance to finish and stops its thread.
+#
 
 
 class LiquidationProcessor:
     _AGE_ERROR_THRESHOLD = timedelta(minutes=5)
     _AGE_WARNING_THRESHOLD = timedelta(minutes=2)
 
-    def __init__(self, context: Context, name: str, account_liquidator: AccountLiquidator, wallet_balancer: WalletBalancer, worthwhile_threshold: Decimal = Decimal("0.01")):
+    def __init__(self, context: Context, name: str, account_liquidator: AccountLiquidator, wallet_balancer: WalletBalancer, worthwhile_threshold: Decimal = Decimal("0.01"), max_in_flight: int = 1):
         self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
         self.context: Context = context
         self.name: str = name
@@ -78,6 +151,17 @@ class LiquidationProcessor:
         self.prices_updated_at: datetime = datetime.now()
         self.state: LiquidationProcessorState = LiquidationProcessorState.STARTING
         self.state_change: EventSource[LiquidationProcessor] = EventSource[LiquidationProcessor]()
+        self.liquidation_queue: LiquidationQueue = LiquidationQueue()
+        self.max_in_flight: int = max_in_flight
+        self._balance_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="WalletBalancer")
+        self._balance_lock = threading.Lock()
+        self._pending_balance_prices: typing.Optional[typing.List[TokenValue]] = None
+        self._wallet_token_gate: _WalletTokenGate = _WalletTokenGate()
+        if isinstance(wallet_balancer, CoalescingWalletBalancer):
+            # Trailing rebalances must wait for liquidations to finish with the wallet's tokens
+            # like any other background balance.
+            wallet_balancer.request_balance = self._schedule_balance
 
     def update_margin_accounts(self, ripe_margin_accounts: typing.List[MarginAccount]):
         self.logger.info(
@@ -90,78 +174,176 @@ class LiquidationProcessor:
             self.state = LiquidationProcessorState.HEALTHY
 
     def update_prices(self, group: Group, prices):
-        started_at = time.time()
+        with get_tracer().span("update_prices") as span:
+            started_at = time.time()
 
-        if self.state == LiquidationProcessorState.STARTING:
-            self.logger.info("Still starting - skipping price update.")
-            return
+            if self.state == LiquidationProcessorState.STARTING:
+                self.logger.info("Still starting - skipping price update.")
+                return
 
-        if self.ripe_accounts is None:
-            self.logger.info("Ripe accounts is None - skipping price update.")
-            return
+            if self.ripe_accounts is None:
+                self.logger.info("Ripe accounts is None - skipping price update.")
+                return
 
-        self.logger.info(
-            f"Ripe accounts last updated {self.ripe_accounts_updated_at:%Y-%m-%d %H:%M:%S}")
-        self._check_update_recency("ripe account", self.ripe_accounts_updated_at)
+            self.logger.info(
+                f"Ripe accounts last updated {self.ripe_accounts_updated_at:%Y-%m-%d %H:%M:%S}")
+            self._check_update_recency("ripe account", self.ripe_accounts_updated_at)
 
-        report: typing.List[str] = []
-        updated: typing.List[LiquidatableReport] = []
-        for margin_account in self.ripe_accounts:
-            updated += [LiquidatableReport.build(group, prices, margin_account, self.worthwhile_threshold)]
+            report: typing.List[str] = []
+            updated: typing.List[LiquidatableReport] = []
+            with get_tracer().span("build_reports", {"ripe_accounts": len(self.ripe_accounts)}):
+                for margin_account in self.ripe_accounts:
+                    updated += [LiquidatableReport.build(group, prices, margin_account, self.worthwhile_threshold)]
 
-        liquidatable = list(filter(lambda report: report.state & LiquidatableState.LIQUIDATABLE, updated))
-        report += [f"Of those {len(updated)} ripe accounts, {len(liquidatable)} are liquidatable."]
+            liquidatable = list(filter(lambda report: report.state & LiquidatableState.LIQUIDATABLE, updated))
+            report += [f"Of those {len(updated)} ripe accounts, {len(liquidatable)} are liquidatable."]
 
-        above_water = list(filter(lambda report: report.state & LiquidatableState.ABOVE_WATER, liquidatable))
-        report += [f"Of those {len(liquidatable)} liquidatable margin accounts, {len(above_water)} have assets greater than their liabilities."]
+            above_water = list(filter(lambda report: report.state & LiquidatableState.ABOVE_WATER, liquidatable))
+            report += [f"Of those {len(liquidatable)} liquidatable margin accounts, {len(above_water)} have assets greater than their liabilities."]
 
-        worthwhile = list(filter(lambda report: report.state & LiquidatableState.WORTHWHILE, above_water))
-        report += [f"Of those {len(above_water)} above water margin accounts, {len(worthwhile)} are worthwhile margin accounts with more than ${self.worthwhile_threshold} net assets."]
+            worthwhile = list(filter(lambda report: report.state & LiquidatableState.WORTHWHILE, above_water))
+            report += [f"Of those {len(above_water)} above water margin accounts, {len(worthwhile)} are worthwhile margin accounts with more than ${self.worthwhile_threshold} net assets."]
 
-        report_text = "\n    ".join(report)
-        self.logger.info(f"""Running on {len(self.ripe_accounts)} ripe accounts:
+            report_text = "\n    ".join(report)
+            self.logger.info(f"""Running on {len(self.ripe_accounts)} ripe accounts:
     {report_text}""")
 
-        self._liquidate_all(group, prices, worthwhile)
+            _accounts.labels("ripe").set(len(updated))
+            _accounts.labels("liquidatable").set(len(liquidatable))
+            _accounts.labels("above_water").set(len(above_water))
+            _accounts.labels("worthwhile").set(len(worthwhile))
+            span.set_attribute("ripe_accounts", len(updated))
+            span.set_attribute("liquidatable_accounts", len(liquidatable))
+            span.set_attribute("worthwhile_accounts", len(worthwhile))
+
+            self._liquidate_all(group, prices, worthwhile)
 
-        self.prices_updated_at = datetime.now()
-        time_taken = time.time() - started_at
-        self.logger.info(f"Check of all ripe 🥭 accounts complete. Time taken: {time_taken:.2f} seconds.")
+            self.prices_updated_at = datetime.now()
+            time_taken = time.time() - started_at
+            _update_prices_seconds.observe(time_taken)
+            self.logger.info(f"Check of all ripe 🥭 accounts complete. Time taken: {time_taken:.2f} seconds.")
 
     def _liquidate_all(self, group: Group, prices: typing.List[TokenValue], to_liquidate: typing.List[LiquidatableReport]):
-        to_process = to_liquidate
+        with _liquidate_all_seconds.time(), get_tracer().span("liquidate_all", {"accounts": len(to_liquidate)}):
+            if self.max_in_flight > 1:
+                self._liquidate_all_pipelined(group, prices, to_liquidate)
+            else:
+                self._liquidate_all_sequentially(group, prices, to_liquidate)
+
+    def _liquidate_all_sequentially(self, group: Group, prices: typing.List[TokenValue], to_liquidate: typing.List[LiquidatableReport]):
+        to_process = LiquidationQueue(to_liquidate)
+        self.liquidation_queue = to_process
         while len(to_process) > 0:
-            highest_first = sorted(to_process,
-                                   key=lambda report: report.balance_sheet.assets - report.balance_sheet.liabilities, reverse=True)
-            highest = highest_first[0]
+            highest = to_process.pop()
+            if highest is None:
+                break
+            updated_report = self._liquidate_one(group, prices, highest, self.wallet_balancer.balance)
+            if updated_report is not None:
+                to_process.push(updated_report)
+            self.logger.info(f"Liquidatable accounts to process is now: {len(to_process)}")
+
+    def _liquidate_all_pipelined(self, group: Group, prices: typing.List[TokenValue], to_liquidate: typing.List[LiquidatableReport]):
+        to_process = LiquidationQueue(to_liquidate)
+        self.liquidation_queue = to_process
+        in_flight: typing.Dict[concurrent.futures.Future, LiquidatableReport] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="Liquidation") as executor:
+            while len(to_process) > 0 or len(in_flight) > 0:
+                while len(in_flight) < self.max_in_flight and len(to_process) > 0:
+                    highest = to_process.pop()
+                    if highest is None:
+                        break
+                    future = executor.submit(self._liquidate_one, group, prices, highest,
+                                             self._schedule_balance, get_tracer().current_span())
+                    in_flight[future] = highest
+
+                done, _ = concurrent.futures.wait(in_flight.keys(), return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    del in_flight[future]
+                    updated_report = future.result()
+                    if updated_report is not None:
+                        to_process.push(updated_report)
+
+                self.logger.info(
+                    f"Liquidatable accounts to process is now: {len(to_process)}, with {len(in_flight)} in flight")
+
+    # Work handed to another thread doesn't know which span it's part of, so a pipelined
+    # liquidation passes the span it was started from as `parent_span`.
+    def _liquidate_one(self, group: Group, prices: typing.List[TokenValue], liquidatable_report: LiquidatableReport, balance: typing.Callable[[typing.List[TokenValue]], None], parent_span: typing.Optional[Span] = None) -> typing.Optional[LiquidatableReport]:
+        address = liquidatable_report.margin_account.address
+        with get_tracer().span("liquidate", {"margin_account": str(address)}, parent_span) as span:
             try:
-                liquidate_result = self.account_liquidator.liquidate(highest)
+                with self._wallet_token_gate.liquidating():
+                    liquidate_result = self.account_liquidator.liquidate(liquidatable_report)
                 if liquidate_result is None:
+                    _liquidations.labels("skipped").inc()
                     self.logger.info(
-                        f"Margin account {highest.margin_account.address} was not liquidated and is now being skipped.")
-                else:
-                    self.wallet_balancer.balance(prices)
+                        f"Margin account {liquidatable_report.margin_account.address} was not liquidated and is now being skipped.")
+                    return None
+
+                with get_tracer().span("balance_wallet"):
+                    balance(prices)
 
-                    updated_margin_account = MarginAccount.load(self.context, highest.margin_account.address, group)
+                with get_tracer().span("reload_margin_account"):
+                    updated_margin_account = self._reload_margin_account(liquidatable_report.margin_account.address, group)
                     updated_report = LiquidatableReport.build(
-                        group, prices, updated_margin_account, highest.worthwhile_threshold)
-                    if not (updated_report.state & LiquidatableState.WORTHWHILE):
-                        self.logger.info(
-                            f"Margin account {updated_margin_account.address} has been drained and is no longer worthwhile.")
-                    else:
-                        self.logger.info(
-                            f"Margin account {updated_margin_account.address} is still worthwhile - putting it back on list.")
-                        to_process += [updated_report]
+                        group, prices, updated_margin_account, liquidatable_report.worthwhile_threshold)
+                if not (updated_report.state & LiquidatableState.WORTHWHILE):
+                    _liquidations.labels("drained").inc()
+                    self.logger.info(
+                        f"Margin account {updated_margin_account.address} has been drained and is no longer worthwhile.")
+                    return None
+
+                _liquidations.labels("still_worthwhile").inc()
+                self.logger.info(
+                    f"Margin account {updated_margin_account.address} is still worthwhile - putting it back on list.")
+                return updated_report
             except Exception as exception:
+                _liquidations.labels("failed").inc()
+                span.record_exception(exception)
                 self.logger.error(
-                    f"Liquidator '{self.name}' - failed to liquidate account '{highest.margin_account.address}' - {exception} - {traceback.format_exc()}")
-            finally:
-                # highest should always be in to_process, but we're outside the try-except block
-                # so let's be a little paranoid about it.
-                self.logger.info(f"Liquidatable accounts to process was: {len(to_process)}")
-                if highest in to_process:
-                    to_process.remove(highest)
-                self.logger.info(f"Liquidatable accounts to process is now: {len(to_process)}")
+                    f"Liquidator '{self.name}' - failed to liquidate account '{liquidatable_report.margin_account.address}' - {exception} - {traceback.format_exc()}")
+                return None
+
+    # Derived classes can override this to get the post-liquidation state of a margin account
+    # from somewhere other than the RPC node, the way the backtester does.
+    def _reload_margin_account(self, address: PublicKey, group: Group) -> MarginAccount:
+        return MarginAccount.load(self.context, address, group)
+
+    # Balancing in the background coalesces requests - if a balance is already waiting to run,
+    # a new request just updates the prices it will use rather than queueing another run.
+    def _schedule_balance(self, prices: typing.List[TokenValue]) -> None:
+        with self._balance_lock:
+            already_pending = self._pending_balance_prices is not None
+            self._pending_balance_prices = prices
+        if not already_pending:
+            try:
+                self._balance_executor.submit(self._run_pending_balance)
+            except RuntimeError as exception:
+                self.logger.warning(f"Liquidator '{self.name}' - not balancing wallet - {exception}")
+
+    def _run_pending_balance(self) -> None:
+        with self._balance_lock:
+            prices = self._pending_balance_prices
+            self._pending_balance_prices = None
+        if prices is None:
+            return
+        try:
+            with self._wallet_token_gate.balancing():
+                self.wallet_balancer.balance(prices)
+        except Exception as exception:
+            self.logger.error(
+                f"Liquidator '{self.name}' - failed to balance wallet - {exception} - {traceback.format_exc()}")
+
+    # Waits for any background balance, then runs any balancing the wallet balancer has put
+    # off, so the last changes aren't left unbalanced.
+    def shutdown(self) -> None:
+        self._balance_executor.shutdown(wait=True)
+        try:
+            with self._wallet_token_gate.balancing():
+                self.wallet_balancer.flush()
+        except Exception as exception:
+            self.logger.error(
+                f"Liquidator '{self.name}' - failed to balance wallet on shutdown - {exception} - {traceback.format_exc()}")
 
     def _check_update_recency(self, name: str, last_updated_at: datetime) -> None:
         how_long_ago_was_last_update = datetime.now() - last_updated_at
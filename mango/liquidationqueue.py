@@ -0,0 +1,91 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import heapq
+import itertools
+import logging
+import typing
+
+from decimal import Decimal
+
+from .liquidatablereport import LiquidatableReport
+
+
+# # 💧 LiquidationQueue class
+#
+# A priority queue of `LiquidatableReport`s, ordered so the report with the highest net
+# assets (assets minus liabilities) comes out first.
+#
+# It's a binary heap, so pushing and popping are O(log n) and there's no re-sorting when an
+# account is re-evaluated and pushed back. Each margin account can only be in the queue once:
+# pushing a new report for an account that's already queued invalidates the old report
+# 'lazily' - the old heap entry stays where it is but is skipped when it reaches the top.
+# Removing an account works the same way.
+#
+# `processing_order()` returns the live reports in the order they'd be processed, without
+# changing the queue, so the scheduling can be inspected.
+#
+
+class LiquidationQueue:
+    def __init__(self, reports: typing.Sequence[LiquidatableReport] = []):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._heap: typing.List[typing.Tuple[Decimal, int, LiquidatableReport]] = []
+        self._versions: typing.Dict[str, int] = {}
+        self._counter = itertools.count()
+        for report in reports:
+            self.push(report)
+
+    @staticmethod
+    def net_assets(report: LiquidatableReport) -> Decimal:
+        return report.balance_sheet.assets - report.balance_sheet.liabilities
+
+    def push(self, report: LiquidatableReport) -> None:
+        key = str(report.margin_account.address)
+        version = next(self._counter)
+        self._versions[key] = version
+        # heapq is a min-heap so negate the net assets to get the highest first. The version
+        # is unique so ties are broken by insertion order and reports are never compared.
+        heapq.heappush(self._heap, (-LiquidationQueue.net_assets(report), version, report))
+
+    def pop(self) -> typing.Optional[LiquidatableReport]:
+        while len(self._heap) > 0:
+            _, version, report = heapq.heappop(self._heap)
+            key = str(report.margin_account.address)
+            if self._versions.get(key) == version:
+                del self._versions[key]
+                return report
+        return None
+
+    def remove(self, report: LiquidatableReport) -> None:
+        key = str(report.margin_account.address)
+        if key in self._versions:
+            del self._versions[key]
+
+    def processing_order(self) -> typing.List[LiquidatableReport]:
+        live = [entry for entry in self._heap if self._versions.get(str(entry[2].margin_account.address)) == entry[1]]
+        return [entry[2] for entry in sorted(live)]
+
+    def __contains__(self, report: LiquidatableReport) -> bool:
+        return str(report.margin_account.address) in self._versions
+
+    def __len__(self) -> int:
+        return len(self._versions)
+
+    def __str__(self) -> str:
+        return f"« LiquidationQueue with {len(self)} margin accounts »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
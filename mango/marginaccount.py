@@ -28,15 +28,28 @@ from .addressableaccount import AddressableAccount
 from .balancesheet import BalanceSheet
 from .constants import SYSTEM_PROGRAM_ADDRESS
 from .context import Context
-from .encoding import encode_int, encode_key
+from .encoding import decode_binary, encode_int, encode_key
 from .group import Group
 from .layouts import layouts
 from .mangoaccountflags import MangoAccountFlags
+from .metrics import default_metrics_registry
 from .openorders import OpenOrders
+from .shardedparser import ShardedParser, get_sharded_parser
 from .token import Token
 from .tokenvalue import TokenValue
+from .tracing import get_tracer
 from .version import Version
 
+_load_ripe_seconds = default_metrics_registry.histogram(
+    "mango_load_ripe_seconds", "Time taken to load ripe margin accounts.")
+_ripe_accounts = default_metrics_registry.gauge(
+    "mango_ripe_accounts", "Number of ripe margin accounts found by the last load.")
+
+# Below this many margin accounts it's quicker to parse them all here than to send them to
+# other processes.
+_MINIMUM_SHARDED_PARSE = 500
+
+
 # # 🥭 MarginAccount class
 #
 
@@ -195,11 +208,13 @@ class MarginAccount(AddressableAccount):
         return ripe_accounts
 
     def load_open_orders_accounts(self, context: Context, group: Group) -> None:
-        for index, oo in enumerate(self.open_orders):
-            key = oo
-            if key is not None:
-                self.open_orders_accounts[index] = OpenOrders.load(
-                    context, key, group.basket_tokens[index].token.decimals, group.shared_quote_token.token.decimals)
+        addresses = [oo for oo in self.open_orders if oo is not None]
+        if len(addresses) == 0:
+            return
+
+        account_infos = AccountInfo.load_multiple(context, addresses)
+        all_open_orders_by_address = {str(account_info.address): account_info for account_info in account_infos}
+        self.install_open_orders_accounts(group, all_open_orders_by_address)
 
     def install_open_orders_accounts(self, group: Group, all_open_orders_by_address: typing.Dict[str, AccountInfo]) -> None:
         for index, oo in enumerate(self.open_orders):
@@ -292,10 +307,14 @@ class MarginAccount(AddressableAccount):
     # This newer method is implemented in load_ripe_v2()
     @staticmethod
     def load_ripe(context: Context, group: Group) -> typing.List["MarginAccount"]:
-        if group.version == Version.V1:
-            return MarginAccount._load_ripe_v1(context, group)
-        else:
-            return MarginAccount._load_ripe_v2(context, group)
+        with _load_ripe_seconds.time(), get_tracer().span("load_ripe") as span:
+            if group.version == Version.V1:
+                ripe_accounts = MarginAccount._load_ripe_v1(context, group)
+            else:
+                ripe_accounts = MarginAccount._load_ripe_v2(context, group)
+            span.set_attribute("ripe_accounts", len(ripe_accounts))
+        _ripe_accounts.set(len(ripe_accounts))
+        return ripe_accounts
 
     @classmethod
     def _load_ripe_v1(cls, context: Context, group: Group) -> typing.List["MarginAccount"]:
@@ -331,7 +350,15 @@ class MarginAccount(AddressableAccount):
         ]
 
         data_size = layouts.MARGIN_ACCOUNT_V2.sizeof()
-        results = context.client.get_program_accounts(context.program_id, data_size=data_size, memcmp_opts=filters)
+        results: typing.Sequence[typing.Dict] = typing.cast(typing.Sequence[typing.Dict], context.client.get_program_accounts(
+            context.program_id, data_size=data_size, memcmp_opts=filters))
+        logger.info(f"Fetched {len(results)} V2 margin accounts to process.")
+
+        prices = group.fetch_token_prices(context)
+        if context.parse_processes > 1 and len(results) >= _MINIMUM_SHARDED_PARSE:
+            results = MarginAccount._sharded_ripe_candidates(context, group, prices, results)
+            logger.info(f"Of those, {len(results)} could be ripe after parsing in {context.parse_processes} processes.")
+
         margin_accounts = []
         open_orders_addresses = []
         for margin_account_data in results:
@@ -341,8 +368,6 @@ class MarginAccount(AddressableAccount):
             open_orders_addresses += margin_account.open_orders
             margin_accounts += [margin_account]
 
-        logger.info(f"Fetched {len(margin_accounts)} V2 margin accounts to process.")
-
         # It looks like this will be more efficient - just specify only the addresses we
         # need, and install them.
         #
@@ -365,13 +390,41 @@ class MarginAccount(AddressableAccount):
         for margin_account in margin_accounts:
             margin_account.install_open_orders_accounts(group, open_orders)
 
-        prices = group.fetch_token_prices(context)
         ripe_accounts = MarginAccount.filter_out_unripe(margin_accounts, group, prices)
 
         time_taken = time.time() - started_at
         logger.info(f"Loading ripe 🥭 accounts complete. Time taken: {time_taken:.2f} seconds.")
         return ripe_accounts
 
+    # Parsing every margin account is the CPU-bound part of loading ripe accounts, so with
+    # `context.parse_processes` set the raw (still base64-encoded) results are sharded across
+    # worker processes by a `ShardedParser`. Each worker decodes and parses its accounts and
+    # sends back only the indexes of accounts that could be ripe. Only those are then parsed
+    # again here, with their open orders accounts installed, for the exact check.
+    #
+    # Workers don't see open orders accounts. Unsettled funds in open orders can only add to an
+    # account's assets, so ignoring them gives a collateral ratio no higher than the real one -
+    # an account that isn't ripe without them isn't ripe with them either.
+    @staticmethod
+    def _sharded_ripe_candidates(context: Context, group: Group, prices: typing.List[TokenValue], results: typing.Sequence[typing.Dict]) -> typing.List[typing.Dict]:
+        items = [f"{result['pubkey']}:{result['account']['data'][1]}:{result['account']['data'][0]}".encode("ascii")
+                 for result in results]
+        sharded_parser = get_sharded_parser(context.parse_processes)
+        candidate_indexes = sharded_parser.map(MarginAccount._ripe_candidates_in_shard, items, context.program_id, group, prices)
+        return [results[index] for index in sorted(candidate_indexes)]
+
+    @staticmethod
+    def _ripe_candidates_in_shard(shared_memory_name: str, first_index: int, offsets: typing.Sequence[int], program_id: PublicKey, group: Group, prices: typing.List[TokenValue]) -> typing.List[int]:
+        candidates: typing.List[int] = []
+        for index, item in ShardedParser.items(shared_memory_name, first_index, offsets):
+            address, encoding, encoded = item.decode("ascii").split(":", 2)
+            account_info = AccountInfo(PublicKey(address), False, Decimal(0), program_id, Decimal(0),
+                                       decode_binary([encoded, encoding]))
+            balance_sheet = MarginAccount.parse(account_info, group).get_balance_sheet_totals(group, prices)
+            if balance_sheet.liabilities > 0 and balance_sheet.collateral_ratio <= group.init_coll_ratio:
+                candidates += [index]
+        return candidates
+
     def __str__(self) -> str:
         info = f"'{self.info}'" if self.info else "(𝑢𝑛-𝑛𝑎𝑚𝑒𝑑)"
         deposits = "\n        ".join([f"{item}" for item in self.deposits])
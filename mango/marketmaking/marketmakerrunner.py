@@ -0,0 +1,219 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import logging
+import mango
+import threading
+import time
+import traceback
+import typing
+
+from datetime import timedelta
+from pyserum.market import Market as PySerumMarket
+from pyserum.market.orderbook import OrderBook
+from pyserum.market.state import MarketState as PySerumMarketState
+from solana.rpc.api import Client
+
+from .simplemarketmaker import SimpleMarketMaker
+
+
+# # 🥭 SharedTokenAccountResolver class
+#
+# Looks up the largest token account the wallet has for a token, and remembers it. Only the
+# address of the token account is used when placing orders so it's safe to keep it around, and
+# sharing one resolver means each token is only looked up once no matter how many markets use it.
+#
+
+class SharedTokenAccountResolver:
+    def __init__(self, context: mango.Context, wallet: mango.Wallet):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.context: mango.Context = context
+        self.wallet: mango.Wallet = wallet
+        self._token_accounts: typing.Dict[str, typing.Optional[mango.TokenAccount]] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    def resolve(self, token: mango.Token) -> typing.Optional[mango.TokenAccount]:
+        key = str(token.mint)
+        with self._lock:
+            if key not in self._token_accounts:
+                self._token_accounts[key] = mango.TokenAccount.fetch_largest_for_owner_and_token(
+                    self.context, self.wallet.address, token)
+            return self._token_accounts[key]
+
+    def __str__(self) -> str:
+        return f"« SharedTokenAccountResolver for {self.wallet.address}: {len(self._token_accounts)} token accounts »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 load_serum_markets function
+#
+# Loads the pyserum `Market`s for several `SpotMarket`s with a single `getMultipleAccounts`
+# call, using the token decimals we already know instead of loading each mint.
+#
+
+def load_serum_markets(context: mango.Context, spot_markets: typing.Sequence[mango.SpotMarket]) -> typing.List[PySerumMarket]:
+    account_infos = mango.AccountInfo.load_multiple(context, [spot_market.address for spot_market in spot_markets])
+    if len(account_infos) != len(spot_markets):
+        raise Exception(f"Failed to load {len(spot_markets)} Serum markets - got {len(account_infos)}.")
+
+    markets: typing.List[PySerumMarket] = []
+    for spot_market, account_info in zip(spot_markets, account_infos):
+        state = PySerumMarketState.from_bytes(context.dex_program_id, int(spot_market.base.decimals),
+                                              int(spot_market.quote.decimals), account_info.data)
+        markets += [PySerumMarket(typing.cast(Client, context.client.compatible_client), state)]
+    return markets
+
+
+# # 🥭 MarketMakerRunner class
+#
+# Runs many `SimpleMarketMaker`s in one process, on one thread.
+#
+# Each iteration fetches what all the market makers need in as few requests as possible and
+# then gives each market maker its turn:
+# 1. All prices are fetched with one `OracleProvider.fetch_prices()` call.
+# 2. The wallet balance of each distinct token is fetched once, however many markets use it.
+# 3. The bids and asks of all Serum markets are loaded with one `getMultipleAccounts` call, and
+#    each market maker's orders are found in those order books.
+# 4. Each market maker updates its orders in turn. A failure in one market maker is logged
+#    and doesn't stop the others.
+#
+# Markets often share a token - usually the quote token. Each market maker is only given an
+# equal share of the balance of a token it shares with other market makers, so together they
+# never size orders against more than the wallet holds.
+#
+# A failed iteration is logged and the runner carries on, so the market makers' orders are
+# always cleaned up when it stops.
+#
+# The market makers should share one `Context` (and so one RPC client and blockhash cache)
+# and their `SerumOrderPlacer`s should share one `SharedTokenAccountResolver`. Each market can
+# only have one market maker - prices and orders are looked up by market symbol.
+#
+
+class MarketMakerRunner:
+    def __init__(self, context: mango.Context, wallet: mango.Wallet, oracle_provider: mango.OracleProvider, market_makers: typing.Sequence[SimpleMarketMaker], pause: timedelta):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        symbols = [market_maker.market.symbol for market_maker in market_makers]
+        duplicates = sorted(set([symbol for symbol in symbols if symbols.count(symbol) > 1]))
+        if len(duplicates) > 0:
+            raise Exception(f"Each market can only have one market maker - duplicated: {', '.join(duplicates)}")
+        self.context: mango.Context = context
+        self.wallet: mango.Wallet = wallet
+        self.oracle_provider: mango.OracleProvider = oracle_provider
+        self.market_makers: typing.Sequence[SimpleMarketMaker] = market_makers
+        self.pause: timedelta = pause
+        self.stop_requested = False
+
+    def start(self):
+        for market_maker in self.market_makers:
+            market_maker.cleanup()
+
+        while not self.stop_requested:
+            self.logger.info("Starting fresh iteration.")
+            start_time = time.time()
+            try:
+                self.run_once()
+                time_taken = time.time() - start_time
+                self.logger.info(f"Updated {len(self.market_makers)} markets. Time taken: {time_taken:.2f} seconds.")
+            except Exception as exception:
+                self.logger.error(f"Failed to update markets: {exception} - {traceback.format_exc()}")
+
+            # Wait and hope for fills.
+            self.logger.info(f"Pausing for {self.pause} seconds.")
+            time.sleep(self.pause.seconds)
+
+        for market_maker in self.market_makers:
+            try:
+                market_maker.cleanup()
+            except Exception as exception:
+                self.logger.error(f"Failed to clean up {market_maker}: {exception}")
+
+    def stop(self):
+        self.stop_requested = True
+
+    def run_once(self):
+        markets = [market_maker.market for market_maker in self.market_makers]
+        prices_by_symbol: typing.Dict[str, mango.Price] = {}
+        for price in self.oracle_provider.fetch_prices(self.context, markets):
+            prices_by_symbol[price.market.symbol] = price
+
+        inventory = self.share_inventory(self.fetch_inventory())
+        orders = self.fetch_orders()
+
+        for market_maker in self.market_makers:
+            symbol = market_maker.market.symbol
+            if symbol not in prices_by_symbol:
+                self.logger.warning(f"No price available for market {symbol} - skipping.")
+                continue
+            try:
+                market_maker.update_orders(prices_by_symbol[symbol], inventory[symbol], orders[symbol])
+            except Exception as exception:
+                self.logger.error(f"Failed to update orders for market {symbol}: {exception}")
+
+    def fetch_inventory(self) -> typing.List[mango.TokenValue]:
+        tokens: typing.List[mango.Token] = []
+        for market_maker in self.market_makers:
+            for token in [market_maker.market.base, market_maker.market.quote]:
+                if token not in tokens:
+                    tokens += [token]
+
+        return mango.TokenValue.fetch_total_values(self.context, self.wallet.address, tokens)
+
+    # Splits the balance of each token evenly between the market makers that use it, giving each
+    # market maker its own inventory keyed by market symbol.
+    def share_inventory(self, inventory: typing.List[mango.TokenValue]) -> typing.Dict[str, typing.List[mango.TokenValue]]:
+        users: typing.Dict[str, int] = {}
+        for market_maker in self.market_makers:
+            for token in [market_maker.market.base, market_maker.market.quote]:
+                users[str(token.mint)] = users.get(str(token.mint), 0) + 1
+
+        shared: typing.Dict[str, typing.List[mango.TokenValue]] = {}
+        for market_maker in self.market_makers:
+            shares: typing.List[mango.TokenValue] = []
+            for token in [market_maker.market.base, market_maker.market.quote]:
+                token_value = mango.TokenValue.find_by_token(inventory, token)
+                shares += [mango.TokenValue(token, token_value.value / users[str(token.mint)])]
+            shared[market_maker.market.symbol] = shares
+        return shared
+
+    def fetch_orders(self) -> typing.Dict[str, typing.List[mango.Order]]:
+        orders: typing.Dict[str, typing.List[mango.Order]] = {}
+        serum_placers: typing.List[mango.SerumOrderPlacer] = []
+        for market_maker in self.market_makers:
+            if isinstance(market_maker.order_placer, mango.SerumOrderPlacer):
+                serum_placers += [market_maker.order_placer]
+            else:
+                orders[market_maker.market.symbol] = market_maker.order_placer.load_my_orders()
+
+        if len(serum_placers) > 0:
+            bid_ask_addresses = []
+            for placer in serum_placers:
+                bid_ask_addresses += [placer.market.state.bids(), placer.market.state.asks()]
+            bid_ask_account_infos = mango.AccountInfo.load_multiple(self.context, bid_ask_addresses)
+            for index, placer in enumerate(serum_placers):
+                bids = OrderBook.from_bytes(placer.market.state, bid_ask_account_infos[index * 2].data)
+                asks = OrderBook.from_bytes(placer.market.state, bid_ask_account_infos[(index * 2) + 1].data)
+                orders[placer.spot_market.symbol] = placer.my_orders_from_order_books(bids, asks)
+
+        return orders
+
+    def __str__(self) -> str:
+        symbols = ", ".join([market_maker.market.symbol for market_maker in self.market_makers])
+        return f"""« MarketMakerRunner for markets: {symbols} »"""
+
+    def __repr__(self) -> str:
+        return f"{self}"
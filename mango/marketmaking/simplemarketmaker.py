@@ -16,6 +16,10 @@
 
 import logging
 import mango
+import rx
+import rx.core.typing
+import rx.operators as ops
+import threading
 import time
 import typing
 
@@ -39,17 +43,22 @@ from decimal import Decimal
 # 5. Sleep for a defined period
 # 6. Repeat from Step 1
 #
+# There is also a reactive mode, started with `start_reactive()`. Instead of sleeping, it
+# requotes whenever the oracle's streaming observable produces a new price (sampled at most
+# once per `debounce` period) or whenever a fill (full or partial) is seen on the open orders
+# account. The inventory and current orders are cached and only reloaded after a fill, and
+# orders are only touched when the desired quote moves outside the `existing_order_tolerance`
+# band.
+#
 # There are many features missing that you'd expect in a more realistic market maker. Here are just a few:
 # * There is very little error handling
 # * There is no retrying of failed actions
-# * There is no introspection on whether orders are filled
 # * There is no inventory management, nor any attempt to balance number of filled buys with number of
 #   filled sells.
 # * Token prices and quantities are rounded to the token mint's decimals, not the market's tick size and
 #   lot size
 # * The strategy of placing orders at a fixed spread around the mid price without taking any other factors
 #   into account is likely to be costly
-# * Place and Cancel instructions aren't batched into single transactions
 #
 
 class SimpleMarketMaker:
@@ -66,6 +75,16 @@ class SimpleMarketMaker:
         self.pause: timedelta = pause
         self.stop_requested = False
 
+        # Reactive-mode state. `_cached_inventory` and `_cached_orders` are only reloaded when
+        # `_state_stale` is set by a fill.
+        self._lock: threading.Lock = threading.Lock()
+        self._latest_price: typing.Optional[mango.Price] = None
+        self._cached_inventory: typing.Optional[typing.List[mango.TokenValue]] = None
+        self._cached_orders: typing.Optional[typing.List[mango.Order]] = None
+        self._state_stale: bool = True
+        self._last_open_orders_state: typing.Optional[typing.Tuple[typing.FrozenSet[int], typing.Tuple[typing.Any, ...]]] = None
+        self._stopped: threading.Event = threading.Event()
+
     def start(self):
         # On startup there should be no existing orders. If we didn't exit cleanly last time though,
         # there may still be some hanging around. Cancel any existing orders so we start fresh.
@@ -77,27 +96,9 @@ class SimpleMarketMaker:
             # Update current state
             price = self.oracle.fetch_price(self.context)
             inventory = self.fetch_inventory()
-
-            # Calculate what we want the orders to be.
-            bid, ask = self.calculate_order_prices(price)
-            buy_size, sell_size = self.calculate_order_sizes(price, inventory)
-
             current_orders = self.order_placer.load_my_orders()
-            buy_orders = [order for order in current_orders if order.side == mango.Side.BUY]
-            if self.orders_require_action(buy_orders, bid, buy_size):
-                self.logger.info("Cancelling BUY orders.")
-                for order in buy_orders:
-                    self.order_placer.cancel_order(order)
-                buy_order = self.order_placer.place_order(mango.Side.BUY, mango.OrderType.POST_ONLY, bid, buy_size)
-                self.logger.info(f"Placed order {buy_order} to BUY {buy_size} at {bid}")
-
-            sell_orders = [order for order in current_orders if order.side == mango.Side.SELL]
-            if self.orders_require_action(sell_orders, ask, sell_size):
-                self.logger.info("Cancelling SELL orders.")
-                for order in sell_orders:
-                    self.order_placer.cancel_order(order)
-                sell_order = self.order_placer.place_order(mango.Side.SELL, mango.OrderType.POST_ONLY, ask, sell_size)
-                self.logger.info(f"Placed order {sell_order} to SELL {sell_size} at {ask}")
+
+            self.update_orders(price, inventory, current_orders)
 
             # Wait and hope for fills.
             self.logger.info(f"Pausing for {self.pause} seconds.")
@@ -105,20 +106,120 @@ class SimpleMarketMaker:
 
         self.cleanup()
 
+    # `fills` should emit an item whenever the open orders account changes. Every item is
+    # treated as a fill unless it has a `client_ids` attribute (like `OpenOrders`) - see
+    # `_on_fill()` for how those are checked.
+    #
+    # This blocks until `stop()` is called.
+    def start_reactive(self, fills: rx.core.typing.Observable, debounce: timedelta):
+        self.cleanup()
+        self._stopped.clear()
+
+        price_stream = typing.cast(rx.Observable, self.oracle.to_streaming_observable(self.context))
+        prices = price_stream.pipe(
+            ops.sample(debounce),
+            ops.map(lambda price: self._on_price(price))
+        )
+        fill_triggers = typing.cast(rx.Observable, fills).pipe(
+            ops.map(lambda item: self._on_fill(item))
+        )
+        subscription = rx.merge(prices, fill_triggers).pipe(
+            ops.catch(mango.observable_pipeline_error_reporter),
+            ops.retry()
+        ).subscribe(mango.create_backpressure_skipping_observer(on_next=lambda _: self._requote(), on_error=mango.log_subscription_error))
+
+        self._stopped.wait()
+        subscription.dispose()
+        with self._lock:
+            self.cleanup()
+
     def stop(self):
         self.stop_requested = True
+        self._stopped.set()
 
     def cleanup(self):
         self.logger.info("Cleaning up.")
         orders = self.order_placer.load_my_orders()
-        for order in orders:
-            self.order_placer.cancel_order(order)
+        if len(orders) > 0:
+            self.order_placer.cancel_and_place(orders, mango.OrderType.POST_ONLY, [])
+        self._cached_orders = []
+
+    def update_orders(self, price: mango.Price, inventory: typing.List[mango.TokenValue], current_orders: typing.List[mango.Order]) -> typing.List[mango.Order]:
+        # Calculate what we want the orders to be.
+        bid, ask = self.calculate_order_prices(price)
+        buy_size, sell_size = self.calculate_order_sizes(price, inventory)
+
+        kept_orders: typing.List[mango.Order] = []
+        to_cancel: typing.List[mango.Order] = []
+        to_place: typing.List[mango.Order] = []
+        buy_orders = [order for order in current_orders if order.side == mango.Side.BUY]
+        if self.orders_require_action(buy_orders, bid, buy_size):
+            self.logger.info(f"Replacing BUY orders with order to BUY {buy_size} at {bid}.")
+            to_cancel += buy_orders
+            to_place += [mango.Order(id=0, side=mango.Side.BUY, price=bid, size=buy_size)]
+        else:
+            kept_orders += buy_orders
+
+        sell_orders = [order for order in current_orders if order.side == mango.Side.SELL]
+        if self.orders_require_action(sell_orders, ask, sell_size):
+            self.logger.info(f"Replacing SELL orders with order to SELL {sell_size} at {ask}.")
+            to_cancel += sell_orders
+            to_place += [mango.Order(id=0, side=mango.Side.SELL, price=ask, size=sell_size)]
+        else:
+            kept_orders += sell_orders
+
+        if len(to_place) == 0:
+            return kept_orders
+
+        # All cancels and places go through the order placer in one call so it can batch them
+        # into as few transactions as possible.
+        placed = self.order_placer.cancel_and_place(to_cancel, mango.OrderType.POST_ONLY, to_place)
+        self.logger.info(f"Placed orders {placed}")
+        return kept_orders + list(placed)
+
+    def _on_price(self, price: mango.Price) -> None:
+        self._latest_price = price
+
+    # Client IDs that differ from the IDs of the orders we think we have mean an order was
+    # filled (or cancelled). The same client IDs with different token balances from the last
+    # item mean one of our orders was partly filled and is still open. The first item seen with
+    # a new set of client IDs is just our own orders being placed, so it isn't a fill.
+    def _on_fill(self, item: typing.Any) -> None:
+        client_ids = getattr(item, "client_ids", None)
+        if client_ids is not None and self._cached_orders is not None:
+            ids = frozenset([int(client_id) for client_id in client_ids])
+            balances = tuple([getattr(item, name, None) for name in
+                              ["base_token_free", "base_token_total", "quote_token_free", "quote_token_total"]])
+            previous = self._last_open_orders_state
+            self._last_open_orders_state = (ids, balances)
+
+            cached_ids = frozenset([int(order.id) for order in self._cached_orders])
+            if ids == cached_ids and (previous is None or previous[0] != ids or previous[1] == balances):
+                return
+
+        self.logger.info("Fill detected - inventory and orders will be reloaded.")
+        self._state_stale = True
+
+    def _requote(self) -> None:
+        if self.stop_requested or self._latest_price is None:
+            return
+
+        with self._lock:
+            if self._state_stale or self._cached_inventory is None or self._cached_orders is None:
+                self._state_stale = False
+                self._cached_inventory = self.fetch_inventory()
+                self._cached_orders = self.order_placer.load_my_orders()
+
+            try:
+                self._cached_orders = self.update_orders(self._latest_price, self._cached_inventory, self._cached_orders)
+            except Exception:
+                # Some of the cancels or new orders may have landed, so the cached orders can't
+                # be trusted any more.
+                self._state_stale = True
+                raise
 
     def fetch_inventory(self) -> typing.List[mango.TokenValue]:
-        return [
-            mango.TokenValue.fetch_total_value(self.context, self.wallet.address, self.market.base),
-            mango.TokenValue.fetch_total_value(self.context, self.wallet.address, self.market.quote)
-        ]
+        return mango.TokenValue.fetch_total_values(self.context, self.wallet.address, [self.market.base, self.market.quote])
 
     def calculate_order_prices(self, price: mango.Price):
         bid = price.mid_price - (price.mid_price * self.spread_ratio)
@@ -131,7 +232,12 @@ class SimpleMarketMaker:
         if base_tokens is None:
             raise Exception(f"Could not find market-maker base token {price.market.base.symbol} in inventory.")
 
-        buy_size = base_tokens.value * self.position_size_ratio
+        quote_tokens: typing.Optional[mango.TokenValue] = mango.TokenValue.find_by_token(inventory, price.market.quote)
+        if quote_tokens is None:
+            raise Exception(f"Could not find market-maker quote token {price.market.quote.symbol} in inventory.")
+
+        # A BUY can't spend more than our share of the quote tokens.
+        buy_size = min(base_tokens.value, quote_tokens.value / price.mid_price) * self.position_size_ratio
         sell_size = base_tokens.value * self.position_size_ratio
 
         return (buy_size, sell_size)
@@ -0,0 +1,395 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import abc
+import bisect
+import http.server
+import logging
+import math
+import threading
+import time
+import typing
+
+
+# # 🥭 Metrics
+#
+# This file contains simple counters, gauges and histograms, and a small HTTP server that
+# exposes them at `/metrics` in the [Prometheus text format](https://prometheus.io/docs/instrumenting/exposition_formats/).
+#
+# Metrics are created on a `MetricsRegistry` - usually `default_metrics_registry` - when a
+# module is loaded, and updated as the code runs. Nothing is exposed unless a `MetricsServer`
+# is started (which `Context` does if `--metrics-port` is specified).
+#
+# Metrics can have labels. Use `labels()` to get the value for a particular set of label
+# values, for example:
+# ```
+# rpc_requests.labels("getAccountInfo").inc()
+# ```
+# A metric without labels can be updated directly.
+#
+
+
+# # 🥭 Metric class
+#
+# The base class for all metrics. It keeps one value for each distinct set of label values.
+#
+
+class Metric(metaclass=abc.ABCMeta):
+    def __init__(self, name: str, description: str, label_names: typing.Sequence[str] = ()):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.name: str = name
+        self.description: str = description
+        self.label_names: typing.Tuple[str, ...] = tuple(label_names)
+        self._lock: threading.Lock = threading.Lock()
+        self._values: typing.Dict[typing.Tuple[str, ...], typing.Any] = {}
+
+    @property
+    @abc.abstractmethod
+    def metric_type(self) -> str:
+        raise NotImplementedError("Metric.metric_type is not implemented on the base type.")
+
+    @abc.abstractmethod
+    def _new_value(self) -> typing.Any:
+        raise NotImplementedError("Metric._new_value() is not implemented on the base type.")
+
+    def labels(self, *label_values: str) -> typing.Any:
+        if len(label_values) != len(self.label_names):
+            raise Exception(f"Metric '{self.name}' needs {len(self.label_names)} label values, not {len(label_values)}.")
+        key = tuple(map(str, label_values))
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = self._new_value()
+            return self._values[key]
+
+    def render(self) -> typing.List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            lines += value.render(self.name, self._format_labels(label_values))
+        return lines
+
+    def _format_labels(self, label_values: typing.Sequence[str]) -> str:
+        pairs = list(zip(self.label_names, label_values))
+        if len(pairs) == 0:
+            return ""
+        escaped = [f'{name}="{_escape_label_value(value)}"' for name, value in pairs]
+        return "{" + ",".join(escaped) + "}"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+# # 🥭 Counter class
+#
+# A value that only ever goes up, like the number of RPC requests sent.
+#
+
+class CounterValue:
+    def __init__(self):
+        self._lock: threading.Lock = threading.Lock()
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        if amount < 0:
+            raise Exception(f"Counters can only increase, not by {amount}.")
+        with self._lock:
+            self.value += amount
+
+    def render(self, name: str, labels: str) -> typing.List[str]:
+        return [f"{name}{labels} {_format_number(self.value)}"]
+
+
+class Counter(Metric):
+    @property
+    def metric_type(self) -> str:
+        return "counter"
+
+    def _new_value(self) -> CounterValue:
+        return CounterValue()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def __str__(self) -> str:
+        return f"« Counter {self.name} »"
+
+
+# # 🥭 Gauge class
+#
+# A value that can go up and down, like the number of ripe margin accounts.
+#
+
+class GaugeValue:
+    def __init__(self):
+        self._lock: threading.Lock = threading.Lock()
+        self.value: float = 0
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def render(self, name: str, labels: str) -> typing.List[str]:
+        return [f"{name}{labels} {_format_number(self.value)}"]
+
+
+class Gauge(Metric):
+    @property
+    def metric_type(self) -> str:
+        return "gauge"
+
+    def _new_value(self) -> GaugeValue:
+        return GaugeValue()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self.labels().dec(amount)
+
+    def __str__(self) -> str:
+        return f"« Gauge {self.name} »"
+
+
+# # 🥭 Histogram class
+#
+# Counts observations (usually durations, in seconds) into buckets, so Prometheus can
+# calculate percentiles with `histogram_quantile()`. The bucket boundaries are upper bounds -
+# an observation is counted in the first bucket it is less than or equal to (and, in the
+# text format, in every bucket after that).
+#
+# `time()` returns a context manager that observes how long its block took:
+# ```
+# with load_ripe_seconds.time():
+#     ...
+# ```
+#
+
+DEFAULT_BUCKETS: typing.Sequence[float] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class HistogramValue:
+    def __init__(self, buckets: typing.Sequence[float]):
+        self._lock: threading.Lock = threading.Lock()
+        self.buckets: typing.Sequence[float] = buckets
+        self.bucket_counts: typing.List[int] = [0] * (len(buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self) -> "_HistogramTimer":
+        return _HistogramTimer(self)
+
+    def render(self, name: str, labels: str) -> typing.List[str]:
+        with self._lock:
+            bucket_counts = list(self.bucket_counts)
+            count = self.count
+            total = self.sum
+        lines: typing.List[str] = []
+        cumulative = 0
+        for upper_bound, bucket_count in zip(list(self.buckets) + [math.inf], bucket_counts):
+            cumulative += bucket_count
+            bucket_labels = _add_label(labels, "le", _format_number(upper_bound))
+            lines += [f"{name}_bucket{bucket_labels} {cumulative}"]
+        lines += [f"{name}_sum{labels} {_format_number(total)}", f"{name}_count{labels} {count}"]
+        return lines
+
+
+def _add_label(labels: str, name: str, value: str) -> str:
+    if labels == "":
+        return f'{{{name}="{value}"}}'
+    return f'{labels[:-1]},{name}="{value}"}}'
+
+
+class _HistogramTimer:
+    def __init__(self, histogram_value: HistogramValue):
+        self.histogram_value: HistogramValue = histogram_value
+        self.started_at: float = 0
+
+    def __enter__(self) -> "_HistogramTimer":
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.histogram_value.observe(time.perf_counter() - self.started_at)
+
+
+class Histogram(Metric):
+    def __init__(self, name: str, description: str, label_names: typing.Sequence[str] = (), buckets: typing.Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, label_names)
+        self.buckets: typing.Sequence[float] = sorted(buckets)
+
+    @property
+    def metric_type(self) -> str:
+        return "histogram"
+
+    def _new_value(self) -> HistogramValue:
+        return HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self) -> _HistogramTimer:
+        return self.labels().time()
+
+    def __str__(self) -> str:
+        return f"« Histogram {self.name} »"
+
+
+# # 🥭 MetricsRegistry class
+#
+# Holds a collection of metrics and renders them all in the Prometheus text format.
+#
+# Asking for a metric that already exists returns the existing metric, as long as it's the
+# same type, so a module can be reloaded without errors.
+#
+
+class MetricsRegistry:
+    def __init__(self):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._lock: threading.Lock = threading.Lock()
+        self.metrics: typing.Dict[str, Metric] = {}
+
+    def counter(self, name: str, description: str, label_names: typing.Sequence[str] = ()) -> Counter:
+        return typing.cast(Counter, self._register(Counter, name, lambda: Counter(name, description, label_names)))
+
+    def gauge(self, name: str, description: str, label_names: typing.Sequence[str] = ()) -> Gauge:
+        return typing.cast(Gauge, self._register(Gauge, name, lambda: Gauge(name, description, label_names)))
+
+    def histogram(self, name: str, description: str, label_names: typing.Sequence[str] = (), buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return typing.cast(Histogram, self._register(Histogram, name, lambda: Histogram(name, description, label_names, buckets)))
+
+    def _register(self, metric_class: typing.Type[Metric], name: str, create: typing.Callable[[], Metric]) -> Metric:
+        with self._lock:
+            if name in self.metrics:
+                existing = self.metrics[name]
+                if not isinstance(existing, metric_class):
+                    raise Exception(f"Metric '{name}' is already registered as a {existing.metric_type}.")
+                return existing
+            metric = create()
+            self.metrics[name] = metric
+            return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self.metrics.values())
+        lines: typing.List[str] = []
+        for metric in metrics:
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
+
+    def __str__(self) -> str:
+        return f"« MetricsRegistry with {len(self.metrics)} metrics »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+default_metrics_registry = MetricsRegistry()
+
+
+# # 🥭 MetricsServer class
+#
+# A small threaded HTTP server that serves a `MetricsRegistry` at `/metrics`, for Prometheus
+# to scrape. It runs on a daemon thread, so it won't keep a process alive.
+#
+# Port 0 picks a free port - the port actually used is available as `port` after `start()`.
+#
+
+class MetricsServer:
+    CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = "0.0.0.0"):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.registry: MetricsRegistry = registry
+        self.host: str = host
+        self.port: int = port
+        self._server: typing.Optional[http.server.ThreadingHTTPServer] = None
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def start(self) -> "MetricsServer":
+        registry = self.registry
+
+        class _MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", MetricsServer.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: typing.Any) -> None:
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), _MetricsRequestHandler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_port
+        self._thread = threading.Thread(target=self._server.serve_forever, kwargs={"poll_interval": 0.1},
+                                        name="MetricsServer", daemon=True)
+        self._thread.start()
+        self.logger.info(f"Serving metrics on http://{self.host}:{self.port}/metrics")
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "MetricsServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def __str__(self) -> str:
+        return f"« MetricsServer on {self.host}:{self.port} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
@@ -19,11 +19,15 @@ import csv
 import logging
 import os.path
 import requests
+import threading
+import time
 import typing
 
+from datetime import timedelta
 from urllib.parse import unquote
 
 from .liquidationevent import LiquidationEvent
+from .metrics import default_metrics_registry
 
 
 # # 🥭 Notification
@@ -31,6 +35,14 @@ from .liquidationevent import LiquidationEvent
 # This file contains code to send arbitrary notifications.
 #
 
+_notification_seconds = default_metrics_registry.histogram(
+    "mango_notification_seconds", "Time taken to send notifications.", ["target"])
+_notification_errors = default_metrics_registry.counter(
+    "mango_notification_errors_total", "Notifications that failed to send.", ["target"])
+_notifications_dropped = default_metrics_registry.counter(
+    "mango_notifications_dropped_total", "Notifications dropped because a background queue was full.")
+
+
 # # 🥭 NotificationTarget class
 #
 # This base class is the root of the different notification mechanisms.
@@ -39,17 +51,34 @@ from .liquidationevent import LiquidationEvent
 #
 # Derived classes should not override `send()` since that is the interface outside classes call and it's used to ensure `NotificationTarget`s don't throw an exception when sending.
 #
+# `maximum_message_length` and `minimum_send_interval` describe the limits of the service
+# behind the target, and are used by `BackgroundNotificationTarget` to batch and pace
+# notifications. A `maximum_message_length` of 0 means items are never combined.
+#
 
 class NotificationTarget(metaclass=abc.ABCMeta):
     def __init__(self):
         self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.maximum_message_length: int = 0
+        self.minimum_send_interval: timedelta = timedelta(seconds=0)
 
     def send(self, item: typing.Any) -> None:
         try:
-            self.send_notification(item)
+            self.send_measured(item)
         except Exception as exception:
             self.logger.error(f"Error sending {item} - {self} - {exception}")
 
+    # Sends the item, recording how long it took (and whether it failed) against this
+    # target's class name. Exceptions are passed on to the caller.
+    def send_measured(self, item: typing.Any) -> None:
+        target = self.__class__.__name__
+        try:
+            with _notification_seconds.labels(target).time():
+                self.send_notification(item)
+        except Exception:
+            _notification_errors.labels(target).inc()
+            raise
+
     @abc.abstractmethod
     def send_notification(self, item: typing.Any) -> None:
         raise NotImplementedError("NotificationTarget.send() is not implemented on the base type.")
@@ -76,11 +105,17 @@ class NotificationTarget(metaclass=abc.ABCMeta):
 #
 # The [Telegram instructions to create a bot](https://core.telegram.org/bots#creating-a-new-bot)
 # show you how to create the bot token.
+#
+# Telegram rejects messages longer than 4096 characters, and bots shouldn't send more than
+# about one message per second to the same chat.
+#
 
 
 class TelegramNotificationTarget(NotificationTarget):
     def __init__(self, address):
         super().__init__()
+        self.maximum_message_length = 4096
+        self.minimum_send_interval = timedelta(seconds=1)
         chat_id, bot_id = address.split("@", 1)
         self.chat_id = chat_id
         self.bot_id = bot_id
@@ -99,11 +134,16 @@ class TelegramNotificationTarget(NotificationTarget):
 #
 # The `DiscordNotificationTarget` sends messages to Discord.
 #
+# Discord webhook messages are limited to 2000 characters, and a webhook is limited to around
+# 30 messages per minute.
+#
 
 
 class DiscordNotificationTarget(NotificationTarget):
     def __init__(self, address):
         super().__init__()
+        self.maximum_message_length = 2000
+        self.minimum_send_interval = timedelta(seconds=2)
         self.address = address
 
     def send_notification(self, item: typing.Any) -> None:
@@ -137,6 +177,10 @@ class DiscordNotificationTarget(NotificationTarget):
 # * `FROM-ADDRESS` is the address the email appears to come from. This must be validated with [Mailjet](https://mailjet.com).
 # * `TO-ADDRESS` is the destination address - the email account to which the email is being sent.
 #
+# There's no practical limit on the size of an email, but nobody wants a separate email for
+# every log message, so `MailjetNotificationTarget` asks for notifications to be combined
+# into at most one email every 10 seconds.
+#
 # Mailjet provides a client library, but really we don't need or want more dependencies. This`
 # code just replicates the `curl` way of doing things:
 # ```
@@ -173,6 +217,8 @@ class DiscordNotificationTarget(NotificationTarget):
 class MailjetNotificationTarget(NotificationTarget):
     def __init__(self, encoded_parameters):
         super().__init__()
+        self.maximum_message_length = 100000
+        self.minimum_send_interval = timedelta(seconds=10)
         self.address = "https://api.mailjet.com/v3.1/send"
         api_key, api_secret, subject, from_name, from_address, to_name, to_address = encoded_parameters.split(":")
         self.api_key: str = unquote(api_key)
@@ -264,6 +310,8 @@ class FilteringNotificationTarget(NotificationTarget):
         super().__init__()
         self.inner_notifier: NotificationTarget = inner_notifier
         self.filter_func = filter_func
+        self.maximum_message_length = inner_notifier.maximum_message_length
+        self.minimum_send_interval = inner_notifier.minimum_send_interval
 
     def send_notification(self, item: typing.Any) -> None:
         if self.filter_func(item):
@@ -273,6 +321,142 @@ class FilteringNotificationTarget(NotificationTarget):
         return f"Filtering notification target for '{self.inner_notifier}'"
 
 
+# # 🥭 BackgroundNotificationTarget class
+#
+# This class takes a `NotificationTarget` and sends notifications to it from a background
+# thread, so callers (including logging calls via `NotificationHandler`) never wait on a slow
+# HTTP request.
+#
+# Notifications are held in a bounded queue. Once the first notification arrives, the
+# background thread waits for `window` to collect any others before sending them. Items are
+# combined into as few messages as the inner target's `maximum_message_length` allows, and
+# messages are spaced at least the inner target's `minimum_send_interval` apart.
+#
+# If the queue is full, new notifications are dropped rather than blocking the caller. The
+# number dropped is sent as a summary message with the next batch.
+#
+# Send times and errors are measured around the inner target's sends on the background
+# thread, rather than around queueing the notification.
+#
+# Call `stop()` to send anything still queued and shut down the background thread.
+#
+
+
+class BackgroundNotificationTarget(NotificationTarget):
+    def __init__(self, inner_notifier: NotificationTarget, window: timedelta = timedelta(seconds=5), max_queue_size: int = 1000):
+        super().__init__()
+        self.inner_notifier: NotificationTarget = inner_notifier
+        self.window: timedelta = window
+        self.max_queue_size: int = max_queue_size
+        self.dropped: int = 0
+        self._queue: typing.List[typing.Any] = []
+        self._first_queued_at: float = 0.0
+        self._last_sent_at: float = 0.0
+        self._stopping: bool = False
+        self._condition: threading.Condition = threading.Condition()
+        self._worker: threading.Thread = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def send(self, item: typing.Any) -> None:
+        # Queueing can't fail and is near-instant, so there's nothing worth measuring here.
+        self.send_notification(item)
+
+    def send_notification(self, item: typing.Any) -> None:
+        with self._condition:
+            if self._stopping:
+                return
+            if len(self._queue) >= self.max_queue_size:
+                self.dropped += 1
+                _notifications_dropped.inc()
+                return
+            if len(self._queue) == 0:
+                self._first_queued_at = time.monotonic()
+            self._queue += [item]
+            self._condition.notify()
+
+    def stop(self, timeout: float = 30.0) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        self._worker.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while len(self._queue) == 0 and self.dropped == 0 and not self._stopping:
+                    self._condition.wait()
+                if len(self._queue) == 0 and self.dropped == 0:
+                    return
+
+                send_at = max(self._first_queued_at + self.window.total_seconds(),
+                              self._last_sent_at + self.inner_notifier.minimum_send_interval.total_seconds())
+                while not self._stopping and time.monotonic() < send_at:
+                    self._condition.wait(send_at - time.monotonic())
+
+                items = self._queue
+                dropped = self.dropped
+                self._queue = []
+                self.dropped = 0
+
+            if dropped > 0:
+                items += [f"{dropped} notification(s) dropped because the notification queue was full."]
+
+            # Nothing that goes wrong with one batch may stop the background thread, or every
+            # later notification would quietly pile up in the queue.
+            try:
+                self._send_all(items)
+            except Exception as exception:
+                self._log_send_error(exception)
+
+    def _send_all(self, items: typing.Sequence[typing.Any]) -> None:
+        for message in self._combine(items):
+            self._wait_for_rate_limit()
+            try:
+                self.inner_notifier.send_measured(message)
+            except Exception as exception:
+                self._log_send_error(exception)
+            finally:
+                self._last_sent_at = time.monotonic()
+
+    def _log_send_error(self, exception: Exception) -> None:
+        # Logged as a warning because errors can be routed back to notification targets, and a
+        # failing target shouldn't keep notifying itself. Only the target's type name is logged,
+        # since formatting the target (or the message) could itself raise.
+        try:
+            self.logger.warning(f"Error sending notification to {type(self.inner_notifier).__name__} - {exception!r}")
+        except Exception:
+            pass
+
+    def _wait_for_rate_limit(self) -> None:
+        send_at = self._last_sent_at + self.inner_notifier.minimum_send_interval.total_seconds()
+        pause = send_at - time.monotonic()
+        if pause > 0:
+            time.sleep(pause)
+
+    def _combine(self, items: typing.Sequence[typing.Any]) -> typing.Sequence[typing.Any]:
+        maximum_length = self.inner_notifier.maximum_message_length
+        if maximum_length == 0:
+            return items
+
+        messages: typing.List[str] = []
+        current: str = ""
+        for item in items:
+            text = str(item)
+            if current == "":
+                current = text
+            elif len(current) + 1 + len(text) <= maximum_length:
+                current = f"{current}\n{text}"
+            else:
+                messages += [current]
+                current = text
+        if current != "":
+            messages += [current]
+        return messages
+
+    def __str__(self) -> str:
+        return f"Background notification target for '{self.inner_notifier}'"
+
+
 # # 🥭 NotificationHandler class
 #
 # A bridge between the worlds of notifications and logging. This allows any
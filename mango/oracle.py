@@ -105,10 +105,16 @@ class Oracle(metaclass=abc.ABCMeta):
 #
 # Derived versions of this class allow creation of oracles for markets.
 #
+# `fetch_prices()` fetches prices for many markets at once. The default implementation
+# just fetches each price in turn, but derived classes should override it to gather all
+# the prices in as few requests as possible. Markets with no available oracle are skipped,
+# so the returned `Price`s may be fewer than the markets passed in.
+#
 
 
 class OracleProvider(metaclass=abc.ABCMeta):
     def __init__(self, name: str) -> None:
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
         self.name = name
 
     @abc.abstractmethod
@@ -118,3 +124,11 @@ class OracleProvider(metaclass=abc.ABCMeta):
     @abc.abstractmethod
     def all_available_symbols(self, context: Context) -> typing.Sequence[str]:
         raise NotImplementedError("OracleProvider.all_available_symbols() is not implemented on the base type.")
+
+    def fetch_prices(self, context: Context, markets: typing.Sequence[Market]) -> typing.Sequence[Price]:
+        prices: typing.List[Price] = []
+        for market in markets:
+            oracle = self.oracle_for_market(context, market)
+            if oracle is not None:
+                prices += [oracle.fetch_price(context)]
+        return prices
@@ -13,7 +13,13 @@
 #   [Github](https://github.com/blockworks-foundation)
 #   [Email](mailto:hello@blockworks.foundation)
 
+import typing
+
+from datetime import timedelta
+
 from .oracle import OracleProvider
+from .oracles.aggregator import aggregator
+from .oracles.composite import composite
 from .oracles.ftx import ftx
 from .oracles.pythnetwork import pythnetwork
 from .oracles.serum import serum
@@ -23,12 +29,24 @@ from .oracles.serum import serum
 #
 # This file allows you to create a concreate OracleProvider for a specified provider name.
 #
+# Several provider names can be separated by commas (e.g. "ftx,serum,pyth") to create a
+# `CompositeOracleProvider` that combines the prices from all of them. The `mode`, `max_age`
+# and `minimum_sources` parameters are only used for such composite providers.
+#
 
-def create_oracle_provider(provider_name: str) -> OracleProvider:
-    if provider_name == "serum":
+def create_oracle_provider(provider_name: str, mode: composite.CompositeMode = composite.CompositeMode.MEDIAN,
+                           max_age: timedelta = timedelta(seconds=30), minimum_sources: int = 1) -> OracleProvider:
+    if "," in provider_name:
+        providers: typing.List[OracleProvider] = []
+        for name in provider_name.split(","):
+            providers += [create_oracle_provider(name.strip())]
+        return composite.CompositeOracleProvider(providers, mode, max_age, minimum_sources)
+    elif provider_name == "serum":
         return serum.SerumOracleProvider()
     elif provider_name == "ftx":
         return ftx.FtxOracleProvider()
     elif provider_name == "pyth":
         return pythnetwork.PythOracleProvider()
+    elif provider_name == "aggregator":
+        return aggregator.AggregatorOracleProvider()
     raise Exception(f"Unknown oracle provider '{provider_name}'.")
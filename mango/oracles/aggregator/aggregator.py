@@ -0,0 +1,129 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import rx
+import rx.operators as ops
+import typing
+
+from solana.publickey import PublicKey
+
+from ...accountinfo import AccountInfo
+from ...aggregator import Aggregator
+from ...context import Context
+from ...group import Group
+from ...market import Market
+from ...observables import observable_pipeline_error_reporter
+from ...oracle import Oracle, OracleProvider, OracleSource, Price
+
+
+# # 🥭 Aggregator
+#
+# This file contains code specific to the on-chain Flux `Aggregator` oracles used by the
+# Mango group.
+#
+
+
+# # 🥭 AggregatorOracle class
+#
+# Implements the `Oracle` abstract base class specialised to the group's on-chain `Aggregator`s.
+#
+# The `Price` timestamp is the time the `Aggregator` answer was last updated on-chain, not
+# the time it was fetched, so stale answers can be spotted.
+#
+
+class AggregatorOracle(Oracle):
+    def __init__(self, market: Market, address: PublicKey):
+        name = f"Aggregator Oracle for {market.symbol}"
+        super().__init__(name, market)
+        self.market: Market = market
+        self.address: PublicKey = address
+        self.source: OracleSource = OracleSource("Aggregator", name, market)
+
+    def fetch_price(self, context: Context) -> Price:
+        account_info = AccountInfo.load(context, self.address)
+        if account_info is None:
+            raise Exception(f"Aggregator account {self.address} not found.")
+
+        return self._price_from_account_info(context, account_info)
+
+    def _price_from_account_info(self, context: Context, account_info: AccountInfo) -> Price:
+        aggregator = Aggregator.parse(context, account_info)
+        price = aggregator.price
+
+        # Aggregators have no notion of bids, asks, or spreads so just provide the single price.
+        return Price(self.source, aggregator.answer.updated_at, self.market, price, price, price)
+
+    def to_streaming_observable(self, context: Context) -> rx.core.typing.Observable:
+        return rx.interval(1).pipe(
+            ops.subscribe_on(context.pool_scheduler),
+            ops.start_with(-1),
+            ops.map(lambda _: self.fetch_price(context)),
+            ops.catch(observable_pipeline_error_reporter),
+            ops.retry(),
+        )
+
+
+# # 🥭 AggregatorOracleProvider class
+#
+# Implements the `OracleProvider` abstract base class specialised to the group's on-chain
+# `Aggregator`s.
+#
+# The `Group` is loaded once, on first use, to find which `Aggregator` belongs to which market.
+#
+
+class AggregatorOracleProvider(OracleProvider):
+    def __init__(self) -> None:
+        super().__init__("Aggregator Oracle Factory")
+        self._group: typing.Optional[Group] = None
+
+    def oracle_for_market(self, context: Context, market: Market) -> typing.Optional[Oracle]:
+        return self._oracle_for_market(context, market)
+
+    def all_available_symbols(self, context: Context) -> typing.Sequence[str]:
+        group = self._load_group(context)
+        return [market_metadata.symbol for market_metadata in group.markets]
+
+    def fetch_prices(self, context: Context, markets: typing.Sequence[Market]) -> typing.Sequence[Price]:
+        oracles: typing.List[AggregatorOracle] = []
+        for market in markets:
+            oracle = self._oracle_for_market(context, market)
+            if oracle is not None:
+                oracles += [oracle]
+
+        if len(oracles) == 0:
+            return []
+
+        account_infos = AccountInfo.load_multiple(context, [oracle.address for oracle in oracles])
+        if len(account_infos) != len(oracles):
+            raise Exception(
+                f"Failed to get aggregator data for {len(oracles)} markets - got {len(account_infos)}.")
+
+        prices: typing.List[Price] = []
+        for oracle, account_info in zip(oracles, account_infos):
+            prices += [oracle._price_from_account_info(context, account_info)]
+        return prices
+
+    def _oracle_for_market(self, context: Context, market: Market) -> typing.Optional[AggregatorOracle]:
+        group = self._load_group(context)
+        for market_metadata in group.markets:
+            if market_metadata.symbol == market.symbol:
+                return AggregatorOracle(market, market_metadata.oracle)
+        return None
+
+    def _load_group(self, context: Context) -> Group:
+        if self._group is None:
+            self._group = Group.load(context)
+        return self._group
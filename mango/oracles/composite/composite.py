@@ -0,0 +1,299 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import enum
+import rx
+import rx.operators as ops
+import statistics
+import threading
+import typing
+
+from datetime import datetime, timedelta
+from rx.core import Observable
+
+from ...context import Context
+from ...market import Market
+from ...observables import EventSource
+from ...oracle import Oracle, OracleProvider, OracleSource, Price
+
+
+# # 🥭 Composite
+#
+# This file contains an oracle that combines the prices from several other oracles. It can
+# take the median of all fresh prices or fall back through the oracles in priority order,
+# and it ignores any price older than a configurable maximum age.
+#
+
+
+# # 🥭 CompositeMode enum
+#
+# How a `CompositeOracle` combines the prices it has:
+# * MEDIAN takes the median of the top bids, mid prices and top asks of all fresh prices.
+# * PRIORITY takes the fresh price from the first oracle in the list that has one.
+#
+
+class CompositeMode(enum.Enum):
+    MEDIAN = enum.auto()
+    PRIORITY = enum.auto()
+
+    def __str__(self) -> str:
+        return self.name
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 OracleSourceStatistics class
+#
+# Tracks how often prices from a single source arrive. The interval is the time between the
+# `CompositeOracle` receiving one price from the source and receiving the next, in seconds, so
+# a source that lags shows up with long intervals.
+#
+# The age of a price isn't a useful latency figure here - Serum, Pyth and FTX (through its
+# REST API) timestamp their `Price`s when they're fetched, so their prices would always look
+# brand new.
+#
+
+class OracleSourceStatistics:
+    def __init__(self, source_name: str) -> None:
+        self.source_name: str = source_name
+        self.count: int = 0
+        self.stale_count: int = 0
+        self.last_interval: float = 0.0
+        self.total_interval: float = 0.0
+        self.max_interval: float = 0.0
+        self.last_received: typing.Optional[datetime] = None
+
+    @property
+    def average_interval(self) -> float:
+        if self.count < 2:
+            return 0.0
+        return self.total_interval / (self.count - 1)
+
+    def record(self, received: datetime, stale: bool) -> None:
+        if self.last_received is not None:
+            self.last_interval = (received - self.last_received).total_seconds()
+            self.total_interval += self.last_interval
+            self.max_interval = max(self.max_interval, self.last_interval)
+        self.count += 1
+        if stale:
+            self.stale_count += 1
+        self.last_received = received
+
+    def __str__(self) -> str:
+        return f"« OracleSourceStatistics '{self.source_name}': {self.count} prices ({self.stale_count} stale), Interval: last {self.last_interval:.3f}s, average {self.average_interval:.3f}s, max {self.max_interval:.3f}s »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 CompositeOracle class
+#
+# Implements the `Oracle` abstract base class by combining the prices of several other `Oracle`s.
+#
+# The streaming observable subscribes to the streaming observables of all the inner oracles
+# and emits a combined `Price` as soon as at least `minimum_sources` fresh prices are
+# available. Each incoming price updates the statistics for its source, and those statistics
+# are published on `statistics_publisher`.
+#
+
+class CompositeOracle(Oracle):
+    def __init__(self, market: Market, oracles: typing.Sequence[Oracle], mode: CompositeMode = CompositeMode.MEDIAN,
+                 max_age: timedelta = timedelta(seconds=30), minimum_sources: int = 1):
+        name = f"Composite Oracle for {market.symbol}"
+        super().__init__(name, market)
+        self.market: Market = market
+        self.oracles: typing.Sequence[Oracle] = oracles
+        self.mode: CompositeMode = mode
+        self.max_age: timedelta = max_age
+        self.minimum_sources: int = minimum_sources
+        self.source: OracleSource = OracleSource("Composite", name, market)
+        self.statistics: typing.Dict[str, OracleSourceStatistics] = {}
+        for oracle in oracles:
+            self.statistics[oracle.name] = OracleSourceStatistics(oracle.name)
+        self.statistics_publisher: EventSource[OracleSourceStatistics] = EventSource[OracleSourceStatistics]()
+        self._lock: threading.Lock = threading.Lock()
+
+    def fetch_price(self, context: Context) -> Price:
+        prices: typing.List[Price] = []
+        for oracle in self.oracles:
+            try:
+                price = oracle.fetch_price(context)
+            except Exception as exception:
+                self.logger.warning(f"Failed to fetch price from {oracle.name}: {exception}")
+                continue
+            if self._record(oracle, price):
+                prices += [price]
+
+        combined = self._combine(prices)
+        if combined is None:
+            raise Exception(
+                f"Only {len(prices)} fresh price(s) available for {self.market.symbol} - need at least {self.minimum_sources}.")
+        return combined
+
+    def to_streaming_observable(self, context: Context) -> rx.core.typing.Observable:
+        # Each subscriber gets its own subscriptions to the inner oracles' streams (and its own
+        # latest prices), so disposing of one subscriber doesn't affect any others.
+        def _create(_: rx.core.typing.Scheduler) -> Observable:
+            latest: typing.Dict[int, Price] = {}
+
+            def _combine_latest(indexed_price: typing.Tuple[int, Price]) -> typing.Optional[Price]:
+                index, price = indexed_price
+                with self._lock:
+                    if self._record(self.oracles[index], price):
+                        latest[index] = price
+                    elif index in latest:
+                        del latest[index]
+
+                    now = datetime.now()
+                    fresh = [latest[key] for key in sorted(latest.keys()) if now - latest[key].timestamp <= self.max_age]
+                    return self._combine(fresh)
+
+            return rx.merge(*[self._indexed_price_stream(context, index, oracle) for index, oracle in enumerate(self.oracles)]).pipe(
+                ops.map(_combine_latest),
+                ops.filter(lambda combined: combined is not None)
+            )
+
+        return rx.defer(_create)
+
+    # Tags each price from an inner oracle with that oracle's index. An error from one inner
+    # stream is logged and ends only that stream, so the other oracles carry on.
+    def _indexed_price_stream(self, context: Context, index: int, oracle: Oracle) -> Observable:
+        def _log_error(exception: Exception, _: Observable) -> Observable:
+            self.logger.warning(f"Error from {oracle.name} price stream: {exception}")
+            return rx.empty()
+
+        return typing.cast(Observable, oracle.to_streaming_observable(context)).pipe(
+            ops.map(lambda price: (index, price)),
+            ops.catch(_log_error)
+        )
+
+    def _record(self, oracle: Oracle, price: Price) -> bool:
+        received = datetime.now()
+        age = received - price.timestamp
+        fresh = age <= self.max_age
+        source_statistics = self.statistics[oracle.name]
+        source_statistics.record(received, not fresh)
+        self.statistics_publisher.publish(source_statistics)
+        if not fresh:
+            self.logger.debug(f"Ignoring stale price from {oracle.name} - {age.total_seconds():.2f} seconds old.")
+        return fresh
+
+    def _combine(self, prices: typing.Sequence[Price]) -> typing.Optional[Price]:
+        return combine_prices(self.source, self.market, prices, self.mode, self.minimum_sources)
+
+    def __str__(self) -> str:
+        oracle_names = ", ".join([oracle.name for oracle in self.oracles])
+        return f"« CompositeOracle {self.market.symbol} [{self.mode}, max age {self.max_age}, minimum {self.minimum_sources}]: {oracle_names} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 combine_prices function
+#
+# Combines a list of (already fresh) prices into a single `Price`, or returns `None` if there
+# are fewer than `minimum_sources` prices. The combined price carries the most recent
+# timestamp of the prices it was built from.
+#
+
+def combine_prices(source: OracleSource, market: Market, prices: typing.Sequence[Price], mode: CompositeMode, minimum_sources: int = 1) -> typing.Optional[Price]:
+    if (len(prices) == 0) or (len(prices) < minimum_sources):
+        return None
+
+    if mode == CompositeMode.PRIORITY:
+        chosen = prices[0]
+        return Price(source, chosen.timestamp, market, chosen.top_bid, chosen.mid_price, chosen.top_ask)
+
+    top_bid = statistics.median([price.top_bid for price in prices])
+    mid_price = statistics.median([price.mid_price for price in prices])
+    top_ask = statistics.median([price.top_ask for price in prices])
+    timestamp = max([price.timestamp for price in prices])
+    return Price(source, timestamp, market, top_bid, mid_price, top_ask)
+
+
+# # 🥭 CompositeOracleProvider class
+#
+# Implements the `OracleProvider` abstract base class by combining several other `OracleProvider`s.
+#
+# `fetch_prices()` calls `fetch_prices()` on each inner provider (so each provider still
+# batches its own requests) and combines the results per market. A provider that fails is
+# logged and skipped, so the remaining providers can still supply prices.
+#
+
+class CompositeOracleProvider(OracleProvider):
+    def __init__(self, providers: typing.Sequence[OracleProvider], mode: CompositeMode = CompositeMode.MEDIAN,
+                 max_age: timedelta = timedelta(seconds=30), minimum_sources: int = 1) -> None:
+        provider_names = ", ".join([provider.name for provider in providers])
+        super().__init__(f"Composite Oracle Factory [{provider_names}]")
+        self.providers: typing.Sequence[OracleProvider] = providers
+        self.mode: CompositeMode = mode
+        self.max_age: timedelta = max_age
+        self.minimum_sources: int = minimum_sources
+
+    def oracle_for_market(self, context: Context, market: Market) -> typing.Optional[Oracle]:
+        oracles: typing.List[Oracle] = []
+        for provider in self.providers:
+            oracle = provider.oracle_for_market(context, market)
+            if oracle is not None:
+                oracles += [oracle]
+
+        if len(oracles) == 0:
+            return None
+
+        return CompositeOracle(market, oracles, self.mode, self.max_age, self.minimum_sources)
+
+    def all_available_symbols(self, context: Context) -> typing.Sequence[str]:
+        symbols: typing.List[str] = []
+        for provider in self.providers:
+            for symbol in provider.all_available_symbols(context):
+                if symbol not in symbols:
+                    symbols += [symbol]
+        return symbols
+
+    def fetch_prices(self, context: Context, markets: typing.Sequence[Market]) -> typing.Sequence[Price]:
+        prices_by_symbol: typing.Dict[str, typing.List[Price]] = {}
+        for market in markets:
+            prices_by_symbol[market.symbol] = []
+
+        for provider in self.providers:
+            try:
+                provider_prices = provider.fetch_prices(context, markets)
+            except Exception as exception:
+                self.logger.warning(f"Failed to fetch prices from {provider.name}: {exception}")
+                continue
+
+            now = datetime.now()
+            for price in provider_prices:
+                if (price.market.symbol in prices_by_symbol) and (now - price.timestamp <= self.max_age):
+                    prices_by_symbol[price.market.symbol] += [price]
+
+        prices: typing.List[Price] = []
+        for market in markets:
+            source = OracleSource("Composite", f"Composite Oracle for {market.symbol}", market)
+            combined = combine_prices(source, market, prices_by_symbol[market.symbol], self.mode, self.minimum_sources)
+            if combined is None:
+                self.logger.warning(f"Not enough fresh prices for {market.symbol} - skipping.")
+            else:
+                prices += [combined]
+        return prices
+
+    def __str__(self) -> str:
+        return f"« CompositeOracleProvider [{self.mode}, max age {self.max_age}, minimum {self.minimum_sources}]: {self.name} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
@@ -58,6 +58,9 @@ class FtxOracle(Oracle):
 
     def fetch_price(self, context: Context) -> Price:
         result = _ftx_get_from_url(f"https://ftx.com/api/markets/{self.market.symbol}")
+        return self._price_from_market_result(result)
+
+    def _price_from_market_result(self, result: typing.Dict) -> Price:
         bid = Decimal(result["bid"])
         ask = Decimal(result["ask"])
         price = Decimal(result["price"])
@@ -108,6 +111,22 @@ class FtxOracleProvider(OracleProvider):
     def oracle_for_market(self, context: Context, market: Market) -> typing.Optional[Oracle]:
         return FtxOracle(market)
 
+    def fetch_prices(self, context: Context, markets: typing.Sequence[Market]) -> typing.Sequence[Price]:
+        # The `/markets` endpoint returns every market in one call, so use that instead of
+        # fetching each market individually.
+        result = _ftx_get_from_url("https://ftx.com/api/markets")
+        results_by_name: typing.Dict[str, typing.Dict] = {}
+        for market_result in result:
+            results_by_name[market_result["name"]] = market_result
+
+        prices: typing.List[Price] = []
+        for market in markets:
+            if market.symbol in results_by_name:
+                prices += [FtxOracle(market)._price_from_market_result(results_by_name[market.symbol])]
+            else:
+                self.logger.warning(f"Could not find market {market.symbol} on FTX.")
+        return prices
+
     def all_available_symbols(self, context: Context) -> typing.Sequence[str]:
         result = _ftx_get_from_url("https://ftx.com/api/markets")
         symbols: typing.List[str] = []
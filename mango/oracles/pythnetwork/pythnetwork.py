@@ -63,6 +63,9 @@ class PythOracle(Oracle):
         if price_account_info is None:
             raise Exception(f"Price account {self.product_data.px_acc} not found.")
 
+        return self._price_from_account_info(price_account_info)
+
+    def _price_from_account_info(self, price_account_info: AccountInfo) -> Price:
         if len(price_account_info.data) != PRICE.sizeof():
             raise Exception(
                 f"Price account data has incorrect size. Expected: {PRICE.sizeof()}, got {len(price_account_info.data)}.")
@@ -99,12 +102,8 @@ class PythOracleProvider(OracleProvider):
 
     def oracle_for_market(self, context: Context, market: Market) -> typing.Optional[Oracle]:
         pyth_context = context.new_from_cluster("devnet")
-        pyth_symbol = self._market_symbol_to_pyth_symbol(market.symbol)
         products = self._fetch_all_pyth_products(pyth_context, self.address)
-        for product in products:
-            if product.attr["symbol"] == pyth_symbol:
-                return PythOracle(market, product)
-        return None
+        return self._oracle_for_market_from_products(market, products)
 
     def all_available_symbols(self, context: Context) -> typing.Sequence[str]:
         pyth_context = context.new_from_cluster("devnet")
@@ -115,6 +114,45 @@ class PythOracleProvider(OracleProvider):
             symbols += self._pyth_symbol_to_market_symbols(symbol)
         return symbols
 
+    def fetch_prices(self, context: Context, markets: typing.Sequence[Market]) -> typing.Sequence[Price]:
+        # Load the mapping and products once for all markets, then all the price accounts
+        # in a single `getMultipleAccounts` call.
+        pyth_context = context.new_from_cluster("devnet")
+        products = self._fetch_all_pyth_products(pyth_context, self.address)
+        oracles: typing.List[PythOracle] = []
+        price_addresses: typing.List[PublicKey] = []
+        for market in markets:
+            product = self._product_for_market(market, products)
+            if product is not None:
+                oracles += [PythOracle(market, product)]
+                price_addresses += [product.px_acc]
+
+        if len(oracles) == 0:
+            return []
+
+        price_account_infos = AccountInfo.load_multiple(pyth_context, price_addresses)
+        if len(price_account_infos) != len(oracles):
+            raise Exception(
+                f"Failed to get price data from Pyth for {len(oracles)} markets - got {len(price_account_infos)}.")
+
+        prices: typing.List[Price] = []
+        for oracle, price_account_info in zip(oracles, price_account_infos):
+            prices += [oracle._price_from_account_info(price_account_info)]
+        return prices
+
+    def _oracle_for_market_from_products(self, market: Market, products: typing.List[typing.Any]) -> typing.Optional[PythOracle]:
+        product = self._product_for_market(market, products)
+        if product is None:
+            return None
+        return PythOracle(market, product)
+
+    def _product_for_market(self, market: Market, products: typing.List[typing.Any]) -> typing.Optional[typing.Any]:
+        pyth_symbol = self._market_symbol_to_pyth_symbol(market.symbol)
+        for product in products:
+            if product.attr["symbol"] == pyth_symbol:
+                return product
+        return None
+
     def _market_symbol_to_pyth_symbol(self, symbol: str) -> str:
         normalised = symbol.upper()
         fixed_usdt = re.sub('USDT$', 'USD', normalised)
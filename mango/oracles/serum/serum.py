@@ -22,6 +22,9 @@ from datetime import datetime
 from decimal import Decimal
 from pyserum.market.orderbook import OrderBook
 from pyserum.market import Market as PySerumMarket
+from pyserum.market.state import MarketState as PySerumMarketState
+from solana.publickey import PublicKey
+from solana.rpc.api import Client
 
 from ...accountinfo import AccountInfo
 from ...context import Context
@@ -61,8 +64,14 @@ class SerumOracle(Oracle):
         if len(bid_ask_account_infos) != 2:
             raise Exception(
                 f"Failed to get bid/ask data from Serum for market address {self.spot_market.address} (bids: {bids_address}, asks: {asks_address}).")
-        bids = OrderBook.from_bytes(self._serum_market.state, bid_ask_account_infos[0].data)
-        asks = OrderBook.from_bytes(self._serum_market.state, bid_ask_account_infos[1].data)
+
+        return self._price_from_order_book_data(self._serum_market.state,
+                                                bid_ask_account_infos[0].data,
+                                                bid_ask_account_infos[1].data)
+
+    def _price_from_order_book_data(self, market_state: PySerumMarketState, bids_data: bytes, asks_data: bytes) -> Price:
+        bids = OrderBook.from_bytes(market_state, bids_data)
+        asks = OrderBook.from_bytes(market_state, asks_data)
 
         top_bid = list(bids.orders())[-1]
         top_ask = list(asks.orders())[0]
@@ -86,6 +95,9 @@ class SerumOracle(Oracle):
 #
 # Implements the `OracleProvider` abstract base class specialised to the Serum Network.
 #
+# `fetch_prices()` loads all the market accounts in one `getMultipleAccounts` call, then
+# all the bids and asks accounts in a second call, no matter how many markets are asked for.
+#
 
 class SerumOracleProvider(OracleProvider):
     def __init__(self) -> None:
@@ -109,3 +121,44 @@ class SerumOracleProvider(OracleProvider):
         for spot_market in all_markets:
             symbols += [spot_market.symbol]
         return symbols
+
+    def fetch_prices(self, context: Context, markets: typing.Sequence[Market]) -> typing.Sequence[Price]:
+        oracles: typing.List[SerumOracle] = []
+        for market in markets:
+            oracle = self.oracle_for_market(context, market)
+            if oracle is not None:
+                oracles += [typing.cast(SerumOracle, oracle)]
+
+        if len(oracles) == 0:
+            return []
+
+        unloaded = [oracle for oracle in oracles if oracle._serum_market is None]
+        if len(unloaded) > 0:
+            market_account_infos = AccountInfo.load_multiple(
+                context, [oracle.spot_market.address for oracle in unloaded])
+            if len(market_account_infos) != len(unloaded):
+                raise Exception(
+                    f"Failed to get market data from Serum for {len(unloaded)} markets - got {len(market_account_infos)}.")
+            for oracle, market_account_info in zip(unloaded, market_account_infos):
+                market_state = PySerumMarketState.from_bytes(context.dex_program_id,
+                                                             int(oracle.spot_market.base.decimals),
+                                                             int(oracle.spot_market.quote.decimals),
+                                                             market_account_info.data)
+                oracle._serum_market = PySerumMarket(typing.cast(Client, context.client.compatible_client), market_state)
+
+        bid_ask_addresses: typing.List[PublicKey] = []
+        for oracle in oracles:
+            bid_ask_addresses += [oracle._serum_market.state.bids(), oracle._serum_market.state.asks()]
+
+        bid_ask_account_infos = AccountInfo.load_multiple(context, bid_ask_addresses)
+        if len(bid_ask_account_infos) != len(bid_ask_addresses):
+            raise Exception(
+                f"Failed to get bid/ask data from Serum for {len(oracles)} markets - expected {len(bid_ask_addresses)} accounts, got {len(bid_ask_account_infos)}.")
+
+        prices: typing.List[Price] = []
+        for index, oracle in enumerate(oracles):
+            bids_data = bid_ask_account_infos[index * 2].data
+            asks_data = bid_ask_account_infos[(index * 2) + 1].data
+            prices += [oracle._price_from_order_book_data(oracle._serum_market.state, bids_data, asks_data)]
+
+        return prices
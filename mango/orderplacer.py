@@ -23,11 +23,16 @@ import typing
 
 from decimal import Decimal
 from pyserum.market import Market as PySerumMarket
+from pyserum.market.orderbook import OrderBook
+from solana.transaction import TransactionInstruction
 
 from .context import Context
+from .instructions import CancelOrderByClientIdInstructionBuilder, ConsumeEventsInstructionBuilder, NewOrderV3InstructionBuilder, SettleInstructionBuilder
 from .openorders import OpenOrders
 from .spotmarket import SpotMarket
+from .token import Token
 from .tokenaccount import TokenAccount
+from .transactionbatcher import TransactionBatcher
 from .wallet import Wallet
 
 
@@ -87,6 +92,11 @@ class Order(typing.NamedTuple):
 # order_placer.place_order(context, side, order_type, price, size)
 # ```
 #
+# `cancel_and_place()` cancels and places several orders in one go. Only the side, price and
+# size of the orders to place are used - new client IDs are generated for them, and the
+# returned `Order`s carry those IDs. The default implementation just calls `cancel_order()`
+# and `place_order()` for each order, but derived classes can batch them.
+#
 
 
 class OrderPlacer(metaclass=abc.ABCMeta):
@@ -105,6 +115,15 @@ class OrderPlacer(metaclass=abc.ABCMeta):
     def load_my_orders(self) -> typing.List[Order]:
         raise NotImplementedError("OrderPlacer.load_my_orders() is not implemented on the base type.")
 
+    def cancel_and_place(self, to_cancel: typing.Sequence[Order], order_type: OrderType, to_place: typing.Sequence[Order]) -> typing.Sequence[Order]:
+        for order in to_cancel:
+            self.cancel_order(order)
+
+        placed: typing.List[Order] = []
+        for order in to_place:
+            placed += [self.place_order(order.side, order_type, order.price, order.size)]
+        return placed
+
     def __repr__(self) -> str:
         return f"{self}"
 
@@ -143,14 +162,29 @@ class NullOrderPlacer(OrderPlacer):
 #
 # This class puts trades on the Serum orderbook. It doesn't do anything complicated.
 #
+# `cancel_and_place()` uses a `TransactionBatcher` to send the cancels, then the new orders
+# with a consume-events 'crank' and a settle, in as few transactions as possible.
+#
+# The cancels are sent apart from the new orders. An order that has already filled can't be
+# cancelled by client ID, and Serum then rejects the whole transaction. If the new orders were
+# in that transaction they'd be lost too. If a batch of cancels fails, each cancel is retried on
+# its own, so only the rejected ones are skipped (and logged).
+#
+# The batcher may still split the new orders across several transactions, and those aren't
+# atomic. If one of them fails, the orders in earlier transactions are on the book but the
+# exception is raised anyway, so callers should reload their orders rather than trust the
+# returned ones.
+#
 
 class SerumOrderPlacer(OrderPlacer):
-    def __init__(self, context: Context, wallet: Wallet, spot_market: SpotMarket, reporter: typing.Callable[[str], None] = None):
+    def __init__(self, context: Context, wallet: Wallet, spot_market: SpotMarket, reporter: typing.Callable[[str], None] = None,
+                 market: typing.Optional[PySerumMarket] = None,
+                 token_account_resolver: typing.Optional[typing.Callable[[Token], typing.Optional[TokenAccount]]] = None):
         super().__init__()
         self.context: Context = context
         self.wallet: Wallet = wallet
         self.spot_market: SpotMarket = spot_market
-        self.market: PySerumMarket = PySerumMarket.load(
+        self.market: PySerumMarket = market or PySerumMarket.load(
             context.client.compatible_client, spot_market.address, context.dex_program_id)
         all_open_orders = OpenOrders.load_for_market_and_owner(
             context, spot_market.address, wallet.address, context.dex_program_id, spot_market.base.decimals, spot_market.quote.decimals)
@@ -158,6 +192,11 @@ class SerumOrderPlacer(OrderPlacer):
             raise Exception(f"No OpenOrders account available for market {spot_market}.")
         self.open_orders = all_open_orders[0]
 
+        # Token accounts are looked up on every order by default. A resolver can be passed in to
+        # share (and cache) token account lookups between several `SerumOrderPlacer`s.
+        self.token_account_resolver: typing.Callable[[Token], typing.Optional[TokenAccount]] = token_account_resolver or (
+            lambda token: TokenAccount.fetch_largest_for_owner_and_token(self.context, self.wallet.address, token))
+
         def report(text):
             self.logger.info(text)
             reporter(text)
@@ -170,6 +209,8 @@ class SerumOrderPlacer(OrderPlacer):
         else:
             self.reporter = just_log
 
+        self.batcher: TransactionBatcher = TransactionBatcher(context, wallet)
+
     def cancel_order(self, order: Order) -> None:
         self.reporter(
             f"Cancelling order {order.id} in openorders {self.open_orders.address} on market {self.spot_market.symbol}.")
@@ -189,7 +230,7 @@ class SerumOrderPlacer(OrderPlacer):
         serum_order_type = pyserum.enums.OrderType.POST_ONLY if order_type == OrderType.POST_ONLY else pyserum.enums.OrderType.IOC if order_type == OrderType.IOC else pyserum.enums.OrderType.LIMIT
         serum_side = pyserum.enums.Side.BUY if side == Side.BUY else pyserum.enums.Side.SELL
         payer_token = self.spot_market.quote if side == Side.BUY else self.spot_market.base
-        token_account = TokenAccount.fetch_largest_for_owner_and_token(self.context, self.wallet.address, payer_token)
+        token_account = self.token_account_resolver(payer_token)
         if token_account is None:
             raise Exception(f"Could not find payer token account for token {payer_token.symbol}.")
 
@@ -199,8 +240,80 @@ class SerumOrderPlacer(OrderPlacer):
         self.context.unwrap_or_raise_exception(response)
         return Order(id=client_id, side=side, price=price, size=size)
 
+    def cancel_and_place(self, to_cancel: typing.Sequence[Order], order_type: OrderType, to_place: typing.Sequence[Order]) -> typing.Sequence[Order]:
+        cancels: typing.List[typing.Tuple[Order, TransactionInstruction]] = []
+        for order in to_cancel:
+            self.reporter(
+                f"Cancelling order {order.id} in openorders {self.open_orders.address} on market {self.spot_market.symbol}.")
+            cancel = CancelOrderByClientIdInstructionBuilder(
+                self.context, self.wallet, self.market, self.open_orders.address, order.id)
+            cancels += [(order, cancel.build())]
+        self._send_cancels(cancels)
+
+        instructions: typing.List[TransactionInstruction] = []
+
+        base_token_account = self.token_account_resolver(self.spot_market.base)
+        if base_token_account is None:
+            raise Exception(f"Could not find token account for token {self.spot_market.base.symbol}.")
+        quote_token_account = self.token_account_resolver(self.spot_market.quote)
+        if quote_token_account is None:
+            raise Exception(f"Could not find token account for token {self.spot_market.quote.symbol}.")
+
+        serum_order_type = pyserum.enums.OrderType.POST_ONLY if order_type == OrderType.POST_ONLY else pyserum.enums.OrderType.IOC if order_type == OrderType.IOC else pyserum.enums.OrderType.LIMIT
+        placed: typing.List[Order] = []
+        for order in to_place:
+            client_id: int = self.context.random_client_id()
+            self.reporter(
+                f"Placing {order_type} {order.side} order for size {order.size} at price {order.price} on market {self.spot_market.symbol} with ID {client_id}.")
+            serum_side = pyserum.enums.Side.BUY if order.side == Side.BUY else pyserum.enums.Side.SELL
+            payer_token_account = quote_token_account if order.side == Side.BUY else base_token_account
+            new_order = NewOrderV3InstructionBuilder(self.context, self.wallet, self.market,
+                                                     payer_token_account.address, self.open_orders.address,
+                                                     serum_order_type, serum_side, order.price, order.size,
+                                                     client_id, None)
+            instructions += [new_order.build()]
+            placed += [Order(id=client_id, side=order.side, price=order.price, size=order.size)]
+
+        if len(instructions) == 0 and len(cancels) == 0:
+            return placed
+
+        consume_events = ConsumeEventsInstructionBuilder(
+            self.context, self.wallet, self.market, [self.open_orders.address])
+        instructions += [consume_events.build()]
+
+        settle = SettleInstructionBuilder(self.context, self.wallet, self.market, self.open_orders.address,
+                                          base_token_account.address, quote_token_account.address)
+        instructions += [settle.build()]
+
+        self.batcher.send(instructions)
+        return placed
+
+    def _send_cancels(self, cancels: typing.Sequence[typing.Tuple[Order, TransactionInstruction]]) -> None:
+        if len(cancels) == 0:
+            return
+
+        try:
+            self.batcher.send([instruction for _, instruction in cancels])
+        except Exception as exception:
+            self.logger.warning(f"Failed to cancel {len(cancels)} orders together - cancelling one at a time. {exception}")
+            for order, instruction in cancels:
+                try:
+                    self.batcher.send([instruction])
+                except Exception as exception:
+                    self.logger.warning(f"Failed to cancel order {order.id} - continuing. {exception}")
+
     def load_my_orders(self) -> typing.List[Order]:
         serum_orders = self.market.load_orders_for_owner(self.wallet.address)
+        return self._to_orders(serum_orders)
+
+    # Finds this placer's orders in already-loaded order books, so several placers can share a
+    # single load of all the bids and asks accounts.
+    def my_orders_from_order_books(self, bids: OrderBook, asks: OrderBook) -> typing.List[Order]:
+        serum_orders = [serum_order for serum_order in [*bids.orders(), *asks.orders()]
+                        if serum_order.open_order_address == self.open_orders.address]
+        return self._to_orders(serum_orders)
+
+    def _to_orders(self, serum_orders: typing.Iterable[typing.Any]) -> typing.List[Order]:
         orders: typing.List[Order] = []
         for serum_order in serum_orders:
             price = Decimal(serum_order.info.price)
@@ -0,0 +1,162 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import atexit
+import collections
+import logging
+import os.path
+import signal
+import sys
+import threading
+import types
+import typing
+
+
+# # 🥭 Profiler
+#
+# This file contains a simple sampling profiler that can run alongside any command.
+#
+
+
+# # 🥭 SamplingProfiler class
+#
+# A background thread wakes every `interval` seconds and records the call stack of every
+# other thread, so the overhead depends on the sampling interval rather than on how many
+# function calls the program makes. (Unlike `cProfile`, nothing is added to each call.)
+#
+# `write()` produces two files:
+# * `filename` - the samples in 'folded stacks' format (one line per distinct stack, frames
+#   separated by semicolons, followed by the sample count). This can be turned into a flame
+#   graph by [flamegraph.pl](https://github.com/brendangregg/FlameGraph) or loaded into
+#   [speedscope](https://www.speedscope.app/).
+# * `filename` + `.top.txt` - the `top` functions with the most samples, both 'self' samples
+#   (where the function itself was running) and 'total' samples (where it was anywhere on the
+#   stack).
+#
+# `install()` starts the profiler, writes the files when the process exits, and (where the
+# platform has it) also writes them whenever the process receives SIGUSR1. That allows a
+# long-running process like the liquidator to be profiled without restarting it:
+# ```
+# kill -USR1 <pid>
+# ```
+# Samples accumulate from when the profiler started, so each write covers the whole run so
+# far.
+#
+
+class SamplingProfiler:
+    def __init__(self, filename: str, interval: float = 0.01, top: int = 20):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.filename: str = filename
+        self.interval: float = interval
+        self.top: int = top
+        self.sample_count: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._stacks: typing.Counter[typing.Tuple[str, ...]] = collections.Counter()
+        self._stop_requested: threading.Event = threading.Event()
+        self._thread: typing.Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self._stop_requested.clear()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop_requested.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def install(self) -> "SamplingProfiler":
+        self.start()
+        atexit.register(self._stop_and_write)
+        if hasattr(signal, "SIGUSR1") and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGUSR1, lambda signal_number, frame: self.write())
+        self.logger.info(f"Profiling to {self.filename} every {self.interval * 1000:.0f}ms.")
+        return self
+
+    def _stop_and_write(self) -> None:
+        self.stop()
+        self.write()
+
+    def _run(self) -> None:
+        profiler_thread_id = threading.get_ident()
+        while not self._stop_requested.wait(self.interval):
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            samples: typing.List[typing.Tuple[str, ...]] = []
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != profiler_thread_id:
+                    thread_name = thread_names.get(thread_id, str(thread_id))
+                    samples += [(thread_name,) + SamplingProfiler._stack(frame)]
+            with self._lock:
+                self._stacks.update(samples)
+                self.sample_count += 1
+
+    @staticmethod
+    def _stack(frame: typing.Optional[types.FrameType]) -> typing.Tuple[str, ...]:
+        frames: typing.List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            frames += [f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")]
+            frame = frame.f_back
+        return tuple(reversed(frames))
+
+    def folded_stacks(self) -> typing.List[str]:
+        with self._lock:
+            stacks = list(self._stacks.items())
+        return [f"{';'.join(stack)} {count}" for stack, count in sorted(stacks, key=lambda item: -item[1])]
+
+    def hot_functions(self) -> typing.List[typing.Tuple[str, int, int]]:
+        with self._lock:
+            stacks = list(self._stacks.items())
+        self_counts: typing.Counter[str] = collections.Counter()
+        total_counts: typing.Counter[str] = collections.Counter()
+        for stack, count in stacks:
+            # The first item is the thread name, not a function.
+            functions = stack[1:]
+            if len(functions) == 0:
+                continue
+            self_counts[functions[-1]] += count
+            for function in set(functions):
+                total_counts[function] += count
+        hottest = sorted(total_counts.keys(), key=lambda function: (-self_counts[function], -total_counts[function]))
+        return [(function, self_counts[function], total_counts[function]) for function in hottest[:self.top]]
+
+    def summary(self) -> str:
+        with self._lock:
+            total = sum(self._stacks.values()) or 1
+        lines = [f"Top {self.top} functions from {self.sample_count} samples ({self.interval * 1000:.0f}ms interval):",
+                 f"{'Self':>7} {'Self%':>6} {'Total':>7} {'Total%':>6}  Function"]
+        for function, self_count, total_count in self.hot_functions():
+            lines += [f"{self_count:>7} {self_count / total:>6.1%} {total_count:>7} {total_count / total:>6.1%}  {function}"]
+        return "\n".join(lines)
+
+    def write(self) -> None:
+        try:
+            with open(self.filename, "w") as folded_file:
+                folded_file.write("\n".join(self.folded_stacks()) + "\n")
+            summary = self.summary()
+            with open(f"{self.filename}.top.txt", "w") as summary_file:
+                summary_file.write(summary + "\n")
+            self.logger.info(f"Profile written to {self.filename}\n{summary}")
+        except Exception as exception:
+            self.logger.error(f"Could not write profile to {self.filename} - {exception}")
+
+    def __str__(self) -> str:
+        return f"« SamplingProfiler writing to {self.filename} [{self.sample_count} samples] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
@@ -0,0 +1,90 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import atexit
+import gzip
+import json
+import logging
+import threading
+import time
+import typing
+
+
+# # 🥭 RPC Recorder
+#
+# This file contains code to record RPC requests and responses, so they can be replayed later
+# by a `ReplayingClient`.
+#
+
+
+# # 🥭 RpcRecorder class
+#
+# The `RpcRecorder` writes every RPC exchange it's given to a gzip-compressed file of JSON
+# lines. Each line holds:
+# * `timestamp` - when the request was sent
+# * `method` - the RPC method name (the first method, for batch requests)
+# * `request` - the JSON-RPC request, as sent
+# * `status` - the HTTP status code of the response
+# * `response` - the response body, as received
+# * `elapsed` - the number of seconds the request took
+#
+# A `CompatibleClient` records to an `RpcRecorder` if its `recorder` property is set.
+#
+# Recording appends to an existing file, so one recording can span several runs. The file is
+# closed (and the last of the compressed data written) when the process exits.
+#
+
+class RpcRecorder:
+    def __init__(self, filename: str):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.filename: str = filename
+        self.count: int = 0
+        self._lock: threading.Lock = threading.Lock()
+        self._file: typing.Optional[typing.TextIO] = typing.cast(typing.TextIO, gzip.open(filename, "at", encoding="utf-8"))
+        atexit.register(self.close)
+
+    def record(self, method: str, request: str, status: int, response: str, elapsed: float) -> None:
+        line = json.dumps({
+            "timestamp": time.time() - elapsed,
+            "method": method,
+            "request": json.loads(request),
+            "status": status,
+            "response": response,
+            "elapsed": elapsed
+        })
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self.logger.info(f"Recorded {self.count} RPC exchanges to {self.filename}.")
+
+    @staticmethod
+    def load(filename: str) -> typing.List[typing.Dict]:
+        with gzip.open(filename, "rt", encoding="utf-8") as recording:
+            return [json.loads(line) for line in recording if line.strip()]
+
+    def __str__(self) -> str:
+        return f"« RpcRecorder to {self.filename} [{self.count} exchanges] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
@@ -0,0 +1,113 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import array
+import atexit
+import concurrent.futures
+import logging
+import multiprocessing
+import threading
+import typing
+
+from multiprocessing import shared_memory
+
+
+# # 🥭 Sharded Parser
+#
+# This file contains a way to spread CPU-bound parsing of many raw items across processes.
+# Threads don't help with that kind of work because of the GIL.
+#
+
+T = typing.TypeVar("T")
+
+
+# # 🥭 ShardedParser class
+#
+# `map()` copies all the items into one block of shared memory and splits them into one
+# contiguous shard per process. Each worker is sent only the name of the shared memory block,
+# the index of its first item and the offsets of its items (as a compact `array`), so the
+# items themselves are never pickled. Workers read their items with `ShardedParser.items()`
+# and return a list of results, which should be small - the point is to send compact records
+# back, not whole parsed objects.
+#
+# The worker processes are kept between calls, so the cost of starting them is only paid
+# once. They're forked rather than spawned: spawning would re-run the `bin/` script (which
+# has no `__main__` guard) in every worker.
+#
+# `function` must be a module-level function or a static method, so it can be pickled.
+#
+
+class ShardedParser:
+    def __init__(self, processes: int):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.processes: int = processes
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("fork"))
+
+    def map(self, function: typing.Callable[..., typing.List[T]], items: typing.Sequence[bytes], *args: typing.Any) -> typing.List[T]:
+        if len(items) == 0:
+            return []
+
+        offsets = array.array("Q", [0])
+        for item in items:
+            offsets.append(offsets[-1] + len(item))
+
+        shared = shared_memory.SharedMemory(create=True, size=max(offsets[-1], 1))
+        try:
+            typing.cast(memoryview, shared.buf)[:offsets[-1]] = b"".join(items)
+            shard_size = -(-len(items) // self.processes)
+            futures = [self._executor.submit(function, shared.name, first_index, offsets[first_index:first_index + shard_size + 1], *args)
+                       for first_index in range(0, len(items), shard_size)]
+            results: typing.List[T] = []
+            for future in futures:
+                results += future.result()
+            return results
+        finally:
+            shared.close()
+            shared.unlink()
+
+    @staticmethod
+    def items(shared_memory_name: str, first_index: int, offsets: typing.Sequence[int]) -> typing.List[typing.Tuple[int, bytes]]:
+        shared = shared_memory.SharedMemory(name=shared_memory_name)
+        try:
+            buffer = typing.cast(memoryview, shared.buf)
+            return [(first_index + counter, bytes(buffer[offsets[counter]:offsets[counter + 1]]))
+                    for counter in range(len(offsets) - 1)]
+        finally:
+            shared.close()
+
+    def shutdown(self) -> None:
+        self._executor.shutdown()
+
+    def __str__(self) -> str:
+        return f"« ShardedParser [{self.processes} processes] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# Worker processes are expensive to start, so there's one `ShardedParser` for each number of
+# processes asked for, shared by everything in this process.
+_sharded_parsers: typing.Dict[int, ShardedParser] = {}
+_sharded_parsers_lock = threading.Lock()
+
+
+def get_sharded_parser(processes: int) -> ShardedParser:
+    with _sharded_parsers_lock:
+        if processes not in _sharded_parsers:
+            _sharded_parsers[processes] = ShardedParser(processes)
+            atexit.register(_sharded_parsers[processes].shutdown)
+        return _sharded_parsers[processes]
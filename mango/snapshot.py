@@ -0,0 +1,310 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import enum
+import logging
+import mmap
+import struct
+import typing
+
+from decimal import Decimal
+from solana.publickey import PublicKey
+from solana.rpc.types import MemcmpOpts
+
+from .accountinfo import AccountInfo
+from .aggregator import Aggregator
+from .context import Context
+from .encoding import encode_key
+from .group import Group
+from .layouts import layouts
+from .marginaccount import MarginAccount
+from .tokenvalue import TokenValue
+from .version import Version
+
+
+# # 🥭 Snapshot
+#
+# This file contains a compact binary file format for the state of a whole group - the group
+# account, all its margin accounts, all its open orders accounts and its oracles.
+#
+# The accounts can't all be fetched in one RPC call, so they aren't all from the same slot.
+# Each account's slot is stored alongside it, and the snapshot's own slot is the group's.
+#
+# Snapshot files can be memory-mapped. The `AccountInfo`s a `Snapshot` returns have `data`
+# that is a `memoryview` onto the file, so `Group.parse()`, `MarginAccount.parse()` and
+# `OpenOrders.parse()` read straight from the mapped file without copying the account data
+# first.
+#
+# The file layout (all integers little-endian) is:
+# * A header: the magic bytes `MANGOSNP`, a 2-byte format version, 2 reserved bytes, the
+#   8-byte slot and the 4-byte number of accounts.
+# * The index: one 112-byte entry per account, sorted by address, holding the address, owner,
+#   `SnapshotAccountKind`, executable flag, lamports, rent epoch, the slot the account was
+#   fetched at, and the offset and length of the account's data. Lookups by address are a
+#   binary search of the index.
+# * The account data, one account after another.
+#
+# Version 1 files, which have 104-byte index entries without the account's slot, can still be
+# read. Their accounts all have the header's slot.
+#
+
+
+# # 🥭 SnapshotAccountKind enum
+#
+# What part of the group an account in the snapshot is.
+#
+
+class SnapshotAccountKind(enum.IntEnum):
+    GROUP = 0
+    MARGIN_ACCOUNT = 1
+    OPEN_ORDERS = 2
+    ORACLE = 3
+
+    def __str__(self) -> str:
+        return self.name
+
+
+_MAGIC = b"MANGOSNP"
+_FORMAT_VERSION = 2
+_HEADER = struct.Struct("<8sHHQI")
+_INDEX_ENTRY = struct.Struct("<32s32sBB6xQQQQI4x")
+_INDEX_ENTRY_V1 = struct.Struct("<32s32sBB6xQQQI4x")
+
+
+# # 🥭 Snapshot class
+#
+# A group's accounts. Use:
+# * `Snapshot.capture(context)` to load the current state through RPC,
+# * `save(filename)` to write it to a file, and
+# * `Snapshot.open(filename)` to memory-map a saved file.
+#
+# `account_slot()` gives the slot an account was fetched at, and `slot_range` the earliest and
+# latest slots of all the accounts.
+#
+# `load_group()`, `load_margin_accounts()` and `load_prices()` parse the accounts into the
+# usual objects, so a notebook can do:
+# ```
+# snapshot = mango.Snapshot.open("group.snapshot")
+# group = snapshot.load_group(context)
+# prices = snapshot.load_prices(context, group)
+# margin_accounts = snapshot.load_margin_accounts(group)
+# ```
+#
+
+class Snapshot:
+    def __init__(self, buffer: typing.Union[bytes, mmap.mmap], filename: typing.Optional[str] = None):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.filename: typing.Optional[str] = filename
+        self._buffer: typing.Union[bytes, mmap.mmap] = buffer
+        self._view: memoryview = memoryview(buffer)
+        magic, version, _, slot, count = _HEADER.unpack_from(self._view, 0)
+        if magic != _MAGIC:
+            raise Exception(f"Data is not a Mango snapshot (magic bytes are {magic!r}).")
+        if version not in (1, _FORMAT_VERSION):
+            raise Exception(f"Snapshot format version {version} is not supported (only versions 1 and {_FORMAT_VERSION}).")
+        self.version: int = version
+        self.slot: int = slot
+        self.count: int = count
+        self._index_entry: struct.Struct = _INDEX_ENTRY_V1 if version == 1 else _INDEX_ENTRY
+
+    # `account_slots` maps account addresses (as strings) to the slot each was fetched at.
+    # Accounts that aren't in it are given `slot`.
+    @staticmethod
+    def build(slot: int, accounts: typing.Sequence[typing.Tuple[SnapshotAccountKind, AccountInfo]], account_slots: typing.Optional[typing.Mapping[str, int]] = None) -> bytes:
+        slots = account_slots or {}
+        by_address = {bytes(account_info.address): (kind, account_info) for kind, account_info in accounts}
+        data_offset = _HEADER.size + (_INDEX_ENTRY.size * len(by_address))
+        index = bytearray()
+        data = bytearray()
+        for address in sorted(by_address.keys()):
+            kind, account_info = by_address[address]
+            index += _INDEX_ENTRY.pack(address, bytes(account_info.owner), kind, account_info.executable,
+                                       int(account_info.lamports), int(account_info.rent_epoch),
+                                       slots.get(str(account_info.address), slot),
+                                       data_offset + len(data), len(account_info.data))
+            data += account_info.data
+
+        return _HEADER.pack(_MAGIC, _FORMAT_VERSION, 0, slot, len(by_address)) + bytes(index) + bytes(data)
+
+    # Each RPC response's context slot is kept as the slot of the accounts it returned.
+    @staticmethod
+    def capture(context: Context) -> "Snapshot":
+        group_response = context.client.get_account_info(context.group_id)
+        if group_response is None or group_response["value"] is None:
+            raise Exception(f"Group account not found at address '{context.group_id}'")
+        slot = group_response["context"]["slot"]
+        group_account_info = AccountInfo._from_response_values(group_response["value"], context.group_id)
+        group = Group.parse(context, group_account_info)
+
+        margin_account_layout = layouts.MARGIN_ACCOUNT_V1 if group.version == Version.V1 else layouts.MARGIN_ACCOUNT_V2
+        margin_account_filters = [
+            MemcmpOpts(
+                offset=layouts.MANGO_ACCOUNT_FLAGS.sizeof(),  # mango_group is just after the MangoAccountFlags, which is the first entry
+                bytes=encode_key(group.address)
+            )
+        ]
+        margin_account_slot, margin_account_infos = Snapshot._load_program_accounts(
+            context, context.program_id, margin_account_layout.sizeof(), margin_account_filters)
+
+        # The same filter `OpenOrders.load_raw_open_orders_account_infos()` uses.
+        open_orders_filters = [
+            MemcmpOpts(
+                offset=layouts.SERUM_ACCOUNT_FLAGS.sizeof() + 37,
+                bytes=encode_key(group.signer_key)
+            )
+        ]
+        open_orders_slot, open_orders_account_infos = Snapshot._load_program_accounts(
+            context, group.dex_program_id, layouts.OPEN_ORDERS.sizeof(), open_orders_filters)
+
+        oracle_response = context.client.compatible_client.get_multiple_accounts([market.oracle for market in group.markets])
+        oracle_slot = oracle_response["result"]["context"]["slot"]
+        oracle_account_infos = [AccountInfo._from_response_values(value, market.oracle)
+                                for value, market in zip(oracle_response["result"]["value"], group.markets)]
+
+        accounts: typing.List[typing.Tuple[SnapshotAccountKind, AccountInfo]] = [(SnapshotAccountKind.GROUP, group_account_info)]
+        accounts += [(SnapshotAccountKind.MARGIN_ACCOUNT, account_info) for account_info in margin_account_infos]
+        accounts += [(SnapshotAccountKind.OPEN_ORDERS, account_info) for account_info in open_orders_account_infos]
+        accounts += [(SnapshotAccountKind.ORACLE, account_info) for account_info in oracle_account_infos]
+
+        account_slots: typing.Dict[str, int] = {}
+        for account_slot, account_infos in [(margin_account_slot, margin_account_infos),
+                                            (open_orders_slot, open_orders_account_infos),
+                                            (oracle_slot, oracle_account_infos)]:
+            account_slots.update({str(account_info.address): account_slot for account_info in account_infos})
+        return Snapshot(Snapshot.build(slot, accounts, account_slots))
+
+    @staticmethod
+    def _load_program_accounts(context: Context, program_id: PublicKey, data_size: int, filters: typing.List[MemcmpOpts]) -> typing.Tuple[int, typing.List[AccountInfo]]:
+        result = context.client.get_program_accounts(program_id, data_size=data_size, memcmp_opts=filters, with_context=True)
+        account_infos = [AccountInfo._from_response_values(item["account"], PublicKey(item["pubkey"])) for item in result["value"]]
+        return result["context"]["slot"], account_infos
+
+    @staticmethod
+    def open(filename: str) -> "Snapshot":
+        with open(filename, "rb") as snapshot_file:
+            mapped = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return Snapshot(mapped, filename)
+
+    def save(self, filename: str) -> None:
+        with open(filename, "wb") as snapshot_file:
+            snapshot_file.write(self._view)
+
+    # Parsed objects keep their `AccountInfo`, and so a view onto the mapped file. If any of
+    # them are still around the file can't be unmapped yet - it's unmapped when the last of
+    # them is garbage-collected instead.
+    def close(self) -> None:
+        self._view.release()
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                self.logger.debug(f"Snapshot {self.filename} is still in use and will be unmapped when no longer referenced.")
+
+    # Entries are always returned in the current format, with version 1 entries given the
+    # header's slot.
+    def _entry(self, index: int) -> typing.Tuple[typing.Any, ...]:
+        entry = self._index_entry.unpack_from(self._view, _HEADER.size + (index * self._index_entry.size))
+        if self.version == 1:
+            return entry[:6] + (self.slot,) + entry[6:]
+        return entry
+
+    def _address_at(self, index: int) -> bytes:
+        offset = _HEADER.size + (index * self._index_entry.size)
+        return bytes(self._view[offset:offset + 32])
+
+    def _account_info(self, entry: typing.Tuple[typing.Any, ...]) -> AccountInfo:
+        address, owner, _, executable, lamports, rent_epoch, _, data_offset, data_length = entry
+        data = self._view[data_offset:data_offset + data_length]
+        return AccountInfo(PublicKey(address), bool(executable), Decimal(lamports), PublicKey(owner),
+                           Decimal(rent_epoch), typing.cast(bytes, data))
+
+    def _find(self, address: PublicKey) -> typing.Optional[typing.Tuple[typing.Any, ...]]:
+        target = bytes(address)
+        low = 0
+        high = self.count
+        while low < high:
+            middle = (low + high) // 2
+            if self._address_at(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self.count and self._address_at(low) == target:
+            return self._entry(low)
+        return None
+
+    def account_info(self, address: PublicKey) -> typing.Optional[AccountInfo]:
+        entry = self._find(address)
+        return None if entry is None else self._account_info(entry)
+
+    def account_slot(self, address: PublicKey) -> typing.Optional[int]:
+        entry = self._find(address)
+        return None if entry is None else entry[6]
+
+    @property
+    def slot_range(self) -> typing.Tuple[int, int]:
+        slots = [self._entry(index)[6] for index in range(self.count)]
+        if len(slots) == 0:
+            return self.slot, self.slot
+        return min(slots), max(slots)
+
+    def account_infos(self, kind: typing.Optional[SnapshotAccountKind] = None) -> typing.List[AccountInfo]:
+        entries = [self._entry(index) for index in range(self.count)]
+        return [self._account_info(entry) for entry in entries if kind is None or entry[2] == kind]
+
+    def group_account_info(self) -> AccountInfo:
+        group_account_infos = self.account_infos(SnapshotAccountKind.GROUP)
+        if len(group_account_infos) != 1:
+            raise Exception(f"Snapshot should have one group account but has {len(group_account_infos)}.")
+        return group_account_infos[0]
+
+    def open_orders_account_infos(self) -> typing.Dict[str, AccountInfo]:
+        return {str(account_info.address): account_info for account_info in self.account_infos(SnapshotAccountKind.OPEN_ORDERS)}
+
+    def load_group(self, context: Context) -> Group:
+        return Group.parse(context, self.group_account_info())
+
+    def load_prices(self, context: Context, group: Group) -> typing.List[TokenValue]:
+        prices: typing.List[TokenValue] = []
+        for basket_token, market in zip(group.basket_tokens, group.markets):
+            oracle_account_info = self.account_info(market.oracle)
+            if oracle_account_info is None:
+                raise Exception(f"Snapshot has no oracle account at '{market.oracle}'.")
+            prices += [TokenValue(basket_token.token, Aggregator.parse(context, oracle_account_info).price)]
+        return prices + [TokenValue(group.shared_quote_token.token, Decimal(1))]
+
+    def load_margin_accounts(self, group: Group) -> typing.List[MarginAccount]:
+        open_orders_account_infos = self.open_orders_account_infos()
+        margin_accounts: typing.List[MarginAccount] = []
+        for account_info in self.account_infos(SnapshotAccountKind.MARGIN_ACCOUNT):
+            margin_account = MarginAccount.parse(account_info, group)
+            margin_account.install_open_orders_accounts(group, open_orders_account_infos)
+            margin_accounts += [margin_account]
+        return margin_accounts
+
+    def __bytes__(self) -> bytes:
+        return bytes(self._view)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __str__(self) -> str:
+        source = f" from {self.filename}" if self.filename is not None else ""
+        earliest, latest = self.slot_range
+        slots = f"slot {self.slot}" if earliest == latest else f"slot {self.slot} (accounts from {earliest} to {latest})"
+        return f"« Snapshot at {slots} with {self.count} accounts{source} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
@@ -0,0 +1,264 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import logging
+import numpy
+import typing
+
+from solana.publickey import PublicKey
+
+from .group import Group
+from .marginaccount import MarginAccount
+from .tokenvalue import TokenValue
+
+
+# # 🥭 Stress Test
+#
+# This file contains a price-shock stress tester. It answers 'how many accounts, and how much
+# collateral, would become liquidatable if prices moved like this?' for thousands of price
+# scenarios at once.
+#
+# Margin accounts are first turned into `MarginAccountColumns` - one row per account and one
+# column per token, for assets and liabilities. Scenarios are a `StressScenarios` matrix - one
+# row per scenario and one column per token, holding prices. The value of every account under
+# every scenario is then a matrix multiplication, and the collateral ratios and liquidatable
+# flags are element-wise operations on the result.
+#
+# Everything is done in 64-bit floats rather than `Decimal`s. That's plenty for risk reporting
+# but an account sitting exactly on a collateral ratio boundary may be classified differently
+# than by `LiquidatableReport`.
+#
+
+
+# # 🥭 MarginAccountColumns class
+#
+# The balances of many margin accounts, in token units, as two `accounts x tokens` arrays.
+# Assets include unsettled funds in open orders accounts, the same as
+# `MarginAccount.get_intrinsic_balance_sheets()`.
+#
+
+class MarginAccountColumns:
+    def __init__(self, symbols: typing.Sequence[str], addresses: typing.Sequence[PublicKey], assets: numpy.ndarray, liabilities: numpy.ndarray):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.symbols: typing.Sequence[str] = symbols
+        self.addresses: typing.Sequence[PublicKey] = addresses
+        self.assets: numpy.ndarray = assets
+        self.liabilities: numpy.ndarray = liabilities
+
+    @staticmethod
+    def from_margin_accounts(group: Group, margin_accounts: typing.Sequence[MarginAccount]) -> "MarginAccountColumns":
+        token_count = len(group.basket_tokens)
+        assets = numpy.zeros((len(margin_accounts), token_count))
+        liabilities = numpy.zeros((len(margin_accounts), token_count))
+        for row, margin_account in enumerate(margin_accounts):
+            for column, balance_sheet in enumerate(margin_account.get_intrinsic_balance_sheets(group)):
+                assets[row, column] = float(balance_sheet.assets)
+                liabilities[row, column] = float(balance_sheet.liabilities)
+
+        symbols = [basket_token.token.symbol for basket_token in group.basket_tokens]
+        addresses = [margin_account.address for margin_account in margin_accounts]
+        return MarginAccountColumns(symbols, addresses, assets, liabilities)
+
+    def __len__(self) -> int:
+        return len(self.addresses)
+
+    def __str__(self) -> str:
+        return f"« MarginAccountColumns [{len(self.addresses)} accounts x {len(self.symbols)} tokens: {', '.join(self.symbols)}] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 StressScenarios class
+#
+# A `scenarios x tokens` matrix of prices, with a description of each scenario.
+#
+# The static constructors build scenarios by applying shocks to `base_prices`. A shock of -0.2
+# is a 20% fall. The last token is the group's shared quote token, and it is never shocked -
+# all prices are in the quote token, so its price is always 1.
+#
+
+class StressScenarios:
+    def __init__(self, symbols: typing.Sequence[str], prices: numpy.ndarray, descriptions: typing.Sequence[str]):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        if prices.shape != (len(descriptions), len(symbols)):
+            raise Exception(f"Price matrix has shape {prices.shape} but should be ({len(descriptions)}, {len(symbols)}).")
+        self.symbols: typing.Sequence[str] = symbols
+        self.prices: numpy.ndarray = prices
+        self.descriptions: typing.Sequence[str] = descriptions
+
+    @staticmethod
+    def from_shocks(prices: typing.Sequence[TokenValue], shocks: numpy.ndarray, descriptions: typing.Optional[typing.Sequence[str]] = None) -> "StressScenarios":
+        symbols = [price.token.symbol for price in prices]
+        base_prices = numpy.array([float(price.value) for price in prices])
+        multipliers = 1.0 + numpy.asarray(shocks, dtype=float)
+        multipliers[:, -1] = 1.0
+        if descriptions is None:
+            descriptions = [", ".join(f"{symbol} {shock:+.1%}" for symbol, shock in zip(symbols[:-1], row[:-1]))
+                            for row in numpy.asarray(shocks, dtype=float)]
+        return StressScenarios(symbols, multipliers * base_prices, descriptions)
+
+    @staticmethod
+    def uniform(prices: typing.Sequence[TokenValue], shocks: typing.Sequence[float]) -> "StressScenarios":
+        shock_matrix = numpy.repeat(numpy.asarray(shocks, dtype=float)[:, numpy.newaxis], len(prices), axis=1)
+        descriptions = [f"All {shock:+.1%}" for shock in shocks]
+        return StressScenarios.from_shocks(prices, shock_matrix, descriptions)
+
+    @staticmethod
+    def per_token(prices: typing.Sequence[TokenValue], shocks: typing.Sequence[float]) -> "StressScenarios":
+        token_count = len(prices) - 1
+        shock_matrix = numpy.zeros((token_count * len(shocks), len(prices)))
+        descriptions: typing.List[str] = []
+        for index in range(token_count):
+            shock_matrix[index * len(shocks):(index + 1) * len(shocks), index] = shocks
+            descriptions += [f"{prices[index].token.symbol} {shock:+.1%}" for shock in shocks]
+        return StressScenarios.from_shocks(prices, shock_matrix, descriptions)
+
+    # Random scenarios shock each token independently, with log-normally distributed price
+    # changes of the given `volatility` (standard deviation of the log change).
+    @staticmethod
+    def random(prices: typing.Sequence[TokenValue], count: int, volatility: float, seed: typing.Optional[int] = None) -> "StressScenarios":
+        generator = numpy.random.default_rng(seed)
+        shocks = numpy.expm1(generator.normal(0.0, volatility, (count, len(prices))))
+        return StressScenarios.from_shocks(prices, shocks)
+
+    def __len__(self) -> int:
+        return len(self.descriptions)
+
+    def __str__(self) -> str:
+        return f"« StressScenarios [{len(self.descriptions)} scenarios x {len(self.symbols)} tokens: {', '.join(self.symbols)}] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 StressTestResult class
+#
+# Per-scenario totals from a `StressTester` run, each an array with one entry per scenario:
+# * `ripe_counts` - accounts at or below the group's initial collateral ratio,
+# * `liquidatable_counts` - accounts at or below the group's maintenance collateral ratio,
+# * `underwater_counts` - liquidatable accounts whose liabilities are more than their assets,
+# * `liquidatable_assets` and `liquidatable_liabilities` - the total value, in the quote
+#   token, of the assets and liabilities of the liquidatable accounts.
+#
+# `account_liquidatable_counts` has one entry per account - the number of scenarios in which
+# that account is liquidatable.
+#
+
+class StressTestResult:
+    def __init__(self, scenarios: StressScenarios, columns: MarginAccountColumns, ripe_counts: numpy.ndarray,
+                 liquidatable_counts: numpy.ndarray, underwater_counts: numpy.ndarray, liquidatable_assets: numpy.ndarray,
+                 liquidatable_liabilities: numpy.ndarray, account_liquidatable_counts: numpy.ndarray):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.scenarios: StressScenarios = scenarios
+        self.columns: MarginAccountColumns = columns
+        self.ripe_counts: numpy.ndarray = ripe_counts
+        self.liquidatable_counts: numpy.ndarray = liquidatable_counts
+        self.underwater_counts: numpy.ndarray = underwater_counts
+        self.liquidatable_assets: numpy.ndarray = liquidatable_assets
+        self.liquidatable_liabilities: numpy.ndarray = liquidatable_liabilities
+        self.account_liquidatable_counts: numpy.ndarray = account_liquidatable_counts
+
+    def worst_scenarios(self, count: int = 10) -> typing.List[int]:
+        return list(numpy.argsort(-self.liquidatable_assets, kind="stable")[:count])
+
+    def most_vulnerable_accounts(self, count: int = 10) -> typing.List[typing.Tuple[PublicKey, int]]:
+        indexes = numpy.argsort(-self.account_liquidatable_counts, kind="stable")[:count]
+        return [(self.columns.addresses[index], int(self.account_liquidatable_counts[index]))
+                for index in indexes if self.account_liquidatable_counts[index] > 0]
+
+    def summary(self, top: int = 10) -> str:
+        def percentiles(values: numpy.ndarray, text: typing.Callable[[float], str]) -> str:
+            points = numpy.percentile(values, [50, 95, 99, 100])
+            return "  ".join(f"{name} {text(point)}" for name, point in zip(["p50", "p95", "p99", "max"], points))
+
+        lines = [f"Stress test of {len(self.columns)} accounts under {len(self.scenarios)} scenarios:",
+                 f"    Liquidatable Accounts : {percentiles(self.liquidatable_counts, lambda value: f'{value:,.0f}')}",
+                 f"    Liquidatable Assets   : {percentiles(self.liquidatable_assets, lambda value: f'{value:,.2f}')}",
+                 f"    Liquidatable Debt     : {percentiles(self.liquidatable_liabilities, lambda value: f'{value:,.2f}')}",
+                 f"    Underwater Accounts   : {percentiles(self.underwater_counts, lambda value: f'{value:,.0f}')}",
+                 f"    Ripe Accounts         : {percentiles(self.ripe_counts, lambda value: f'{value:,.0f}')}",
+                 f"Worst {top} scenarios by liquidatable assets:"]
+        for index in self.worst_scenarios(top):
+            lines += [f"    {self.liquidatable_counts[index]:>8,} accounts {self.liquidatable_assets[index]:>20,.2f} assets {self.underwater_counts[index]:>8,} underwater  {self.scenarios.descriptions[index]}"]
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return f"« StressTestResult [{len(self.columns)} accounts x {len(self.scenarios)} scenarios] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 StressTester class
+#
+# Runs `StressScenarios` against `MarginAccountColumns`, using the group's collateral ratios.
+#
+# The `scenarios x accounts` intermediate arrays can get large (1,000 scenarios for 100,000
+# accounts is 800MB per array) so scenarios are processed `chunk_size` at a time. Each chunk
+# is still a single vectorised computation.
+#
+# The classification matches `LiquidatableReport`: an account with no liabilities is never
+# ripe or liquidatable.
+#
+
+class StressTester:
+    def __init__(self, group: Group, columns: MarginAccountColumns, chunk_size: int = 1000):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.group: Group = group
+        self.columns: MarginAccountColumns = columns
+        self.chunk_size: int = chunk_size
+        self.maint_coll_ratio: float = float(group.maint_coll_ratio)
+        self.init_coll_ratio: float = float(group.init_coll_ratio)
+
+    def run(self, scenarios: StressScenarios) -> StressTestResult:
+        if list(scenarios.symbols) != list(self.columns.symbols):
+            raise Exception(f"Scenario tokens {scenarios.symbols} do not match account tokens {self.columns.symbols}.")
+
+        scenario_count = len(scenarios)
+        ripe_counts = numpy.zeros(scenario_count, dtype=numpy.int64)
+        liquidatable_counts = numpy.zeros(scenario_count, dtype=numpy.int64)
+        underwater_counts = numpy.zeros(scenario_count, dtype=numpy.int64)
+        liquidatable_assets = numpy.zeros(scenario_count)
+        liquidatable_liabilities = numpy.zeros(scenario_count)
+        account_liquidatable_counts = numpy.zeros(len(self.columns), dtype=numpy.int64)
+        has_liabilities = (self.columns.liabilities > 0).any(axis=1)
+
+        for start in range(0, scenario_count, self.chunk_size):
+            chunk = slice(start, start + self.chunk_size)
+            prices = scenarios.prices[chunk]
+            asset_values = prices @ self.columns.assets.T
+            liability_values = prices @ self.columns.liabilities.T
+            with numpy.errstate(divide="ignore", invalid="ignore"):
+                collateral_ratios = numpy.where(has_liabilities, asset_values / liability_values, numpy.inf)
+
+            ripe = collateral_ratios <= self.init_coll_ratio
+            liquidatable = collateral_ratios <= self.maint_coll_ratio
+            ripe_counts[chunk] = ripe.sum(axis=1)
+            liquidatable_counts[chunk] = liquidatable.sum(axis=1)
+            underwater_counts[chunk] = (liquidatable & (collateral_ratios < 1.0)).sum(axis=1)
+            liquidatable_assets[chunk] = numpy.where(liquidatable, asset_values, 0.0).sum(axis=1)
+            liquidatable_liabilities[chunk] = numpy.where(liquidatable, liability_values, 0.0).sum(axis=1)
+            account_liquidatable_counts += liquidatable.sum(axis=0)
+
+        return StressTestResult(scenarios, self.columns, ripe_counts, liquidatable_counts, underwater_counts,
+                                liquidatable_assets, liquidatable_liabilities, account_liquidatable_counts)
+
+    def __str__(self) -> str:
+        return f"« StressTester [{len(self.columns)} accounts, maint {self.maint_coll_ratio}, init {self.init_coll_ratio}] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
@@ -20,8 +20,11 @@ import typing
 from decimal import Decimal
 from solana.publickey import PublicKey
 from solana.rpc.types import TokenAccountOpts
+from spl.token.constants import TOKEN_PROGRAM_ID
 
+from .accountinfo import AccountInfo
 from .context import Context
+from .layouts import layouts
 from .token import Token
 
 
@@ -62,6 +65,29 @@ class TokenValue:
             return TokenValue(token, Decimal(0))
         return value
 
+    # This fetches all the owner's SPL token accounts in a single `getTokenAccountsByOwner`
+    # call (filtering on the token program rather than on a mint), parses the raw amounts
+    # locally and totals them by mint. Each token in `tokens` gets a `TokenValue`, with a value
+    # of 0 if the owner has no account for it.
+    @staticmethod
+    def fetch_total_values(context: Context, account_public_key: PublicKey, tokens: typing.Sequence[Token]) -> typing.List["TokenValue"]:
+        opts = TokenAccountOpts(program_id=TOKEN_PROGRAM_ID)
+        token_accounts = context.client.get_token_accounts_by_owner(account_public_key, opts)
+
+        raw_totals: typing.Dict[str, Decimal] = {}
+        for token_account in token_accounts:
+            account_info = AccountInfo._from_response_values(token_account["account"], PublicKey(token_account["pubkey"]))
+            layout = layouts.TOKEN_ACCOUNT.parse(account_info.data)
+            key = str(layout.mint)
+            raw_totals[key] = raw_totals.get(key, Decimal(0)) + layout.amount
+
+        values: typing.List[TokenValue] = []
+        for token in tokens:
+            raw_total = raw_totals.get(str(token.mint), Decimal(0))
+            values += [TokenValue(token, raw_total / (10 ** token.decimals))]
+
+        return values
+
     @staticmethod
     def report(values: typing.List["TokenValue"], reporter: typing.Callable[[str], None] = print) -> None:
         for value in values:
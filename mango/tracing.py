@@ -0,0 +1,301 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://mango.markets/) support is available at:
+#   [Docs](https://docs.mango.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import abc
+import atexit
+import contextlib
+import json
+import logging
+import os
+import threading
+import time
+import typing
+
+
+# # 🥭 Tracing
+#
+# This file contains lightweight tracing, so the time taken by a liquidation can be broken
+# down into its parts - fetching prices, loading ripe accounts, building reports, preparing
+# instructions, sending, waiting for confirmation and reloading.
+#
+# Code marks out the work it does with spans:
+# ```
+# with get_tracer().span("load_ripe") as span:
+#     ...
+#     span.set_attribute("ripe_accounts", len(ripe_accounts))
+# ```
+# Spans started inside another span (on the same thread) are its children. Work handed to
+# another thread can pass the parent span explicitly.
+#
+# The default tracer is a `NullTracer`, which does nothing. Use `set_tracer()` (or the
+# `--trace-filename` command-line parameter) to use a `FileTracer` instead.
+#
+# Spans use the OpenTelemetry data model - 16-byte trace IDs, 8-byte span IDs, nanosecond
+# timestamps, typed attributes and OK/ERROR statuses - and `FileTracer` writes them in the
+# [OTLP JSON](https://opentelemetry.io/docs/specs/otlp/#json-protobuf-encoding) format, so the
+# files can be loaded by OpenTelemetry tools (for example the collector's `otlpjsonfile`
+# receiver) without mango-explorer depending on the OpenTelemetry SDK.
+#
+
+
+# # 🥭 SpanStatus class
+#
+# The status codes OpenTelemetry uses.
+#
+
+class SpanStatus:
+    UNSET: int = 0
+    OK: int = 1
+    ERROR: int = 2
+
+
+# # 🥭 Span class
+#
+# A single timed operation, with its trace ID, its parent's span ID (if it has a parent) and
+# any attributes that describe it.
+#
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_span_id: typing.Optional[str] = None,
+                 attributes: typing.Optional[typing.Dict[str, typing.Any]] = None):
+        self.name: str = name
+        self.trace_id: str = trace_id
+        self.span_id: str = os.urandom(8).hex()
+        self.parent_span_id: typing.Optional[str] = parent_span_id
+        self.attributes: typing.Dict[str, typing.Any] = dict(attributes or {})
+        self.thread_name: str = threading.current_thread().name
+        self.start_time_ns: int = time.time_ns()
+        self.end_time_ns: typing.Optional[int] = None
+        self.status: int = SpanStatus.UNSET
+        self.status_message: str = ""
+
+    @property
+    def duration_seconds(self) -> float:
+        end_time_ns = self.end_time_ns if self.end_time_ns is not None else time.time_ns()
+        return (end_time_ns - self.start_time_ns) / 1e9
+
+    def set_attribute(self, key: str, value: typing.Any) -> None:
+        self.attributes[key] = value
+
+    def record_exception(self, exception: BaseException) -> None:
+        self.status = SpanStatus.ERROR
+        self.status_message = f"{type(exception).__name__}: {exception}"
+
+    def end(self) -> None:
+        if self.end_time_ns is None:
+            self.end_time_ns = time.time_ns()
+            if self.status == SpanStatus.UNSET:
+                self.status = SpanStatus.OK
+
+    def to_otlp(self) -> typing.Dict[str, typing.Any]:
+        otlp: typing.Dict[str, typing.Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_time_ns),
+            "endTimeUnixNano": str(self.end_time_ns or self.start_time_ns),
+            "attributes": [_otlp_attribute("thread.name", self.thread_name)] + [
+                _otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": self.status}
+        }
+        if self.parent_span_id is not None:
+            otlp["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            otlp["status"]["message"] = self.status_message
+        return otlp
+
+    def __str__(self) -> str:
+        return f"« Span '{self.name}' [{self.trace_id}/{self.span_id}] {self.duration_seconds:.3f} seconds »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+def _otlp_attribute(key: str, value: typing.Any) -> typing.Dict[str, typing.Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+# # 🥭 Tracer class
+#
+# The base class for tracers. `span()` starts a span, makes it the current span for the
+# thread while its block runs, and passes it to `export()` when the block finishes. An
+# exception escaping the block marks the span as an error (and carries on being raised).
+#
+# Derived classes implement `export()` to do something with finished spans.
+#
+
+class Tracer(metaclass=abc.ABCMeta):
+    def __init__(self):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self._local: threading.local = threading.local()
+
+    def current_span(self) -> typing.Optional[Span]:
+        stack: typing.List[Span] = getattr(self._local, "stack", [])
+        return stack[-1] if len(stack) > 0 else None
+
+    @contextlib.contextmanager
+    def span(self, name: str, attributes: typing.Optional[typing.Dict[str, typing.Any]] = None,
+             parent: typing.Optional[Span] = None) -> typing.Iterator[Span]:
+        parent = parent or self.current_span()
+        if parent is None:
+            span = Span(name, os.urandom(16).hex(), None, attributes)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        self._local.stack.append(span)
+        try:
+            yield span
+        except BaseException as exception:
+            span.record_exception(exception)
+            raise
+        finally:
+            self._local.stack.pop()
+            span.end()
+            try:
+                self.export(span)
+            except Exception as exception:
+                self.logger.warning(f"Could not export span {span} - {exception}")
+
+    @abc.abstractmethod
+    def export(self, span: Span) -> None:
+        raise NotImplementedError("Tracer.export() is not implemented on the base type.")
+
+    def close(self) -> None:
+        pass
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 NullTracer class
+#
+# A 'null', 'no-op' tracer, and the default. Its `span()` skips all the bookkeeping and
+# yields a span that's never exported, so instrumented code costs next to nothing when
+# tracing is off.
+#
+
+class NullTracer(Tracer):
+    def __init__(self):
+        super().__init__()
+        self._null_span: Span = Span("null", "0" * 32)
+
+    def current_span(self) -> typing.Optional[Span]:
+        return None
+
+    @contextlib.contextmanager
+    def span(self, name: str, attributes: typing.Optional[typing.Dict[str, typing.Any]] = None,
+             parent: typing.Optional[Span] = None) -> typing.Iterator[Span]:
+        yield self._null_span
+
+    def export(self, span: Span) -> None:
+        pass
+
+    def __str__(self) -> str:
+        return "« NullTracer »"
+
+
+# # 🥭 MemoryTracer class
+#
+# Keeps every finished span in its `spans` list. Mostly useful for tests.
+#
+
+class MemoryTracer(Tracer):
+    def __init__(self):
+        super().__init__()
+        self._lock: threading.Lock = threading.Lock()
+        self.spans: typing.List[Span] = []
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self.spans += [span]
+
+    def __str__(self) -> str:
+        return f"« MemoryTracer with {len(self.spans)} spans »"
+
+
+# # 🥭 FileTracer class
+#
+# Appends each finished span to a file, one OTLP JSON `ExportTraceServiceRequest` per line
+# (the format the OpenTelemetry collector's `otlpjsonfile` receiver reads).
+#
+# `FileTracer.load()` reads such a file back as a list of OTLP span dictionaries, for
+# looking at latency breakdowns offline.
+#
+
+class FileTracer(Tracer):
+    def __init__(self, filename: str, service_name: str = "mango-explorer"):
+        super().__init__()
+        self.filename: str = filename
+        self.service_name: str = service_name
+        self._lock: threading.Lock = threading.Lock()
+        self._file: typing.Optional[typing.TextIO] = open(filename, "a", encoding="utf-8")
+        atexit.register(self.close)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "mango"},
+                    "spans": [span.to_otlp()]
+                }]
+            }]
+        })
+        with self._lock:
+            if self._file is not None:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def load(filename: str) -> typing.List[typing.Dict[str, typing.Any]]:
+        spans: typing.List[typing.Dict[str, typing.Any]] = []
+        with open(filename, encoding="utf-8") as trace_file:
+            for line in trace_file:
+                if line.strip():
+                    for resource_spans in json.loads(line)["resourceSpans"]:
+                        for scope_spans in resource_spans["scopeSpans"]:
+                            spans += scope_spans["spans"]
+        return spans
+
+    def __str__(self) -> str:
+        return f"« FileTracer writing to {self.filename} »"
+
+
+_tracer: Tracer = NullTracer()
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def set_tracer(tracer: Tracer) -> None:
+    global _tracer
+    _tracer = tracer
@@ -59,10 +59,16 @@ from .wallet import Wallet
 # trade_executor.buy("ETH", 2.5)
 # ```
 #
+# Executors that look at the orderbook before trading record the best orderbook price they
+# traded against in `last_book_prices`, keyed by market symbol, so callers can work out the
+# slippage from the price they expected. Entries are only ever overwritten, so callers should
+# remove a market's entry before trading in it.
+#
 
 class TradeExecutor(metaclass=abc.ABCMeta):
     def __init__(self):
         self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.last_book_prices: typing.Dict[str, Decimal] = {}
 
     @abc.abstractmethod
     def buy(self, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
@@ -183,6 +189,7 @@ class SerumImmediateTradeExecutor(TradeExecutor):
         asks = market.load_asks()
         top_ask = next(asks.orders())
         top_price = Decimal(top_ask.info.price)
+        self.last_book_prices[symbol] = top_price
         increase_factor = Decimal(1) + self.price_adjustment_factor
         price = top_price * increase_factor
         self.reporter(f"Price {price} - adjusted by {self.price_adjustment_factor} from {top_price}")
@@ -204,6 +211,7 @@ class SerumImmediateTradeExecutor(TradeExecutor):
         bid_orders = list(bids.orders())
         top_bid = bid_orders[len(bid_orders) - 1]
         top_price = Decimal(top_bid.info.price)
+        self.last_book_prices[symbol] = top_price
         decrease_factor = Decimal(1) - self.price_adjustment_factor
         price = top_price * decrease_factor
         self.reporter(f"Price {price} - adjusted by {self.price_adjustment_factor} from {top_price}")
@@ -0,0 +1,111 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import logging
+import time
+import typing
+
+from solana.account import Account
+from solana.blockhash import Blockhash
+from solana.publickey import PublicKey
+from solana.transaction import PACKET_DATA_SIZE, Transaction, TransactionInstruction
+
+from .context import Context
+from .wallet import Wallet
+
+
+# # 🥭 TransactionBatcher class
+#
+# Packs a list of instructions into as few transactions as possible, keeping the instructions
+# in order and never splitting one across transactions.
+#
+# The size of each candidate transaction is estimated by compiling its message with a dummy
+# blockhash (all blockhashes are 32 bytes) and adding 64 bytes for each required signature,
+# plus the length prefix for the signature list. A transaction is closed as soon as adding
+# the next instruction would take it over `PACKET_DATA_SIZE` (1232 bytes).
+#
+# `send()` sends each transaction in turn and logs how long each batch took to send.
+#
+
+_DUMMY_BLOCKHASH: Blockhash = Blockhash(str(PublicKey(bytes(32))))
+
+
+class TransactionBatcher:
+    def __init__(self, context: Context, wallet: Wallet, maximum_size: int = PACKET_DATA_SIZE):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.context: Context = context
+        self.wallet: Wallet = wallet
+        self.maximum_size: int = maximum_size
+
+    def estimate_size(self, instructions: typing.Sequence[TransactionInstruction]) -> int:
+        transaction = Transaction(recent_blockhash=_DUMMY_BLOCKHASH, fee_payer=self.wallet.address)
+        transaction.add(*instructions)
+        message = transaction.compile_message()
+        signature_count = message.header.num_required_signatures
+        # The signature count is encoded as a 'shortvec' - 1 byte for fewer than 128 signatures.
+        signature_count_length = 1 if signature_count < 128 else 2
+        return signature_count_length + (signature_count * 64) + len(message.serialize())
+
+    def pack(self, instructions: typing.Sequence[TransactionInstruction]) -> typing.List[Transaction]:
+        transactions: typing.List[Transaction] = []
+        current: typing.List[TransactionInstruction] = []
+        for instruction in instructions:
+            if self.estimate_size(current + [instruction]) <= self.maximum_size:
+                current += [instruction]
+                continue
+
+            if len(current) == 0:
+                raise Exception(f"Instruction {instruction} is too large to fit in a transaction.")
+
+            transactions += [self._to_transaction(current)]
+            current = [instruction]
+            if self.estimate_size(current) > self.maximum_size:
+                raise Exception(f"Instruction {instruction} is too large to fit in a transaction.")
+
+        if len(current) > 0:
+            transactions += [self._to_transaction(current)]
+
+        return transactions
+
+    def send(self, instructions: typing.Sequence[TransactionInstruction], signers: typing.Sequence[Account] = []) -> typing.List[str]:
+        transactions = self.pack(instructions)
+        all_signers: typing.List[Account] = [self.wallet.account, *signers]
+        transaction_ids: typing.List[str] = []
+        for index, transaction in enumerate(transactions):
+            # Only pass the signers this transaction actually needs, or signing will fail.
+            signer_keys = set([str(meta.pubkey) for instruction in transaction.instructions for meta in instruction.keys if meta.is_signer])
+            transaction_signers = [all_signers[0]] + [signer for signer in all_signers[1:]
+                                                      if str(signer.public_key()) in signer_keys]
+            start_time = time.time()
+            transaction_id = self.context.client.send_transaction(
+                transaction, *transaction_signers, opts=self.context.transaction_options)
+            time_taken = time.time() - start_time
+            self.logger.info(
+                f"Sent batch {index + 1} of {len(transactions)} ({len(transaction.instructions)} instructions) as {transaction_id}. Time taken: {time_taken:.2f} seconds.")
+            transaction_ids += [transaction_id]
+
+        return transaction_ids
+
+    def _to_transaction(self, instructions: typing.Sequence[TransactionInstruction]) -> Transaction:
+        transaction = Transaction()
+        transaction.add(*instructions)
+        return transaction
+
+    def __str__(self) -> str:
+        return f"« TransactionBatcher for {self.wallet.address}, maximum size {self.maximum_size} bytes »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
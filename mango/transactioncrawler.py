@@ -0,0 +1,119 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import collections
+import concurrent.futures
+import logging
+import typing
+
+from solana.publickey import PublicKey
+
+from .context import Context
+from .transactionscout import TransactionScout
+
+
+# # 🥭 TransactionCrawler class
+#
+# Crawls backwards through the transaction history of an address (by default the group),
+# loading each transaction as a `TransactionScout`.
+#
+# Signatures are paged with `getConfirmedSignaturesForAddress2`. Transactions are then
+# loaded in batches of `batch_size`, each batch being a single JSON-RPC batch request of
+# `getConfirmedTransaction` calls, with up to `max_in_flight` batches being loaded
+# concurrently. Everything is lazy, so while batches are being loaded the next page of
+# signatures is being fetched.
+#
+# Transactions always come out in the same order as their signatures went in, no matter
+# what order the batches complete in. `load_responses()` gives the raw `getConfirmedTransaction`
+# results (paired with their signatures) for callers that want to keep them, and
+# `load_transactions()` decodes them into `TransactionScout`s.
+#
+# Resuming:
+# * Pass `until` to stop at a signature that's already been processed (for instance the
+#   most recent signature from the previous run) - it and anything older is skipped.
+# * Pass `before` to carry on a backfill from where it stopped. `last_signature` is the
+#   signature of the most recent transaction to come out of `load_transactions()` so it can
+#   be saved and used as `before` next time.
+#
+
+class TransactionCrawler:
+    def __init__(self, context: Context, address: typing.Optional[PublicKey] = None, page_size: int = 1000, batch_size: int = 50, max_in_flight: int = 4):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.context: Context = context
+        self.address: PublicKey = address or context.group_id
+        self.page_size: int = page_size
+        self.batch_size: int = batch_size
+        self.max_in_flight: int = max_in_flight
+        self.last_signature: typing.Optional[str] = None
+
+    def fetch_signatures(self, before: typing.Optional[str] = None, until: typing.Optional[str] = None) -> typing.Iterator[str]:
+        while True:
+            signatures = self.context.client.get_confirmed_signatures_for_address2(
+                self.address, before=before, limit=self.page_size, until=until)
+            for signature in signatures:
+                if signature == until:
+                    # Some nodes ignore `until`, so double-check it here.
+                    return
+                yield signature
+
+            if len(signatures) < self.page_size:
+                return
+            before = signatures[-1]
+
+    def load_responses(self, signatures: typing.Iterable[str]) -> typing.Iterator[typing.Tuple[str, typing.Optional[typing.Dict]]]:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="TransactionCrawler") as executor:
+            in_flight: typing.Deque[typing.Tuple[typing.List[str], concurrent.futures.Future]] = collections.deque()
+            for batch in self._batches(signatures):
+                in_flight.append((batch, executor.submit(self._fetch_batch, batch)))
+                if len(in_flight) >= self.max_in_flight:
+                    yield from self._complete_oldest(in_flight)
+
+            while len(in_flight) > 0:
+                yield from self._complete_oldest(in_flight)
+
+    def load_transactions(self, signatures: typing.Iterable[str]) -> typing.Iterator[TransactionScout]:
+        for _, response in self.load_responses(signatures):
+            if response is not None:
+                yield TransactionScout.from_transaction_response(self.context, response)
+
+    def crawl(self, before: typing.Optional[str] = None, until: typing.Optional[str] = None) -> typing.Iterator[TransactionScout]:
+        return self.load_transactions(self.fetch_signatures(before, until))
+
+    def _complete_oldest(self, in_flight: typing.Deque[typing.Tuple[typing.List[str], concurrent.futures.Future]]) -> typing.Iterator[typing.Tuple[str, typing.Optional[typing.Dict]]]:
+        batch, future = in_flight.popleft()
+        for signature, response in zip(batch, future.result()):
+            self.last_signature = signature
+            yield signature, response
+
+    def _batches(self, signatures: typing.Iterable[str]) -> typing.Iterator[typing.List[str]]:
+        batch: typing.List[str] = []
+        for signature in signatures:
+            batch += [signature]
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+
+        if len(batch) > 0:
+            yield batch
+
+    def _fetch_batch(self, signatures: typing.List[str]) -> typing.Sequence[typing.Optional[typing.Dict]]:
+        return self.context.client.get_confirmed_transactions(signatures)
+
+    def __str__(self) -> str:
+        return f"« TransactionCrawler for {self.address} [page size: {self.page_size}, batch size: {self.batch_size}, max in flight: {self.max_in_flight}] »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
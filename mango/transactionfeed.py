@@ -0,0 +1,114 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import collections
+import concurrent.futures
+import logging
+import threading
+import time
+import typing
+
+from solana.publickey import PublicKey
+
+from .context import Context
+from .observables import EventSource
+from .transactionscout import TransactionScout
+from .transactionstore import TransactionStore
+from .websocketsubscription import WebSocketLogsSubscription
+
+
+# # 🥭 TransactionFeed class
+#
+# A live feed of `TransactionScout`s for every transaction that mentions an address (by
+# default the group).
+#
+# It uses a `WebSocketLogsSubscription` to hear about each new transaction as soon as it's
+# confirmed, then loads and decodes the full transaction on a small thread pool and
+# publishes it on `publisher`. A transaction can take a moment to become available from
+# `getConfirmedTransaction` after its logs are seen, so loading is retried using the
+# context's `retry_pauses`.
+#
+# The websocket resends its subscription when it reconnects, which can lead to the same
+# transaction being notified twice, so the most recent `remember` signatures are tracked
+# and duplicates ignored.
+#
+# If a `TransactionStore` is given, each transaction is also added to it. Then the next
+# `TransactionStore.sync()` won't report it again.
+#
+
+class TransactionFeed:
+    def __init__(self, context: Context, address: typing.Optional[PublicKey] = None, store: typing.Optional[TransactionStore] = None, max_in_flight: int = 4, remember: int = 1000):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.context: Context = context
+        self.address: PublicKey = address or context.group_id
+        self.store: typing.Optional[TransactionStore] = store
+        self.publisher: EventSource[TransactionScout] = EventSource[TransactionScout]()
+        self.subscription: WebSocketLogsSubscription = WebSocketLogsSubscription(context, self.address)
+        self.subscription.publisher.subscribe(on_next=self._on_logs)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="TransactionFeed")
+        self._seen: typing.Deque[str] = collections.deque(maxlen=remember)
+        self._seen_set: typing.Set[str] = set()
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        self.subscription.open()
+
+    def close(self) -> None:
+        self.subscription.close()
+        self._executor.shutdown(wait=True)
+        self.publisher.on_completed()
+        self.publisher.dispose()
+
+    def _on_logs(self, logs: typing.Dict) -> None:
+        signature = logs["signature"]
+        with self._lock:
+            if signature in self._seen_set:
+                return
+            if len(self._seen) == self._seen.maxlen:
+                self._seen_set.discard(self._seen[0])
+            self._seen.append(signature)
+            self._seen_set.add(signature)
+
+        self._executor.submit(self._load_and_publish, signature)
+
+    def _load_and_publish(self, signature: str) -> None:
+        try:
+            response = self._load(signature)
+            if response is None:
+                self.logger.warning(f"Transaction {signature} could not be loaded - skipping it.")
+                return
+
+            transaction_scout = TransactionScout.from_transaction_response(self.context, response)
+            if self.store is not None:
+                self.store.add(signature, response, transaction_scout)
+            self.publisher.publish(transaction_scout)
+        except Exception as exception:
+            self.logger.warning(f"Failed to process transaction {signature}: {exception}")
+
+    def _load(self, signature: str) -> typing.Optional[typing.Dict]:
+        response = self.context.client.get_confirmed_transaction(signature)
+        for pause in self.context.retry_pauses:
+            if response is not None:
+                break
+            time.sleep(float(pause))
+            response = self.context.client.get_confirmed_transaction(signature)
+        return response
+
+    def __str__(self) -> str:
+        return f"« TransactionFeed for {self.address} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
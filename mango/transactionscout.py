@@ -15,7 +15,9 @@
 
 
 import base58
+import construct
 import datetime
+import threading
 import typing
 
 from decimal import Decimal
@@ -125,6 +127,83 @@ _token_out_indices: typing.Dict[InstructionType, int] = {
 }
 
 
+# # 🥭 InstructionDecoderRegistry class
+#
+# Decoding instructions is the bulk of the work in loading a `TransactionScout`, so this
+# registry keeps everything that can be shared between instructions and transactions:
+# * A compiled `construct` parser for each instruction variant, keyed by variant. Compiled
+#   parsers are generated Python code rather than an interpreted tree of `construct` objects
+#   and parse in roughly half the time. (If a parser can't be compiled, the regular one is
+#   used.)
+# * The variant is read straight from the first 4 (little-endian) bytes, rather than through
+#   a separate `MANGO_INSTRUCTION_VARIANT_FINDER` parse.
+# * A cache of `PublicKey`s by their base58 string, since the same few accounts (the program,
+#   the group, the vaults, the sysvars...) appear in almost every Mango transaction.
+#
+# `decode()` decodes a single instruction's data and `decode_many()` decodes a batch at once.
+#
+# `InstructionDecoderRegistry.default()` returns a shared registry, which is what
+# `MangoInstruction.from_response()` and `TransactionScout.from_transaction_response()` use.
+#
+
+class InstructionDecoderRegistry:
+    _default: typing.Optional["InstructionDecoderRegistry"] = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, parsers_by_variant: typing.Mapping[int, construct.Construct] = layouts.InstructionParsersByVariant, maximum_cached_keys: int = 10000):
+        self.parsers_by_variant: typing.Dict[int, construct.Construct] = {}
+        for variant, parser in parsers_by_variant.items():
+            try:
+                self.parsers_by_variant[variant] = parser.compile()
+            except Exception:
+                self.parsers_by_variant[variant] = parser
+        self.maximum_cached_keys: int = maximum_cached_keys
+        self._public_keys: typing.Dict[str, PublicKey] = {}
+
+    @staticmethod
+    def default() -> "InstructionDecoderRegistry":
+        with InstructionDecoderRegistry._default_lock:
+            if InstructionDecoderRegistry._default is None:
+                InstructionDecoderRegistry._default = InstructionDecoderRegistry()
+            return InstructionDecoderRegistry._default
+
+    def public_key(self, encoded: str) -> PublicKey:
+        public_key = self._public_keys.get(encoded)
+        if public_key is None:
+            public_key = PublicKey(encoded)
+            if len(self._public_keys) >= self.maximum_cached_keys:
+                self._public_keys.clear()
+            self._public_keys[encoded] = public_key
+        return public_key
+
+    def public_keys(self, encoded: typing.Sequence[str]) -> typing.List[PublicKey]:
+        return [self.public_key(key) for key in encoded]
+
+    def decode(self, data: bytes) -> typing.Tuple[InstructionType, typing.Any]:
+        variant = int.from_bytes(data[0:4], "little")
+        parser = self.parsers_by_variant.get(variant)
+        if parser is None:
+            raise Exception(f"Could not find instruction parser for variant {variant}.")
+
+        return InstructionType(variant), parser.parse(data)
+
+    def decode_many(self, data: typing.Sequence[bytes]) -> typing.List[typing.Tuple[InstructionType, typing.Any]]:
+        parsers = self.parsers_by_variant
+        results: typing.List[typing.Tuple[InstructionType, typing.Any]] = []
+        for instruction_data in data:
+            variant = int.from_bytes(instruction_data[0:4], "little")
+            if variant not in parsers:
+                raise Exception(f"Could not find instruction parser for variant {variant}.")
+            results += [(InstructionType(variant), parsers[variant].parse(instruction_data))]
+        return results
+
+    def __str__(self) -> str:
+        return f"« InstructionDecoderRegistry with {len(self.parsers_by_variant)} parsers, {len(self._public_keys)} cached keys »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
 # # 🥭 MangoInstruction class
 #
 # This class packages up Mango instruction data, which can come from disparate parts of the
@@ -212,7 +291,7 @@ class MangoInstruction:
         return None
 
     @staticmethod
-    def from_response(context: Context, all_accounts: typing.Sequence[PublicKey], instruction_data: typing.Dict) -> typing.Optional["MangoInstruction"]:
+    def from_response(context: Context, all_accounts: typing.Sequence[PublicKey], instruction_data: typing.Dict, decoder: typing.Optional[InstructionDecoderRegistry] = None) -> typing.Optional["MangoInstruction"]:
         program_account_index = instruction_data["programIdIndex"]
         if all_accounts[program_account_index] != context.program_id:
             # It's an instruction, it's just not a Mango one.
@@ -222,10 +301,7 @@ class MangoInstruction:
         instructions_account_indices = instruction_data["accounts"]
 
         decoded = base58.b58decode(data)
-        initial = layouts.MANGO_INSTRUCTION_VARIANT_FINDER.parse(decoded)
-        parser = layouts.InstructionParsersByVariant[initial.variant]
-        if parser is None:
-            raise Exception(f"Could not find instruction parser for variant {initial.variant}.")
+        instruction_type, parsed = (decoder or InstructionDecoderRegistry.default()).decode(decoded)
 
         # A whole bunch of accounts are listed for a transaction. Some (or all) of them apply
         # to this instruction. The instruction data gives the index of each account it uses,
@@ -233,12 +309,7 @@ class MangoInstruction:
         # instruction data could say [3, 2, 14], meaning the first account it uses is index 3
         # in the whole transaction account list, the second is index 2 in the whole transaction
         # account list, the third is index 14 in the whole transaction account list.
-        accounts: typing.List[PublicKey] = []
-        for index in instructions_account_indices:
-            accounts += [all_accounts[index]]
-
-        parsed = parser.parse(decoded)
-        instruction_type = InstructionType(int(parsed.variant))
+        accounts: typing.List[PublicKey] = [all_accounts[index] for index in instructions_account_indices]
 
         return MangoInstruction(instruction_type, parsed, accounts)
 
@@ -318,9 +389,11 @@ class TransactionScout:
         return tx
 
     @staticmethod
-    def from_transaction_response(context: Context, response: typing.Dict) -> "TransactionScout":
+    def from_transaction_response(context: Context, response: typing.Dict, decoder: typing.Optional[InstructionDecoderRegistry] = None) -> "TransactionScout":
+        registry: InstructionDecoderRegistry = decoder or InstructionDecoderRegistry.default()
+
         def balance_to_token_value(accounts: typing.Sequence[PublicKey], balance: typing.Dict) -> OwnedTokenValue:
-            mint = PublicKey(balance["mint"])
+            mint = registry.public_key(balance["mint"])
             account = accounts[balance["accountIndex"]]
             amount = Decimal(balance["uiTokenAmount"]["amount"])
             decimals = Decimal(balance["uiTokenAmount"]["decimals"])
@@ -331,10 +404,10 @@ class TransactionScout:
 
         try:
             succeeded = True if response["meta"]["err"] is None else False
-            accounts = list(map(PublicKey, response["transaction"]["message"]["accountKeys"]))
+            accounts = registry.public_keys(response["transaction"]["message"]["accountKeys"])
             instructions: typing.List[MangoInstruction] = []
             for instruction_data in response["transaction"]["message"]["instructions"]:
-                instruction = MangoInstruction.from_response(context, accounts, instruction_data)
+                instruction = MangoInstruction.from_response(context, accounts, instruction_data, registry)
                 if instruction is not None:
                     instructions += [instruction]
 
@@ -405,12 +478,12 @@ class TransactionScout:
 
 # # 🥭 fetch_all_recent_transaction_signatures function
 #
-def fetch_all_recent_transaction_signatures(context: Context) -> typing.Sequence[str]:
+def fetch_all_recent_transaction_signatures(context: Context, until: typing.Optional[str] = None) -> typing.Sequence[str]:
     all_fetched = False
     before = None
     signature_results: typing.List[str] = []
     while not all_fetched:
-        signatures = context.client.get_confirmed_signatures_for_address2(context.group_id, before=before)
+        signatures = context.client.get_confirmed_signatures_for_address2(context.group_id, before=before, until=until)
         signature_results += signatures
         if (len(signatures) == 0):
             all_fetched = True
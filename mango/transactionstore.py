@@ -0,0 +1,326 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import datetime
+import json
+import logging
+import pandas as pd
+import sqlite3
+import threading
+import typing
+
+from solana.publickey import PublicKey
+
+from .context import Context
+from .instructiontype import InstructionType
+from .transactioncrawler import TransactionCrawler
+from .transactionscout import TransactionScout
+
+
+# # 🥭 TransactionStore class
+#
+# An append-only local SQLite store of decoded Mango transactions, so that reports and
+# notebooks don't need to download and decode the same transactions over and over again.
+#
+# There are two tables:
+# * `transactions` has one row per transaction, with the decoded fields (signature, slot,
+#   timestamp, success, group, sender and instruction names) plus the raw
+#   `getConfirmedTransaction` response so a full `TransactionScout` can be rebuilt locally
+#   with `load()`.
+# * `instructions` has one row per `MangoInstruction` in each transaction, with its type,
+#   sender, group, target, token accounts and parameters.
+#
+# Both are indexed on the columns most likely to be queried - signature, slot, sender,
+# instruction type and group.
+#
+# `sync()` brings the store up to date using a `TransactionCrawler`. It only fetches
+# transactions newer than the last one synced for the crawler's address (tracked in the
+# `sync_state` table), so it replaces keeping the last signature in a separate state file.
+# It commits as it goes and records how far it has got in the `sync_progress` table, so a
+# long backfill that fails partway resumes from where it stopped.
+# It yields transactions newest first - `load_oldest_first()` puts them back in the order they
+# happened.
+#
+# `transactions_frame()` and `instructions_frame()` return pandas `DataFrame`s for use in
+# notebooks.
+#
+# Transactions are never updated or deleted - adding a signature that's already stored is
+# ignored (and `add()` returns False).
+#
+
+class TransactionStore:
+    def __init__(self, context: Context, filename: str = ":memory:"):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.context: Context = context
+        self.filename: str = filename
+        self.connection: sqlite3.Connection = sqlite3.connect(filename, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._create_schema()
+
+    def _create_schema(self) -> None:
+        with self._lock, self.connection:
+            self.connection.executescript("""
+CREATE TABLE IF NOT EXISTS transactions (
+    signature TEXT PRIMARY KEY,
+    slot INTEGER,
+    block_time INTEGER,
+    timestamp TEXT,
+    succeeded INTEGER,
+    group_name TEXT,
+    group_address TEXT,
+    sender TEXT,
+    instruction_types TEXT,
+    response TEXT
+);
+CREATE INDEX IF NOT EXISTS transactions_slot ON transactions (slot);
+CREATE INDEX IF NOT EXISTS transactions_sender ON transactions (sender);
+CREATE INDEX IF NOT EXISTS transactions_group ON transactions (group_address);
+
+CREATE TABLE IF NOT EXISTS instructions (
+    signature TEXT,
+    position INTEGER,
+    instruction_type TEXT,
+    sender TEXT,
+    group_address TEXT,
+    target TEXT,
+    token_in_account TEXT,
+    token_out_account TEXT,
+    parameters TEXT,
+    PRIMARY KEY (signature, position)
+);
+CREATE INDEX IF NOT EXISTS instructions_type ON instructions (instruction_type);
+CREATE INDEX IF NOT EXISTS instructions_sender ON instructions (sender);
+CREATE INDEX IF NOT EXISTS instructions_group ON instructions (group_address);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    address TEXT PRIMARY KEY,
+    newest_signature TEXT
+);
+
+CREATE TABLE IF NOT EXISTS sync_progress (
+    address TEXT PRIMARY KEY,
+    newest_signature TEXT,
+    before_signature TEXT
+);
+""")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.connection.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+
+    def __contains__(self, signature: str) -> bool:
+        with self._lock:
+            row = self.connection.execute("SELECT 1 FROM transactions WHERE signature = ?", (signature,)).fetchone()
+            return row is not None
+
+    def newest_signature(self, address: PublicKey) -> typing.Optional[str]:
+        with self._lock:
+            row = self.connection.execute("SELECT newest_signature FROM sync_state WHERE address = ?",
+                                          (str(address),)).fetchone()
+            return None if row is None else row[0]
+
+    def add(self, signature: str, response: typing.Dict, transaction_scout: TransactionScout) -> bool:
+        with self._lock, self.connection:
+            return self._insert(signature, response, transaction_scout)
+
+    def _insert(self, signature: str, response: typing.Dict, transaction_scout: TransactionScout) -> bool:
+        cursor = self.connection.execute(
+            "INSERT OR IGNORE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (signature,
+             response.get("slot"),
+             response.get("blockTime"),
+             transaction_scout.timestamp.isoformat(),
+             int(transaction_scout.succeeded),
+             transaction_scout.group_name,
+             str(transaction_scout.group),
+             str(transaction_scout.sender),
+             ",".join([ins.instruction_type.name for ins in transaction_scout.instructions]),
+             json.dumps(response)))
+        if cursor.rowcount == 0:
+            # Already stored.
+            return False
+
+        def optional_key(key: typing.Optional[PublicKey]) -> typing.Optional[str]:
+            return None if key is None else str(key)
+
+        self.connection.executemany(
+            "INSERT OR IGNORE INTO instructions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(signature,
+              position,
+              ins.instruction_type.name,
+              str(ins.sender),
+              str(ins.group),
+              optional_key(ins.describe_target()),
+              optional_key(ins.token_in_account),
+              optional_key(ins.token_out_account),
+              ins.describe_parameters()) for position, ins in enumerate(transaction_scout.instructions)])
+        return True
+
+    def load(self, signature: str) -> typing.Optional[TransactionScout]:
+        with self._lock:
+            row = self.connection.execute("SELECT response FROM transactions WHERE signature = ?",
+                                          (signature,)).fetchone()
+        if row is None:
+            return None
+        return TransactionScout.from_transaction_response(self.context, json.loads(row[0]))
+
+    # Rebuilds the stored transactions with the given signatures, oldest (lowest slot) first.
+    # Signatures that aren't stored are skipped. Only the slots and signatures are held in
+    # memory - each transaction is rebuilt as it's needed.
+    #
+    # Signatures are often in `sync()`'s newest-first order, so they're reversed before being
+    # sorted. That keeps transactions in the same slot oldest first too.
+    def load_oldest_first(self, signatures: typing.Sequence[str]) -> typing.Iterator[TransactionScout]:
+        slots: typing.List[typing.Tuple[int, str]] = []
+        with self._lock:
+            for signature in reversed(signatures):
+                row = self.connection.execute("SELECT slot FROM transactions WHERE signature = ?",
+                                              (signature,)).fetchone()
+                if row is not None:
+                    slots += [(row[0] or 0, signature)]
+
+        for _, signature in sorted(slots, key=lambda entry: entry[0]):
+            transaction_scout = self.load(signature)
+            if transaction_scout is not None:
+                yield transaction_scout
+
+    # Fetches and stores all transactions for the crawler's address that are newer than the
+    # last sync, yielding each newly-stored transaction, newest first, once it's committed.
+    #
+    # Nothing is held in memory beyond the crawler's in-flight batches - signatures are
+    # streamed from the crawler and rows are committed every `commit_size` signatures, along
+    # with the sync's progress. If a sync stops partway (an exception, or the caller stops
+    # iterating) the next `sync()` carries on from the last commit before fetching anything
+    # newer.
+    def sync(self, crawler: TransactionCrawler, commit_size: int = 100) -> typing.Iterator[TransactionScout]:
+        address = str(crawler.address)
+        newest_stored = self.newest_signature(crawler.address)
+        progress = self._sync_progress(address)
+        if progress is not None:
+            run_newest, before = progress
+            self.logger.info(f"Resuming sync for {crawler.address} from before {before}.")
+            yield from self._sync_range(crawler, run_newest, before, newest_stored, commit_size)
+            newest_stored = run_newest
+
+        yield from self._sync_range(crawler, None, None, newest_stored, commit_size)
+
+    def _sync_progress(self, address: str) -> typing.Optional[typing.Tuple[str, str]]:
+        with self._lock:
+            row = self.connection.execute("SELECT newest_signature, before_signature FROM sync_progress WHERE address = ?",
+                                          (address,)).fetchone()
+            return None if row is None else (row[0], row[1])
+
+    def _sync_range(self, crawler: TransactionCrawler, run_newest: typing.Optional[str], before: typing.Optional[str], until: typing.Optional[str], commit_size: int) -> typing.Iterator[TransactionScout]:
+        address = str(crawler.address)
+        pending: typing.List[typing.Tuple[str, typing.Dict, TransactionScout]] = []
+        uncommitted: int = 0
+        synced: int = 0
+        for signature, response in crawler.load_responses(crawler.fetch_signatures(before=before, until=until)):
+            if run_newest is None:
+                run_newest = signature
+            before = signature
+            uncommitted += 1
+            if response is not None:
+                try:
+                    pending += [(signature, response, TransactionScout.from_transaction_response(self.context, response))]
+                except Exception as exception:
+                    self.logger.warning(f"Skipping transaction {signature} - could not decode it: {exception}")
+
+            if uncommitted >= commit_size:
+                yield from self._commit(address, pending, run_newest, before)
+                synced += uncommitted
+                pending = []
+                uncommitted = 0
+
+        if run_newest is None:
+            self.logger.info(f"No new transactions for {crawler.address} since {until}.")
+            return
+
+        yield from self._commit(address, pending, run_newest, None)
+        synced += uncommitted
+        self.logger.info(f"Synced {synced} new transactions for {crawler.address}.")
+
+    # Stores the transactions and records how far the sync has got in the same database
+    # transaction. A `before` of None means the sync is complete, so `run_newest` becomes
+    # the newest stored signature.
+    def _commit(self, address: str, pending: typing.Sequence[typing.Tuple[str, typing.Dict, TransactionScout]], run_newest: str, before: typing.Optional[str]) -> typing.Sequence[TransactionScout]:
+        with self._lock, self.connection:
+            # Transactions already in the store (perhaps added by a `TransactionFeed`) have
+            # already been seen, so they're not returned again.
+            inserted = [transaction_scout for signature, response, transaction_scout in pending
+                        if self._insert(signature, response, transaction_scout)]
+            if before is None:
+                self.connection.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (address, run_newest))
+                self.connection.execute("DELETE FROM sync_progress WHERE address = ?", (address,))
+            else:
+                self.connection.execute("INSERT OR REPLACE INTO sync_progress VALUES (?, ?, ?)",
+                                        (address, run_newest, before))
+
+        return inserted
+
+    def transactions_frame(self, sender: typing.Optional[PublicKey] = None, group_name: typing.Optional[str] = None, since: typing.Optional[datetime.datetime] = None, until: typing.Optional[datetime.datetime] = None) -> pd.DataFrame:
+        conditions, parameters = TransactionStore._build_conditions("", sender, group_name, since, until)
+        sql = f"SELECT signature, slot, timestamp, succeeded, group_name, group_address, sender, instruction_types FROM transactions{conditions} ORDER BY slot"
+        with self._lock:
+            frame = pd.read_sql_query(sql, self.connection, params=parameters, parse_dates=["timestamp"])
+        frame["succeeded"] = frame["succeeded"].astype(bool)
+        return frame
+
+    def instructions_frame(self, instruction_type: typing.Optional[InstructionType] = None, sender: typing.Optional[PublicKey] = None, group_name: typing.Optional[str] = None, since: typing.Optional[datetime.datetime] = None, until: typing.Optional[datetime.datetime] = None) -> pd.DataFrame:
+        conditions, parameters = TransactionStore._build_conditions("transactions.", sender, group_name, since, until)
+        if instruction_type is not None:
+            conditions = f"{conditions} AND instructions.instruction_type = ?" if conditions else " WHERE instructions.instruction_type = ?"
+            parameters += [instruction_type.name]
+        sql = f"""SELECT instructions.signature, transactions.slot, transactions.timestamp, transactions.succeeded,
+    instructions.position, instructions.instruction_type, instructions.sender, instructions.group_address,
+    instructions.target, instructions.token_in_account, instructions.token_out_account, instructions.parameters
+FROM instructions JOIN transactions ON instructions.signature = transactions.signature{conditions}
+ORDER BY transactions.slot, instructions.position"""
+        with self._lock:
+            frame = pd.read_sql_query(sql, self.connection, params=parameters, parse_dates=["timestamp"])
+        frame["succeeded"] = frame["succeeded"].astype(bool)
+        return frame
+
+    @staticmethod
+    def _build_conditions(prefix: str, sender: typing.Optional[PublicKey], group_name: typing.Optional[str], since: typing.Optional[datetime.datetime], until: typing.Optional[datetime.datetime]) -> typing.Tuple[str, typing.List[typing.Any]]:
+        clauses: typing.List[str] = []
+        parameters: typing.List[typing.Any] = []
+        if sender is not None:
+            clauses += [f"{prefix}sender = ?"]
+            parameters += [str(sender)]
+        if group_name is not None:
+            clauses += [f"{prefix}group_name = ?"]
+            parameters += [group_name]
+        if since is not None:
+            clauses += [f"{prefix}timestamp >= ?"]
+            parameters += [since.isoformat()]
+        if until is not None:
+            clauses += [f"{prefix}timestamp < ?"]
+            parameters += [until.isoformat()]
+
+        if len(clauses) == 0:
+            return "", parameters
+        return " WHERE " + " AND ".join(clauses), parameters
+
+    def close(self) -> None:
+        with self._lock:
+            self.connection.close()
+
+    def __str__(self) -> str:
+        return f"« TransactionStore '{self.filename}' »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
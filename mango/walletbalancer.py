@@ -15,13 +15,19 @@
 
 
 import abc
+import concurrent.futures
 import logging
+import threading
+import time
 import typing
 
+from datetime import datetime, timedelta
 from decimal import Decimal
 
 from .context import Context
 from .group import Group
+from .liquidationevent import LiquidationEvent
+from .orderplacer import Side
 from .token import Token
 from .tokenvalue import TokenValue
 from .tradeexecutor import TradeExecutor
@@ -177,6 +183,58 @@ def sort_changes_for_trades(changes: typing.List[TokenValue]) -> typing.List[Tok
     return sorted(changes, key=lambda change: change.value)
 
 
+# # 🥭 plan_trades function
+#
+# Splits balance changes into the two stages of a rebalance:
+# * SELLs, which only depend on their own base token balance and so are independent of each
+#   other and can all be executed at the same time, and
+# * BUYs, which all spend the shared quote balance and so have to wait until the SELLs have
+#   topped it up.
+#
+# Zero changes are dropped. Each stage keeps the ordering from `sort_changes_for_trades()`.
+#
+
+def plan_trades(changes: typing.List[TokenValue]) -> typing.Tuple[typing.List[TokenValue], typing.List[TokenValue]]:
+    sorted_changes = sort_changes_for_trades(changes)
+    sells = [change for change in sorted_changes if change.value < 0]
+    buys = [change for change in sorted_changes if change.value > 0]
+    return sells, buys
+
+
+# # 🥭 TradeRecord class
+#
+# Records how a single rebalancing trade went: how long it took, and the slippage between
+# the price we expected (the price used to plan the rebalance) and the best orderbook price
+# the trade executor actually traded against.
+#
+# Slippage is expressed as a fraction of the expected price, and is positive when the trade
+# went against us - a BUY at a higher price or a SELL at a lower price.
+#
+
+class TradeRecord:
+    def __init__(self, symbol: str, side: Side, quantity: Decimal, expected_price: Decimal, book_price: typing.Optional[Decimal], signatures: typing.Sequence[str], time_taken: float):
+        self.symbol: str = symbol
+        self.side: Side = side
+        self.quantity: Decimal = quantity
+        self.expected_price: Decimal = expected_price
+        self.book_price: typing.Optional[Decimal] = book_price
+        self.signatures: typing.Sequence[str] = signatures
+        self.time_taken: float = time_taken
+
+    @property
+    def slippage(self) -> typing.Optional[Decimal]:
+        if self.book_price is None or self.expected_price == 0:
+            return None
+        difference = (self.book_price - self.expected_price) / self.expected_price
+        return difference if self.side == Side.BUY else -difference
+
+    def __str__(self) -> str:
+        return f"« TradeRecord {self.side} {self.quantity:,.8f} {self.symbol} - expected {self.expected_price}, book {self.book_price}, slippage {self.slippage}, took {self.time_taken:.2f} seconds »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
 # # 🥭 calculate_required_balance_changes function
 #
 # Takes a list of current balances, and a list of desired balances, and returns the list of changes required to get us to the desired balances.
@@ -258,6 +316,11 @@ class WalletBalancer(metaclass=abc.ABCMeta):
     def balance(self, prices: typing.List[TokenValue]):
         raise NotImplementedError("WalletBalancer.balance() is not implemented on the base type.")
 
+    # Runs any balancing that has been put off until later. Most balancers never put anything
+    # off, so by default this does nothing.
+    def flush(self) -> None:
+        pass
+
 
 # # 🥭 NullWalletBalancer class
 #
@@ -275,9 +338,13 @@ class NullWalletBalancer(WalletBalancer):
 #
 # This is the high-level class that does much of the work.
 #
+# Trades are made in two stages, planned by `plan_trades()`: first all the SELLs, up to
+# `max_concurrent_trades` at a time, then (once they've all succeeded) the BUYs one by one.
+# A `TradeRecord` for each trade in the most recent balance is kept in `trade_records`.
+#
 
 class LiveWalletBalancer(WalletBalancer):
-    def __init__(self, context: Context, wallet: Wallet, group: Group, trade_executor: TradeExecutor, action_threshold: Decimal, tokens: typing.List[Token], target_balances: typing.List[TargetBalance]):
+    def __init__(self, context: Context, wallet: Wallet, group: Group, trade_executor: TradeExecutor, action_threshold: Decimal, tokens: typing.List[Token], target_balances: typing.List[TargetBalance], max_concurrent_trades: int = 4):
         self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
         self.context: Context = context
         self.wallet: Wallet = wallet
@@ -286,6 +353,8 @@ class LiveWalletBalancer(WalletBalancer):
         self.action_threshold: Decimal = action_threshold
         self.tokens: typing.List[Token] = tokens
         self.target_balances: typing.List[TargetBalance] = target_balances
+        self.max_concurrent_trades: int = max_concurrent_trades
+        self.trade_records: typing.List[TradeRecord] = []
 
     def balance(self, prices: typing.List[TokenValue]):
         padding = "\n    "
@@ -315,25 +384,173 @@ class LiveWalletBalancer(WalletBalancer):
             self.logger.info("No balance changes to make.")
             return
 
-        sorted_changes = sort_changes_for_trades(filtered_changes)
-        self._make_changes(sorted_changes)
+        self._make_changes(filtered_changes, prices)
         updated_balances = self._fetch_balances()
         self.logger.info(f"Finishing balances: {padding}{balances_report(updated_balances)}")
 
-    def _make_changes(self, balance_changes: typing.List[TokenValue]):
+    def _make_changes(self, balance_changes: typing.List[TokenValue], prices: typing.List[TokenValue]):
         self.logger.info(f"Balance changes to make: {balance_changes}")
+        sells, buys = plan_trades(balance_changes)
+        records: typing.List[TradeRecord] = []
+        self.trade_records = records
+
+        if len(sells) > 0:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, self.max_concurrent_trades), thread_name_prefix="Sell") as executor:
+                futures = [executor.submit(self._make_change, change, prices) for change in sells]
+                concurrent.futures.wait(futures)
+            # Raise the first failure (if any) before buying, since the BUYs may rely on the
+            # quote the failed SELL should have provided.
+            records += [future.result() for future in futures]
+
+        for change in buys:
+            records += [self._make_change(change, prices)]
+
+        for record in records:
+            self.logger.info(f"Trade: {record}")
+
+    def _make_change(self, change: TokenValue, prices: typing.List[TokenValue]) -> TradeRecord:
         quote = self.group.shared_quote_token.token.symbol
-        for change in balance_changes:
-            market_symbol = f"{change.token.symbol}/{quote}"
-            if change.value < 0:
-                self.trade_executor.sell(market_symbol, change.value.copy_abs())
-            else:
-                self.trade_executor.buy(market_symbol, change.value.copy_abs())
+        market_symbol = f"{change.token.symbol}/{quote}"
+        expected_price = TokenValue.find_by_token(prices, change.token).value
+        quantity = change.value.copy_abs()
+        # Clear any book price left from an earlier trade in this market, so a trade that never
+        # reaches the orderbook doesn't report it. Concurrent trades are always in different
+        # markets, so they never share an entry.
+        self.trade_executor.last_book_prices.pop(market_symbol, None)
+        started_at = time.time()
+        if change.value < 0:
+            side = Side.SELL
+            signatures = self.trade_executor.sell(market_symbol, quantity)
+        else:
+            side = Side.BUY
+            signatures = self.trade_executor.buy(market_symbol, quantity)
+        time_taken = time.time() - started_at
+        book_price = self.trade_executor.last_book_prices.get(market_symbol)
+        return TradeRecord(market_symbol, side, quantity, expected_price, book_price, signatures, time_taken)
 
     def _fetch_balances(self) -> typing.List[TokenValue]:
-        balances: typing.List[TokenValue] = []
-        for token in self.tokens:
-            balance = TokenValue.fetch_total_value(self.context, self.wallet.address, token)
-            balances += [balance]
+        return TokenValue.fetch_total_values(self.context, self.wallet.address, self.tokens)
+
 
-        return balances
+# # 🥭 CoalescingWalletBalancer class
+#
+# Wraps another `WalletBalancer` so that a burst of `balance()` calls (say, after liquidating
+# many accounts in a row during a market crash) results in as few actual rebalances as
+# possible.
+#
+# It subscribes to `LiquidationEvent`s (via `on_liquidation()`) and accumulates the balance
+# changes from successful liquidations, netted per token - if one liquidation gives us ETH
+# and the next takes it away, the two cancel out before any trade is considered.
+#
+# A `balance()` call only runs the inner balancer if:
+# * the value of the accumulated changes (at the prices passed to `balance()`) is at least
+#   `value_threshold`, or
+# * the last rebalance was at least `window` ago.
+#
+# Otherwise a single trailing rebalance is scheduled for when the window expires, using the
+# latest prices, so accumulated changes are never left unbalanced. The inner balancer
+# computes its trades from current and target balances in one go, so all the liquidations
+# in the window are netted across tokens into one set of trades (SELLs before BUYs).
+#
+# When the window expires the trailing rebalance is handed to `request_balance`. By default
+# that just calls `balance()` from the timer thread, but a `LiquidationProcessor` replaces it
+# with its own background balancing, so the trailing rebalance waits for liquidations that
+# are spending tokens.
+#
+# `flush()` runs any pending rebalance immediately.
+#
+
+class CoalescingWalletBalancer(WalletBalancer):
+    def __init__(self, inner: WalletBalancer, window: timedelta, value_threshold: Decimal):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.inner: WalletBalancer = inner
+        self.window: timedelta = window
+        self.value_threshold: Decimal = value_threshold
+        self.pending_changes: typing.Dict[str, TokenValue] = {}
+        self.last_balanced_at: datetime = datetime.min
+        self._latest_prices: typing.Optional[typing.List[TokenValue]] = None
+        self._timer: typing.Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._balance_lock = threading.Lock()
+        self.request_balance: typing.Callable[[typing.List[TokenValue]], None] = self.balance
+
+    def on_liquidation(self, event: LiquidationEvent) -> None:
+        if not event.succeeded:
+            return
+
+        with self._lock:
+            for change in event.changes:
+                key = str(change.token.mint)
+                if key in self.pending_changes:
+                    pending = self.pending_changes[key]
+                    self.pending_changes[key] = TokenValue(pending.token, pending.value + change.value)
+                else:
+                    self.pending_changes[key] = change
+
+    def pending_value(self, prices: typing.List[TokenValue]) -> Decimal:
+        with self._lock:
+            pending = list(self.pending_changes.values())
+
+        total = Decimal(0)
+        for change in pending:
+            price = TokenValue.find_by_token(prices, change.token)
+            total += (change.value * price.value).copy_abs()
+        return total
+
+    def balance(self, prices: typing.List[TokenValue]):
+        with self._lock:
+            self._latest_prices = prices
+
+        pending_value = self.pending_value(prices)
+        since_last_balance = datetime.now() - self.last_balanced_at
+        if pending_value >= self.value_threshold:
+            self.logger.info(
+                f"Pending balance changes worth {pending_value} reach threshold {self.value_threshold} - balancing now.")
+            self.flush()
+        elif since_last_balance >= self.window:
+            self.logger.info(f"Last balance was {since_last_balance} ago - balancing now.")
+            self.flush()
+        else:
+            self._schedule_trailing_balance(self.window - since_last_balance)
+
+    def flush(self) -> None:
+        with self._lock:
+            prices = self._latest_prices
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if prices is None:
+            return
+
+        with self._balance_lock:
+            with self._lock:
+                self.pending_changes = {}
+            self.inner.balance(prices)
+            self.last_balanced_at = datetime.now()
+
+    def _schedule_trailing_balance(self, delay: timedelta) -> None:
+        with self._lock:
+            if self._timer is not None:
+                return
+            self.logger.info(f"Coalescing balance changes - next balance in {delay}.")
+            self._timer = threading.Timer(delay.total_seconds(), self._run_trailing_balance)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run_trailing_balance(self) -> None:
+        with self._lock:
+            self._timer = None
+            prices = self._latest_prices
+        if prices is None:
+            return
+
+        try:
+            self.request_balance(prices)
+        except Exception as exception:
+            self.logger.error(f"Failed to run trailing balance - {exception}")
+
+    def __str__(self) -> str:
+        return f"« CoalescingWalletBalancer [{self.window}, {self.value_threshold}] wrapping {self.inner} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
@@ -0,0 +1,153 @@
+# # ⚠ Warning
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+# LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+# NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+# WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+# [🥭 Mango Markets](https://markets/) support is available at:
+#   [Docs](https://docs.markets/)
+#   [Discord](https://discord.gg/67jySBhxrg)
+#   [Twitter](https://twitter.com/mangomarkets)
+#   [Github](https://github.com/blockworks-foundation)
+#   [Email](mailto:hello@blockworks.foundation)
+
+
+import abc
+import json
+import logging
+import typing
+
+from solana.publickey import PublicKey
+
+from .accountinfo import AccountInfo
+from .context import Context
+from .observables import EventSource
+from .reconnectingwebsocket import ReconnectingWebsocket
+
+
+# # 🥭 WebSocketSubscription class
+#
+# The `WebSocketSubscription` maintains a Solana RPC websocket subscription and publishes
+# each notification it receives (after converting it with `parse()`) on its `publisher`.
+#
+# The underlying `ReconnectingWebsocket` resends the subscription request every time it
+# reconnects, so subscribers keep receiving notifications across disconnections.
+#
+
+TSubscriptionInstance = typing.TypeVar("TSubscriptionInstance")
+
+
+class WebSocketSubscription(typing.Generic[TSubscriptionInstance], metaclass=abc.ABCMeta):
+    def __init__(self, context: Context, address: PublicKey):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.context: Context = context
+        self.address: PublicKey = address
+        self.publisher: EventSource[TSubscriptionInstance] = EventSource[TSubscriptionInstance]()
+        self._ws: typing.Optional[ReconnectingWebsocket] = None
+
+    @abc.abstractmethod
+    def build_request(self) -> str:
+        raise NotImplementedError("WebSocketSubscription.build_request() is not implemented on the base type.")
+
+    @abc.abstractmethod
+    def parse(self, notification: typing.Dict) -> TSubscriptionInstance:
+        raise NotImplementedError("WebSocketSubscription.parse() is not implemented on the base type.")
+
+    @property
+    @abc.abstractmethod
+    def notification_method(self) -> str:
+        raise NotImplementedError("WebSocketSubscription.notification_method is not implemented on the base type.")
+
+    def open(self) -> None:
+        self._ws = ReconnectingWebsocket(self.context.websocket_url, self.build_request(), self._on_item)
+        self._ws.open()
+
+    def close(self) -> None:
+        if self._ws is not None:
+            self._ws.close()
+            self._ws = None
+        self.publisher.on_completed()
+        self.publisher.dispose()
+
+    def _on_item(self, response: typing.Dict) -> None:
+        if response.get("method") != self.notification_method:
+            if "error" in response:
+                self.logger.warning(f"Subscription error for {self.address}: {response['error']}")
+            return
+
+        try:
+            built = self.parse(response["params"]["result"])
+        except Exception as exception:
+            self.logger.warning(f"Failed to parse notification for {self.address}: {exception}")
+            return
+
+        self.publisher.publish(built)
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 WebSocketAccountSubscription class
+#
+# Subscribes to changes in a single account using `accountSubscribe` and publishes the
+# new state of the account, converted from its `AccountInfo` by the `constructor` function.
+#
+
+class WebSocketAccountSubscription(WebSocketSubscription[TSubscriptionInstance]):
+    def __init__(self, context: Context, address: PublicKey, constructor: typing.Callable[[AccountInfo], TSubscriptionInstance]):
+        super().__init__(context, address)
+        self.constructor: typing.Callable[[AccountInfo], TSubscriptionInstance] = constructor
+
+    @property
+    def notification_method(self) -> str:
+        return "accountNotification"
+
+    def build_request(self) -> str:
+        return json.dumps({
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "accountSubscribe",
+            "params": [str(self.address), {"encoding": "base64", "commitment": str(self.context.commitment)}]
+        })
+
+    def parse(self, notification: typing.Dict) -> TSubscriptionInstance:
+        account_info = AccountInfo._from_response_values(notification["value"], self.address)
+        return self.constructor(account_info)
+
+    def __str__(self) -> str:
+        return f"« WebSocketAccountSubscription for {self.address} »"
+
+
+# # 🥭 WebSocketLogsSubscription class
+#
+# Subscribes to the logs of every transaction that mentions an address (for instance the
+# group, or the Mango program) using `logsSubscribe`, and publishes the notification's value
+# - a dictionary with the transaction's `signature`, `err` and `logs`.
+#
+# Notifications arrive as soon as the transaction reaches the context's commitment level,
+# which makes this a quick way to find out about new transactions without polling.
+#
+
+class WebSocketLogsSubscription(WebSocketSubscription[typing.Dict]):
+    def __init__(self, context: Context, address: PublicKey):
+        super().__init__(context, address)
+
+    @property
+    def notification_method(self) -> str:
+        return "logsNotification"
+
+    def build_request(self) -> str:
+        return json.dumps({
+            "jsonrpc": "2.0",
+            "id": 1,
+            "method": "logsSubscribe",
+            "params": [{"mentions": [str(self.address)]}, {"commitment": str(self.context.commitment)}]
+        })
+
+    def parse(self, notification: typing.Dict) -> typing.Dict:
+        return notification["value"]
+
+    def __str__(self) -> str:
+        return f"« WebSocketLogsSubscription for {self.address} »"
@@ -1,4 +1,6 @@
+import base58
 import datetime
+import typing
 
 from decimal import Decimal
 from typing import NamedTuple
@@ -72,3 +74,33 @@ def fake_wallet() -> mango.Wallet:
     wallet = mango.Wallet([1] * 64)
     wallet.account = Account()
     return wallet
+
+
+def fake_deposit_transaction_response(context: mango.Context, signature: str, slot: int, quantity: int) -> typing.Dict:
+    group = fake_seeded_public_key("group")
+    margin_account = fake_seeded_public_key("margin account")
+    owner = fake_seeded_public_key("owner")
+    token_account = fake_seeded_public_key("token account")
+    vault = fake_seeded_public_key("vault")
+    data = mango.layouts.DEPOSIT.build({"quantity": quantity})
+    return {
+        "slot": slot,
+        "blockTime": 1620000000 + slot,
+        "meta": {
+            "err": None,
+            "logMessages": ["Program log: deposit"],
+            "preTokenBalances": [],
+            "postTokenBalances": []
+        },
+        "transaction": {
+            "signatures": [signature],
+            "message": {
+                "accountKeys": [str(group), str(margin_account), str(owner), str(token_account), str(vault), str(context.program_id)],
+                "instructions": [{
+                    "programIdIndex": 5,
+                    "accounts": [0, 1, 2, 3, 4],
+                    "data": base58.b58encode(data).decode("ascii")
+                }]
+            }
+        }
+    }
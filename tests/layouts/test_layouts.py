@@ -2,6 +2,7 @@ from decimal import Decimal
 from solana.publickey import PublicKey
 
 import base64
+import datetime
 
 import mango.layouts as layouts
 
@@ -56,3 +57,43 @@ def test_5_group_layout():
     assert group.total_deposits[2] == Decimal("2694842671710.10896760628261797877389")
     assert group.total_deposits[3] == Decimal("1120935950.72574680115181388001879825")
     assert group.total_deposits[4] == Decimal("16878577760340.8089556008013804037004")
+
+
+def test_index_layout_round_trip():
+    last_update = datetime.datetime(2021, 6, 1, 12, 30, 0)
+    data = layouts.INDEX.build({"last_update": last_update, "borrow": Decimal("1.5"), "deposit": Decimal("1.25")})
+    assert len(data) == layouts.INDEX.sizeof()
+
+    index = layouts.INDEX.parse(data)
+    assert index.last_update == last_update
+    assert index.borrow == Decimal("1.5")
+    assert index.deposit == Decimal("1.25")
+
+
+def test_margin_account_v2_layout_round_trip():
+    group = PublicKey("2oogpTYm1sp6LPZAWD3bp2wsFpnV2kXL1s52yyFhW5vp")
+    owner = PublicKey("9n4nbM75f5Ui33ZbPYXn59EwSgE8CGsHtAeTH5YFeJ9E")
+    open_orders = PublicKey("A8YFbxQYFVqKZaoYJLLUVcQiWP7G2MeEgW5wsAQgMvFw")
+    data = layouts.MARGIN_ACCOUNT_V2.build({
+        "account_flags": {"initialized": True, "group": False, "margin_account": True, "srm_account": False},
+        "mango_group": group,
+        "owner": owner,
+        "deposits": [Decimal(1), Decimal(0), Decimal("2.5"), Decimal(0), Decimal(1000)],
+        "borrows": [Decimal(0), Decimal("0.125"), Decimal(0), Decimal(0), Decimal(0)],
+        "open_orders": [open_orders, None, None, None],
+        "being_liquidated": 0,
+        "has_borrows": 1,
+        "info": ""
+    })
+    assert len(data) == layouts.MARGIN_ACCOUNT_V2.sizeof()
+
+    margin_account = layouts.MARGIN_ACCOUNT_V2.parse(data)
+    assert margin_account.account_flags.margin_account
+    assert margin_account.mango_group == group
+    assert margin_account.owner == owner
+    assert margin_account.deposits[2] == Decimal("2.5")
+    assert margin_account.deposits[4] == Decimal(1000)
+    assert margin_account.borrows[1] == Decimal("0.125")
+    assert margin_account.open_orders[0] == open_orders
+    assert margin_account.open_orders[1] is None
+    assert margin_account.has_borrows == 1
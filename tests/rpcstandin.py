@@ -0,0 +1,648 @@
+from .context import mango
+from .fakes import fake_seeded_public_key
+
+import base58
+import base64
+import collections
+import datetime
+import hashlib
+import http.server
+import json
+import logging
+import random
+import socket
+import struct
+import threading
+import time
+import typing
+
+from decimal import Decimal
+from solana.publickey import PublicKey
+from solana.utils import shortvec_encoding
+
+#
+# A local stand-in for a Solana JSON-RPC server, so code that talks to an RPC node (like
+# `MarginAccount.load_ripe()` or the `LiquidationProcessor`) can be exercised and timed
+# without hammering a public RPC node.
+#
+# The server serves accounts from an `AccountSnapshot` - either recorded from a real node
+# with `AccountSnapshot.record()` or built from fakes with `fake_group_snapshot()`. It can
+# add latency to every request, and rate-limit requests with the same 429 (too many
+# requests) and 413 (too much bandwidth) responses real nodes use.
+#
+
+
+# # 🥭 AccountSnapshot class
+#
+# A collection of accounts, keyed by address, stored in the same form as the `value` of an
+# RPC `getAccountInfo` response. Snapshots can be saved to and loaded from JSON files.
+#
+
+class AccountSnapshot:
+    def __init__(self, slot: int = 1, accounts: typing.Optional[typing.Dict[str, typing.Dict]] = None):
+        self.slot: int = slot
+        self.accounts: typing.Dict[str, typing.Dict] = accounts or {}
+
+    def add(self, address: PublicKey, owner: PublicKey, data: bytes, lamports: int = 1000000, executable: bool = False) -> None:
+        self.accounts[str(address)] = {
+            "data": [base64.b64encode(data).decode("ascii"), "base64"],
+            "executable": executable,
+            "lamports": lamports,
+            "owner": str(owner),
+            "rentEpoch": 0
+        }
+
+    def add_account_info(self, account_info: mango.AccountInfo) -> None:
+        self.add(account_info.address, account_info.owner, account_info.data,
+                 int(account_info.lamports), account_info.executable)
+
+    def get(self, address: str) -> typing.Optional[typing.Dict]:
+        return self.accounts.get(address)
+
+    def account_info(self, address: str) -> mango.AccountInfo:
+        account = self.accounts[address]
+        return mango.AccountInfo(PublicKey(address), account["executable"], Decimal(account["lamports"]),
+                                 PublicKey(account["owner"]), Decimal(account["rentEpoch"]),
+                                 base64.b64decode(account["data"][0]))
+
+    def update(self, address: PublicKey, data: bytes) -> typing.Dict:
+        existing = self.accounts[str(address)]
+        self.slot += 1
+        self.add(address, PublicKey(existing["owner"]), data, existing["lamports"], existing["executable"])
+        return self.accounts[str(address)]
+
+    def program_accounts(self, program_id: str, filters: typing.Sequence[typing.Dict]) -> typing.List[typing.Dict]:
+        matches: typing.List[typing.Dict] = []
+        for address, account in self.accounts.items():
+            if account["owner"] != program_id:
+                continue
+            data = base64.b64decode(account["data"][0])
+            if all(AccountSnapshot._matches(data, account_filter) for account_filter in filters):
+                matches += [{"pubkey": address, "account": account}]
+        return matches
+
+    @staticmethod
+    def _matches(data: bytes, account_filter: typing.Dict) -> bool:
+        if "dataSize" in account_filter:
+            return len(data) == account_filter["dataSize"]
+        if "memcmp" in account_filter:
+            offset = account_filter["memcmp"]["offset"]
+            expected = base58.b58decode(account_filter["memcmp"]["bytes"])
+            return data[offset:offset + len(expected)] == expected
+        raise Exception(f"Unsupported filter: {account_filter}")
+
+    @staticmethod
+    def record(context: mango.Context, addresses: typing.List[PublicKey]) -> "AccountSnapshot":
+        snapshot = AccountSnapshot()
+        for account_info in mango.AccountInfo.load_multiple(context, addresses):
+            snapshot.add_account_info(account_info)
+        return snapshot
+
+    @staticmethod
+    def load(filename: str) -> "AccountSnapshot":
+        with open(filename) as json_file:
+            saved = json.load(json_file)
+        return AccountSnapshot(saved["slot"], saved["accounts"])
+
+    def save(self, filename: str) -> None:
+        with open(filename, "w") as json_file:
+            json.dump({"slot": self.slot, "accounts": self.accounts}, json_file)
+
+    def __len__(self) -> int:
+        return len(self.accounts)
+
+    def __str__(self) -> str:
+        return f"« AccountSnapshot at slot {self.slot} with {len(self.accounts)} accounts »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+# # 🥭 fake_mainnet_context() function
+#
+# A `Context` for the mainnet 5-token group, so snapshots can use real token mints and spot
+# markets (which the `Context`'s lookups need to find). Use `StandInRpcServer.context_for()`
+# to point it at a running stand-in server.
+#
+
+def fake_mainnet_context() -> mango.Context:
+    constants = mango.MangoConstants["mainnet-beta"]
+    group_name = "BTC_ETH_SOL_SRM_USDC"
+    return mango.Context("mainnet-beta", "http://localhost", PublicKey(constants["mango_program_id"]),
+                         PublicKey(constants["dex_program_id"]), group_name,
+                         PublicKey(constants["mango_groups"][group_name]["mango_group_pk"]))
+
+
+# # 🥭 fake_group_snapshot() function
+#
+# Builds an `AccountSnapshot` for `context`'s 5-token group, containing the group account, an
+# oracle account for each market, `margin_account_count` margin accounts that each have a USDC
+# deposit and a borrow (in native token units, like the real accounts), and an `OpenOrders`
+# account for every third margin account.
+#
+# `ripe_fraction` of the margin accounts (rounded to the nearest account) have a collateral
+# ratio below the group's initial collateral ratio, so they're returned by
+# `MarginAccount.load_ripe()`. Accounts are generated from `seed` so the same parameters
+# always build the same snapshot.
+#
+
+FAKE_PRICES: typing.Sequence[Decimal] = [Decimal(35000), Decimal(2500), Decimal(35), Decimal(5)]
+FAKE_DECIMALS: typing.Sequence[int] = [6, 6, 9, 6, 6]
+
+
+def fake_group_snapshot(context: mango.Context, margin_account_count: int = 100, ripe_fraction: float = 0.1, seed: int = 42) -> AccountSnapshot:
+    group_config = mango.MangoConstants[context.cluster]["mango_groups"][context.group_name]
+    mints = [PublicKey(mint) for mint in group_config["mint_pks"]]
+    vaults = [PublicKey(vault) for vault in group_config["vault_pks"]]
+    spot_markets = [PublicKey(market) for market in group_config["spot_market_pks"]]
+    oracles = [PublicKey(oracle) for oracle in group_config["oracle_pks"]]
+    signer_key = fake_seeded_public_key("signer key")
+    oracle_program_id = fake_seeded_public_key("oracle program ID")
+    updated = datetime.datetime.now().replace(microsecond=0)
+
+    snapshot = AccountSnapshot()
+    group_data = mango.layouts.GROUP_V2.build({
+        "account_flags": {"initialized": True, "group": True, "margin_account": False, "srm_account": False},
+        "tokens": mints,
+        "vaults": vaults,
+        "indexes": [{"last_update": updated, "borrow": Decimal(1), "deposit": Decimal(1)}] * len(mints),
+        "spot_markets": spot_markets,
+        "oracles": oracles,
+        "signer_nonce": 1,
+        "signer_key": signer_key,
+        "dex_program_id": context.dex_program_id,
+        "total_deposits": [Decimal(10 ** 12)] * len(mints),
+        "total_borrows": [Decimal(10 ** 10)] * len(mints),
+        "maint_coll_ratio": Decimal("1.1"),
+        "init_coll_ratio": Decimal("1.2"),
+        "srm_vault": fake_seeded_public_key("SRM vault"),
+        "admin": fake_seeded_public_key("admin"),
+        "borrow_limits": [0] * len(mints),
+        "mint_decimals": FAKE_DECIMALS,
+        "oracle_decimals": [2] * len(oracles),
+        "padding": [None] * mango.layouts.GROUP_V2_PADDING
+    })
+    snapshot.add(context.group_id, context.program_id, group_data)
+
+    for oracle, price in zip(oracles, FAKE_PRICES):
+        oracle_data = mango.layouts.AGGREGATOR.build({
+            "config": {"description": "", "decimals": 2, "restart_delay": 0, "max_submissions": 1,
+                       "min_submissions": 1, "reward_amount": 0, "reward_token_account": None},
+            "initialized": 1,
+            "owner": oracle_program_id,
+            "round": {"id": 1, "created_at": 0, "updated_at": 0},
+            "round_submissions": None,
+            "answer": {"round_id": 1, "median": int(price * 100), "created_at": updated, "updated_at": updated},
+            "answer_submissions": None
+        })
+        snapshot.add(oracle, oracle_program_id, oracle_data)
+
+    randomiser = random.Random(seed)
+    ripe_indexes = set(randomiser.sample(range(margin_account_count), round(margin_account_count * ripe_fraction)))
+    for counter in range(margin_account_count):
+        margin_account_address = fake_seeded_public_key(f"margin account {counter}")
+        borrowed_index = randomiser.randrange(len(FAKE_PRICES))
+        usdc_deposit = Decimal(randomiser.randint(1000, 100000))
+        if counter in ripe_indexes:
+            collateral_ratio = Decimal(str(round(randomiser.uniform(1.01, 1.15), 4)))
+        else:
+            collateral_ratio = Decimal(str(round(randomiser.uniform(1.5, 4.0), 4)))
+        borrow = usdc_deposit / collateral_ratio / FAKE_PRICES[borrowed_index]
+
+        deposits = [Decimal(0)] * len(mints)
+        deposits[-1] = usdc_deposit * (10 ** FAKE_DECIMALS[-1])
+        borrows = [Decimal(0)] * len(mints)
+        borrows[borrowed_index] = round(borrow * (10 ** FAKE_DECIMALS[borrowed_index]))
+        open_orders: typing.List[typing.Optional[PublicKey]] = [None] * len(spot_markets)
+        if counter % 3 == 0:
+            open_orders_address = fake_seeded_public_key(f"open orders {counter}")
+            open_orders[borrowed_index] = open_orders_address
+            open_orders_data = mango.layouts.OPEN_ORDERS.build({
+                "account_flags": {"initialized": True, "market": False, "open_orders": True, "request_queue": False,
+                                  "event_queue": False, "bids": False, "asks": False, "disabled": False},
+                "market": spot_markets[borrowed_index],
+                "owner": signer_key,
+                "base_token_free": 0,
+                "base_token_total": 0,
+                "quote_token_free": 1000000,
+                "quote_token_total": 1000000,
+                "free_slot_bits": 2 ** 128 - 1,
+                "is_bid_bits": 0,
+                "orders": [0] * 128,
+                "client_ids": [0] * 128,
+                "referrer_rebate_accrued": 0
+            })
+            snapshot.add(open_orders_address, context.dex_program_id, open_orders_data)
+
+        margin_account_data = mango.layouts.MARGIN_ACCOUNT_V2.build({
+            "account_flags": {"initialized": True, "group": False, "margin_account": True, "srm_account": False},
+            "mango_group": context.group_id,
+            "owner": fake_seeded_public_key(f"owner {counter}"),
+            "deposits": deposits,
+            "borrows": borrows,
+            "open_orders": open_orders,
+            "being_liquidated": 0,
+            "has_borrows": 1,
+            "info": ""
+        })
+        snapshot.add(margin_account_address, context.program_id, margin_account_data)
+
+    return snapshot
+
+
+# # 🥭 StandInRpcServer class
+#
+# A threaded HTTP server that answers the JSON-RPC calls mango-explorer makes, using the
+# accounts in an `AccountSnapshot`. It supports single and batch requests for:
+# * getAccountInfo
+# * getMultipleAccounts (with the real 100-account limit by default)
+# * getProgramAccounts (with `dataSize` and `memcmp` filters, and `withContext`)
+# * getBalance
+# * getRecentBlockhash
+# * sendTransaction (transactions are recorded, not run)
+# * getConfirmedTransaction (for transactions added with `add_transaction()` or sent to the
+#   server)
+#
+# Websocket connections on the same port can use accountSubscribe, programSubscribe and
+# logsSubscribe. Notifications are sent when `update_account()` or `publish_logs()` is called.
+#
+# `latency` is added to every HTTP request. If `max_requests_per_second` is set, requests
+# beyond that in any one second get a 429 response. If `max_bytes_per_second` is set, requests
+# that would take the bytes sent beyond that in any one second get a 413 response.
+#
+
+class StandInRpcServer:
+    def __init__(self, snapshot: AccountSnapshot, latency: datetime.timedelta = datetime.timedelta(seconds=0),
+                 max_requests_per_second: int = 0, max_bytes_per_second: int = 0, max_multiple_accounts: int = 100):
+        self.logger: logging.Logger = logging.getLogger(self.__class__.__name__)
+        self.snapshot: AccountSnapshot = snapshot
+        self.latency: datetime.timedelta = latency
+        self.max_requests_per_second: int = max_requests_per_second
+        self.max_bytes_per_second: int = max_bytes_per_second
+        self.max_multiple_accounts: int = max_multiple_accounts
+        self.request_counts: typing.Counter[str] = collections.Counter()
+        self.rate_limited_count: int = 0
+        self.sent_transactions: typing.Dict[str, int] = {}
+        self.confirmed_transactions: typing.Dict[str, typing.Dict] = {}
+
+        self._lock: threading.Lock = threading.Lock()
+        self._window: int = 0
+        self._window_requests: int = 0
+        self._window_bytes: int = 0
+        self._subscription_counter = iter(range(1, 2 ** 31))
+        self._subscriptions: typing.Dict[int, typing.Tuple[str, typing.Any, _WebSocketConnection]] = {}
+        self._server: typing.Optional[http.server.ThreadingHTTPServer] = None
+        self._thread: typing.Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        if self._server is None:
+            raise Exception("StandInRpcServer has not been started.")
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self) -> "StandInRpcServer":
+        server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _StandInRequestHandler)
+        server.daemon_threads = True
+        setattr(server, "standin", self)
+        self._server = server
+        self._thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+        self._thread.start()
+        self.logger.info(f"Stand-in RPC server listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            connections = {subscription[2] for subscription in self._subscriptions.values()}
+            self._subscriptions = {}
+        for connection in connections:
+            connection.close()
+
+    def context_for(self, context: mango.Context) -> mango.Context:
+        return mango.Context(context.cluster, self.url, context.program_id, context.dex_program_id,
+                             context.group_name, context.group_id)
+
+    def add_transaction(self, signature: str, response: typing.Dict) -> None:
+        with self._lock:
+            self.confirmed_transactions[signature] = response
+
+    def update_account(self, address: PublicKey, data: bytes) -> None:
+        with self._lock:
+            account = self.snapshot.update(address, data)
+            slot = self.snapshot.slot
+            subscriptions = list(self._subscriptions.items())
+        for subscription_id, (kind, target, connection) in subscriptions:
+            if kind == "account" and target == str(address):
+                connection.notify("accountNotification", subscription_id, slot, account)
+            elif kind == "program" and target[0] == account["owner"]:
+                if all(AccountSnapshot._matches(base64.b64decode(account["data"][0]), account_filter) for account_filter in target[1]):
+                    connection.notify("programNotification", subscription_id, slot,
+                                      {"pubkey": str(address), "account": account})
+
+    def publish_logs(self, signature: str, logs: typing.Sequence[str], mentions: typing.Sequence[PublicKey]) -> None:
+        mentioned = {str(address) for address in mentions}
+        with self._lock:
+            slot = self.snapshot.slot
+            subscriptions = list(self._subscriptions.items())
+        for subscription_id, (kind, target, connection) in subscriptions:
+            if kind == "logs" and ((target is None) or (target in mentioned)):
+                connection.notify("logsNotification", subscription_id, slot,
+                                  {"signature": signature, "err": None, "logs": list(logs)})
+
+    # Returns the HTTP status code and body for an HTTP request body.
+    def handle_http(self, body: bytes) -> typing.Tuple[int, bytes]:
+        if self.latency.total_seconds() > 0:
+            time.sleep(self.latency.total_seconds())
+
+        with self._lock:
+            window = int(time.monotonic())
+            if window != self._window:
+                self._window = window
+                self._window_requests = 0
+                self._window_bytes = 0
+            self._window_requests += 1
+            if (self.max_requests_per_second > 0) and (self._window_requests > self.max_requests_per_second):
+                self.rate_limited_count += 1
+                return 429, b"Too many requests for a specific RPC call, contact your app developer or support@rpcpool.com."
+
+        request = json.loads(body)
+        if isinstance(request, list):
+            response: typing.Any = [self._handle_call(call) for call in request]
+        else:
+            response = self._handle_call(request)
+        response_body = json.dumps(response).encode("utf-8")
+
+        with self._lock:
+            self._window_bytes += len(response_body)
+            if (self.max_bytes_per_second > 0) and (self._window_bytes > self.max_bytes_per_second):
+                self.rate_limited_count += 1
+                return 413, b"Too much bandwidth used, contact your app developer or support@rpcpool.com."
+
+        return 200, response_body
+
+    def _handle_call(self, call: typing.Dict) -> typing.Dict:
+        method: str = call["method"]
+        params: typing.List[typing.Any] = call.get("params", [])
+        with self._lock:
+            self.request_counts[method] += 1
+            slot = self.snapshot.slot
+
+        handlers: typing.Dict[str, typing.Callable[[typing.List[typing.Any], int], typing.Any]] = {
+            "getAccountInfo": self._get_account_info,
+            "getMultipleAccounts": self._get_multiple_accounts,
+            "getProgramAccounts": self._get_program_accounts,
+            "getBalance": self._get_balance,
+            "getRecentBlockhash": self._get_recent_blockhash,
+            "sendTransaction": self._send_transaction,
+            "getConfirmedTransaction": self._get_confirmed_transaction
+        }
+        if method not in handlers:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+
+        try:
+            result = handlers[method](params, slot)
+        except _StandInRpcError as exception:
+            return {"jsonrpc": "2.0", "id": call.get("id"), "error": {"code": exception.code, "message": exception.message}}
+
+        return {"jsonrpc": "2.0", "id": call.get("id"), "result": result}
+
+    def _get_account_info(self, params: typing.List[typing.Any], slot: int) -> typing.Dict:
+        return {"context": {"slot": slot}, "value": self.snapshot.get(params[0])}
+
+    def _get_multiple_accounts(self, params: typing.List[typing.Any], slot: int) -> typing.Dict:
+        addresses: typing.List[str] = params[0]
+        if len(addresses) > self.max_multiple_accounts:
+            raise _StandInRpcError(-32602, f"Too many inputs provided; max {self.max_multiple_accounts}")
+        return {"context": {"slot": slot}, "value": [self.snapshot.get(address) for address in addresses]}
+
+    def _get_program_accounts(self, params: typing.List[typing.Any], slot: int) -> typing.Any:
+        options: typing.Dict = params[1] if len(params) > 1 else {}
+        accounts = self.snapshot.program_accounts(params[0], options.get("filters", []))
+        if options.get("withContext"):
+            return {"context": {"slot": slot}, "value": accounts}
+        return accounts
+
+    def _get_balance(self, params: typing.List[typing.Any], slot: int) -> typing.Dict:
+        account = self.snapshot.get(params[0])
+        return {"context": {"slot": slot}, "value": account["lamports"] if account is not None else 0}
+
+    def _get_recent_blockhash(self, params: typing.List[typing.Any], slot: int) -> typing.Dict:
+        blockhash = base58.b58encode(hashlib.sha256(str(slot).encode("ascii")).digest()).decode("ascii")
+        return {"context": {"slot": slot}, "value": {"blockhash": blockhash, "feeCalculator": {"lamportsPerSignature": 5000}}}
+
+    def _send_transaction(self, params: typing.List[typing.Any], slot: int) -> str:
+        raw = base64.b64decode(params[0])
+        _, offset = shortvec_encoding.decode_length(raw)
+        signature = base58.b58encode(raw[offset:offset + 64]).decode("ascii")
+        with self._lock:
+            self.sent_transactions[signature] = slot
+        return signature
+
+    def _get_confirmed_transaction(self, params: typing.List[typing.Any], slot: int) -> typing.Optional[typing.Dict]:
+        signature: str = params[0]
+        with self._lock:
+            if signature in self.confirmed_transactions:
+                return self.confirmed_transactions[signature]
+            sent_slot = self.sent_transactions.get(signature)
+        if sent_slot is None:
+            return None
+        return {
+            "slot": sent_slot,
+            "blockTime": int(time.time()),
+            "meta": {"err": None, "fee": 5000, "logMessages": [], "preTokenBalances": [], "postTokenBalances": []},
+            "transaction": {"signatures": [signature], "message": {"accountKeys": [], "instructions": []}}
+        }
+
+    # Handles one websocket request, returning the response to send back.
+    def handle_websocket(self, request: typing.Dict, connection: "_WebSocketConnection") -> typing.Dict:
+        method: str = request.get("method", "")
+        params: typing.List[typing.Any] = request.get("params", [])
+        with self._lock:
+            self.request_counts[method] += 1
+            if method == "accountSubscribe":
+                result: typing.Any = self._subscribe("account", params[0], connection)
+            elif method == "programSubscribe":
+                options: typing.Dict = params[1] if len(params) > 1 else {}
+                result = self._subscribe("program", (params[0], options.get("filters", [])), connection)
+            elif method == "logsSubscribe":
+                mentions = params[0]["mentions"][0] if isinstance(params[0], dict) else None
+                result = self._subscribe("logs", mentions, connection)
+            elif method in ["accountUnsubscribe", "programUnsubscribe", "logsUnsubscribe"]:
+                result = self._subscriptions.pop(params[0], None) is not None
+            else:
+                return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    def _subscribe(self, kind: str, target: typing.Any, connection: "_WebSocketConnection") -> int:
+        subscription_id = next(self._subscription_counter)
+        self._subscriptions[subscription_id] = (kind, target, connection)
+        return subscription_id
+
+    def remove_connection(self, connection: "_WebSocketConnection") -> None:
+        with self._lock:
+            self._subscriptions = {subscription_id: subscription for subscription_id, subscription
+                                   in self._subscriptions.items() if subscription[2] is not connection}
+
+    def __enter__(self) -> "StandInRpcServer":
+        return self.start()
+
+    def __exit__(self, *args) -> None:
+        self.stop()
+
+    def __str__(self) -> str:
+        return f"« StandInRpcServer serving {self.snapshot} »"
+
+    def __repr__(self) -> str:
+        return f"{self}"
+
+
+class _StandInRpcError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code: int = code
+        self.message: str = message
+
+
+# # 🥭 _WebSocketConnection class
+#
+# Just enough of the websocket protocol (RFC 6455) to exchange JSON text messages with a
+# client. Client frames are always masked, server frames never are.
+#
+
+class _WebSocketConnection:
+    def __init__(self, connection: socket.socket):
+        self.connection: socket.socket = connection
+        self._send_lock: threading.Lock = threading.Lock()
+        self.closed: bool = False
+
+    def receive(self) -> typing.Optional[str]:
+        while True:
+            header = self._receive_exactly(2)
+            if header is None:
+                return None
+            opcode = header[0] & 0x0F
+            length = header[1] & 0x7F
+            if length == 126:
+                extended = self._receive_exactly(2)
+                if extended is None:
+                    return None
+                length = struct.unpack(">H", extended)[0]
+            elif length == 127:
+                extended = self._receive_exactly(8)
+                if extended is None:
+                    return None
+                length = struct.unpack(">Q", extended)[0]
+            mask = self._receive_exactly(4) if header[1] & 0x80 else bytes(4)
+            payload = self._receive_exactly(length)
+            if (mask is None) or (payload is None):
+                return None
+            unmasked = bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+            if opcode == 0x8:
+                self._send_frame(0x8, unmasked[0:2])
+                return None
+            elif opcode == 0x9:
+                self._send_frame(0xA, unmasked)
+            elif opcode == 0x1:
+                return unmasked.decode("utf-8")
+
+    def send(self, message: typing.Dict) -> None:
+        self._send_frame(0x1, json.dumps(message).encode("utf-8"))
+
+    def notify(self, method: str, subscription_id: int, slot: int, value: typing.Any) -> None:
+        self.send({
+            "jsonrpc": "2.0",
+            "method": method,
+            "params": {"result": {"context": {"slot": slot}, "value": value}, "subscription": subscription_id}
+        })
+
+    def close(self) -> None:
+        if not self.closed:
+            self._send_frame(0x8, struct.pack(">H", 1000))
+            self.closed = True
+
+    def _send_frame(self, opcode: int, payload: bytes) -> None:
+        if len(payload) < 126:
+            header = bytes([0x80 | opcode, len(payload)])
+        elif len(payload) < 2 ** 16:
+            header = bytes([0x80 | opcode, 126]) + struct.pack(">H", len(payload))
+        else:
+            header = bytes([0x80 | opcode, 127]) + struct.pack(">Q", len(payload))
+        with self._send_lock:
+            if self.closed:
+                return
+            try:
+                self.connection.sendall(header + payload)
+            except OSError:
+                self.closed = True
+
+    def _receive_exactly(self, count: int) -> typing.Optional[bytes]:
+        received = b""
+        while len(received) < count:
+            try:
+                chunk = self.connection.recv(count - len(received))
+            except OSError:
+                return None
+            if len(chunk) == 0:
+                return None
+            received += chunk
+        return received
+
+
+# # 🥭 _StandInRequestHandler class
+#
+# Passes HTTP POSTs to the `StandInRpcServer` and upgrades GETs to websocket connections.
+#
+
+class _StandInRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    _WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    @property
+    def standin(self) -> StandInRpcServer:
+        return typing.cast(StandInRpcServer, getattr(self.server, "standin"))
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        status, response_body = self.standin.handle_http(body)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json" if status == 200 else "text/plain")
+        self.send_header("Content-Length", str(len(response_body)))
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def do_GET(self) -> None:
+        if self.headers.get("Upgrade", "").lower() != "websocket":
+            response_body = b"ok"
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(response_body)))
+            self.end_headers()
+            self.wfile.write(response_body)
+            return
+
+        key = self.headers["Sec-WebSocket-Key"] + _StandInRequestHandler._WEBSOCKET_GUID
+        accept = base64.b64encode(hashlib.sha1(key.encode("ascii")).digest()).decode("ascii")
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+
+        connection = _WebSocketConnection(self.connection)
+        try:
+            while True:
+                message = connection.receive()
+                if message is None:
+                    break
+                connection.send(self.standin.handle_websocket(json.loads(message), connection))
+        finally:
+            self.standin.remove_connection(connection)
+            self.close_connection = True
+
+    def log_message(self, format: str, *args: typing.Any) -> None:
+        pass
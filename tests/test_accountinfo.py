@@ -1,4 +1,6 @@
 from .context import mango
+from .fakes import fake_seeded_public_key
+from .rpcstandin import AccountSnapshot, StandInRpcServer, fake_mainnet_context
 
 from decimal import Decimal
 from solana.publickey import PublicKey
@@ -40,3 +42,19 @@ def test_split_list_into_chunks():
     split_20 = mango.AccountInfo._split_list_into_chunks(list_to_split, 20)
     assert len(split_20) == 1
     assert split_20[0] == ["a", "b", "c", "d", "e", "f", "g", "h", "i", "j"]
+
+
+def test_load_multiple_pairs_each_chunk_with_its_own_addresses():
+    context = fake_mainnet_context()
+    snapshot = AccountSnapshot()
+    addresses = [fake_seeded_public_key(f"account {counter}") for counter in range(5)]
+    for counter, address in enumerate(addresses):
+        snapshot.add(address, fake_seeded_public_key("owner"), bytes([counter]))
+
+    with StandInRpcServer(snapshot) as server:
+        standin_context = server.context_for(context)
+        actual = mango.AccountInfo.load_multiple(standin_context, addresses, chunk_size=2)
+
+    assert server.request_counts["getMultipleAccounts"] == 3
+    assert [account_info.address for account_info in actual] == addresses
+    assert [account_info.data for account_info in actual] == [bytes([counter]) for counter in range(5)]
@@ -0,0 +1,166 @@
+from .context import mango
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import os.path
+import tempfile
+import typing
+
+from decimal import Decimal
+
+
+def captured_snapshot(context: mango.Context) -> mango.Snapshot:
+    with StandInRpcServer(fake_group_snapshot(context, 40, ripe_fraction=0.25)) as server:
+        return mango.Snapshot.capture(server.context_for(context))
+
+
+def captured_frames(context: mango.Context, timestamps) -> list:
+    snapshot = captured_snapshot(context)
+    return [mango.BacktestFrame(timestamp, snapshot) for timestamp in timestamps]
+
+
+# Builds a copy of the snapshot with every oracle price multiplied by `price_multiplier` and
+# without the `removed` margin accounts.
+def modified_snapshot(snapshot: mango.Snapshot, price_multiplier: Decimal = Decimal(1), removed: typing.AbstractSet[str] = frozenset()) -> mango.Snapshot:
+    accounts: typing.List[typing.Tuple[mango.SnapshotAccountKind, mango.AccountInfo]] = []
+    for kind in mango.SnapshotAccountKind:
+        for account_info in snapshot.account_infos(kind):
+            if str(account_info.address) in removed:
+                continue
+            if kind == mango.SnapshotAccountKind.ORACLE:
+                oracle = mango.layouts.AGGREGATOR.parse(bytes(account_info.data))
+                oracle.answer.median = int(oracle.answer.median * price_multiplier)
+                account_info = mango.AccountInfo(account_info.address, account_info.executable, account_info.lamports,
+                                                 account_info.owner, account_info.rent_epoch, mango.layouts.AGGREGATOR.build(oracle))
+            accounts += [(kind, account_info)]
+    return mango.Snapshot(mango.Snapshot.build(snapshot.slot, accounts))
+
+
+def opportunity_addresses(context: mango.Context, snapshot: mango.Snapshot) -> typing.List[str]:
+    return sorted(mango.backtest._LoadedFrame(context, mango.BacktestFrame(0.0, snapshot)).opportunities.keys())
+
+
+def test_liquidates_opportunities():
+    context = fake_mainnet_context()
+    backtester = mango.Backtester(context, captured_frames(context, [0.0, 10.0, 20.0]))
+    result = backtester.run(mango.BacktestParameters(throttle_ripe_update_to_seconds=Decimal(5)))
+
+    assert result.opportunities > 0
+    assert result.liquidations == result.opportunities
+    assert result.missed == 0
+    assert len(result.latencies) == result.liquidations
+    assert all(latency >= 0 for latency in result.latencies)
+    # Prices don't move, so every trade fills and the liquidation incentive is all profit.
+    assert result.unfilled_trades == 0
+    assert result.profit > 0
+
+
+def test_processing_delay_is_deterministic():
+    context = fake_mainnet_context()
+    backtester = mango.Backtester(context, captured_frames(context, [0.0, 10.0]), processing_seconds=0.5)
+    first = backtester.run(mango.BacktestParameters())
+    second = backtester.run(mango.BacktestParameters())
+
+    # All the opportunities are in the first frame, and are liquidated one after another.
+    assert sorted(first.latencies) == [0.5 * (counter + 1) for counter in range(first.liquidations)]
+    assert first.latencies == second.latencies
+    assert first.profit == second.profit
+
+
+def test_price_moves_leave_iocs_unfilled():
+    context = fake_mainnet_context()
+    snapshot = captured_snapshot(context)
+    frames = [mango.BacktestFrame(0.0, snapshot), mango.BacktestFrame(1.0, modified_snapshot(snapshot, Decimal("1.2")))]
+    backtester = mango.Backtester(context, frames, trade_seconds=1.0, processing_seconds=0.0)
+
+    # The buy-backs land after prices have risen 20%, past a 5% adjustment but within 50%.
+    tight = backtester.run(mango.BacktestParameters(adjustment_factor=Decimal("0.05")))
+    assert tight.liquidations > 0
+    assert tight.unfilled_trades == tight.liquidations
+
+    loose = backtester.run(mango.BacktestParameters(adjustment_factor=Decimal("0.5")))
+    assert loose.liquidations == tight.liquidations
+    assert loose.unfilled_trades == 0
+    assert loose.profit != tight.profit
+
+
+def test_throttle_misses_short_lived_opportunities():
+    context = fake_mainnet_context()
+    snapshot = captured_snapshot(context)
+    # Prices spike for two seconds, making more accounts liquidatable until they recover.
+    frames = [mango.BacktestFrame(0.0, snapshot),
+              mango.BacktestFrame(2.0, modified_snapshot(snapshot, Decimal("1.04"))),
+              mango.BacktestFrame(4.0, snapshot)]
+    backtester = mango.Backtester(context, frames, processing_seconds=0.1)
+
+    slow = backtester.run(mango.BacktestParameters(throttle_ripe_update_to_seconds=Decimal(5), throttle_reload_to_seconds=Decimal(1)))
+    fast = backtester.run(mango.BacktestParameters(throttle_ripe_update_to_seconds=Decimal(1), throttle_reload_to_seconds=Decimal(1)))
+
+    assert slow.opportunities == fast.opportunities
+    assert slow.opportunities > len(opportunity_addresses(context, snapshot))
+    assert slow.missed > 0
+    assert fast.missed == 0
+
+
+def test_someone_else_liquidates_first():
+    context = fake_mainnet_context()
+    snapshot = captured_snapshot(context)
+    opportunities = opportunity_addresses(context, snapshot)
+    # A second later, half of the opportunities have been taken by someone else.
+    taken = set(opportunities[::2])
+    frames = [mango.BacktestFrame(0.0, snapshot), mango.BacktestFrame(1.0, modified_snapshot(snapshot, removed=taken))]
+
+    # Liquidating instantly gets everything before the others do.
+    instant = mango.Backtester(context, frames, processing_seconds=0.0).run(mango.BacktestParameters())
+    assert instant.liquidations == len(opportunities)
+
+    # Taking half a second over each one means only the first lands before the second frame,
+    # after which only the accounts that weren't taken can be liquidated.
+    slow = mango.Backtester(context, frames, processing_seconds=0.5).run(mango.BacktestParameters())
+    not_taken = len(set(opportunities) - taken)
+    assert slow.opportunities == len(opportunities)
+    assert not_taken <= slow.liquidations <= not_taken + 1
+    assert slow.missed == slow.opportunities - slow.liquidations
+
+
+def test_worthwhile_threshold_causes_misses():
+    context = fake_mainnet_context()
+    backtester = mango.Backtester(context, captured_frames(context, [0.0, 10.0]))
+    result = backtester.run(mango.BacktestParameters(worthwhile_threshold=Decimal(10 ** 12)))
+
+    assert result.opportunities > 0
+    assert result.liquidations == 0
+    assert result.missed == result.opportunities
+    assert result.profit == 0
+
+
+def test_run_all_in_processes():
+    context = fake_mainnet_context()
+    backtester = mango.Backtester(context, captured_frames(context, [0.0, 10.0]))
+    all_parameters = [mango.BacktestParameters(throttle_ripe_update_to_seconds=Decimal(throttle))
+                      for throttle in [1, 5]]
+    results = backtester.run_all(all_parameters, processes=2)
+
+    assert [result.parameters.throttle_ripe_update_to_seconds for result in results] == [Decimal(1), Decimal(5)]
+    expected = backtester.run(all_parameters[0])
+    assert results[0].opportunities == expected.opportunities
+    assert results[0].liquidations == expected.liquidations
+    assert results[0].profit == expected.profit
+
+
+def test_frames_from_rpc_recording():
+    context = fake_mainnet_context()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "recording.jsonl.gz")
+        with StandInRpcServer(fake_group_snapshot(context, 20)) as server:
+            standin_context = server.context_for(context)
+            recorder = mango.RpcRecorder(filename)
+            standin_context.client.compatible_client.recorder = recorder
+            mango.Snapshot.capture(standin_context)
+            mango.Snapshot.capture(standin_context)
+            recorder.close()
+
+        frames = mango.BacktestFrame.from_rpc_recording(context, filename)
+
+    assert len(frames) == 2
+    assert frames[0].timestamp <= frames[1].timestamp
+    assert len(frames[0].snapshot.load_margin_accounts(frames[0].snapshot.load_group(context))) == 20
@@ -0,0 +1,107 @@
+import json
+import threading
+import typing
+
+from .context import mango
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+from datetime import timedelta
+from solana.blockhash import Blockhash
+from solana.rpc.types import RPCResponse
+
+
+class BlockhashCountingClient(mango.CompatibleClient):
+    def __init__(self):
+        super().__init__("Test", "local", "http://localhost", "processed", False)
+        self.blockhash_requests = 0
+
+    def get_recent_blockhash(self, *args, **kwargs) -> RPCResponse:
+        self.blockhash_requests += 1
+        blockhash = "11111111111111111111111111111111" if self.blockhash_requests == 1 else "11111111111111111111111111111112"
+        return RPCResponse(result={"value": {"blockhash": blockhash}})
+
+
+def test_blockhash_fetched_every_time_by_default():
+    actual = BlockhashCountingClient()
+    assert actual._blockhash_for_transaction() == Blockhash("11111111111111111111111111111111")
+    assert actual._blockhash_for_transaction() == Blockhash("11111111111111111111111111111112")
+    assert actual.blockhash_requests == 2
+
+
+def test_blockhash_cached_for_duration():
+    actual = BlockhashCountingClient()
+    actual.blockhash_cache_duration = timedelta(seconds=60)
+    assert actual._blockhash_for_transaction() == Blockhash("11111111111111111111111111111111")
+    assert actual._blockhash_for_transaction() == Blockhash("11111111111111111111111111111111")
+    assert actual.blockhash_requests == 1
+
+
+class FakeResponse:
+    def __init__(self, text: str):
+        self.status_code = 200
+        self.text = text
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeBatchSession:
+    def __init__(self):
+        self.posted: typing.List[typing.Any] = []
+
+    def post(self, url, headers=None, data=None):
+        requests = json.loads(data)
+        self.posted += [requests]
+        # Reply in reverse order - responses are matched to requests by ID.
+        return FakeResponse(json.dumps([{"jsonrpc": "2.0", "id": request["id"], "result": request["params"][0]} for request in reversed(requests)]))
+
+
+def test_batch_request_returns_responses_in_call_order():
+    actual = mango.CompatibleClient("Test", "local", "http://localhost", "processed", False)
+    session = FakeBatchSession()
+    setattr(actual, "_create_session", lambda: session)
+    responses = actual.get_confirmed_transactions(["first", "second", "third"])
+    assert len(session.posted) == 1
+    assert [request["method"] for request in session.posted[0]] == ["getConfirmedTransaction"] * 3
+    assert [response["result"] for response in responses] == ["first", "second", "third"]
+
+
+def test_each_thread_gets_its_own_session():
+    actual = mango.CompatibleClient("Test", "local", "http://localhost", "processed", False)
+    main_session = actual._session
+    assert actual._session is main_session
+
+    thread_sessions: typing.List[typing.Any] = []
+    threads = [threading.Thread(target=lambda: thread_sessions.append(actual._session)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(set(map(id, thread_sessions + [main_session]))) == 4
+
+
+def test_concurrent_requests_from_worker_threads():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 1)) as server:
+        standin_context = server.context_for(context)
+        account_infos: typing.List[typing.Any] = []
+        errors: typing.List[Exception] = []
+
+        def _load_group_repeatedly():
+            try:
+                for _ in range(10):
+                    account_infos.append(mango.AccountInfo.load(standin_context, standin_context.group_id))
+            except Exception as exception:
+                errors.append(exception)
+
+        threads = [threading.Thread(target=_load_group_repeatedly) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert errors == []
+    assert len(account_infos) == 40
+    assert all(account_info is not None and account_info.address == context.group_id for account_info in account_infos)
+    assert server.request_counts["getAccountInfo"] == 40
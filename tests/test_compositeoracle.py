@@ -0,0 +1,177 @@
+import pytest
+import rx
+import rx.core.typing
+import typing
+
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from rx.disposable import Disposable
+
+
+class FakeOracle(mango.Oracle):
+    def __init__(self, name: str, market: mango.Market, price: Decimal, timestamp: datetime):
+        super().__init__(name, market)
+        self.source = mango.OracleSource("Fake", name, market)
+        self.price = price
+        self.timestamp = timestamp
+        self.observers: typing.List[rx.core.typing.Observer] = []
+
+    def fetch_price(self, context: mango.Context) -> mango.Price:
+        return mango.Price(self.source, self.timestamp, self.market, self.price, self.price, self.price)
+
+    def to_streaming_observable(self, context: mango.Context):
+        def subscribe(observer, scheduler_=None):
+            self.observers.append(observer)
+            return Disposable(lambda: self.observers.remove(observer))
+
+        return rx.create(subscribe)
+
+    def emit(self, price: Decimal) -> None:
+        for observer in list(self.observers):
+            observer.on_next(mango.Price(self.source, datetime.now(), self.market, price, price, price))
+
+    def fail(self, exception: Exception) -> None:
+        for observer in list(self.observers):
+            observer.on_error(exception)
+
+
+def _fake_market() -> mango.Market:
+    base = mango.Token("BASE", "Base Token", fake_seeded_public_key("base token"), Decimal(6))
+    quote = mango.Token("QUOTE", "Quote Token", fake_seeded_public_key("quote token"), Decimal(6))
+    return mango.SpotMarket(base, quote, fake_seeded_public_key("spot market"))
+
+
+def test_constructor():
+    market = _fake_market()
+    oracle = FakeOracle("Fake 1", market, Decimal(1), datetime.now())
+    actual = mango.CompositeOracle(market, [oracle], mango.CompositeMode.PRIORITY, timedelta(seconds=5), 1)
+    assert actual is not None
+    assert actual.logger is not None
+    assert actual.market == market
+    assert actual.oracles == [oracle]
+    assert actual.mode == mango.CompositeMode.PRIORITY
+    assert actual.max_age == timedelta(seconds=5)
+    assert actual.minimum_sources == 1
+    assert actual.statistics["Fake 1"].count == 0
+
+
+def test_median_ignores_stale_prices():
+    market = _fake_market()
+    now = datetime.now()
+    oracles = [
+        FakeOracle("Fake 1", market, Decimal(10), now),
+        FakeOracle("Fake 2", market, Decimal(12), now),
+        FakeOracle("Fake 3", market, Decimal(100), now - timedelta(minutes=5)),
+        FakeOracle("Fake 4", market, Decimal(20), now)
+    ]
+    actual = mango.CompositeOracle(market, oracles, mango.CompositeMode.MEDIAN, timedelta(seconds=30))
+    price = actual.fetch_price(fake_context())
+    assert price.mid_price == Decimal(12)
+    assert actual.statistics["Fake 3"].stale_count == 1
+    assert actual.statistics["Fake 1"].stale_count == 0
+
+
+def test_priority_falls_back_past_stale_prices():
+    market = _fake_market()
+    now = datetime.now()
+    oracles = [
+        FakeOracle("Fake 1", market, Decimal(10), now - timedelta(minutes=5)),
+        FakeOracle("Fake 2", market, Decimal(12), now),
+        FakeOracle("Fake 3", market, Decimal(14), now)
+    ]
+    actual = mango.CompositeOracle(market, oracles, mango.CompositeMode.PRIORITY, timedelta(seconds=30))
+    price = actual.fetch_price(fake_context())
+    assert price.mid_price == Decimal(12)
+
+
+def test_minimum_sources_not_met():
+    market = _fake_market()
+    oracles = [FakeOracle("Fake 1", market, Decimal(10), datetime.now())]
+    actual = mango.CompositeOracle(market, oracles, mango.CompositeMode.MEDIAN, timedelta(seconds=30), 2)
+    with pytest.raises(Exception, match="need at least 2"):
+        actual.fetch_price(fake_context())
+
+
+def test_streaming_emits_once_minimum_sources_are_fresh():
+    market = _fake_market()
+    oracles = [FakeOracle(f"Fake {counter}", market, Decimal(0), datetime.now()) for counter in range(3)]
+    actual = mango.CompositeOracle(market, oracles, mango.CompositeMode.MEDIAN, timedelta(seconds=30), 2)
+    prices: typing.List[mango.Price] = []
+    actual.to_streaming_observable(fake_context()).subscribe(on_next=prices.append)
+
+    oracles[0].emit(Decimal(10))
+    assert prices == []
+
+    oracles[1].emit(Decimal(20))
+    oracles[2].emit(Decimal(12))
+    assert [price.mid_price for price in prices] == [Decimal(15), Decimal(12)]
+    assert actual.statistics["Fake 0"].count == 1
+    assert actual.statistics["Fake 2"].count == 1
+
+
+def test_streaming_subscribers_are_independent():
+    market = _fake_market()
+    oracles = [FakeOracle(f"Fake {counter}", market, Decimal(0), datetime.now()) for counter in range(2)]
+    actual = mango.CompositeOracle(market, oracles, mango.CompositeMode.PRIORITY, timedelta(seconds=30))
+    observable = actual.to_streaming_observable(fake_context())
+    assert oracles[0].observers == []
+
+    first: typing.List[mango.Price] = []
+    second: typing.List[mango.Price] = []
+    first_subscription = observable.subscribe(on_next=first.append)
+    oracles[1].emit(Decimal(20))
+    observable.subscribe(on_next=second.append)
+    assert len(oracles[0].observers) == 2
+
+    # The second subscriber has no earlier prices, so it only sees the new price.
+    oracles[0].emit(Decimal(10))
+    assert [price.mid_price for price in first] == [Decimal(20), Decimal(10)]
+    assert [price.mid_price for price in second] == [Decimal(10)]
+
+    first_subscription.dispose()
+    oracles[1].emit(Decimal(21))
+    assert len(first) == 2
+    assert [price.mid_price for price in second] == [Decimal(10), Decimal(10)]
+    assert len(oracles[0].observers) == 1
+    assert len(oracles[1].observers) == 1
+
+
+def test_streaming_dispose_unsubscribes_from_inner_oracles():
+    market = _fake_market()
+    oracles = [FakeOracle(f"Fake {counter}", market, Decimal(0), datetime.now()) for counter in range(2)]
+    actual = mango.CompositeOracle(market, oracles, mango.CompositeMode.MEDIAN, timedelta(seconds=30))
+    subscription = actual.to_streaming_observable(fake_context()).subscribe()
+    assert [len(oracle.observers) for oracle in oracles] == [1, 1]
+
+    subscription.dispose()
+    assert [len(oracle.observers) for oracle in oracles] == [0, 0]
+
+
+def test_streaming_continues_after_one_source_fails():
+    market = _fake_market()
+    oracles = [FakeOracle(f"Fake {counter}", market, Decimal(0), datetime.now()) for counter in range(2)]
+    actual = mango.CompositeOracle(market, oracles, mango.CompositeMode.MEDIAN, timedelta(seconds=30))
+    prices: typing.List[mango.Price] = []
+    errors: typing.List[Exception] = []
+    actual.to_streaming_observable(fake_context()).subscribe(on_next=prices.append, on_error=errors.append)
+
+    oracles[0].fail(Exception("Test failure"))
+    oracles[1].emit(Decimal(20))
+    assert [price.mid_price for price in prices] == [Decimal(20)]
+    assert errors == []
+
+
+def test_source_statistics_record_intervals_between_prices():
+    actual = mango.OracleSourceStatistics("Fake")
+    started_at = datetime.now()
+    actual.record(started_at, False)
+    actual.record(started_at + timedelta(seconds=2), False)
+    actual.record(started_at + timedelta(seconds=6), True)
+    assert actual.count == 3
+    assert actual.stale_count == 1
+    assert actual.last_interval == 4
+    assert actual.max_interval == 4
+    assert actual.average_interval == 3
@@ -102,3 +102,8 @@ def test_new_from_group_id_3token_group():
     assert derived.group_name == "BTC_ETH_USDT"
     assert derived.group_id == PublicKey("7pVYhpKUHw88neQHxgExSH6cerMZ1Axx1ALQP9sxtvQV")
     context_has_default_values(mango.Context.default())
+
+
+def test_websocket_url():
+    assert mango.Context.default().websocket_url == "wss://solana-api.projectserum.com"
+    assert mango.Context.default().new_from_cluster_url("http://localhost:8899").websocket_url == "ws://localhost:8899"
@@ -177,6 +177,22 @@ def test_new_order_v3_instruction_builder_constructor():
     assert actual.fee_discount_address == fee_discount_address
 
 
+def test_cancel_order_by_client_id_instruction_builder_constructor():
+    context: mango.Context = fake_context()
+    wallet: mango.Wallet = {"fake": "Wallet"}
+    market: Market = {"fake": "Market"}
+    open_orders_address: PublicKey = fake_seeded_public_key("open orders account")
+    client_id: int = 53
+    actual = mango.CancelOrderByClientIdInstructionBuilder(context, wallet, market, open_orders_address, client_id)
+    assert actual is not None
+    assert actual.logger is not None
+    assert actual.context == context
+    assert actual.wallet == wallet
+    assert actual.market == market
+    assert actual.open_orders_address == open_orders_address
+    assert actual.client_id == client_id
+
+
 def test_consume_events_instruction_builder_constructor():
     context: mango.Context = fake_context()
     wallet: mango.Wallet = {"fake": "Wallet"}
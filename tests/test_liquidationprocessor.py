@@ -1,7 +1,10 @@
 from .context import mango
-from .fakes import fake_context
+from .fakes import fake_context, fake_seeded_public_key, fake_token
 from .mocks import mock_group, mock_prices, mock_margin_account, mock_open_orders
 
+import datetime
+import threading
+import time
 import typing
 
 from decimal import Decimal
@@ -20,6 +23,7 @@ def test_constructor():
     assert actual.account_liquidator == account_liquidator
     assert actual.wallet_balancer == wallet_balancer
     assert actual.worthwhile_threshold == worthwhile_threshold
+    assert actual.max_in_flight == 1
 
 
 #
@@ -280,3 +284,165 @@ def test_open_orders_bigger_referral_fee_liquidatable():
             )
         ]
     )
+
+
+class ConcurrencyTrackingAccountLiquidator(mango.AccountLiquidator):
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.maximum_in_flight = 0
+        self.liquidated: typing.List[mango.LiquidatableReport] = []
+
+    def prepare_instructions(self, liquidatable_report: mango.LiquidatableReport) -> typing.List[mango.InstructionBuilder]:
+        return []
+
+    def liquidate(self, liquidatable_report: mango.LiquidatableReport) -> typing.Optional[typing.Sequence[str]]:
+        with self.lock:
+            self.in_flight += 1
+            self.maximum_in_flight = max(self.maximum_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+            self.liquidated += [liquidatable_report]
+        # Returning None means 'not liquidated', so no reload is attempted.
+        return None
+
+
+class FakeMarginAccount:
+    def __init__(self, name: str):
+        self.address = fake_seeded_public_key(name)
+
+
+def fake_report(name: str, assets: str) -> mango.LiquidatableReport:
+    balance_sheet = mango.BalanceSheet(fake_token(), Decimal(0), Decimal(assets), Decimal(0))
+    # Only the margin account's address is used, so there's no need for a real group or margin account.
+    group = typing.cast(mango.Group, None)
+    margin_account = typing.cast(mango.MarginAccount, FakeMarginAccount(name))
+    return mango.LiquidatableReport(group, [], margin_account, balance_sheet, [],
+                                    mango.LiquidatableState.UNSET, Decimal("0.01"))
+
+
+def test_pipelined_liquidations_respect_in_flight_limit():
+    account_liquidator = ConcurrencyTrackingAccountLiquidator()
+    actual = mango.LiquidationProcessor(fake_context(), "Test Liquidator", account_liquidator,
+                                        mango.NullWalletBalancer(), Decimal("0.1"), max_in_flight=2)
+    reports = [fake_report("first", "10"), fake_report("second", "20"),
+               fake_report("third", "30"), fake_report("fourth", "40")]
+    actual._liquidate_all(None, [], reports)
+
+    assert len(account_liquidator.liquidated) == 4
+    assert account_liquidator.maximum_in_flight == 2
+    assert len(actual.liquidation_queue) == 0
+
+
+def test_sequential_liquidations_are_one_at_a_time():
+    account_liquidator = ConcurrencyTrackingAccountLiquidator()
+    actual = mango.LiquidationProcessor(fake_context(), "Test Liquidator", account_liquidator,
+                                        mango.NullWalletBalancer(), Decimal("0.1"))
+    reports = [fake_report("first", "10"), fake_report("second", "20"), fake_report("third", "30")]
+    actual._liquidate_all(None, [], reports)
+
+    assert account_liquidator.maximum_in_flight == 1
+    assert [report.margin_account.address for report in account_liquidator.liquidated] == [
+        reports[2].margin_account.address, reports[1].margin_account.address, reports[0].margin_account.address]
+
+
+class BlockingWalletBalancer(mango.WalletBalancer):
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.balanced: typing.List[typing.List[mango.TokenValue]] = []
+
+    def balance(self, prices: typing.List[mango.TokenValue]):
+        self.started.set()
+        self.release.wait(5)
+        self.balanced += [prices]
+
+
+def test_background_balance_waits_for_liquidations_in_flight():
+    wallet_balancer = BlockingWalletBalancer()
+    wallet_balancer.release.set()
+    actual = mango.LiquidationProcessor(fake_context(), "Test Liquidator", mango.NullAccountLiquidator(),
+                                        wallet_balancer, Decimal("0.1"), max_in_flight=2)
+    with actual._wallet_token_gate.liquidating():
+        actual._schedule_balance([])
+        time.sleep(0.1)
+        assert not wallet_balancer.started.is_set()
+
+    assert wallet_balancer.started.wait(5)
+    actual.shutdown()
+    assert wallet_balancer.balanced == [[]]
+
+
+def test_liquidations_wait_for_background_balance():
+    wallet_balancer = BlockingWalletBalancer()
+    actual = mango.LiquidationProcessor(fake_context(), "Test Liquidator", mango.NullAccountLiquidator(),
+                                        wallet_balancer, Decimal("0.1"), max_in_flight=2)
+    actual._schedule_balance([])
+    assert wallet_balancer.started.wait(5)
+
+    liquidating = threading.Event()
+
+    def _liquidate():
+        with actual._wallet_token_gate.liquidating():
+            liquidating.set()
+
+    thread = threading.Thread(target=_liquidate)
+    thread.start()
+    assert not liquidating.wait(0.1)
+
+    wallet_balancer.release.set()
+    assert liquidating.wait(5)
+    thread.join(5)
+    actual.shutdown()
+
+
+def test_shutdown_finishes_pending_balance():
+    wallet_balancer = BlockingWalletBalancer()
+    actual = mango.LiquidationProcessor(fake_context(), "Test Liquidator", mango.NullAccountLiquidator(),
+                                        wallet_balancer, Decimal("0.1"), max_in_flight=2)
+    actual._schedule_balance([])
+    assert wallet_balancer.started.wait(5)
+    threading.Timer(0.1, wallet_balancer.release.set).start()
+    actual.shutdown()
+    assert wallet_balancer.balanced == [[]]
+
+    # Balances asked for after shutdown are skipped rather than raising.
+    actual._schedule_balance([])
+    assert len(wallet_balancer.balanced) == 1
+
+
+def test_coalesced_trailing_balance_waits_for_liquidations_in_flight():
+    inner = BlockingWalletBalancer()
+    inner.release.set()
+    wallet_balancer = mango.CoalescingWalletBalancer(inner, datetime.timedelta(milliseconds=50), Decimal(1000))
+    actual = mango.LiquidationProcessor(fake_context(), "Test Liquidator", mango.NullAccountLiquidator(),
+                                        wallet_balancer, Decimal("0.1"), max_in_flight=2)
+    wallet_balancer.balance([])
+    inner.balanced = []
+    inner.started.clear()
+
+    with actual._wallet_token_gate.liquidating():
+        wallet_balancer.balance([])
+        time.sleep(0.2)
+        assert not inner.started.is_set()
+
+    assert inner.started.wait(5)
+    actual.shutdown()
+    # The trailing balance, then the flush on shutdown.
+    assert inner.balanced == [[], []]
+
+
+def test_shutdown_flushes_coalesced_balance():
+    inner = BlockingWalletBalancer()
+    inner.release.set()
+    wallet_balancer = mango.CoalescingWalletBalancer(inner, datetime.timedelta(minutes=5), Decimal(1000))
+    actual = mango.LiquidationProcessor(fake_context(), "Test Liquidator", mango.NullAccountLiquidator(),
+                                        wallet_balancer, Decimal("0.1"), max_in_flight=2)
+    wallet_balancer.balance([])
+    wallet_balancer.balance([])
+    assert len(inner.balanced) == 1
+
+    actual.shutdown()
+    assert len(inner.balanced) == 2
@@ -0,0 +1,68 @@
+from .context import mango
+from .fakes import fake_seeded_public_key, fake_token
+
+import typing
+
+from decimal import Decimal
+
+
+class FakeMarginAccount:
+    def __init__(self, name: str):
+        self.address = fake_seeded_public_key(name)
+
+
+def fake_report(name: str, assets: str, liabilities: str = "0") -> mango.LiquidatableReport:
+    balance_sheet = mango.BalanceSheet(fake_token(), Decimal(liabilities), Decimal(assets), Decimal(0))
+    # Only the margin account's address is used, so there's no need for a real group or margin account.
+    group = typing.cast(mango.Group, None)
+    margin_account = typing.cast(mango.MarginAccount, FakeMarginAccount(name))
+    return mango.LiquidatableReport(group, [], margin_account, balance_sheet, [],
+                                    mango.LiquidatableState.UNSET, Decimal("0.01"))
+
+
+def test_empty_queue():
+    actual = mango.LiquidationQueue()
+    assert len(actual) == 0
+    assert actual.pop() is None
+    assert actual.processing_order() == []
+
+
+def test_pops_highest_net_assets_first():
+    low = fake_report("low", "10")
+    middle = fake_report("middle", "50", "20")
+    high = fake_report("high", "100")
+    actual = mango.LiquidationQueue([low, high, middle])
+    assert len(actual) == 3
+    assert actual.processing_order() == [high, middle, low]
+    assert actual.pop() == high
+    assert actual.pop() == middle
+    assert actual.pop() == low
+    assert actual.pop() is None
+
+
+def test_push_replaces_existing_report_for_account():
+    first = fake_report("account", "100")
+    other = fake_report("other", "50")
+    actual = mango.LiquidationQueue([first, other])
+
+    # The account has been partly liquidated, so it's pushed back with lower net assets.
+    reevaluated = fake_report("account", "20")
+    actual.push(reevaluated)
+    assert len(actual) == 2
+    assert actual.processing_order() == [other, reevaluated]
+    assert actual.pop() == other
+    assert actual.pop() == reevaluated
+    assert actual.pop() is None
+
+
+def test_remove():
+    first = fake_report("first", "100")
+    second = fake_report("second", "50")
+    actual = mango.LiquidationQueue([first, second])
+    actual.remove(first)
+    assert first not in actual
+    assert second in actual
+    assert len(actual) == 1
+    assert actual.pop() == second
+    assert actual.pop() is None
+
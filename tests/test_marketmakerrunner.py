@@ -0,0 +1,156 @@
+import pytest
+import typing
+
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key, fake_wallet
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from mango.marketmaking.marketmakerrunner import MarketMakerRunner
+from mango.marketmaking.simplemarketmaker import SimpleMarketMaker
+
+
+class FakeOracleProvider(mango.OracleProvider):
+    def __init__(self, prices: typing.Dict[str, Decimal]):
+        super().__init__("Fake Oracle Factory")
+        self.prices = prices
+        self.fetch_prices_calls: typing.List[typing.Sequence[mango.Market]] = []
+
+    def oracle_for_market(self, context: mango.Context, market: mango.Market) -> typing.Optional[mango.Oracle]:
+        raise NotImplementedError()
+
+    def all_available_symbols(self, context: mango.Context) -> typing.Sequence[str]:
+        return list(self.prices.keys())
+
+    def fetch_prices(self, context: mango.Context, markets: typing.Sequence[mango.Market]) -> typing.Sequence[mango.Price]:
+        self.fetch_prices_calls += [markets]
+        prices: typing.List[mango.Price] = []
+        for market in markets:
+            if market.symbol in self.prices:
+                price = self.prices[market.symbol]
+                source = mango.OracleSource("Fake", "Fake", market)
+                prices += [mango.Price(source, datetime.now(), market, price, price, price)]
+        return prices
+
+
+class FakeOrderPlacer(mango.NullOrderPlacer):
+    def __init__(self, market_name: str, orders: typing.List[mango.Order]):
+        super().__init__(market_name)
+        self.orders = orders
+
+    def load_my_orders(self) -> typing.List[mango.Order]:
+        return self.orders
+
+
+_QUOTE = mango.Token("USDC", "USD Coin", fake_seeded_public_key("USDC"), Decimal(6))
+
+
+def _fake_market(base_symbol: str) -> mango.SpotMarket:
+    base = mango.Token(base_symbol, f"{base_symbol} Token", fake_seeded_public_key(base_symbol), Decimal(6))
+    return mango.SpotMarket(base, _QUOTE, fake_seeded_public_key(f"{base_symbol} spot market"))
+
+
+def _fake_market_maker(market: mango.SpotMarket, orders: typing.List[mango.Order], updates: typing.List[typing.Tuple[str, mango.Price, typing.List[mango.Order]]]) -> SimpleMarketMaker:
+    order_placer = FakeOrderPlacer(market.symbol, orders)
+    market_maker = SimpleMarketMaker(fake_context(), fake_wallet(), market, order_placer, None,  # type: ignore
+                                     Decimal("0.01"), Decimal("0.1"), Decimal("0.0001"), timedelta(seconds=1))
+
+    def _update_orders(price, inventory, current_orders):
+        if market.base.symbol == "FAIL":
+            raise Exception("Test failure")
+        updates.append((market.symbol, price, current_orders))
+        return current_orders
+
+    setattr(market_maker, "update_orders", _update_orders)
+    return market_maker
+
+
+def _fake_fetch_total_values(fetched: typing.List[typing.Sequence[mango.Token]]):
+    def _fetch_total_values(context, address, tokens):
+        fetched.append(tokens)
+        return [mango.TokenValue(token, Decimal(10)) for token in tokens]
+    return _fetch_total_values
+
+
+def test_run_once_updates_each_market_maker(monkeypatch):
+    fetched: typing.List[typing.Sequence[mango.Token]] = []
+    monkeypatch.setattr(mango.TokenValue, "fetch_total_values", _fake_fetch_total_values(fetched))
+
+    updates: typing.List[typing.Tuple[str, mango.Price, typing.List[mango.Order]]] = []
+    eth_orders = [mango.Order(id=1, side=mango.Side.BUY, price=Decimal(2400), size=Decimal(1))]
+    market_makers = [
+        _fake_market_maker(_fake_market("BTC"), [], updates),
+        _fake_market_maker(_fake_market("ETH"), eth_orders, updates)
+    ]
+    oracle_provider = FakeOracleProvider({"BTC/USDC": Decimal(35000), "ETH/USDC": Decimal(2500)})
+    actual = MarketMakerRunner(fake_context(), fake_wallet(), oracle_provider, market_makers, timedelta(seconds=1))
+    actual.run_once()
+
+    assert len(oracle_provider.fetch_prices_calls) == 1
+    assert [[token.symbol for token in tokens] for tokens in fetched] == [["BTC", "USDC", "ETH"]]
+    assert [(symbol, price.mid_price, orders) for symbol, price, orders in updates] == [
+        ("BTC/USDC", Decimal(35000), []),
+        ("ETH/USDC", Decimal(2500), eth_orders)
+    ]
+
+
+def test_run_once_skips_markets_without_prices_and_survives_failures(monkeypatch):
+    monkeypatch.setattr(mango.TokenValue, "fetch_total_values", _fake_fetch_total_values([]))
+
+    updates: typing.List[typing.Tuple[str, mango.Price, typing.List[mango.Order]]] = []
+    market_makers = [
+        _fake_market_maker(_fake_market("FAIL"), [], updates),
+        _fake_market_maker(_fake_market("BTC"), [], updates),
+        _fake_market_maker(_fake_market("ETH"), [], updates)
+    ]
+    oracle_provider = FakeOracleProvider({"FAIL/USDC": Decimal(1), "ETH/USDC": Decimal(2500)})
+    actual = MarketMakerRunner(fake_context(), fake_wallet(), oracle_provider, market_makers, timedelta(seconds=1))
+    actual.run_once()
+
+    assert [symbol for symbol, _, _ in updates] == ["ETH/USDC"]
+
+
+def test_duplicate_markets_are_rejected():
+    updates: typing.List[typing.Tuple[str, mango.Price, typing.List[mango.Order]]] = []
+    market_makers = [
+        _fake_market_maker(_fake_market("BTC"), [], updates),
+        _fake_market_maker(_fake_market("ETH"), [], updates),
+        _fake_market_maker(_fake_market("BTC"), [], updates)
+    ]
+    with pytest.raises(Exception, match="duplicated: BTC/USDC"):
+        MarketMakerRunner(fake_context(), fake_wallet(), FakeOracleProvider({}), market_makers, timedelta(seconds=1))
+
+
+def test_shared_tokens_are_split_between_market_makers():
+    updates: typing.List[typing.Tuple[str, mango.Price, typing.List[mango.Order]]] = []
+    btc = _fake_market("BTC")
+    eth = _fake_market("ETH")
+    market_makers = [_fake_market_maker(btc, [], updates), _fake_market_maker(eth, [], updates)]
+    actual = MarketMakerRunner(fake_context(), fake_wallet(), FakeOracleProvider({}), market_makers, timedelta(seconds=1))
+    inventory = [mango.TokenValue(btc.base, Decimal(2)), mango.TokenValue(_QUOTE, Decimal(1000)),
+                 mango.TokenValue(eth.base, Decimal(30))]
+
+    shared = actual.share_inventory(inventory)
+    assert [(value.token.symbol, value.value) for value in shared["BTC/USDC"]] == [("BTC", 2), ("USDC", 500)]
+    assert [(value.token.symbol, value.value) for value in shared["ETH/USDC"]] == [("ETH", 30), ("USDC", 500)]
+
+
+def test_start_survives_failed_iterations_and_cleans_up():
+    updates: typing.List[typing.Tuple[str, mango.Price, typing.List[mango.Order]]] = []
+    market_maker = _fake_market_maker(_fake_market("BTC"), [], updates)
+    cleanups: typing.List[int] = []
+    setattr(market_maker, "cleanup", lambda: cleanups.append(1))
+    actual = MarketMakerRunner(fake_context(), fake_wallet(), FakeOracleProvider({}), [market_maker], timedelta(seconds=0))
+    iterations: typing.List[int] = []
+
+    def _run_once():
+        iterations.append(1)
+        if len(iterations) == 2:
+            actual.stop()
+        raise Exception("Test failure")
+
+    setattr(actual, "run_once", _run_once)
+    actual.start()
+
+    assert len(iterations) == 2
+    assert len(cleanups) == 2
@@ -0,0 +1,94 @@
+from .context import mango
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import pytest
+import requests
+
+from mango.client import TooManyRequestsRateLimitException
+
+
+def test_counter_with_labels():
+    registry = mango.MetricsRegistry()
+    counter = registry.counter("test_requests_total", "Test requests.", ["method"])
+    counter.labels("getAccountInfo").inc()
+    counter.labels("getAccountInfo").inc(2)
+    counter.labels("getBalance").inc()
+
+    rendered = registry.render()
+    assert "# TYPE test_requests_total counter" in rendered
+    assert 'test_requests_total{method="getAccountInfo"} 3.0' in rendered
+    assert 'test_requests_total{method="getBalance"} 1.0' in rendered
+
+
+def test_counter_cannot_decrease():
+    counter = mango.MetricsRegistry().counter("test_total", "Test.")
+    with pytest.raises(Exception):
+        counter.inc(-1)
+
+
+def test_gauge():
+    registry = mango.MetricsRegistry()
+    gauge = registry.gauge("test_accounts", "Test accounts.")
+    gauge.set(10)
+    gauge.dec(3)
+
+    assert "test_accounts 7.0" in registry.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = mango.MetricsRegistry()
+    histogram = registry.histogram("test_seconds", "Test seconds.", ["method"], buckets=[0.1, 1.0])
+    for value in [0.05, 0.1, 0.5, 5.0]:
+        histogram.labels("test").observe(value)
+
+    rendered = registry.render()
+    assert 'test_seconds_bucket{method="test",le="0.1"} 2' in rendered
+    assert 'test_seconds_bucket{method="test",le="1.0"} 3' in rendered
+    assert 'test_seconds_bucket{method="test",le="+Inf"} 4' in rendered
+    assert 'test_seconds_sum{method="test"} 5.65' in rendered
+    assert 'test_seconds_count{method="test"} 4' in rendered
+
+
+def test_registering_twice_returns_the_same_metric():
+    registry = mango.MetricsRegistry()
+    counter = registry.counter("test_total", "Test.")
+    assert registry.counter("test_total", "Test.") is counter
+    with pytest.raises(Exception):
+        registry.gauge("test_total", "Test.")
+
+
+def test_wrong_number_of_label_values_is_an_error():
+    counter = mango.MetricsRegistry().counter("test_total", "Test.", ["method"])
+    with pytest.raises(Exception):
+        counter.inc()
+
+
+def test_server_serves_metrics():
+    registry = mango.MetricsRegistry()
+    registry.counter("test_total", "Test.").inc()
+    with mango.MetricsServer(registry, 0, "127.0.0.1") as server:
+        response = requests.get(f"http://127.0.0.1:{server.port}/metrics")
+        missing = requests.get(f"http://127.0.0.1:{server.port}/other")
+
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain")
+    assert "test_total 1.0" in response.text
+    assert missing.status_code == 404
+
+
+def test_rpc_requests_are_measured():
+    context = fake_mainnet_context()
+    registry = mango.default_metrics_registry
+    requests_seconds = registry.histogram("mango_rpc_request_seconds", "")
+    rate_limited = registry.counter("mango_rpc_rate_limited_total", "")
+    count_before = requests_seconds.labels("getAccountInfo").count
+    rate_limited_before = rate_limited.labels("getAccountInfo", "too_many_requests").value
+
+    with StandInRpcServer(fake_group_snapshot(context, 1), max_requests_per_second=1) as server:
+        standin_context = server.context_for(context)
+        with pytest.raises(TooManyRequestsRateLimitException):
+            for _ in range(3):
+                mango.AccountInfo.load(standin_context, standin_context.group_id)
+
+    assert requests_seconds.labels("getAccountInfo").count > count_before
+    assert rate_limited.labels("getAccountInfo", "too_many_requests").value == rate_limited_before + 1
@@ -1,7 +1,11 @@
 from .context import mango
 
+import threading
+import time
 import typing
 
+from datetime import timedelta
+
 
 class MockNotificationTarget(mango.NotificationTarget):
     def __init__(self):
@@ -82,6 +86,125 @@ def test_filtering_notification_target():
     assert(mock.send_notification_called)
 
 
+class RecordingNotificationTarget(mango.NotificationTarget):
+    def __init__(self, maximum_message_length: int = 0, minimum_send_interval: timedelta = timedelta(seconds=0)):
+        super().__init__()
+        self.maximum_message_length = maximum_message_length
+        self.minimum_send_interval = minimum_send_interval
+        self.release = threading.Event()
+        self.release.set()
+        self.sent: typing.List[typing.Any] = []
+        self.sent_at: typing.List[float] = []
+
+    def send_notification(self, item: typing.Any) -> None:
+        self.release.wait()
+        self.sent += [item]
+        self.sent_at += [time.monotonic()]
+
+
+def test_background_notification_target_does_not_block():
+    recording = RecordingNotificationTarget()
+    recording.release.clear()
+    background = mango.BackgroundNotificationTarget(recording, timedelta(seconds=0))
+    started_at = time.monotonic()
+    background.send("first")
+    background.send("second")
+    assert time.monotonic() - started_at < 0.5
+    recording.release.set()
+    background.stop()
+    assert recording.sent == ["first", "second"]
+
+
+def test_background_notification_target_combines_within_window():
+    recording = RecordingNotificationTarget(maximum_message_length=11)
+    background = mango.BackgroundNotificationTarget(recording, timedelta(seconds=10))
+    background.send("one")
+    background.send("two")
+    background.send("three")
+    background.stop()
+    assert recording.sent == ["one\ntwo", "three"]
+
+
+def test_background_notification_target_respects_rate_limit():
+    recording = RecordingNotificationTarget(minimum_send_interval=timedelta(seconds=0.1))
+    background = mango.BackgroundNotificationTarget(recording, timedelta(seconds=0))
+    background.send("one")
+    background.send("two")
+    background.send("three")
+    background.stop()
+    assert recording.sent == ["one", "two", "three"]
+    assert recording.sent_at[1] - recording.sent_at[0] >= 0.1
+    assert recording.sent_at[2] - recording.sent_at[1] >= 0.1
+
+
+def test_background_notification_target_summarises_overflow():
+    recording = RecordingNotificationTarget(maximum_message_length=1000)
+    background = mango.BackgroundNotificationTarget(recording, timedelta(seconds=10), max_queue_size=2)
+    for counter in range(5):
+        background.send(f"message {counter}")
+    assert background.dropped == 3
+    background.stop()
+    assert len(recording.sent) == 1
+    assert recording.sent[0].startswith("message 0\nmessage 1\n3 notification(s) dropped")
+
+
+class UnprintableItem:
+    def __str__(self) -> str:
+        raise Exception("Can't print this")
+
+
+def test_background_notification_target_survives_unprintable_items():
+    recording = RecordingNotificationTarget(maximum_message_length=1000)
+    background = mango.BackgroundNotificationTarget(recording, timedelta(seconds=0))
+    background.send(UnprintableItem())
+    time.sleep(0.1)
+    background.send("later")
+    background.stop()
+    assert recording.sent == ["later"]
+
+
+class SlowFailingNotificationTarget(mango.NotificationTarget):
+    def __init__(self):
+        super().__init__()
+        self.sent: typing.List[typing.Any] = []
+
+    def send_notification(self, item: typing.Any) -> None:
+        time.sleep(0.1)
+        if item == "fail":
+            raise Exception("Test failure")
+        self.sent += [item]
+
+    def __str__(self) -> str:
+        return "Slow failing notifications"
+
+
+def test_background_notification_target_measures_inner_sends():
+    registry = mango.default_metrics_registry
+    seconds = registry.histogram("mango_notification_seconds", "", ["target"])
+    errors = registry.counter("mango_notification_errors_total", "", ["target"])
+    count_before = seconds.labels("SlowFailingNotificationTarget").count
+    sum_before = seconds.labels("SlowFailingNotificationTarget").sum
+    errors_before = errors.labels("SlowFailingNotificationTarget").value
+    background_count_before = seconds.labels("BackgroundNotificationTarget").count
+
+    inner = SlowFailingNotificationTarget()
+    background = mango.BackgroundNotificationTarget(inner, timedelta(seconds=0))
+    background.send("succeed")
+    background.send("fail")
+    time.sleep(0.5)
+
+    # The failure mustn't stop the worker sending later notifications.
+    assert background._worker.is_alive()
+    background.send("later")
+    background.stop()
+    assert inner.sent == ["succeed", "later"]
+
+    assert seconds.labels("SlowFailingNotificationTarget").count == count_before + 3
+    assert seconds.labels("SlowFailingNotificationTarget").sum - sum_before >= 0.3
+    assert errors.labels("SlowFailingNotificationTarget").value == errors_before + 1
+    assert seconds.labels("BackgroundNotificationTarget").count == background_count_before
+
+
 def test_parse_subscription_target():
     telegram_target = mango.parse_subscription_target(
         "telegram:012345678@9876543210:ABCDEFGHijklmnop-qrstuvwxyzABCDEFGH")
@@ -0,0 +1,135 @@
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key
+from .rpcstandin import AccountSnapshot, StandInRpcServer, fake_mainnet_context
+
+import types
+import typing
+
+from datetime import datetime
+from decimal import Decimal
+from mango.oracles.ftx import ftx
+from mango.oracles.pythnetwork import pythnetwork
+from mango.oracles.serum import serum
+
+
+def _fake_market(symbol: str) -> mango.SpotMarket:
+    base = mango.Token(symbol, f"{symbol} Token", fake_seeded_public_key(f"{symbol} token"), Decimal(6))
+    quote = mango.Token("USDC", "USDC Token", fake_seeded_public_key("USDC token"), Decimal(6))
+    return mango.SpotMarket(base, quote, fake_seeded_public_key(f"{symbol} spot market"))
+
+
+def _fake_price(market: mango.Market, price: Decimal) -> mango.Price:
+    return mango.Price(mango.OracleSource("Fake", "Fake", market), datetime.now(), market, price, price, price)
+
+
+class FakeOracle(mango.Oracle):
+    def __init__(self, market: mango.Market, price: Decimal):
+        super().__init__(f"Fake Oracle for {market.symbol}", market)
+        self.price = price
+
+    def fetch_price(self, context: mango.Context) -> mango.Price:
+        return _fake_price(self.market, self.price)
+
+    def to_streaming_observable(self, context: mango.Context):
+        raise NotImplementedError()
+
+
+class FakeOracleProvider(mango.OracleProvider):
+    def __init__(self, prices: typing.Dict[str, Decimal]):
+        super().__init__("Fake Oracle Factory")
+        self.prices = prices
+
+    def oracle_for_market(self, context: mango.Context, market: mango.Market) -> typing.Optional[mango.Oracle]:
+        if market.symbol not in self.prices:
+            return None
+        return FakeOracle(market, self.prices[market.symbol])
+
+    def all_available_symbols(self, context: mango.Context) -> typing.Sequence[str]:
+        return list(self.prices.keys())
+
+
+def test_default_fetch_prices_skips_markets_without_oracles():
+    provider = FakeOracleProvider({"BTC/USDC": Decimal(35000), "ETH/USDC": Decimal(2500)})
+    markets = [_fake_market("BTC"), _fake_market("SOL"), _fake_market("ETH")]
+    actual = provider.fetch_prices(fake_context(), markets)
+    assert [price.market.symbol for price in actual] == ["BTC/USDC", "ETH/USDC"]
+    assert [price.mid_price for price in actual] == [Decimal(35000), Decimal(2500)]
+
+
+def test_serum_fetch_prices_uses_two_requests(monkeypatch):
+    markets = [_fake_market("BTC"), _fake_market("ETH"), _fake_market("SOL")]
+    snapshot = AccountSnapshot()
+    for counter, market in enumerate(markets):
+        snapshot.add(market.address, fake_seeded_public_key("DEX"), bytes([counter]))
+        snapshot.add(fake_seeded_public_key(f"{market.symbol} bids"), fake_seeded_public_key("DEX"), bytes([counter, 1]))
+        snapshot.add(fake_seeded_public_key(f"{market.symbol} asks"), fake_seeded_public_key("DEX"), bytes([counter, 2]))
+
+    def _fake_market_state(program_id, base_decimals, quote_decimals, data):
+        symbol = markets[data[0]].symbol
+        return types.SimpleNamespace(bids=lambda: fake_seeded_public_key(f"{symbol} bids"),
+                                     asks=lambda: fake_seeded_public_key(f"{symbol} asks"))
+
+    def _fake_price_from_order_book_data(oracle, market_state, bids_data, asks_data):
+        assert bids_data[0] == asks_data[0] == markets.index(oracle.spot_market)
+        assert (bids_data[1], asks_data[1]) == (1, 2)
+        return _fake_price(oracle.spot_market, Decimal(bids_data[0]))
+
+    monkeypatch.setattr(serum.PySerumMarketState, "from_bytes", _fake_market_state)
+    monkeypatch.setattr(serum, "PySerumMarket", lambda client, state: types.SimpleNamespace(state=state))
+    monkeypatch.setattr(serum.SerumOracle, "_price_from_order_book_data", _fake_price_from_order_book_data)
+
+    with StandInRpcServer(snapshot) as server:
+        standin_context = server.context_for(fake_mainnet_context())
+        actual = serum.SerumOracleProvider().fetch_prices(standin_context, markets)
+
+    assert server.request_counts["getMultipleAccounts"] == 2
+    assert [price.market for price in actual] == markets
+    assert [price.mid_price for price in actual] == [Decimal(0), Decimal(1), Decimal(2)]
+
+
+def test_pyth_fetch_prices_loads_all_price_accounts_at_once(monkeypatch):
+    markets = [_fake_market("BTC"), _fake_market("DOGE"), _fake_market("ETH")]
+    snapshot = AccountSnapshot()
+    products = []
+    for counter, symbol in enumerate(["BTC", "ETH", "SOL"]):
+        price_address = fake_seeded_public_key(f"{symbol} price")
+        snapshot.add(price_address, fake_seeded_public_key("Pyth"), bytes([counter]))
+        products += [types.SimpleNamespace(attr={"symbol": f"{symbol}/USD"}, px_acc=price_address,
+                                           address=fake_seeded_public_key(f"{symbol} product"))]
+
+    def _fake_price_from_account_info(oracle, price_account_info):
+        return _fake_price(oracle.market, Decimal(price_account_info.data[0]))
+
+    monkeypatch.setattr(pythnetwork.PythOracleProvider, "_fetch_all_pyth_products", lambda self, context, address: products)
+    monkeypatch.setattr(pythnetwork.PythOracle, "_price_from_account_info", _fake_price_from_account_info)
+
+    with StandInRpcServer(snapshot) as server:
+        standin_context = server.context_for(fake_mainnet_context())
+        monkeypatch.setattr(standin_context, "new_from_cluster", lambda cluster: standin_context)
+        provider = pythnetwork.PythOracleProvider(fake_seeded_public_key("Pyth mapping"))
+        actual = provider.fetch_prices(standin_context, markets)
+
+    assert server.request_counts["getMultipleAccounts"] == 1
+    assert [price.market.symbol for price in actual] == ["BTC/USDC", "ETH/USDC"]
+    assert [price.mid_price for price in actual] == [Decimal(0), Decimal(1)]
+
+
+def test_ftx_fetch_prices_uses_one_request(monkeypatch):
+    urls: typing.List[str] = []
+
+    def _fake_ftx_get_from_url(url: str) -> typing.List[typing.Dict]:
+        urls.append(url)
+        return [
+            {"name": "BTC/USDC", "bid": 34990, "ask": 35010, "price": 35000},
+            {"name": "ETH/USDC", "bid": 2499, "ask": 2501, "price": 2500}
+        ]
+
+    monkeypatch.setattr(ftx, "_ftx_get_from_url", _fake_ftx_get_from_url)
+
+    markets = [_fake_market("ETH"), _fake_market("DOGE"), _fake_market("BTC")]
+    actual = ftx.FtxOracleProvider().fetch_prices(fake_context(), markets)
+
+    assert urls == ["https://ftx.com/api/markets"]
+    assert [price.market.symbol for price in actual] == ["ETH/USDC", "BTC/USDC"]
+    assert [price.top_bid for price in actual] == [Decimal(2499), Decimal(34990)]
+    assert [price.mid_price for price in actual] == [Decimal(2500), Decimal(35000)]
@@ -0,0 +1,50 @@
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key, fake_wallet
+
+import typing
+
+from decimal import Decimal
+from solana.account import Account
+from solana.system_program import TransferParams, transfer
+from solana.transaction import TransactionInstruction
+
+
+class RejectingTransactionBatcher(mango.TransactionBatcher):
+    def __init__(self, rejected: typing.Sequence[TransactionInstruction]):
+        super().__init__(fake_context(), fake_wallet())
+        self.rejected: typing.Sequence[TransactionInstruction] = rejected
+        self.sent: typing.List[typing.Sequence[TransactionInstruction]] = []
+
+    def send(self, instructions: typing.Sequence[TransactionInstruction], signers: typing.Sequence[Account] = []) -> typing.List[str]:
+        if any([instruction in self.rejected for instruction in instructions]):
+            raise Exception("Transaction rejected")
+        self.sent += [instructions]
+        return ["signature"]
+
+
+def _fake_cancel(seed: str) -> typing.Tuple[mango.Order, TransactionInstruction]:
+    order = mango.Order(id=len(seed), side=mango.Side.BUY, price=Decimal(1), size=Decimal(1))
+    wallet = fake_wallet()
+    return order, transfer(TransferParams(from_pubkey=wallet.address, to_pubkey=fake_seeded_public_key(seed), lamports=1))
+
+
+def _order_placer(batcher: mango.TransactionBatcher) -> mango.SerumOrderPlacer:
+    # Skips the constructor, which needs to load the market and OpenOrders accounts.
+    actual = mango.SerumOrderPlacer.__new__(mango.SerumOrderPlacer)
+    mango.OrderPlacer.__init__(actual)
+    actual.batcher = batcher
+    return actual
+
+
+def test_serum_cancels_are_sent_together():
+    cancels = [_fake_cancel("one"), _fake_cancel("three")]
+    batcher = RejectingTransactionBatcher([])
+    _order_placer(batcher)._send_cancels(cancels)
+    assert batcher.sent == [[cancels[0][1], cancels[1][1]]]
+
+
+def test_serum_rejected_cancel_does_not_stop_the_others():
+    cancels = [_fake_cancel("one"), _fake_cancel("three"), _fake_cancel("fifteen")]
+    batcher = RejectingTransactionBatcher([cancels[1][1]])
+    _order_placer(batcher)._send_cancels(cancels)
+    assert batcher.sent == [[cancels[0][1]], [cancels[2][1]]]
@@ -0,0 +1,57 @@
+from .context import mango
+
+import atexit
+import os
+import os.path
+import signal
+import tempfile
+import time
+
+
+def busy_for(seconds: float) -> int:
+    total = 0
+    cutoff = time.time() + seconds
+    while time.time() < cutoff:
+        total += sum(range(100))
+    return total
+
+
+def test_samples_running_functions():
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "profile.folded")
+        profiler = mango.SamplingProfiler(filename, interval=0.001, top=5)
+        profiler.start()
+        busy_for(0.2)
+        profiler.stop()
+        profiler.write()
+
+        with open(filename) as folded_file:
+            folded = folded_file.read()
+        with open(f"{filename}.top.txt") as summary_file:
+            summary = summary_file.read()
+
+    assert profiler.sample_count > 0
+    assert "busy_for (test_profiler.py:" in folded
+    for line in folded.strip().split("\n"):
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert stack.startswith("MainThread;") or ";" in stack
+    assert "busy_for (test_profiler.py:" in summary
+    assert len(profiler.hot_functions()) <= 5
+
+
+def test_sigusr1_writes_profile():
+    previous_handler = signal.getsignal(signal.SIGUSR1)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "profile.folded")
+        profiler = mango.SamplingProfiler(filename, interval=0.001).install()
+        try:
+            busy_for(0.05)
+            os.kill(os.getpid(), signal.SIGUSR1)
+            busy_for(0.05)
+            assert os.path.isfile(filename)
+            assert os.path.isfile(f"{filename}.top.txt")
+        finally:
+            profiler.stop()
+            atexit.unregister(profiler._stop_and_write)
+            signal.signal(signal.SIGUSR1, previous_handler)
@@ -0,0 +1,108 @@
+from .context import mango
+from .fakes import fake_deposit_transaction_response, fake_seeded_public_key
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import os.path
+import pytest
+import tempfile
+
+
+def replaying_context(context: mango.Context, filename: str) -> mango.Context:
+    replaying = mango.Context(context.cluster, context.cluster_url, context.program_id, context.dex_program_id,
+                              context.group_name, context.group_id)
+    replaying.client = mango.BetterClient(mango.ReplayingClient("Test", context.cluster, filename))
+    return replaying
+
+
+def test_records_requests_and_responses():
+    context = fake_mainnet_context()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "recording.jsonl.gz")
+        with StandInRpcServer(fake_group_snapshot(context, 10)) as server:
+            standin_context = server.context_for(context)
+            recorder = mango.RpcRecorder(filename)
+            standin_context.client.compatible_client.recorder = recorder
+            group = mango.Group.load(standin_context)
+            group.fetch_token_prices(standin_context)
+            recorder.close()
+
+        recorded = mango.RpcRecorder.load(filename)
+
+    assert recorder.count == 2
+    assert [exchange["method"] for exchange in recorded] == ["getAccountInfo", "getMultipleAccounts"]
+    assert recorded[0]["request"]["params"][0] == str(context.group_id)
+    assert recorded[0]["status"] == 200
+    assert recorded[0]["elapsed"] > 0
+
+
+def test_replays_recorded_responses():
+    context = fake_mainnet_context()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "recording.jsonl.gz")
+        with StandInRpcServer(fake_group_snapshot(context, 20, ripe_fraction=0.25)) as server:
+            standin_context = server.context_for(context)
+            recorder = mango.RpcRecorder(filename)
+            standin_context.client.compatible_client.recorder = recorder
+            group = mango.Group.load(standin_context)
+            ripe = mango.MarginAccount.load_ripe(standin_context, group)
+            recorder.close()
+
+        # The server has stopped, so everything has to come from the recording.
+        replaying = replaying_context(context, filename)
+        replayed_group = mango.Group.load(replaying)
+        replayed_ripe = mango.MarginAccount.load_ripe(replaying, replayed_group)
+
+        # Requests can be replayed more than once.
+        replayed_again = mango.MarginAccount.load_ripe(replaying, replayed_group)
+
+    assert replayed_group.address == group.address
+    assert [str(account.address) for account in replayed_ripe] == [str(account.address) for account in ripe]
+    assert len(replayed_again) == len(ripe)
+
+
+def test_replays_batch_requests_with_new_ids():
+    context = fake_mainnet_context()
+    signatures = ["signature 1", "signature 2", "signature 3"]
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "recording.jsonl.gz")
+        with StandInRpcServer(fake_group_snapshot(context, 1)) as server:
+            for slot, signature in enumerate(signatures):
+                server.add_transaction(signature, fake_deposit_transaction_response(context, signature, slot, 100))
+            standin_context = server.context_for(context)
+            recorder = mango.RpcRecorder(filename)
+            standin_context.client.compatible_client.recorder = recorder
+            standin_context.client.get_confirmed_transactions(signatures)
+            recorder.close()
+
+        replaying = replaying_context(context, filename)
+
+        # Use up some request IDs so the replayed IDs differ from the recorded ones.
+        with pytest.raises(Exception, match="No recorded response"):
+            replaying.client.get_recent_blockhash()
+        replayed = replaying.client.get_confirmed_transactions(signatures)
+
+    assert [response["transaction"]["signatures"][0] for response in replayed] == signatures
+
+
+def test_replay_misses_raise_unless_lenient():
+    context = fake_mainnet_context()
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "recording.jsonl.gz")
+        with StandInRpcServer(fake_group_snapshot(context, 1)) as server:
+            standin_context = server.context_for(context)
+            recorder = mango.RpcRecorder(filename)
+            standin_context.client.compatible_client.recorder = recorder
+            mango.AccountInfo.load(standin_context, context.group_id)
+            recorder.close()
+
+        replaying = replaying_context(context, filename)
+        with pytest.raises(mango.ReplayMissException):
+            mango.AccountInfo.load(replaying, fake_seeded_public_key("not recorded"))
+
+        lenient = mango.ReplayingClient("Test", context.cluster, filename, strict=False)
+        replaying.client = mango.BetterClient(lenient)
+        replayed = mango.AccountInfo.load(replaying, fake_seeded_public_key("not recorded"))
+
+    # The lenient client answers with the group's account, but says it's done so.
+    assert replayed is not None
+    assert lenient.misses == 1
@@ -0,0 +1,119 @@
+from .context import mango
+from .fakes import fake_seeded_public_key
+from .rpcstandin import AccountSnapshot, StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import datetime
+import os.path
+import pytest
+import tempfile
+import threading
+import time
+import typing
+
+from mango.client import TooManyRequestsRateLimitException, TooMuchBandwidthRateLimitException
+from solana.account import Account
+from solana.system_program import TransferParams, transfer
+from solana.transaction import Transaction
+
+
+def test_snapshot_save_and_load():
+    context = fake_mainnet_context()
+    snapshot = fake_group_snapshot(context, 10)
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "snapshot.json")
+        snapshot.save(filename)
+        loaded = AccountSnapshot.load(filename)
+
+    assert len(loaded) == len(snapshot)
+    assert loaded.get(str(context.group_id)) == snapshot.get(str(context.group_id))
+
+
+def test_load_ripe_from_standin():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 20, ripe_fraction=0.25)) as server:
+        standin_context = server.context_for(context)
+        group = mango.Group.load(standin_context)
+        ripe = mango.MarginAccount.load_ripe(standin_context, group)
+
+    assert len(group.basket_tokens) == 5
+    assert len(ripe) == 5
+    assert server.request_counts["getProgramAccounts"] == 2
+    assert server.request_counts["getMultipleAccounts"] == 1
+
+
+def test_latency_is_added():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 1), latency=datetime.timedelta(seconds=0.1)) as server:
+        standin_context = server.context_for(context)
+        started_at = time.time()
+        mango.AccountInfo.load(standin_context, standin_context.group_id)
+        assert time.time() - started_at >= 0.1
+
+
+def test_too_many_multiple_accounts_is_an_error():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 1), max_multiple_accounts=2) as server:
+        standin_context = server.context_for(context)
+        addresses = [fake_seeded_public_key(f"account {counter}") for counter in range(3)]
+        with pytest.raises(Exception, match="Too many inputs provided; max 2"):
+            standin_context.client.get_multiple_accounts(list(map(str, addresses)))
+
+
+def test_too_many_requests_is_rate_limited():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 1), max_requests_per_second=1) as server:
+        standin_context = server.context_for(context)
+        with pytest.raises(TooManyRequestsRateLimitException):
+            for _ in range(3):
+                mango.AccountInfo.load(standin_context, standin_context.group_id)
+    assert server.rate_limited_count > 0
+
+
+def test_too_much_bandwidth_is_rate_limited():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 1), max_bytes_per_second=100) as server:
+        standin_context = server.context_for(context)
+        with pytest.raises(TooMuchBandwidthRateLimitException):
+            mango.AccountInfo.load(standin_context, standin_context.group_id)
+
+
+def test_send_transaction_is_recorded():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 1)) as server:
+        standin_context = server.context_for(context)
+        sender = Account()
+        transaction = Transaction().add(transfer(TransferParams(from_pubkey=sender.public_key(),
+                                                                to_pubkey=fake_seeded_public_key("recipient"),
+                                                                lamports=1)))
+        signature = standin_context.client.send_transaction(transaction, sender)
+        confirmed = standin_context.client.get_confirmed_transaction(signature)
+
+    assert signature in server.sent_transactions
+    assert confirmed["transaction"]["signatures"] == [signature]
+
+
+def test_account_subscription_receives_updates():
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 1)) as server:
+        standin_context = server.context_for(context)
+        received: typing.List[bytes] = []
+        received_event = threading.Event()
+
+        def on_next(data: bytes) -> None:
+            received.append(data)
+            received_event.set()
+
+        subscription = mango.WebSocketAccountSubscription(
+            standin_context, standin_context.group_id, lambda account_info: account_info.data)
+        subscription.publisher.subscribe(on_next=on_next)
+        subscription.open()
+        try:
+            cutoff = time.time() + 5
+            while server.request_counts["accountSubscribe"] == 0 and time.time() < cutoff:
+                time.sleep(0.01)
+            server.update_account(standin_context.group_id, bytes([1, 2, 3]))
+            assert received_event.wait(5)
+        finally:
+            subscription.close()
+
+    assert received == [bytes([1, 2, 3])]
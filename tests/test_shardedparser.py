@@ -0,0 +1,39 @@
+from .context import mango
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import logging
+import os
+
+
+def lengths_in_shard(shared_memory_name: str, first_index: int, offsets, multiplier: int):
+    return [(index, len(item) * multiplier, os.getpid()) for index, item in mango.ShardedParser.items(shared_memory_name, first_index, offsets)]
+
+
+def test_map_spreads_items_across_processes():
+    items = [b"x" * counter for counter in range(100)]
+    results = mango.get_sharded_parser(2).map(lengths_in_shard, items, 3)
+
+    assert [(index, length) for index, length, _ in results] == [(index, index * 3) for index in range(100)]
+    # Which worker picks up which shard is up to the pool, so only check the work was done
+    # outside this process.
+    pids = {pid for _, _, pid in results}
+    assert os.getpid() not in pids
+    assert mango.get_sharded_parser(2) is mango.get_sharded_parser(2)
+    assert mango.get_sharded_parser(2).map(lengths_in_shard, [], 3) == []
+
+
+def test_sharded_load_ripe_matches_single_process(caplog):
+    caplog.set_level(logging.INFO)
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, 600, ripe_fraction=0.05)) as server:
+        standin_context = server.context_for(context)
+        group = mango.Group.load(standin_context)
+        expected = mango.MarginAccount.load_ripe(standin_context, group)
+        standin_context.parse_processes = 2
+        sharded = mango.MarginAccount.load_ripe(standin_context, group)
+
+    assert len(expected) == 30
+    assert [str(margin_account.address) for margin_account in sharded] == [str(margin_account.address) for margin_account in expected]
+    assert "could be ripe after parsing in 2 processes" in caplog.text
+    installed = [len([oo for oo in margin_account.open_orders_accounts if oo is not None]) for margin_account in sharded]
+    assert installed == [len([oo for oo in margin_account.open_orders_accounts if oo is not None]) for margin_account in expected]
@@ -0,0 +1,217 @@
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key, fake_wallet
+
+import pytest
+import threading
+import time
+import typing
+
+from datetime import datetime, timedelta
+from decimal import Decimal
+from mango.marketmaking.simplemarketmaker import SimpleMarketMaker
+from rx.subject import Subject
+
+
+class FakeOrderPlacer(mango.OrderPlacer):
+    def __init__(self):
+        super().__init__()
+        self.orders: typing.List[mango.Order] = []
+        self.load_count: int = 0
+        self.cancel_and_place_calls: typing.List[typing.Tuple[typing.Sequence[mango.Order], typing.Sequence[mango.Order]]] = []
+        self._next_id: int = 1
+
+    def cancel_order(self, order: mango.Order) -> None:
+        raise NotImplementedError()
+
+    def place_order(self, side: mango.Side, order_type: mango.OrderType, price: Decimal, size: Decimal) -> mango.Order:
+        raise NotImplementedError()
+
+    def load_my_orders(self) -> typing.List[mango.Order]:
+        self.load_count += 1
+        return list(self.orders)
+
+    def cancel_and_place(self, to_cancel: typing.Sequence[mango.Order], order_type: mango.OrderType, to_place: typing.Sequence[mango.Order]) -> typing.Sequence[mango.Order]:
+        self.cancel_and_place_calls += [(to_cancel, to_place)]
+        placed = [order._replace(id=self._next_id + counter) for counter, order in enumerate(to_place)]
+        self._next_id += len(to_place)
+        self.orders = [order for order in self.orders if order not in to_cancel] + placed
+        return placed
+
+
+class FakeStreamingOracle(mango.Oracle):
+    def __init__(self, market: mango.Market):
+        super().__init__("Fake Streaming Oracle", market)
+        self.source = mango.OracleSource("Fake", "Fake Streaming Oracle", market)
+        self.prices = Subject()
+
+    def fetch_price(self, context: mango.Context) -> mango.Price:
+        raise NotImplementedError()
+
+    def to_streaming_observable(self, context: mango.Context):
+        return self.prices
+
+    def emit(self, price: Decimal) -> None:
+        self.prices.on_next(mango.Price(self.source, datetime.now(), self.market, price, price, price))
+
+
+class FakeOpenOrders:
+    def __init__(self, client_ids: typing.Sequence[int], base_token_free: Decimal = Decimal(0)):
+        self.client_ids: typing.List[Decimal] = [Decimal(client_id) for client_id in client_ids]
+        self.base_token_free: Decimal = base_token_free
+        self.base_token_total: Decimal = base_token_free
+        self.quote_token_free: Decimal = Decimal(0)
+        self.quote_token_total: Decimal = Decimal(0)
+
+
+def _fake_market() -> mango.SpotMarket:
+    base = mango.Token("BASE", "Base Token", fake_seeded_public_key("base token"), Decimal(6))
+    quote = mango.Token("QUOTE", "Quote Token", fake_seeded_public_key("quote token"), Decimal(6))
+    return mango.SpotMarket(base, quote, fake_seeded_public_key("spot market"))
+
+
+def _fake_market_maker() -> typing.Tuple[SimpleMarketMaker, FakeOrderPlacer, FakeStreamingOracle, typing.List[int]]:
+    market = _fake_market()
+    order_placer = FakeOrderPlacer()
+    oracle = FakeStreamingOracle(market)
+    market_maker = SimpleMarketMaker(fake_context(), fake_wallet(), market, order_placer, oracle,
+                                     Decimal("0.01"), Decimal("0.1"), Decimal("0.0001"), timedelta(seconds=1))
+    inventory_loads: typing.List[int] = []
+
+    def _fetch_inventory() -> typing.List[mango.TokenValue]:
+        inventory_loads.append(1)
+        return [mango.TokenValue(market.base, Decimal(10)), mango.TokenValue(market.quote, Decimal(1000))]
+
+    setattr(market_maker, "fetch_inventory", _fetch_inventory)
+    return market_maker, order_placer, oracle, inventory_loads
+
+
+def _wait_for(condition: typing.Callable[[], bool], timeout: float = 5.0) -> None:
+    stop_at = time.time() + timeout
+    while not condition():
+        if time.time() > stop_at:
+            raise Exception("Timed out waiting for condition.")
+        time.sleep(0.01)
+
+
+def _start_reactive(market_maker: SimpleMarketMaker, fills: Subject, debounce: timedelta) -> threading.Thread:
+    thread = threading.Thread(target=lambda: market_maker.start_reactive(fills, debounce), daemon=True)
+    thread.start()
+    return thread
+
+
+def test_on_fill_ignores_placement_but_not_partial_fills():
+    market_maker, order_placer, oracle, inventory_loads = _fake_market_maker()
+    market_maker._cached_orders = [mango.Order(id=1, side=mango.Side.BUY, price=Decimal(99), size=Decimal(1))]
+    market_maker._state_stale = False
+
+    # The first update with our new order's client ID is just the order being placed.
+    market_maker._on_fill(FakeOpenOrders([1]))
+    assert not market_maker._state_stale
+
+    # Same client ID, same balances - nothing's happened.
+    market_maker._on_fill(FakeOpenOrders([1]))
+    assert not market_maker._state_stale
+
+    # Same client ID but the balances have changed - the order has been partly filled.
+    market_maker._on_fill(FakeOpenOrders([1], Decimal("0.5")))
+    assert market_maker._state_stale
+
+    # The order's gone - it's been completely filled.
+    market_maker._state_stale = False
+    market_maker._on_fill(FakeOpenOrders([]))
+    assert market_maker._state_stale
+
+
+def test_failed_requote_marks_state_stale():
+    market_maker, order_placer, oracle, inventory_loads = _fake_market_maker()
+    market_maker._latest_price = mango.Price(oracle.source, datetime.now(), oracle.market,
+                                             Decimal(100), Decimal(100), Decimal(100))
+
+    def _fail(to_cancel, order_type, to_place):
+        raise Exception("Transaction failed")
+
+    setattr(order_placer, "cancel_and_place", _fail)
+    with pytest.raises(Exception):
+        market_maker._requote()
+    assert market_maker._state_stale
+
+    # The next requote reloads the orders rather than trusting the cache.
+    delattr(order_placer, "cancel_and_place")
+    market_maker._requote()
+    assert order_placer.load_count == 2
+    assert not market_maker._state_stale
+
+
+def test_buy_size_is_limited_by_quote_tokens():
+    market_maker, order_placer, oracle, inventory_loads = _fake_market_maker()
+    price = mango.Price(oracle.source, datetime.now(), oracle.market, Decimal(100), Decimal(100), Decimal(100))
+    inventory = [mango.TokenValue(oracle.market.base, Decimal(10)), mango.TokenValue(oracle.market.quote, Decimal(500))]
+    buy_size, sell_size = market_maker.calculate_order_sizes(price, inventory)
+    assert buy_size == Decimal("0.5")
+    assert sell_size == Decimal(1)
+
+
+def test_reactive_debounces_prices():
+    market_maker, order_placer, oracle, inventory_loads = _fake_market_maker()
+    fills = Subject()
+    thread = _start_reactive(market_maker, fills, timedelta(seconds=0.2))
+    _wait_for(lambda: oracle.prices.observers != [])
+
+    for price in range(100, 110):
+        oracle.emit(Decimal(price))
+    _wait_for(lambda: len(order_placer.cancel_and_place_calls) > 0)
+    time.sleep(0.5)
+
+    # The ten prices arrived well within one debounce period, so at most two were quoted (if a
+    # sample happened to fall while they were arriving) and the last quote used the last price.
+    assert len(order_placer.cancel_and_place_calls) <= 2
+    bids = [order.price for order in order_placer.orders if order.side == mango.Side.BUY]
+    assert bids == [Decimal(109) - (Decimal(109) * Decimal("0.01"))]
+
+    market_maker.stop()
+    thread.join(5)
+
+
+def test_reactive_reloads_state_only_after_fills():
+    market_maker, order_placer, oracle, inventory_loads = _fake_market_maker()
+    fills = Subject()
+    thread = _start_reactive(market_maker, fills, timedelta(seconds=0.05))
+    _wait_for(lambda: oracle.prices.observers != [])
+
+    oracle.emit(Decimal(100))
+    _wait_for(lambda: len(order_placer.cancel_and_place_calls) == 1)
+    assert len(inventory_loads) == 1
+    load_count = order_placer.load_count
+
+    # A new price requotes from the cached inventory and orders.
+    oracle.emit(Decimal(110))
+    _wait_for(lambda: len(order_placer.cancel_and_place_calls) == 2)
+    assert len(inventory_loads) == 1
+    assert order_placer.load_count == load_count
+
+    # A partial fill leaves the same orders open but reloads the inventory and orders.
+    client_ids = [int(order.id) for order in order_placer.orders]
+    fills.on_next(FakeOpenOrders(client_ids))
+    fills.on_next(FakeOpenOrders(client_ids, Decimal(1)))
+    _wait_for(lambda: len(inventory_loads) == 2)
+    assert order_placer.load_count == load_count + 1
+
+    market_maker.stop()
+    thread.join(5)
+
+
+def test_reactive_stop_cancels_orders_and_unsubscribes():
+    market_maker, order_placer, oracle, inventory_loads = _fake_market_maker()
+    fills = Subject()
+    thread = _start_reactive(market_maker, fills, timedelta(seconds=0.05))
+    _wait_for(lambda: oracle.prices.observers != [])
+
+    oracle.emit(Decimal(100))
+    _wait_for(lambda: len(order_placer.orders) == 2)
+
+    market_maker.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert order_placer.orders == []
+    assert oracle.prices.observers == []
+    assert fills.observers == []
@@ -0,0 +1,127 @@
+from .context import mango
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import os.path
+import pytest
+import struct
+import tempfile
+
+from decimal import Decimal
+from solana.publickey import PublicKey
+
+
+def test_capture_save_and_open():
+    context = fake_mainnet_context()
+    account_snapshot = fake_group_snapshot(context, 30, ripe_fraction=0.2)
+    with StandInRpcServer(account_snapshot) as server:
+        standin_context = server.context_for(context)
+        group = mango.Group.load(standin_context)
+        expected_prices = group.fetch_token_prices(standin_context)
+        expected_ripe = mango.MarginAccount.load_ripe(standin_context, group)
+        captured = mango.Snapshot.capture(standin_context)
+
+    # 1 group, 30 margin accounts, 10 open orders accounts and the oracles.
+    assert len(captured) == 1 + 30 + 10 + len(group.markets)
+    assert captured.slot == account_snapshot.slot
+
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "group.snapshot")
+        captured.save(filename)
+        snapshot = mango.Snapshot.open(filename)
+        try:
+            assert snapshot.filename == filename
+            assert snapshot.slot == captured.slot
+            assert len(snapshot) == len(captured)
+
+            group_account_info = snapshot.group_account_info()
+            assert isinstance(group_account_info.data, memoryview)
+            loaded_group = snapshot.load_group(context)
+            assert loaded_group.address == group.address
+            assert loaded_group.maint_coll_ratio == Decimal("1.1")
+
+            prices = snapshot.load_prices(context, loaded_group)
+            assert [price.value for price in prices] == [price.value for price in expected_prices]
+
+            margin_accounts = snapshot.load_margin_accounts(loaded_group)
+            assert len(margin_accounts) == 30
+            ripe = mango.MarginAccount.filter_out_unripe(margin_accounts, loaded_group, prices)
+            assert sorted(str(margin_account.address) for margin_account in ripe) == sorted(
+                str(margin_account.address) for margin_account in expected_ripe)
+            assert sum(len([oo for oo in margin_account.open_orders_accounts if oo is not None])
+                       for margin_account in margin_accounts) == 10
+
+            open_orders_account_infos = snapshot.open_orders_account_infos()
+            address, account_info = next(iter(open_orders_account_infos.items()))
+            open_orders = mango.OpenOrders.parse(account_info, Decimal(6), Decimal(6))
+            assert str(open_orders.address) == address
+            assert open_orders.quote_token_total == Decimal(1)
+        finally:
+            snapshot.close()
+
+
+def test_capture_records_each_account_slot(monkeypatch):
+    context = fake_mainnet_context()
+    account_snapshot = fake_group_snapshot(context, 10, ripe_fraction=0.2)
+    group_slot = account_snapshot.slot
+    with StandInRpcServer(account_snapshot) as server:
+        standin_context = server.context_for(context)
+        compatible_client = standin_context.client.compatible_client
+        post = compatible_client._post
+
+        # Each request is answered a slot later than the one before.
+        def _post_and_advance(method, headers, data):
+            response = post(method, headers, data)
+            account_snapshot.slot += 1
+            return response
+
+        monkeypatch.setattr(compatible_client, "_post", _post_and_advance)
+        captured = mango.Snapshot.capture(standin_context)
+
+    group = captured.load_group(context)
+    margin_accounts = captured.load_margin_accounts(group)
+    assert captured.slot == group_slot
+    assert captured.account_slot(context.group_id) == group_slot
+    assert {captured.account_slot(margin_account.address) for margin_account in margin_accounts} == {group_slot + 1}
+    assert {captured.account_slot(account_info.address) for account_info in captured.open_orders_account_infos().values()} == {group_slot + 2}
+    assert {captured.account_slot(market.oracle) for market in group.markets} == {group_slot + 3}
+    assert captured.slot_range == (group_slot, group_slot + 3)
+    assert captured.account_slot(context.program_id) is None
+
+    reloaded = mango.Snapshot(bytes(captured))
+    assert reloaded.slot_range == captured.slot_range
+    assert reloaded.account_slot(group.markets[0].oracle) == group_slot + 3
+
+
+def test_reads_version_1_files():
+    context = fake_mainnet_context()
+    account_info = fake_group_snapshot(context, 1).account_info(str(context.group_id))
+    header = struct.pack("<8sHHQI", b"MANGOSNP", 1, 0, 9, 1)
+    entry = struct.pack("<32s32sBB6xQQQI4x", bytes(account_info.address), bytes(account_info.owner),
+                        mango.SnapshotAccountKind.GROUP, account_info.executable, int(account_info.lamports),
+                        int(account_info.rent_epoch), len(header) + 104, len(account_info.data))
+    snapshot = mango.Snapshot(header + entry + bytes(account_info.data))
+
+    assert snapshot.version == 1
+    assert snapshot.account_slot(context.group_id) == 9
+    assert snapshot.slot_range == (9, 9)
+    assert snapshot.load_group(context).address == context.group_id
+
+
+def test_lookup_by_address():
+    context = fake_mainnet_context()
+    account_snapshot = fake_group_snapshot(context, 10)
+    accounts = [(mango.SnapshotAccountKind.MARGIN_ACCOUNT, account_snapshot.account_info(address))
+                for address in account_snapshot.accounts.keys()]
+    snapshot = mango.Snapshot(mango.Snapshot.build(7, accounts))
+
+    assert snapshot.slot == 7
+    for address in account_snapshot.accounts.keys():
+        account_info = snapshot.account_info(PublicKey(address))
+        assert account_info is not None
+        assert bytes(account_info.data) == bytes(account_snapshot.account_info(address).data)
+    assert snapshot.account_info(context.program_id) is None
+
+
+def test_rejects_other_data():
+    with pytest.raises(Exception):
+        mango.Snapshot(b"NOTASNAP" + bytes(100))
@@ -0,0 +1,73 @@
+from .context import mango
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import numpy
+
+from decimal import Decimal
+
+
+def load_fake_group(margin_account_count: int = 50):
+    context = fake_mainnet_context()
+    with StandInRpcServer(fake_group_snapshot(context, margin_account_count, ripe_fraction=0.3)) as server:
+        snapshot = mango.Snapshot.capture(server.context_for(context))
+    group = snapshot.load_group(context)
+    return group, snapshot.load_prices(context, group), snapshot.load_margin_accounts(group)
+
+
+def shocked(prices, multipliers):
+    return [mango.TokenValue(price.token, price.value * Decimal(str(multiplier))) for price, multiplier in zip(prices, multipliers)]
+
+
+def test_columns_match_balance_sheets():
+    group, _, margin_accounts = load_fake_group(10)
+    columns = mango.MarginAccountColumns.from_margin_accounts(group, margin_accounts)
+
+    assert len(columns) == 10
+    assert columns.assets.shape == (10, len(group.basket_tokens))
+    for row, margin_account in enumerate(margin_accounts):
+        balance_sheets = margin_account.get_intrinsic_balance_sheets(group)
+        assert list(columns.assets[row]) == [float(sheet.assets) for sheet in balance_sheets]
+        assert list(columns.liabilities[row]) == [float(sheet.liabilities) for sheet in balance_sheets]
+
+
+def test_matches_liquidatable_reports():
+    group, prices, margin_accounts = load_fake_group()
+    columns = mango.MarginAccountColumns.from_margin_accounts(group, margin_accounts)
+    shocks = [0.0, -0.1, 0.1, -0.3]
+    scenarios = mango.StressScenarios.uniform(prices, shocks)
+    result = mango.StressTester(group, columns, chunk_size=3).run(scenarios)
+
+    assert len(scenarios) == 4
+    assert scenarios.prices[:, -1].tolist() == [1.0] * 4
+    for index, shock in enumerate(shocks):
+        scenario_prices = shocked(prices, [1 + shock] * (len(prices) - 1) + [1])
+        reports = [mango.LiquidatableReport.build(group, scenario_prices, margin_account, Decimal(0))
+                   for margin_account in margin_accounts]
+        liquidatable = [report for report in reports if report.state & mango.LiquidatableState.LIQUIDATABLE]
+        ripe = [report for report in reports if report.state & mango.LiquidatableState.RIPE]
+        assert result.liquidatable_counts[index] == len(liquidatable)
+        assert result.ripe_counts[index] == len(ripe)
+        expected_assets = sum(float(report.balance_sheet.assets) for report in liquidatable)
+        assert numpy.isclose(result.liquidatable_assets[index], expected_assets, rtol=1e-6)
+
+    # Borrows are all in non-quote tokens, so prices falling can only help.
+    assert result.liquidatable_counts[1] <= result.liquidatable_counts[0] <= result.liquidatable_counts[2]
+    assert result.account_liquidatable_counts.sum() == result.liquidatable_counts.sum()
+
+
+def test_per_token_and_random_scenarios():
+    group, prices, margin_accounts = load_fake_group(20)
+    columns = mango.MarginAccountColumns.from_margin_accounts(group, margin_accounts)
+    per_token = mango.StressScenarios.per_token(prices, [-0.5, 0.5])
+    assert len(per_token) == 2 * (len(prices) - 1)
+    assert per_token.descriptions[1] == f"{prices[0].token.symbol} +50.0%"
+    assert per_token.prices[1, 0] == float(prices[0].value) * 1.5
+    assert per_token.prices[1, 1] == float(prices[1].value)
+
+    random_scenarios = mango.StressScenarios.random(prices, 500, 0.2, seed=1)
+    result = mango.StressTester(group, columns).run(random_scenarios)
+    assert len(result.liquidatable_counts) == 500
+    assert (random_scenarios.prices > 0).all()
+    assert len(result.worst_scenarios(5)) == 5
+    assert result.liquidatable_assets[result.worst_scenarios(1)[0]] == result.liquidatable_assets.max()
+    assert "Worst 5 scenarios" in result.summary(5)
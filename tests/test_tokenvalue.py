@@ -1,7 +1,10 @@
+import typing
+
 from .context import mango
-from .fakes import fake_token
+from .fakes import fake_context, fake_seeded_public_key, fake_token
 
 from decimal import Decimal
+from solana.publickey import PublicKey
 
 
 def test_constructor():
@@ -12,3 +15,39 @@ def test_constructor():
     assert actual.logger is not None
     assert actual.token == token
     assert actual.value == value
+
+
+def fake_token_account_response(address: str, mint: PublicKey, amount: int) -> typing.Dict:
+    data = mango.layouts.TOKEN_ACCOUNT.build({"mint": mint, "owner": fake_seeded_public_key("owner"), "amount": amount})
+    return {
+        "pubkey": str(fake_seeded_public_key(address)),
+        "account": {
+            "executable": False,
+            "lamports": 2039280,
+            "owner": str(fake_seeded_public_key("token program")),
+            "rentEpoch": 200,
+            "data": mango.encode_binary(data)
+        }
+    }
+
+
+def test_fetch_total_values():
+    context = fake_context()
+    first = mango.Token("FIRST", "First Token", fake_seeded_public_key("first"), Decimal(6))
+    second = mango.Token("SECOND", "Second Token", fake_seeded_public_key("second"), Decimal(2))
+    missing = mango.Token("MISSING", "Missing Token", fake_seeded_public_key("missing"), Decimal(6))
+    context.client.compatible_client.token_accounts_by_owner = [
+        fake_token_account_response("account 1", first.mint, 1500000),
+        fake_token_account_response("account 2", first.mint, 250000),
+        fake_token_account_response("account 3", second.mint, 12345),
+        fake_token_account_response("account 4", fake_seeded_public_key("other"), 99)
+    ]
+
+    actual = mango.TokenValue.fetch_total_values(context, fake_seeded_public_key("owner"), [first, second, missing])
+    assert len(actual) == 3
+    assert actual[0].token == first
+    assert actual[0].value == Decimal("1.75")
+    assert actual[1].token == second
+    assert actual[1].value == Decimal("123.45")
+    assert actual[2].token == missing
+    assert actual[2].value == Decimal(0)
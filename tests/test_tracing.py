@@ -0,0 +1,116 @@
+from .context import mango
+from .rpcstandin import StandInRpcServer, fake_group_snapshot, fake_mainnet_context
+
+import os.path
+import pytest
+import tempfile
+import threading
+
+from decimal import Decimal
+
+
+def test_default_tracer_is_null():
+    assert isinstance(mango.get_tracer(), mango.NullTracer)
+    with mango.get_tracer().span("test") as span:
+        assert span is not None
+        span.set_attribute("ignored", 1)
+    assert mango.get_tracer().current_span() is None
+
+
+def test_nested_spans_share_trace():
+    tracer = mango.MemoryTracer()
+    with tracer.span("outer") as outer:
+        with tracer.span("inner", {"count": 3}) as inner:
+            assert tracer.current_span() is inner
+        assert tracer.current_span() is outer
+    assert tracer.current_span() is None
+
+    assert [span.name for span in tracer.spans] == ["inner", "outer"]
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_span_id == outer.span_id
+    assert outer.parent_span_id is None
+    assert inner.attributes == {"count": 3}
+    assert inner.status == mango.SpanStatus.OK
+    assert outer.end_time_ns is not None and outer.end_time_ns >= inner.end_time_ns
+
+
+def test_explicit_parent_across_threads():
+    tracer = mango.MemoryTracer()
+    with tracer.span("outer") as outer:
+        def work() -> None:
+            with tracer.span("on thread", parent=outer):
+                pass
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+    on_thread = tracer.spans[0]
+    assert on_thread.name == "on thread"
+    assert on_thread.trace_id == outer.trace_id
+    assert on_thread.parent_span_id == outer.span_id
+
+
+def test_exception_marks_span_as_error():
+    tracer = mango.MemoryTracer()
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError("Boom")
+
+    assert tracer.spans[0].status == mango.SpanStatus.ERROR
+    assert tracer.spans[0].status_message == "ValueError: Boom"
+
+
+def test_file_tracer_writes_otlp_json():
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "trace.jsonl")
+        tracer = mango.FileTracer(filename)
+        with tracer.span("outer", {"flag": True, "ratio": 1.5}):
+            with tracer.span("inner", {"count": 2, "name": "test"}):
+                pass
+        tracer.close()
+        spans = mango.FileTracer.load(filename)
+
+    assert [span["name"] for span in spans] == ["inner", "outer"]
+    inner, outer = spans
+    assert len(outer["traceId"]) == 32
+    assert len(outer["spanId"]) == 16
+    assert "parentSpanId" not in outer
+    assert inner["parentSpanId"] == outer["spanId"]
+    assert int(outer["endTimeUnixNano"]) >= int(outer["startTimeUnixNano"])
+    assert outer["status"] == {"code": mango.SpanStatus.OK}
+    attributes = {attribute["key"]: attribute["value"] for attribute in inner["attributes"]}
+    assert attributes["count"] == {"intValue": "2"}
+    assert attributes["name"] == {"stringValue": "test"}
+    outer_attributes = {attribute["key"]: attribute["value"] for attribute in outer["attributes"]}
+    assert outer_attributes["flag"] == {"boolValue": True}
+    assert outer_attributes["ratio"] == {"doubleValue": 1.5}
+
+
+def test_liquidation_is_traced():
+    context = fake_mainnet_context()
+    tracer = mango.MemoryTracer()
+    mango.set_tracer(tracer)
+    try:
+        with StandInRpcServer(fake_group_snapshot(context, 20, ripe_fraction=0.25)) as server:
+            standin_context = server.context_for(context)
+            group = mango.Group.load(standin_context)
+            prices = group.fetch_token_prices(standin_context)
+            ripe = mango.MarginAccount.load_ripe(standin_context, group)
+            liquidation_processor = mango.LiquidationProcessor(standin_context, "Test", mango.NullAccountLiquidator(),
+                                                               mango.NullWalletBalancer(), Decimal("0.01"))
+            liquidation_processor.update_margin_accounts(ripe)
+            liquidation_processor.update_prices(group, prices)
+    finally:
+        mango.set_tracer(mango.NullTracer())
+
+    spans_by_name = {span.name: span for span in tracer.spans}
+    assert "fetch_token_prices" in spans_by_name
+    assert spans_by_name["load_ripe"].attributes["ripe_accounts"] == len(ripe)
+
+    update_prices = spans_by_name["update_prices"]
+    assert update_prices.attributes["ripe_accounts"] == len(ripe)
+    assert spans_by_name["build_reports"].parent_span_id == update_prices.span_id
+    assert spans_by_name["liquidate_all"].parent_span_id == update_prices.span_id
+    liquidate_spans = [span for span in tracer.spans if span.name == "liquidate"]
+    assert len(liquidate_spans) == update_prices.attributes["worthwhile_accounts"]
+    assert all(span.parent_span_id == spans_by_name["liquidate_all"].span_id for span in liquidate_spans)
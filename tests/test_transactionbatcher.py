@@ -0,0 +1,50 @@
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key, fake_wallet
+
+from solana.system_program import TransferParams, transfer
+
+
+def _fake_transfer(wallet: mango.Wallet, seed: str):
+    return transfer(TransferParams(from_pubkey=wallet.address, to_pubkey=fake_seeded_public_key(seed), lamports=1))
+
+
+def test_constructor():
+    context = fake_context()
+    wallet = fake_wallet()
+    actual = mango.TransactionBatcher(context, wallet)
+    assert actual is not None
+    assert actual.logger is not None
+    assert actual.context == context
+    assert actual.wallet == wallet
+    assert actual.maximum_size == 1232
+
+
+def test_estimate_size_matches_serialized_size():
+    wallet = fake_wallet()
+    actual = mango.TransactionBatcher(fake_context(), wallet)
+    instructions = [_fake_transfer(wallet, "one"), _fake_transfer(wallet, "two")]
+    transaction = actual.pack(instructions)[0]
+    transaction.recent_blockhash = mango.transactionbatcher._DUMMY_BLOCKHASH
+    transaction.sign(wallet.account)
+    assert actual.estimate_size(instructions) == len(transaction.serialize())
+
+
+def test_pack_fits_everything_in_one_transaction():
+    wallet = fake_wallet()
+    actual = mango.TransactionBatcher(fake_context(), wallet)
+    instructions = [_fake_transfer(wallet, str(index)) for index in range(5)]
+    transactions = actual.pack(instructions)
+    assert len(transactions) == 1
+    assert transactions[0].instructions == instructions
+
+
+def test_pack_splits_in_order_when_too_large():
+    wallet = fake_wallet()
+    actual = mango.TransactionBatcher(fake_context(), wallet)
+    instructions = [_fake_transfer(wallet, str(index)) for index in range(40)]
+    transactions = actual.pack(instructions)
+    assert len(transactions) > 1
+    repacked = [instruction for transaction in transactions for instruction in transaction.instructions]
+    assert repacked == instructions
+    for transaction in transactions:
+        assert actual.estimate_size(transaction.instructions) <= 1232
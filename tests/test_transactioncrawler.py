@@ -0,0 +1,70 @@
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key
+
+import random
+import time
+import typing
+
+
+class FakeSignaturesClient:
+    def __init__(self, signatures: typing.List[str]):
+        self.signatures = signatures
+        self.signature_requests: typing.List[typing.Tuple[typing.Optional[str], typing.Optional[str]]] = []
+
+    def get_confirmed_signatures_for_address2(self, account, before=None, limit=None, until=None) -> typing.Sequence[str]:
+        self.signature_requests += [(before, until)]
+        start = 0 if before is None else self.signatures.index(before) + 1
+        page = self.signatures[start:start + limit]
+        if until in page:
+            page = page[:page.index(until)]
+        return page
+
+
+class SlowBatchCrawler(mango.TransactionCrawler):
+    def __init__(self, context: mango.Context, batch_size: int, max_in_flight: int):
+        super().__init__(context, fake_seeded_public_key("address"), page_size=4,
+                         batch_size=batch_size, max_in_flight=max_in_flight)
+        self.batches: typing.List[typing.List[str]] = []
+
+    def _fetch_batch(self, signatures: typing.List[str]) -> typing.Sequence[typing.Optional[typing.Dict]]:
+        self.batches += [signatures]
+        # Make batches complete out of order.
+        time.sleep(random.random() / 20)
+        return [None if signature.endswith("5") else {"signature": signature} for signature in signatures]
+
+
+def test_fetch_signatures_pages_through_history():
+    context = fake_context()
+    all_signatures = [f"signature {index}" for index in range(10)]
+    client = FakeSignaturesClient(all_signatures)
+    context.client = client  # type: ignore
+    actual = mango.TransactionCrawler(context, fake_seeded_public_key("address"), page_size=4)
+    assert list(actual.fetch_signatures()) == all_signatures
+    assert client.signature_requests == [(None, None), ("signature 3", None), ("signature 7", None)]
+
+
+def test_fetch_signatures_resumes():
+    context = fake_context()
+    all_signatures = [f"signature {index}" for index in range(10)]
+    context.client = FakeSignaturesClient(all_signatures)  # type: ignore
+    actual = mango.TransactionCrawler(context, fake_seeded_public_key("address"), page_size=4)
+    assert list(actual.fetch_signatures(until="signature 6")) == all_signatures[:6]
+    assert list(actual.fetch_signatures(before="signature 6")) == all_signatures[7:]
+
+
+def test_load_responses_keeps_order():
+    context = fake_context()
+    all_signatures = [f"signature {index}" for index in range(23)]
+    context.client = FakeSignaturesClient(all_signatures)  # type: ignore
+    actual = SlowBatchCrawler(context, batch_size=3, max_in_flight=4)
+    results = list(actual.load_responses(actual.fetch_signatures()))
+
+    # Transactions that couldn't be loaded have a response of None.
+    assert [signature for signature, _ in results] == all_signatures
+    for signature, response in results:
+        if signature.endswith("5"):
+            assert response is None
+        else:
+            assert response == {"signature": signature}
+    assert len(actual.batches) == 8
+    assert actual.last_signature == "signature 22"
@@ -0,0 +1,61 @@
+from .context import mango
+from .fakes import fake_context, fake_deposit_transaction_response, fake_seeded_public_key
+
+import typing
+
+
+def fake_feed_context() -> mango.Context:
+    context = fake_context()
+    # Group name lookups need a real cluster, and there's no need to wait between retries.
+    context.cluster = "devnet"
+    context.retry_pauses = []
+    return context
+
+
+class FakeTransactionClient:
+    def __init__(self, responses: typing.Dict[str, typing.Optional[typing.Dict]]):
+        self.responses = responses
+        self.requests: typing.List[str] = []
+
+    def get_confirmed_transaction(self, signature: str) -> typing.Optional[typing.Dict]:
+        self.requests += [signature]
+        return self.responses.get(signature)
+
+
+def test_feed_publishes_decoded_transactions_once():
+    context = fake_feed_context()
+    response = fake_deposit_transaction_response(context, "signature", 3, 10)
+    client = FakeTransactionClient({"signature": response})
+    context.client = client  # type: ignore
+    store = mango.TransactionStore(context)
+
+    actual = mango.TransactionFeed(context, fake_seeded_public_key("group"), store)
+    received: typing.List[mango.TransactionScout] = []
+    actual.publisher.subscribe(on_next=received.append)
+
+    logs = {"signature": "signature", "err": None, "logs": []}
+    actual.subscription._on_item({"jsonrpc": "2.0", "method": "logsNotification",
+                                  "params": {"result": {"context": {"slot": 3}, "value": logs}, "subscription": 1}})
+    # Duplicate notification, say after a reconnection.
+    actual.subscription._on_item({"jsonrpc": "2.0", "method": "logsNotification",
+                                  "params": {"result": {"context": {"slot": 3}, "value": logs}, "subscription": 1}})
+    # Closing waits for in-flight loads to finish.
+    actual.close()
+
+    assert client.requests == ["signature"]
+    assert len(received) == 1
+    assert received[0].signatures == ["signature"]
+    assert "signature" in store
+
+
+def test_feed_skips_unavailable_transactions():
+    context = fake_feed_context()
+    context.client = FakeTransactionClient({})  # type: ignore
+
+    actual = mango.TransactionFeed(context, fake_seeded_public_key("group"))
+    received: typing.List[mango.TransactionScout] = []
+    actual.publisher.subscribe(on_next=received.append)
+    actual._on_logs({"signature": "missing", "err": None, "logs": []})
+    actual.close()
+
+    assert received == []
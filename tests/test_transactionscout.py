@@ -1,5 +1,7 @@
+import pytest
+
 from .context import mango
-from .fakes import fake_seeded_public_key, fake_token
+from .fakes import fake_context, fake_deposit_transaction_response, fake_seeded_public_key, fake_token
 
 from datetime import datetime
 from decimal import Decimal
@@ -51,3 +53,46 @@ def test_transaction_scout_constructor():
     assert actual.messages == messages
     assert actual.pre_token_balances == pre_token_balances
     assert actual.post_token_balances == post_token_balances
+
+
+def test_instruction_decoder_registry_decodes_variants():
+    actual = mango.InstructionDecoderRegistry()
+    deposit = mango.layouts.DEPOSIT.build({"quantity": 27})
+    borrow = mango.layouts.BORROW.build({"token_index": 2, "quantity": 5})
+
+    instruction_type, parsed = actual.decode(deposit)
+    assert instruction_type == mango.InstructionType.Deposit
+    assert parsed.quantity == Decimal(27)
+
+    decoded = actual.decode_many([deposit, borrow])
+    assert [instruction_type for instruction_type, _ in decoded] == [mango.InstructionType.Deposit, mango.InstructionType.Borrow]
+    assert decoded[1][1].token_index == Decimal(2)
+    assert decoded[1][1].quantity == Decimal(5)
+
+
+def test_instruction_decoder_registry_unknown_variant():
+    actual = mango.InstructionDecoderRegistry()
+    with pytest.raises(Exception):
+        actual.decode(bytes([99, 0, 0, 0]))
+
+
+def test_instruction_decoder_registry_reuses_public_keys():
+    actual = mango.InstructionDecoderRegistry()
+    encoded = str(fake_seeded_public_key("account"))
+    first = actual.public_key(encoded)
+    second = actual.public_keys([encoded])[0]
+    assert first == fake_seeded_public_key("account")
+    assert first is second
+
+
+def test_from_transaction_response_uses_registry():
+    context = fake_context()
+    context.cluster = "devnet"
+    response = fake_deposit_transaction_response(context, "signature", 1, 12)
+    decoder = mango.InstructionDecoderRegistry()
+    actual = mango.TransactionScout.from_transaction_response(context, response, decoder)
+    assert len(actual.instructions) == 1
+    assert actual.instructions[0].instruction_type == mango.InstructionType.Deposit
+    assert actual.instructions[0].instruction_data.quantity == Decimal(12)
+    assert actual.sender == fake_seeded_public_key("owner")
+    assert actual.accounts[0] is decoder.public_key(str(fake_seeded_public_key("group")))
@@ -0,0 +1,136 @@
+from .context import mango
+from .fakes import fake_context, fake_deposit_transaction_response, fake_seeded_public_key
+
+import typing
+
+from decimal import Decimal
+
+
+class FakeCrawlerClient:
+    def __init__(self, responses: typing.Dict[str, typing.Dict], signatures: typing.List[str]):
+        self.responses = responses
+        self.signatures = signatures
+
+    def get_confirmed_signatures_for_address2(self, account, before=None, limit=None, until=None) -> typing.Sequence[str]:
+        start = 0 if before is None else self.signatures.index(before) + 1
+        page = self.signatures[start:start + limit]
+        if until in page:
+            page = page[:page.index(until)]
+        return page
+
+    def get_confirmed_transactions(self, signatures: typing.Sequence[str]) -> typing.Sequence[typing.Optional[typing.Dict]]:
+        return [self.responses.get(signature) for signature in signatures]
+
+
+def fake_store_context() -> mango.Context:
+    context = fake_context()
+    # Group name lookups need a real cluster.
+    context.cluster = "devnet"
+    return context
+
+
+def test_sync_is_incremental():
+    context = fake_store_context()
+    responses = {f"signature {index}": fake_deposit_transaction_response(context, f"signature {index}", index, index * 10)
+                 for index in range(5)}
+    # Newest first, like getConfirmedSignaturesForAddress2.
+    client = FakeCrawlerClient(responses, ["signature 2", "signature 1", "signature 0"])
+    context.client = client  # type: ignore
+    crawler = mango.TransactionCrawler(context, fake_seeded_public_key("group"), page_size=2, batch_size=2)
+
+    actual = mango.TransactionStore(context)
+    added = list(actual.sync(crawler))
+    assert [transaction.signatures[0] for transaction in added] == ["signature 2", "signature 1", "signature 0"]
+    assert len(actual) == 3
+    assert actual.newest_signature(crawler.address) == "signature 2"
+
+    client.signatures = ["signature 4", "signature 3", "signature 2", "signature 1", "signature 0"]
+    added = list(actual.sync(crawler))
+    assert [transaction.signatures[0] for transaction in added] == ["signature 4", "signature 3"]
+    assert len(actual) == 5
+    assert actual.newest_signature(crawler.address) == "signature 4"
+
+    assert list(actual.sync(crawler)) == []
+
+
+def test_sync_commits_in_batches_and_resumes():
+    context = fake_store_context()
+    responses = {f"signature {index}": fake_deposit_transaction_response(context, f"signature {index}", index, index * 10)
+                 for index in range(7)}
+    client = FakeCrawlerClient(responses, [f"signature {index}" for index in range(4, -1, -1)])
+    context.client = client  # type: ignore
+    crawler = mango.TransactionCrawler(context, fake_seeded_public_key("group"), page_size=2, batch_size=2)
+
+    actual = mango.TransactionStore(context)
+    sync = actual.sync(crawler, commit_size=2)
+    # The first batch is committed before anything is yielded.
+    assert next(sync).signatures[0] == "signature 4"
+    assert len(actual) == 2
+    # Stopping partway through keeps what's been committed but doesn't mark the sync done.
+    sync.close()
+    assert actual.newest_signature(crawler.address) is None
+
+    # Two newer transactions arrive before the next sync. The interrupted backfill is finished
+    # first, then the newer transactions are fetched.
+    client.signatures = [f"signature {index}" for index in range(6, -1, -1)]
+    added = list(actual.sync(crawler, commit_size=2))
+    assert [transaction.signatures[0] for transaction in added] == [
+        "signature 2", "signature 1", "signature 0", "signature 6", "signature 5"]
+    assert len(actual) == 7
+    assert actual.newest_signature(crawler.address) == "signature 6"
+    assert list(actual.sync(crawler)) == []
+
+
+def test_load_oldest_first():
+    context = fake_store_context()
+    actual = mango.TransactionStore(context)
+    for index in range(5):
+        response = fake_deposit_transaction_response(context, f"signature {index}", index, index * 10)
+        actual.add(f"signature {index}", response, mango.TransactionScout.from_transaction_response(context, response))
+
+    # In the order a resumed sync yields them - the rest of the older range, then the newer one.
+    signatures = ["signature 1", "signature 0", "signature 4", "signature 3", "missing"]
+    loaded = list(actual.load_oldest_first(signatures))
+    assert [transaction.signatures[0] for transaction in loaded] == [
+        "signature 0", "signature 1", "signature 3", "signature 4"]
+
+
+def test_load_rebuilds_transaction_scout():
+    context = fake_store_context()
+    response = fake_deposit_transaction_response(context, "signature", 7, 25)
+    transaction_scout = mango.TransactionScout.from_transaction_response(context, response)
+
+    actual = mango.TransactionStore(context)
+    actual.add("signature", response, transaction_scout)
+    actual.add("signature", response, transaction_scout)
+    assert len(actual) == 1
+    assert "signature" in actual
+    assert "other signature" not in actual
+    assert actual.load("other signature") is None
+
+    loaded = actual.load("signature")
+    assert loaded is not None
+    assert loaded.signatures == ["signature"]
+    assert loaded.instructions[0].instruction_type == mango.InstructionType.Deposit
+    assert loaded.instructions[0].instruction_data.quantity == Decimal(25)
+
+
+def test_frames():
+    context = fake_store_context()
+    actual = mango.TransactionStore(context)
+    for index in range(3):
+        response = fake_deposit_transaction_response(context, f"signature {index}", index, index)
+        actual.add(f"signature {index}", response, mango.TransactionScout.from_transaction_response(context, response))
+
+    transactions = actual.transactions_frame()
+    assert list(transactions["signature"]) == ["signature 0", "signature 1", "signature 2"]
+    assert list(transactions["slot"]) == [0, 1, 2]
+    assert all(transactions["succeeded"])
+    assert all(transactions["sender"] == str(fake_seeded_public_key("owner")))
+
+    deposits = actual.instructions_frame(mango.InstructionType.Deposit)
+    assert len(deposits) == 3
+    assert list(deposits["parameters"]) == ["quantity: 0", "quantity: 1", "quantity: 2"]
+
+    assert len(actual.instructions_frame(mango.InstructionType.Withdraw)) == 0
+    assert len(actual.transactions_frame(sender=fake_seeded_public_key("someone else"))) == 0
@@ -1,7 +1,12 @@
+import datetime
 import pytest
+import threading
+import time
+import typing
 
 from .context import mango
-from .fakes import fake_token
+from .fakes import fake_context, fake_seeded_public_key, fake_token
+from .mocks import mock_group, BTC, ETH, SOL
 
 from decimal import Decimal
 from solana.publickey import PublicKey
@@ -153,3 +158,166 @@ def test_sort_changes_for_trades():
 
     assert(sorted_changes[0] == btc_sell)
     assert(sorted_changes[1] == eth_buy)
+
+
+class CountingWalletBalancer(mango.WalletBalancer):
+    def __init__(self):
+        self.calls: typing.List[typing.List[mango.TokenValue]] = []
+
+    def balance(self, prices: typing.List[mango.TokenValue]):
+        self.calls += [prices]
+
+
+def liquidation_event(eth_change: str, usdt_change: str) -> mango.LiquidationEvent:
+    before = [mango.TokenValue(ETH_TOKEN, Decimal(10)), mango.TokenValue(USDT_TOKEN, Decimal(1000))]
+    after = [mango.TokenValue(ETH_TOKEN, Decimal(10) + Decimal(eth_change)),
+             mango.TokenValue(USDT_TOKEN, Decimal(1000) + Decimal(usdt_change))]
+    return mango.LiquidationEvent(datetime.datetime.now(), "Test", "Group", True, ["signature"],
+                                  fake_seeded_public_key("wallet"), fake_seeded_public_key("margin account"),
+                                  before, after)
+
+
+def test_coalescing_wallet_balancer_nets_pending_changes():
+    actual = mango.CoalescingWalletBalancer(CountingWalletBalancer(), datetime.timedelta(minutes=5), Decimal(1000))
+    actual.on_liquidation(liquidation_event("1", "-100"))
+    actual.on_liquidation(liquidation_event("-0.5", "60"))
+    prices = [mango.TokenValue(ETH_TOKEN, Decimal(100)), mango.TokenValue(USDT_TOKEN, Decimal(1))]
+
+    assert actual.pending_changes[str(ETH_TOKEN.mint)].value == Decimal("0.5")
+    assert actual.pending_changes[str(USDT_TOKEN.mint)].value == Decimal(-40)
+    assert actual.pending_value(prices) == Decimal(90)
+
+
+def test_coalescing_wallet_balancer_coalesces_within_window():
+    inner = CountingWalletBalancer()
+    actual = mango.CoalescingWalletBalancer(inner, datetime.timedelta(minutes=5), Decimal(1000))
+    prices = [mango.TokenValue(ETH_TOKEN, Decimal(100)), mango.TokenValue(USDT_TOKEN, Decimal(1))]
+
+    # First call runs straight away because nothing has been balanced yet.
+    actual.on_liquidation(liquidation_event("1", "-100"))
+    actual.balance(prices)
+    assert len(inner.calls) == 1
+    assert len(actual.pending_changes) == 0
+
+    # Subsequent small changes within the window are held back.
+    actual.on_liquidation(liquidation_event("1", "-100"))
+    actual.balance(prices)
+    actual.on_liquidation(liquidation_event("1", "-100"))
+    actual.balance(prices)
+    assert len(inner.calls) == 1
+
+    # Until they're flushed.
+    actual.flush()
+    assert len(inner.calls) == 2
+    assert len(actual.pending_changes) == 0
+
+
+def test_coalescing_wallet_balancer_balances_above_threshold():
+    inner = CountingWalletBalancer()
+    actual = mango.CoalescingWalletBalancer(inner, datetime.timedelta(minutes=5), Decimal(1000))
+    prices = [mango.TokenValue(ETH_TOKEN, Decimal(100)), mango.TokenValue(USDT_TOKEN, Decimal(1))]
+    actual.balance(prices)
+    assert len(inner.calls) == 1
+
+    actual.on_liquidation(liquidation_event("10", "-1000"))
+    actual.balance(prices)
+    assert len(inner.calls) == 2
+    actual.flush()
+
+
+def test_coalescing_wallet_balancer_hands_trailing_balance_to_request_balance():
+    inner = CountingWalletBalancer()
+    actual = mango.CoalescingWalletBalancer(inner, datetime.timedelta(milliseconds=50), Decimal(1000))
+    requested = threading.Event()
+    actual.request_balance = lambda prices: requested.set()
+    prices = [mango.TokenValue(ETH_TOKEN, Decimal(100)), mango.TokenValue(USDT_TOKEN, Decimal(1))]
+    actual.balance(prices)
+
+    actual.on_liquidation(liquidation_event("1", "-100"))
+    actual.balance(prices)
+    assert requested.wait(5)
+
+    # The trailing balance is only requested, not run from the timer thread.
+    assert len(inner.calls) == 1
+    assert len(actual.pending_changes) == 2
+
+
+def test_plan_trades():
+    eth = mango.TokenValue(ETH_TOKEN, Decimal("-0.5"))
+    btc = mango.TokenValue(BTC_TOKEN, Decimal("-0.05"))
+    usdt = mango.TokenValue(USDT_TOKEN, Decimal(200))
+    unchanged = mango.TokenValue(fake_token(), Decimal(0))
+    sells, buys = mango.plan_trades([usdt, btc, unchanged, eth])
+    assert sells == [eth, btc]
+    assert buys == [usdt]
+
+
+def test_trade_record_slippage():
+    buy = mango.TradeRecord("ETH/USDT", mango.Side.BUY, Decimal(1), Decimal(2000), Decimal(2020), [], 0.5)
+    assert buy.slippage == Decimal("0.01")
+    sell = mango.TradeRecord("ETH/USDT", mango.Side.SELL, Decimal(1), Decimal(2000), Decimal(2020), [], 0.5)
+    assert sell.slippage == Decimal("-0.01")
+    unknown = mango.TradeRecord("ETH/USDT", mango.Side.SELL, Decimal(1), Decimal(2000), None, [], 0.5)
+    assert unknown.slippage is None
+
+
+class RecordingTradeExecutor(mango.TradeExecutor):
+    def __init__(self):
+        super().__init__()
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.maximum_in_flight = 0
+        self.trades: typing.List[str] = []
+
+    def _trade(self, side: str, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
+        with self.lock:
+            self.in_flight += 1
+            self.maximum_in_flight = max(self.maximum_in_flight, self.in_flight)
+        time.sleep(0.05)
+        with self.lock:
+            self.in_flight -= 1
+            self.trades += [f"{side} {symbol}"]
+            self.last_book_prices[symbol] = Decimal(100)
+        return [f"{side} {symbol} signature"]
+
+    def buy(self, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
+        return self._trade("BUY", symbol, quantity)
+
+    def sell(self, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
+        return self._trade("SELL", symbol, quantity)
+
+
+def test_live_wallet_balancer_sells_concurrently_then_buys():
+    group = mock_group()
+    trade_executor = RecordingTradeExecutor()
+    actual = mango.LiveWalletBalancer(fake_context(), {"fake": "Wallet"}, group, trade_executor,
+                                      Decimal("0.01"), [], [], max_concurrent_trades=2)
+    prices = [mango.TokenValue(ETH, Decimal(100)), mango.TokenValue(BTC, Decimal(100)), mango.TokenValue(SOL, Decimal(100))]
+    changes = [mango.TokenValue(SOL, Decimal(5)), mango.TokenValue(ETH, Decimal(-2)), mango.TokenValue(BTC, Decimal(-1))]
+    actual._make_changes(changes, prices)
+
+    assert trade_executor.maximum_in_flight == 2
+    assert trade_executor.trades[2] == "BUY SOL/USDC"
+    assert len(actual.trade_records) == 3
+    assert [record.side for record in actual.trade_records] == [mango.Side.SELL, mango.Side.SELL, mango.Side.BUY]
+    assert actual.trade_records[0].expected_price == Decimal(100)
+    assert actual.trade_records[0].slippage == Decimal(0)
+
+
+class UnpricedTradeExecutor(mango.TradeExecutor):
+    def buy(self, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
+        return []
+
+    def sell(self, symbol: str, quantity: Decimal) -> typing.Sequence[str]:
+        return []
+
+
+def test_live_wallet_balancer_ignores_earlier_book_prices():
+    trade_executor = UnpricedTradeExecutor()
+    trade_executor.last_book_prices["ETH/USDC"] = Decimal(50)
+    actual = mango.LiveWalletBalancer(fake_context(), {"fake": "Wallet"}, mock_group(), trade_executor,
+                                      Decimal("0.01"), [], [])
+    actual._make_changes([mango.TokenValue(ETH, Decimal(-2))], [mango.TokenValue(ETH, Decimal(100))])
+
+    assert actual.trade_records[0].book_price is None
+    assert actual.trade_records[0].slippage is None
@@ -0,0 +1,72 @@
+from .context import mango
+from .fakes import fake_context, fake_seeded_public_key
+
+import base64
+
+
+def test_account_subscription_constructor():
+    context = fake_context()
+    address = fake_seeded_public_key("account")
+    actual = mango.WebSocketAccountSubscription(context, address, lambda account_info: account_info)
+    assert actual is not None
+    assert actual.logger is not None
+    assert actual.context == context
+    assert actual.address == address
+    assert actual.publisher is not None
+
+
+def test_account_subscription_publishes_notifications():
+    address = fake_seeded_public_key("account")
+    actual = mango.WebSocketAccountSubscription(fake_context(), address, lambda account_info: account_info.data)
+    received = []
+    actual.publisher.subscribe(on_next=received.append)
+
+    # Subscription confirmations are not notifications and should be ignored.
+    actual._on_item({"jsonrpc": "2.0", "result": 23, "id": 1})
+    actual._on_item({
+        "jsonrpc": "2.0",
+        "method": "accountNotification",
+        "params": {
+            "result": {
+                "context": {"slot": 5199307},
+                "value": {
+                    "data": [base64.b64encode(bytes([1, 2, 3])).decode(), "base64"],
+                    "executable": False,
+                    "lamports": 33594,
+                    "owner": "11111111111111111111111111111111",
+                    "rentEpoch": 635
+                }
+            },
+            "subscription": 23
+        }
+    })
+
+    assert received == [bytes([1, 2, 3])]
+
+
+def test_logs_subscription_publishes_notifications():
+    address = fake_seeded_public_key("group")
+    actual = mango.WebSocketLogsSubscription(fake_context(), address)
+    assert "logsSubscribe" in actual.build_request()
+    assert str(address) in actual.build_request()
+
+    received = []
+    actual.publisher.subscribe(on_next=received.append)
+    actual._on_item({
+        "jsonrpc": "2.0",
+        "method": "logsNotification",
+        "params": {
+            "result": {
+                "context": {"slot": 5208469},
+                "value": {
+                    "signature": "5h6xBEauJ3PK6SWCZ1PGjBvj8vDdWG3KpwATGy1ARAXFSDwt8GFXM7W5Ncn16wmqokgpiKRLuS83KUxyZyv2sUYv",
+                    "err": None,
+                    "logs": ["BPF program 83astBRguLMdt2h5U1Tpdq5tjFoJ6noeGwaY3mDLVcri success"]
+                }
+            },
+            "subscription": 24040
+        }
+    })
+
+    assert len(received) == 1
+    assert received[0]["signature"] == "5h6xBEauJ3PK6SWCZ1PGjBvj8vDdWG3KpwATGy1ARAXFSDwt8GFXM7W5Ncn16wmqokgpiKRLuS83KUxyZyv2sUYv"